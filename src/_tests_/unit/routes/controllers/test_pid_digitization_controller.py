@@ -2,7 +2,7 @@
 # Licensed under the MIT license.
 import os
 import unittest
-from unittest.mock import MagicMock, patch, call
+from unittest.mock import ANY, AsyncMock, MagicMock, patch, call
 from parameterized import parameterized
 from fastapi import HTTPException
 import pytest
@@ -12,21 +12,67 @@ import datetime
 from app.models.graph_construction.graph_construction_response import GraphConstructionInferenceResponse
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
-from app.routes.controllers.pid_digitization_controller import detect_symbols, detect_text, \
+from app.routes.controllers.pid_digitization_controller import detect_symbols, detect_symbols_batch, detect_text, \
     detect_lines_and_construct_graph, process_line_detection_and_graph_construction_job,\
-    process_line_detection, get_inference_results, get_job_status, get_output_inference_images,\
-    persist_graph
+    process_line_detection, process_graph_construction, get_inference_results, get_job_status, get_output_inference_images,\
+    persist_graph, _update_job_status, _write_job_status, get_output_inference_image_tile, \
+    get_output_inference_image_region, get_output_inference_image_tiles_manifest
 from app.models.enums.inference_result import InferenceResult
 from app.models.bounding_box import BoundingBox
 from app.models.graph_construction.graph_construction_request import GraphConstructionInferenceRequest
 from app.models.line_detection.line_detection_response import LineDetectionInferenceResponse
 import app.queue_consumer as queue_consumer
-from app.models.bounding_box import BoundingBox
-from app.models.symbol_detection.symbol_detection_inference_response import SymbolDetectionInferenceResponse
-from app.models.bounding_box import BoundingBox
+from app.services.job_profiler import profile_stage
+from app.services.output_image_writer import OutputImageUploadError
+from app.models.enums.job_status import JobStatus
+from app.models.enums.job_step import JobStep
+from app.models.enums.line_detection_algorithm import LineDetectionAlgorithm
+from app.models.enums.output_image_rendering_mode import OutputImageRenderingMode
 from app.models.symbol_detection.symbol_detection_inference_response import SymbolDetectionInferenceResponse
 from app.models.image_response import ImageResponse
 import json
+import cv2
+import numpy as np
+from app.utils.image_tiles import build_image_pyramid
+from app.utils import document_utils
+from app.models.downloaded_blob import DownloadedBlob
+from app.routes.controllers import pid_digitization_controller
+import asyncio
+import tempfile
+
+
+class SyncBlobStorageClientAdapter:
+    '''Serves the async blob storage calls of the controller with the sync blob storage client patched by the tests.'''
+
+    async def upload_bytes(self, blob_name, data):
+        return pid_digitization_controller.blob_storage_client.upload_bytes(blob_name, data)
+
+    async def download_bytes(self, blob_name):
+        return pid_digitization_controller.blob_storage_client.download_bytes(blob_name)
+
+    async def download_bytes_if_exists(self, blob_name):
+        if not pid_digitization_controller.blob_storage_client.blob_exists(blob_name):
+            return None
+        return pid_digitization_controller.blob_storage_client.download_bytes(blob_name)
+
+    async def download_blob_if_exists(self, blob_name, if_none_match=None):
+        content = await self.download_bytes_if_exists(blob_name)
+        return None if content is None else DownloadedBlob(content=content)
+
+    async def blob_exists(self, blob_name):
+        return pid_digitization_controller.blob_storage_client.blob_exists(blob_name)
+
+
+_async_blob_storage_client_patcher = patch(
+    "app.routes.controllers.pid_digitization_controller.async_blob_storage_client", SyncBlobStorageClientAdapter())
+
+
+def setUpModule():
+    _async_blob_storage_client_patcher.start()
+
+
+def tearDownModule():
+    _async_blob_storage_client_patcher.stop()
 
 
 class TestDetectSymbols(unittest.IsolatedAsyncioTestCase):
@@ -64,6 +110,25 @@ class TestDetectSymbols(unittest.IsolatedAsyncioTestCase):
         build_output_image_path.assert_called_once_with(pid_id, InferenceResult.symbol_detection, InferenceResult.symbol_detection.value)
         run_inferencing.assert_called_once_with('123', bounding_box_inclusive, 0.5, b'123', output_image_path)
 
+    async def test_output_image_upload_error_throws_http_exception(self):
+        # arrange
+        image = MagicMock()
+        image.read = AsyncMock(return_value=b'123')
+        run_inferencing = AsyncMock(return_value={'label': []})
+        output_image_writer = MagicMock()
+        output_image_writes = output_image_writer.track_writes.return_value.__enter__.return_value
+        output_image_writes.wait.side_effect = OutputImageUploadError(['123/symbol-detection/output_123_symbol-detection.png'])
+
+        # act
+        with patch("app.routes.controllers.pid_digitization_controller.symbol_detection.run_inferencing", run_inferencing), \
+                patch("app.routes.controllers.pid_digitization_controller.output_image_writer", output_image_writer), \
+                pytest.raises(HTTPException) as e:
+            await detect_symbols('123', {'topX': 0.0, 'topY': 0.0, 'bottomX': 1.0, 'bottomY': 1.0}, image)
+
+        # assert
+        self.assertEqual(e.value.status_code, 500)
+        output_image_writes.wait.assert_called_once()
+
     async def test_invalid_bounding_box_inclusive_throws_http_exception(self):
         # arrange
         async def mock_image_read(*args):
@@ -98,6 +163,186 @@ class TestDetectSymbols(unittest.IsolatedAsyncioTestCase):
         assert e.value.detail == f'The bounding_box_inclusive_str JSON string value provided for P&ID image {pid_id} is invalid. Make sure that all coordinates (topX, topY, bottomX, bottomY) are present and in the range [0, 1].'
 
 
+def _encode_batch_image(width: int) -> bytes:
+    _, buffer = cv2.imencode('.png', np.zeros((10, width, 3), dtype=np.uint8))
+    return buffer.tobytes()
+
+
+def _encode_multi_page_tiff(widths: list[int]) -> bytes:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'document.tiff')
+        cv2.imwritemulti(path, [np.zeros((10, width, 3), dtype=np.uint8) for width in widths])
+        with open(path, 'rb') as f:
+            return f.read()
+
+
+def _create_upload_file(filename: str, content: bytes) -> MagicMock:
+    file = MagicMock()
+    file.filename = filename
+    file.read = AsyncMock(return_value=content)
+    return file
+
+
+class TestDetectSymbolsBatch(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.bounding_box_inclusive = {'topX': 0.0, 'topY': 0.0, 'bottomX': 1.0, 'bottomY': 1.0}
+        self.config = MagicMock()
+        self.config.inference_score_threshold = 0.5
+        self.config.symbol_detection_batch_max_sheets = 10
+        self.blob_storage_client = MagicMock()
+        self.output_image_writer = MagicMock()
+
+    def _create_result(self, pid_id: str) -> SymbolDetectionInferenceResponse:
+        return SymbolDetectionInferenceResponse(
+            image_url=f'{pid_id}.png',
+            image_details={'format': 'png', 'width': 10, 'height': 10},
+            bounding_box_inclusive=self.bounding_box_inclusive,
+            label=[])
+
+    async def _detect_symbols_batch(self, files, run_inferencing) -> list[dict]:
+        with patch("app.routes.controllers.pid_digitization_controller.symbol_detection.run_inferencing", run_inferencing), \
+            patch("app.routes.controllers.pid_digitization_controller.blob_storage_client", self.blob_storage_client), \
+            patch("app.routes.controllers.pid_digitization_controller.output_image_writer", self.output_image_writer), \
+                patch("app.routes.controllers.pid_digitization_controller.config", self.config):
+            response = await detect_symbols_batch('batch', self.bounding_box_inclusive, files)
+            return [json.loads(line) async for line in response.body_iterator]
+
+    async def test_happy_path_returns_result_per_sheet(self):
+        # arrange
+        async def mock_run_inferencing(pid_id, *args):
+            return self._create_result(pid_id)
+
+        run_inferencing = AsyncMock(side_effect=mock_run_inferencing)
+        files = [
+            _create_upload_file('first.png', _encode_batch_image(20)),
+            _create_upload_file('document.tiff', _encode_multi_page_tiff([30, 40])),
+        ]
+
+        # act
+        lines = await self._detect_symbols_batch(files, run_inferencing)
+
+        # assert
+        lines = sorted(lines, key=lambda line: line['index'])
+        self.assertEqual([line['index'] for line in lines], [0, 1, 2])
+        self.assertEqual([line['pid_id'] for line in lines], ['batch-0', 'batch-1', 'batch-2'])
+        self.assertEqual([line['status_code'] for line in lines], [200, 200, 200])
+        self.assertEqual([line['result']['image_url'] for line in lines], ['batch-0.png', 'batch-1.png', 'batch-2.png'])
+
+        # the pages of the tiff document are sent as png images
+        sheets = {call_args.args[0]: call_args.args[3] for call_args in run_inferencing.call_args_list}
+        self.assertEqual(sheets['batch-0'], files[0].read.return_value)
+        self.assertEqual([cv2.imdecode(np.frombuffer(sheets[pid_id], np.uint8), cv2.IMREAD_COLOR).shape[1]
+                          for pid_id in ['batch-1', 'batch-2']], [30, 40])
+        run_inferencing.assert_any_call('batch-1', self.bounding_box_inclusive, 0.5, ANY,
+                                        'batch-1/symbol-detection/output_batch-1_symbol-detection.png')
+
+        uploaded_blobs = {call_args.args[0]: call_args.args[1] for call_args in self.blob_storage_client.upload_bytes.call_args_list}
+        for pid_id in ['batch-0', 'batch-1', 'batch-2']:
+            self.assertEqual(uploaded_blobs[f'{pid_id}/symbol-detection/{pid_id}.png'], sheets[pid_id])
+            self.assertEqual(json.loads(uploaded_blobs[f'{pid_id}/symbol-detection/response.json']),
+                             self._create_result(pid_id).dict())
+        self.assertEqual(self.output_image_writer.track_writes.return_value.__enter__.return_value.wait.call_count, 3)
+
+    async def test_results_are_returned_as_sheets_complete(self):
+        # arrange
+        second_sheet_completed = asyncio.Event()
+
+        async def mock_run_inferencing(pid_id, *args):
+            if pid_id == 'batch-0':
+                await second_sheet_completed.wait()
+            else:
+                second_sheet_completed.set()
+            return self._create_result(pid_id)
+
+        files = [
+            _create_upload_file('first.png', _encode_batch_image(20)),
+            _create_upload_file('second.png', _encode_batch_image(30)),
+        ]
+
+        # act
+        lines = await self._detect_symbols_batch(files, AsyncMock(side_effect=mock_run_inferencing))
+
+        # assert
+        self.assertEqual([line['index'] for line in lines], [1, 0])
+
+    async def test_failed_sheet_does_not_fail_batch(self):
+        # arrange
+        async def mock_run_inferencing(pid_id, *args):
+            if pid_id == 'batch-1':
+                raise HTTPException(status_code=400, detail='error')
+            return self._create_result(pid_id)
+
+        files = [
+            _create_upload_file('first.png', _encode_batch_image(20)),
+            _create_upload_file('second.png', _encode_batch_image(30)),
+        ]
+
+        # act
+        lines = await self._detect_symbols_batch(files, AsyncMock(side_effect=mock_run_inferencing))
+
+        # assert
+        lines = sorted(lines, key=lambda line: line['index'])
+        self.assertEqual(lines[0]['status_code'], 200)
+        self.assertEqual(lines[1], {'index': 1, 'pid_id': 'batch-1', 'status_code': 400, 'result': None, 'detail': 'error'})
+        uploaded_blobs = [call_args.args[0] for call_args in self.blob_storage_client.upload_bytes.call_args_list]
+        self.assertNotIn('batch-1/symbol-detection/response.json', uploaded_blobs)
+
+    async def test_invalid_file_throws_http_exception(self):
+        # arrange
+        run_inferencing = AsyncMock()
+        files = [
+            _create_upload_file('first.png', _encode_batch_image(20)),
+            _create_upload_file('second.exe', b'test'),
+        ]
+
+        # act
+        with pytest.raises(HTTPException) as e:
+            await self._detect_symbols_batch(files, run_inferencing)
+
+        # assert
+        assert e.value.status_code == 400
+        run_inferencing.assert_not_called()
+
+    async def test_too_many_sheets_throws_http_exception(self):
+        # arrange
+        self.config.symbol_detection_batch_max_sheets = 2
+        run_inferencing = AsyncMock()
+        files = [
+            _create_upload_file('first.png', _encode_batch_image(20)),
+            _create_upload_file('document.tiff', _encode_multi_page_tiff([30, 40])),
+        ]
+
+        # act
+        with pytest.raises(HTTPException) as e:
+            await self._detect_symbols_batch(files, run_inferencing)
+
+        # assert
+        assert e.value.status_code == 400
+        assert e.value.detail == 'The batch batch has more than 2 sheets.'
+        run_inferencing.assert_not_called()
+
+    async def test_documents_over_the_sheets_left_in_the_batch_are_not_split(self):
+        # arrange
+        self.config.symbol_detection_batch_max_sheets = 3
+        run_inferencing = AsyncMock()
+        files = [
+            _create_upload_file('first.tiff', _encode_multi_page_tiff([20, 30])),
+            _create_upload_file('second.tiff', _encode_multi_page_tiff([30, 40])),
+        ]
+        split_document_pages = MagicMock(wraps=document_utils.split_document_pages)
+
+        # act
+        with patch("app.routes.controllers.pid_digitization_controller.document_utils.split_document_pages", split_document_pages):
+            with pytest.raises(HTTPException) as e:
+                await self._detect_symbols_batch(files, run_inferencing)
+
+        # assert
+        assert e.value.status_code == 400
+        assert e.value.detail == 'The batch batch has more than 3 sheets.'
+        self.assertEqual([call_args.args[1] for call_args in split_document_pages.call_args_list], [3, 1])
+        run_inferencing.assert_not_called()
+
+
 class TestDetectText(unittest.IsolatedAsyncioTestCase):
     async def test_happy_path_returns_text(self):
         # arrange
@@ -163,7 +408,12 @@ class TestDetectText(unittest.IsolatedAsyncioTestCase):
             return False
 
         pid_id = '123'
-        corrected_symbol_detection_results = {'label': []}
+        corrected_symbol_detection_results = SymbolDetectionInferenceResponse(**{
+            'label': [],
+            'image_url': '123/images/123.jpg',
+            'image_details': {
+                'width': 100,
+                'height': 100}})
 
         image_path = '123/images/123.jpg'
         build_image_path = MagicMock(return_value=image_path)
@@ -236,6 +486,7 @@ class TestGraphConstruction(unittest.IsolatedAsyncioTestCase):
         dt.utcnow = MagicMock(return_value=datetime.datetime(2020, 6, 25, 0, 10, 0, 0))
 
         queue = MagicMock()
+        queue.is_full = MagicMock(return_value=False)
 
         # act
         with patch("app.routes.controllers.pid_digitization_controller.storage_path_template_builder.build_image_path", build_image_path), \
@@ -255,6 +506,45 @@ class TestGraphConstruction(unittest.IsolatedAsyncioTestCase):
         queue.put.assert_called_once_with((process_line_detection_and_graph_construction_job,
                                            ('123', corrected_text_detection_results,)))
 
+    async def test_job_queue_full_throws_http_exception(self):
+        # arrange
+        pid_id = '123'
+        corrected_text_detection_results = GraphConstructionInferenceRequest(**{'all_text_list': [], 'text_and_symbols_associated_list': [], 'thinning_enabled': True, 'hough_threshold': 10, 'hough_max_line_gap': 5, 'hough_min_line_length': 20, 'bounding_box_inclusive': None, 'image_details': {'height': 100, 'width': 100}, 'image_url': '123.png'})
+
+        image_path = '123/images/123.jpg'
+        build_image_path = MagicMock(return_value=image_path)
+
+        job_status_path = '123/graph_construction/job_status.json'
+        build_job_status_path = MagicMock(return_value=job_status_path)
+
+        blob_storage_client = MagicMock()
+        blob_storage_client.blob_exists = MagicMock(side_effect=[True, False])
+
+        config = MagicMock()
+        config.line_detection_job_timeout_seconds = 300
+
+        dt = MagicMock()
+        dt.utcnow = MagicMock(return_value=datetime.datetime(2020, 6, 25, 0, 10, 0, 0))
+
+        queue = MagicMock()
+        queue.is_full = MagicMock(return_value=True)
+
+        # act
+        with patch("app.routes.controllers.pid_digitization_controller.storage_path_template_builder.build_image_path", build_image_path), \
+             patch("app.routes.controllers.pid_digitization_controller.storage_path_template_builder.build_inference_job_status_path", build_job_status_path), \
+             patch("app.routes.controllers.pid_digitization_controller.blob_storage_client", blob_storage_client), \
+             patch("app.routes.controllers.pid_digitization_controller.config", config), \
+             patch("app.routes.controllers.pid_digitization_controller.datetime", dt), \
+             patch("app.queue_consumer._queue", queue):
+            with pytest.raises(HTTPException) as e:
+                await detect_lines_and_construct_graph(pid_id, corrected_text_detection_results)
+
+        # assert
+        assert e.value.status_code == 503
+        assert e.value.headers == {'Retry-After': '30'}
+        blob_storage_client.upload_bytes.assert_not_called()
+        queue.put.assert_not_called()
+
     async def test_invalid_bounding_box_inclusive_throws_http_exception(self):
         # arrange
         pid_id = '123'
@@ -364,6 +654,7 @@ class TestGraphConstruction(unittest.IsolatedAsyncioTestCase):
         dt.utcnow = MagicMock(return_value=datetime.datetime(2020, 6, 25, 0, 10, 1, 0))
 
         queue = MagicMock()
+        queue.is_full = MagicMock(return_value=False)
 
         # act
         with patch("app.routes.controllers.pid_digitization_controller.storage_path_template_builder.build_image_path", build_image_path), \
@@ -408,6 +699,7 @@ class TestGraphConstruction(unittest.IsolatedAsyncioTestCase):
         dt.utcnow = MagicMock(return_value=datetime.datetime(2020, 6, 25, 0, 10, 1, 0))
 
         queue = MagicMock()
+        queue.is_full = MagicMock(return_value=False)
 
         # act
         with patch("app.routes.controllers.pid_digitization_controller.storage_path_template_builder.build_image_path", build_image_path), \
@@ -451,7 +743,7 @@ class TestGraphConstruction(unittest.IsolatedAsyncioTestCase):
         build_debug_image_path = MagicMock(side_effect=debug_image_path)
 
         blob_storage_client = MagicMock()
-        blob_storage_client.download_bytes = MagicMock(wraps=mock_download_bytes)
+        blob_storage_client.download_image_buffer = MagicMock(wraps=mock_download_bytes)
 
         detect_lines = MagicMock(wraps=mock_detect_lines)
 
@@ -466,6 +758,7 @@ class TestGraphConstruction(unittest.IsolatedAsyncioTestCase):
         config.line_detection_hough_min_line_length = 5
         config.line_detection_hough_rho = 0.1
         config.line_detection_hough_theta = 1080
+        config.line_detection_algorithm = LineDetectionAlgorithm.hough
         config.line_detection_job_timeout_seconds = 300
 
 
@@ -484,14 +777,20 @@ class TestGraphConstruction(unittest.IsolatedAsyncioTestCase):
         build_image_path.assert_called_once_with(pid_id, InferenceResult.symbol_detection)
         build_job_status_path.assert_called_with(pid_id, InferenceResult.graph_construction)
         build_response_path.assert_called_with(pid_id, InferenceResult.graph_construction, InferenceResult.line_detection.value)
-        blob_storage_client.download_bytes.assert_called_once_with(image_path)
+        blob_storage_client.download_image_buffer.assert_called_once_with(image_path)
         blob_storage_client.upload_bytes.assert_has_calls([
             call(job_status_path, '{"status": "in_progress", "step": "line_detection", "message": null, "updated_at": "2020-06-25 00:10:01"}'),
-            call(response_path, '{"image_url": "123.png", "image_details": {"format": "png", "width": 100, "height": 100}, "line_segments_count": 0, "line_segments": []}'),
+            call(response_path, '{"image_url": "123.png", "image_details": {"format": "png", "width": 100, "height": 100}, '
+                                '"line_segments_count": 0, "line_segments_count_before_merging": null, "line_segments": []}'),
             call(job_status_path, '{"status": "done", "step": "line_detection", "message": null, "updated_at": "2020-06-25 00:10:01"}'),
         ])
 
-        detect_lines.assert_called_once_with(pid_id, b'123', corrected_text_detection_results, True, 5, None, 5, 0.1, 1080, None, 100, 100, '123/images/debug_123_preprocessed.jpg', '123/images/debug_123_preprocessed_before_thinning.jpg', '123/graph-construction/output_123_line-detection.png')
+        self.assertEqual(detect_lines.call_args.args[1].image_bytes, b'123')
+        detect_lines.assert_called_once_with(pid_id, ANY, corrected_text_detection_results, True, 5, None, 5, 0.1, 1080, None, 100, 100,
+                                             '123/images/debug_123_preprocessed.jpg',
+                                             '123/images/debug_123_preprocessed_before_thinning.jpg',
+                                             '123/graph-construction/output_123_line-detection.png',
+                                             LineDetectionAlgorithm.hough)
 
 
     async def test_happy_path_process_line_detection_non_default_parameters(self):
@@ -503,7 +802,19 @@ class TestGraphConstruction(unittest.IsolatedAsyncioTestCase):
             return b'123'
 
         pid_id = '123'
-        corrected_text_detection_results = GraphConstructionInferenceRequest(**{'all_text_list': [], 'text_and_symbols_associated_list': [], 'thinning_enabled': False, 'hough_threshold': 10, 'hough_max_line_gap': 5, 'hough_min_line_length': 10, 'hough_rho': 0.2, 'hough_theta': 360, 'bounding_box_inclusive': {'topX': 0.2, 'topY': 0.2, 'bottomX': 0.8, 'bottomY': 0.8}, 'image_details': {'height': 100, 'width': 100}, 'image_url': '1.png'})
+        corrected_text_detection_results = GraphConstructionInferenceRequest(**{
+            'all_text_list': [],
+            'text_and_symbols_associated_list': [],
+            'thinning_enabled': False,
+            'hough_threshold': 10,
+            'hough_max_line_gap': 5,
+            'hough_min_line_length': 10,
+            'hough_rho': 0.2,
+            'hough_theta': 360,
+            'line_detection_algorithm': 'morphology',
+            'bounding_box_inclusive': {'topX': 0.2, 'topY': 0.2, 'bottomX': 0.8, 'bottomY': 0.8},
+            'image_details': {'height': 100, 'width': 100},
+            'image_url': '1.png'})
 
         image_path = '123/images/123.jpg'
         build_image_path = MagicMock(return_value=image_path)
@@ -518,7 +829,7 @@ class TestGraphConstruction(unittest.IsolatedAsyncioTestCase):
         build_debug_image_path = MagicMock(side_effect=debug_image_path)
 
         blob_storage_client = MagicMock()
-        blob_storage_client.download_bytes = MagicMock(wraps=mock_download_bytes)
+        blob_storage_client.download_image_buffer = MagicMock(wraps=mock_download_bytes)
 
         detect_lines = MagicMock(wraps=mock_detect_lines)
 
@@ -533,6 +844,7 @@ class TestGraphConstruction(unittest.IsolatedAsyncioTestCase):
         config.line_detection_hough_min_line_length = 15
         config.line_detection_hough_rho = 0.1
         config.line_detection_hough_theta = 1080
+        config.line_detection_algorithm = LineDetectionAlgorithm.hough
         config.line_detection_job_timeout_seconds = 300
 
 
@@ -551,14 +863,21 @@ class TestGraphConstruction(unittest.IsolatedAsyncioTestCase):
         build_image_path.assert_called_once_with(pid_id, InferenceResult.symbol_detection)
         build_job_status_path.assert_called_with(pid_id, InferenceResult.graph_construction)
         build_response_path.assert_called_with(pid_id, InferenceResult.graph_construction, InferenceResult.line_detection.value)
-        blob_storage_client.download_bytes.assert_called_once_with(image_path)
+        blob_storage_client.download_image_buffer.assert_called_once_with(image_path)
         blob_storage_client.upload_bytes.assert_has_calls([
             call(job_status_path, '{"status": "in_progress", "step": "line_detection", "message": null, "updated_at": "2020-06-25 00:10:01"}'),
-            call(response_path, '{"image_url": "123.png", "image_details": {"format": "png", "width": 100, "height": 100}, "line_segments_count": 0, "line_segments": []}'),
+            call(response_path, '{"image_url": "123.png", "image_details": {"format": "png", "width": 100, "height": 100}, '
+                                '"line_segments_count": 0, "line_segments_count_before_merging": null, "line_segments": []}'),
             call(job_status_path, '{"status": "done", "step": "line_detection", "message": null, "updated_at": "2020-06-25 00:10:01"}'),
         ])
 
-        detect_lines.assert_called_once_with(pid_id, b'123', corrected_text_detection_results, False, 10, None, 15, 0.2, 360, BoundingBox(topX=0.2, topY=0.2, bottomX=0.8, bottomY=0.8), 100, 100, '123/images/debug_123_preprocessed.jpg', '123/images/debug_123_preprocessed_before_thinning.jpg', '123/graph-construction/output_123_line-detection.png')
+        self.assertEqual(detect_lines.call_args.args[1].image_bytes, b'123')
+        detect_lines.assert_called_once_with(pid_id, ANY, corrected_text_detection_results, False, 10, None, 15, 0.2, 360,
+                                             BoundingBox(topX=0.2, topY=0.2, bottomX=0.8, bottomY=0.8), 100, 100,
+                                             '123/images/debug_123_preprocessed.jpg',
+                                             '123/images/debug_123_preprocessed_before_thinning.jpg',
+                                             '123/graph-construction/output_123_line-detection.png',
+                                             LineDetectionAlgorithm.morphology)
 
 
     async def test_process_line_detection_failure_status(self):
@@ -582,7 +901,7 @@ class TestGraphConstruction(unittest.IsolatedAsyncioTestCase):
         build_debug_image_path = MagicMock(side_effect=debug_image_path)
 
         blob_storage_client = MagicMock()
-        blob_storage_client.download_bytes = MagicMock(wraps=mock_download_bytes)
+        blob_storage_client.download_image_buffer = MagicMock(wraps=mock_download_bytes)
 
         detect_lines = MagicMock(side_effect=Exception('Error during line detection'))
 
@@ -597,6 +916,7 @@ class TestGraphConstruction(unittest.IsolatedAsyncioTestCase):
         config.line_detection_hough_min_line_length = 5
         config.line_detection_hough_rho = 0.1
         config.line_detection_hough_theta = 1080
+        config.line_detection_algorithm = LineDetectionAlgorithm.hough
         config.line_detection_job_timeout_seconds = 300
 
         # act
@@ -614,13 +934,44 @@ class TestGraphConstruction(unittest.IsolatedAsyncioTestCase):
         build_image_path.assert_called_once_with(pid_id, InferenceResult.symbol_detection)
         build_job_status_path.assert_called_with(pid_id, InferenceResult.graph_construction)
         build_response_path.assert_not_called()
-        blob_storage_client.download_bytes.assert_called_once_with(image_path)
+        blob_storage_client.download_image_buffer.assert_called_once_with(image_path)
         blob_storage_client.upload_bytes.assert_has_calls([
             call(job_status_path, '{"status": "in_progress", "step": "line_detection", "message": null, "updated_at": "2020-06-25 00:10:01"}'),
             call(job_status_path, '{"status": "failure", "step": "line_detection", "message": "Error during line detection", "updated_at": "2020-06-25 00:10:01"}'),
         ])
 
-        detect_lines.assert_called_once_with(pid_id, b'123', corrected_text_detection_results, True, 5, None, 5, 0.1, 1080, None, 100, 100, '123/images/debug_123_preprocessed.jpg', '123/images/debug_123_preprocessed_before_thinning.jpg', '123/graph-construction/output_123_line-detection.png')
+        self.assertEqual(detect_lines.call_args.args[1].image_bytes, b'123')
+        detect_lines.assert_called_once_with(pid_id, ANY, corrected_text_detection_results, True, 5, None, 5, 0.1, 1080, None, 100, 100,
+                                             '123/images/debug_123_preprocessed.jpg',
+                                             '123/images/debug_123_preprocessed_before_thinning.jpg',
+                                             '123/graph-construction/output_123_line-detection.png',
+                                             LineDetectionAlgorithm.hough)
+
+    async def test_process_line_detection_output_image_upload_error_failure_status(self):
+        # arrange
+        corrected_text_detection_results = GraphConstructionInferenceRequest(
+            all_text_list=[], text_and_symbols_associated_list=[], image_details={'height': 100, 'width': 100}, image_url='123.png')
+        detect_lines = MagicMock(return_value=LineDetectionInferenceResponse(
+            line_segments=[], line_segments_count=0, image_details={'height': 100, 'width': 100}, image_url='123.png'))
+        output_image_writer = MagicMock()
+        output_image_writes = output_image_writer.track_writes.return_value.__enter__.return_value
+        output_image_writes.wait.side_effect = OutputImageUploadError(['123/graph-construction/output_123_line-detection.png'])
+        update_job_status = MagicMock()
+
+        # act
+        with patch("app.routes.controllers.pid_digitization_controller.line_detection.detect_lines", detect_lines), \
+                patch("app.routes.controllers.pid_digitization_controller.blob_storage_client"), \
+                patch("app.routes.controllers.pid_digitization_controller.output_image_writer", output_image_writer), \
+                patch("app.routes.controllers.pid_digitization_controller._update_job_status", update_job_status):
+            result = process_line_detection('123', corrected_text_detection_results)
+
+        # assert
+        self.assertIsNone(result)
+        output_image_writes.wait.assert_called_once()
+        self.assertEqual(update_job_status.call_args_list, [
+            call('123', JobStep.line_detection, JobStatus.in_progress),
+            call('123', JobStep.line_detection, JobStatus.failure, str(output_image_writes.wait.side_effect)),
+        ])
 
 
 class TestGetInference(unittest.IsolatedAsyncioTestCase):
@@ -868,7 +1219,8 @@ class TestGetJobStatus(unittest.IsolatedAsyncioTestCase):
             result = await get_job_status(pid_id)
 
         # assert
-        assert result == {'status': 'done', 'step': 'line_detection', 'message': None, 'updated_at': '2023-06-08 14:57:25.521724'}
+        assert json.loads(result.body) == {
+            'status': 'done', 'step': 'line_detection', 'message': None, 'updated_at': '2023-06-08 14:57:25.521724'}
         assert blob_storage_client.blob_exists.call_count == 1
         assert blob_storage_client.download_bytes.call_count == 1
         assert storage_path_template_builder.build_inference_job_status_path.call_count == 1
@@ -896,6 +1248,37 @@ class TestGetJobStatus(unittest.IsolatedAsyncioTestCase):
         assert e.value.status_code == 404
         assert e.value.detail == 'Inference results not found for pid 123.'
 
+    async def test_happy_path_downloads_job_status_in_single_storage_round_trip(self):
+        # arrange
+        async_blob_storage_client = MagicMock()
+        async_blob_storage_client.download_blob_if_exists = AsyncMock(
+            return_value=DownloadedBlob(content=b'{"status": "done"}', etag='"1"'))
+
+        # act
+        with patch("app.routes.controllers.pid_digitization_controller.async_blob_storage_client", async_blob_storage_client):
+            result = await get_job_status('123')
+
+        # assert
+        assert json.loads(result.body) == {'status': 'done'}
+        assert result.headers['ETag'] == '"1"'
+        async_blob_storage_client.download_blob_if_exists.assert_awaited_once_with('123/graph-construction/job_status.json', None)
+        async_blob_storage_client.blob_exists.assert_not_called()
+
+    async def test_job_status_matching_if_none_match_returns_not_modified(self):
+        # arrange
+        async_blob_storage_client = MagicMock()
+        async_blob_storage_client.download_blob_if_exists = AsyncMock(return_value=DownloadedBlob(etag='"1"'))
+
+        # act
+        with patch("app.routes.controllers.pid_digitization_controller.async_blob_storage_client", async_blob_storage_client):
+            result = await get_job_status('123', '"1"')
+
+        # assert
+        assert result.status_code == 304
+        assert result.body == b''
+        assert result.headers['ETag'] == '"1"'
+        async_blob_storage_client.download_blob_if_exists.assert_awaited_once_with('123/graph-construction/job_status.json', '"1"')
+
 
 class TestGetInferenceImages(unittest.IsolatedAsyncioTestCase):
     @parameterized.expand([(InferenceResult.symbol_detection, '123_symbol-detection.png'),
@@ -953,6 +1336,40 @@ class TestGetInferenceImages(unittest.IsolatedAsyncioTestCase):
         assert blob_storage_client.blob_exists.call_count == 1
         assert blob_storage_client.download_bytes.call_count == 0
 
+    async def test_image_not_exists_is_rendered_from_inference_response(self):
+        # arrange
+        blob_storage_client = MagicMock()
+        blob_storage_client.blob_exists = MagicMock(return_value=False)
+        render_output_image = MagicMock(return_value=b'456')
+
+        # act
+        with patch("app.routes.controllers.pid_digitization_controller.blob_storage_client", blob_storage_client), \
+             patch("app.routes.controllers.pid_digitization_controller.config.output_image_rendering_mode", OutputImageRenderingMode.lazy), \
+             patch("app.routes.controllers.pid_digitization_controller.output_image_renderer.render_output_image", render_output_image):
+            result = await get_output_inference_images('123', InferenceResult.line_detection)
+
+        # assert
+        assert result == ImageResponse(image=b'456', filename='123_line-detection.png')
+        render_output_image.assert_called_once_with('123', InferenceResult.line_detection)
+        assert blob_storage_client.download_bytes.call_count == 0
+
+    async def test_image_not_exists_is_not_rendered_in_eager_mode(self):
+        # arrange
+        blob_storage_client = MagicMock()
+        blob_storage_client.blob_exists = MagicMock(return_value=False)
+        render_output_image = MagicMock(return_value=b'456')
+
+        # act
+        with patch("app.routes.controllers.pid_digitization_controller.blob_storage_client", blob_storage_client), \
+             patch("app.routes.controllers.pid_digitization_controller.config.output_image_rendering_mode", OutputImageRenderingMode.eager), \
+             patch("app.routes.controllers.pid_digitization_controller.output_image_renderer.render_output_image", render_output_image):
+            with pytest.raises(HTTPException) as e:
+                await get_output_inference_images('123', InferenceResult.line_detection)
+
+        # assert
+        assert e.value.status_code == 404
+        render_output_image.assert_not_called()
+
 
 class TestGraphPersistence(unittest.IsolatedAsyncioTestCase):
     async def test_happy_path_returns_success(self):
@@ -995,3 +1412,229 @@ class TestGraphPersistence(unittest.IsolatedAsyncioTestCase):
 
         # assert
         graph_persistence_persist.assert_called_once_with(pid_id, corrected_graph_construction_results.connected_symbols)
+
+
+class TestUpdateJobStatus(unittest.TestCase):
+    def test_happy_path_writes_job_status(self):
+        # arrange
+        job_status_path = '123/graph_construction/job_status.json'
+        build_job_status_path = MagicMock(return_value=job_status_path)
+        blob_storage_client = MagicMock()
+        dt = MagicMock()
+        dt.utcnow = MagicMock(return_value=datetime.datetime(2020, 6, 25, 0, 10, 0, 0))
+
+        # act
+        with patch("app.routes.controllers.pid_digitization_controller.storage_path_template_builder.build_inference_job_status_path",
+                   build_job_status_path), \
+             patch("app.routes.controllers.pid_digitization_controller.blob_storage_client", blob_storage_client), \
+             patch("app.routes.controllers.pid_digitization_controller.datetime", dt):
+            _update_job_status('123', JobStep.line_detection, JobStatus.in_progress)
+
+        # assert
+        blob_storage_client.upload_bytes.assert_called_once_with(
+            job_status_path, '{"status": "in_progress", "step": "line_detection", "message": null, "updated_at": "2020-06-25 00:10:00"}')
+
+    def test_job_worker_process_sends_job_status_to_parent(self):
+        # arrange
+        blob_storage_client = MagicMock()
+        call_in_parent = MagicMock()
+        dt = MagicMock()
+        dt.utcnow = MagicMock(return_value=datetime.datetime(2020, 6, 25, 0, 10, 0, 0))
+
+        # act
+        with patch("app.routes.controllers.pid_digitization_controller.blob_storage_client", blob_storage_client), \
+             patch("app.routes.controllers.pid_digitization_controller.is_job_worker_process", MagicMock(return_value=True)), \
+             patch("app.routes.controllers.pid_digitization_controller.call_in_parent", call_in_parent), \
+             patch("app.routes.controllers.pid_digitization_controller.datetime", dt):
+            _update_job_status('123', JobStep.line_detection, JobStatus.done)
+
+        # assert
+        blob_storage_client.upload_bytes.assert_not_called()
+        call_in_parent.assert_called_once_with(
+            _write_job_status, '123', JobStep.line_detection, JobStatus.done, None, '2020-06-25T00:10:00')
+
+
+class TestProcessLineDetectionAndGraphConstructionJob(unittest.TestCase):
+    def test_happy_path_uploads_job_profile(self):
+        # arrange
+        blob_storage_client = MagicMock()
+
+        def process_line_detection(pid_id, text_detection_results, pid_image):
+            with profile_stage('line_detection.hough') as stage:
+                stage.counts['line_segments'] = 2
+
+        # act
+        with patch("app.routes.controllers.pid_digitization_controller.blob_storage_client", blob_storage_client), \
+             patch("app.routes.controllers.pid_digitization_controller.process_line_detection", process_line_detection), \
+             patch("app.routes.controllers.pid_digitization_controller.process_graph_construction", MagicMock()):
+            process_line_detection_and_graph_construction_job('123', MagicMock())
+
+        # assert
+        blob_storage_client.upload_bytes.assert_called_once()
+        path, profile_json = blob_storage_client.upload_bytes.call_args.args
+        self.assertEqual(path, '123/graph-construction/profile.json')
+        profile = json.loads(profile_json)
+        self.assertEqual(profile['pid_id'], '123')
+        self.assertEqual([stage['name'] for stage in profile['stages']], ['line_detection.hough'])
+        self.assertEqual(profile['stages'][0]['counts'], {'line_segments': 2})
+
+    def test_job_profile_is_uploaded_when_job_fails(self):
+        # arrange
+        blob_storage_client = MagicMock()
+
+        # act
+        with patch("app.routes.controllers.pid_digitization_controller.blob_storage_client", blob_storage_client), \
+             patch("app.routes.controllers.pid_digitization_controller.process_line_detection", MagicMock()), \
+             patch("app.routes.controllers.pid_digitization_controller.process_graph_construction",
+                   MagicMock(side_effect=Exception('error'))):
+            with pytest.raises(Exception):
+                process_line_detection_and_graph_construction_job('123', MagicMock())
+
+        # assert
+        blob_storage_client.upload_bytes.assert_called_once()
+        self.assertEqual(blob_storage_client.upload_bytes.call_args.args[0], '123/graph-construction/profile.json')
+
+    def test_image_is_downloaded_once_for_both_steps(self):
+        # arrange
+        blob_storage_client = MagicMock()
+        blob_storage_client.download_image_buffer = MagicMock(return_value=b'123')
+        pid_images = []
+
+        def process_step(pid_id, text_detection_results, *args):
+            pid_image = args[-1]
+            pid_images.append(pid_image)
+            self.assertEqual(pid_image.image_bytes, b'123')
+
+        # act
+        with patch("app.routes.controllers.pid_digitization_controller.blob_storage_client", blob_storage_client), \
+             patch("app.routes.controllers.pid_digitization_controller.process_line_detection", process_step), \
+             patch("app.routes.controllers.pid_digitization_controller.process_graph_construction", process_step):
+            process_line_detection_and_graph_construction_job('123', MagicMock())
+
+        # assert
+        blob_storage_client.download_image_buffer.assert_called_once()
+        self.assertEqual(len(pid_images), 2)
+        self.assertIs(pid_images[0], pid_images[1])
+
+
+class TestLazyOutputImageRendering(unittest.TestCase):
+    def setUp(self):
+        self.config = MagicMock()
+        self.config.output_image_rendering_mode = OutputImageRenderingMode.lazy
+        self.config.debug = False
+        self.config.line_detection_hough_threshold = 5
+        self.config.detect_dotted_lines = False
+        self.config.line_detection_hough_min_line_length = 5
+        self.config.line_detection_hough_rho = 0.1
+        self.config.line_detection_hough_theta = 1080
+        self.text_detection_results = GraphConstructionInferenceRequest(**{
+            'all_text_list': [], 'text_and_symbols_associated_list': [],
+            'image_details': {'height': 100, 'width': 100}, 'image_url': '123.png'})
+
+        for target, value in [('config', self.config),
+                              ('blob_storage_client', MagicMock()),
+                              ('_update_job_status', MagicMock())]:
+            patcher = patch(f'app.routes.controllers.pid_digitization_controller.{target}', value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_line_detection_does_not_draw_output_image(self):
+        # arrange
+        detect_lines = MagicMock(return_value=LineDetectionInferenceResponse(**{
+            'line_segments': [], 'line_segments_count': 0,
+            'image_details': {'height': 100, 'width': 100}, 'image_url': '123.png'}))
+
+        # act
+        with patch("app.routes.controllers.pid_digitization_controller.line_detection.detect_lines", detect_lines):
+            process_line_detection('123', self.text_detection_results)
+
+        # assert
+        detect_lines.assert_called_once()
+        self.assertIsNone(detect_lines.call_args.args[14])
+
+    def test_graph_construction_does_not_draw_output_and_debug_images(self):
+        # arrange
+        construct_graph = MagicMock(return_value=([], []))
+        line_detection_results = LineDetectionInferenceResponse(**{
+            'line_segments': [], 'line_segments_count': 0,
+            'image_details': {'height': 100, 'width': 100}, 'image_url': '123.png'})
+
+        # act
+        with patch("app.routes.controllers.pid_digitization_controller.graph_construction.construct_graph", construct_graph):
+            result = process_graph_construction('123', self.text_detection_results, line_detection_results)
+
+        # assert
+        self.assertEqual(result.connected_symbols, [])
+        self.assertEqual(construct_graph.call_args.args[4:7], (None, None, None))
+
+
+class TestGetInferenceImageTilesAndRegion(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.image = np.random.default_rng(0).integers(0, 256, (300, 500, 3), dtype=np.uint8)
+        self.output_image_path = '123/graph-construction/output_123_line-detection.png'
+        self.tiles_path = '123/graph-construction/output_123_line-detection_tiles'
+        self.blobs = {}
+
+        blob_storage_client = MagicMock()
+        blob_storage_client.blob_exists = MagicMock(side_effect=lambda blob_name: blob_name in self.blobs)
+        blob_storage_client.download_bytes = MagicMock(side_effect=lambda blob_name: self.blobs[blob_name])
+        patcher = patch("app.routes.controllers.pid_digitization_controller.blob_storage_client", blob_storage_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _store_tiles(self):
+        manifest, tiles = build_image_pyramid(self.image, 128)
+        for level, row, column, tile in tiles:
+            self.blobs[f'{self.tiles_path}/{level}/{row}_{column}.png'] = cv2.imencode('.png', tile)[1].tobytes()
+        self.blobs[f'{self.tiles_path}/manifest.json'] = manifest.json()
+
+    async def test_happy_path_get_tiles_manifest_and_tile(self):
+        # arrange
+        self._store_tiles()
+
+        # act
+        manifest = await get_output_inference_image_tiles_manifest('123', InferenceResult.line_detection)
+        tile = await get_output_inference_image_tile('123', InferenceResult.line_detection, 0, 1, 2)
+
+        # assert
+        assert (manifest.width, manifest.height, manifest.tile_size, manifest.levels_count) == (500, 300, 128, 3)
+        assert tile == ImageResponse(image=self.blobs[f'{self.tiles_path}/0/1_2.png'], filename='123_line-detection_0_1_2.png')
+
+    async def test_tile_not_exists_throws_http_exception(self):
+        # act
+        with pytest.raises(HTTPException) as e:
+            await get_output_inference_image_tile('123', InferenceResult.line_detection, 0, 0, 0)
+
+        # assert
+        assert e.value.status_code == 404
+
+    async def test_happy_path_get_region_from_tiles(self):
+        # arrange
+        self._store_tiles()
+
+        # act
+        result = await get_output_inference_image_region('123', InferenceResult.line_detection, 0.2, 0.4, 0.3, 0.5, 1000)
+
+        # assert
+        region = cv2.imdecode(np.frombuffer(result.body, np.uint8), cv2.IMREAD_COLOR)
+        assert np.array_equal(region, self.image[120:150, 100:150])
+        assert self.output_image_path not in self.blobs
+
+    async def test_happy_path_get_region_from_output_image_without_tiles(self):
+        # arrange
+        self.blobs[self.output_image_path] = cv2.imencode('.png', self.image)[1].tobytes()
+
+        # act
+        result = await get_output_inference_image_region('123', InferenceResult.line_detection, 0.0, 0.0, 1.0, 1.0, 100)
+
+        # assert
+        region = cv2.imdecode(np.frombuffer(result.body, np.uint8), cv2.IMREAD_COLOR)
+        assert region.shape == (60, 100, 3)
+
+    async def test_invalid_region_throws_http_exception(self):
+        # act
+        with pytest.raises(HTTPException) as e:
+            await get_output_inference_image_region('123', InferenceResult.line_detection, 0.5, 0.0, 0.2, 1.0, 100)
+
+        # assert
+        assert e.value.status_code == 400
@@ -1,5 +1,6 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
+import asyncio
 import sys
 import os
 import json
@@ -9,19 +10,35 @@ from fastapi import FastAPI, File, UploadFile
 from starlette.testclient import TestClient
 import unittest
 from parameterized import parameterized
+import cv2
+import numpy as np
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+from app.config import Config
 from app.routes.tracing_middleware import TracingMiddleware
+from app.services.blob_archiver import BlobArchiver
 from app.models.symbol_detection.symbol_detection_inference_response import SymbolDetectionInferenceResponse
 
 
+def _encode_image(extension: str) -> bytes:
+    _, buffer = cv2.imencode(f'.{extension}', np.zeros((10, 20, 3), dtype=np.uint8))
+    return buffer.tobytes()
+
+
 # define all unit tests in TracingMiddleware
 class TestTracingMiddleware(unittest.TestCase):
     def setUp(self):
         self.app = FastAPI()
         self.blob_storage_client_mock = Mock()
-        self.blob_storage_client_mock.upload_bytes = Mock()
-        self.app.add_middleware(TracingMiddleware, blob_storage_client=self.blob_storage_client_mock)
+        self.blob_storage_client_mock.upload_bytes = AsyncMock()
+        self.streamed_uploads = {}
+
+        async def upload_stream(blob_name, chunks):
+            self.streamed_uploads[blob_name] = [chunk async for chunk in chunks]
+
+        self.blob_storage_client_mock.upload_stream = AsyncMock(side_effect=upload_stream)
+        self.archiver = BlobArchiver(self.blob_storage_client_mock, Config(tracing_archive_workers_count=1))
+        self.app.add_middleware(TracingMiddleware, blob_storage_client=self.blob_storage_client_mock, archiver=self.archiver)
 
         @self.app.post("/api/pid-digitalization/symbol-detection/{id}")
         async def object_detection(id: str, file: UploadFile = File(...)):
@@ -31,33 +48,62 @@ class TestTracingMiddleware(unittest.TestCase):
         async def text_detection(id: str, object_detection_result: SymbolDetectionInferenceResponse):
             return { "predictions": [{ 'box': {'topX': 10, 'topY': 10, 'bottomX': 10, 'bottomY': 10}, 'label': '0', 'score': 0.5 }]}
 
+        @self.app.get("/api/pid-digitalization/symbol-detection/{id}")
+        async def get_symbol_detection(id: str):
+            return {"id": id}
+
+        @self.app.post("/api/pid-digitalization/batch/symbol-detection/{id}")
+        async def batch_symbol_detection(id: str, files: list[UploadFile] = File(...)):
+            return {"id": id, "files_count": len(files)}
+
+        # the client keeps its event loop between the requests, the archiver runs in it
         self.client = TestClient(self.app)
+        self.client.__enter__()
+        self.addCleanup(self.client.__exit__, None, None, None)
+
+    def _post(self, *args, **kwargs):
+        response = self.client.post(*args, **kwargs)
+        self.client.portal.call(self.archiver.flush)
+        return response
 
     @parameterized.expand([('png'), ('jpg'), ('jpeg'), ('PNG'), ('JPG'), ('JPEG')])
     def test_dispatch_only_uploadfile(self, image_type):
+        # arrange
+        image_bytes = _encode_image(image_type.lower())
 
         # act
-        response = self.client.post("/api/pid-digitalization/symbol-detection/123", files={"file": (f"test.{image_type}", b"test")})
+        response = self._post("/api/pid-digitalization/symbol-detection/123", files={"file": (f"test.{image_type}", image_bytes)})
 
         # assert
         assert response.status_code == 200
         assert response.json() == { "predictions": [{ 'box': {'topX': 10, 'topY': 10, 'bottomX': 10, 'bottomY': 10}, 'label': '0', 'score': 0.5 }]}
 
-        self.blob_storage_client_mock.upload_bytes.assert_has_calls([
-            call("123/symbol-detection/123.png", b"test"),
-            call('123/symbol-detection/response.json', '{"predictions":[{"box":{"topX":10,"topY":10,"bottomX":10,"bottomY":10},"label":"0","score":0.5}]}')
-        ],
-        any_order=True)
+        self.assertEqual(b''.join(self.streamed_uploads["123/symbol-detection/123.png"]), image_bytes)
+        self.blob_storage_client_mock.upload_bytes.assert_called_once_with(
+            '123/symbol-detection/response.json',
+            b'{"predictions":[{"box":{"topX":10,"topY":10,"bottomX":10,"bottomY":10},"label":"0","score":0.5}]}')
 
 
     def test_dispatch_only_uploadfile_invalid_image(self):
 
         # act
-        response = self.client.post("/api/pid-digitalization/symbol-detection/123", files={"file": ("test.exe", b"test")})
+        response = self._post("/api/pid-digitalization/symbol-detection/123", files={"file": ("test.exe", b"test")})
+
+        # assert
+        assert response.status_code == 400
+
+        self.assertEqual(self.streamed_uploads, {})
+        self.blob_storage_client_mock.upload_bytes.assert_not_called()
+
+    def test_dispatch_only_uploadfile_invalid_image_content(self):
+
+        # act
+        response = self._post("/api/pid-digitalization/symbol-detection/123", files={"file": ("test.png", b"test")})
 
         # assert
         assert response.status_code == 400
 
+        self.assertEqual(self.streamed_uploads, {})
         self.blob_storage_client_mock.upload_bytes.assert_not_called()
 
     def test_dispatch_withno_uploadfile(self):
@@ -71,7 +117,7 @@ class TestTracingMiddleware(unittest.TestCase):
         }
 
         # act
-        response = self.client.post("/api/pid-digitalization/text-detection/123", json=json_payload)
+        response = self._post("/api/pid-digitalization/text-detection/123", json=json_payload)
 
         # assert
         assert response.status_code == 200
@@ -83,7 +129,7 @@ class TestTracingMiddleware(unittest.TestCase):
             call('123/text-detection/request.json',
                   expected_request),
             call('123/text-detection/response.json',
-                 '{"predictions":[{"box":{"topX":10,"topY":10,"bottomX":10,"bottomY":10},"label":"0","score":0.5}]}')
+                 b'{"predictions":[{"box":{"topX":10,"topY":10,"bottomX":10,"bottomY":10},"label":"0","score":0.5}]}')
             ],
             any_order=True)
 
@@ -98,9 +144,88 @@ class TestTracingMiddleware(unittest.TestCase):
         }
 
         # act
-        response = self.client.post("/api/pid-digitalization/text-detection/123", json=json_payload)
+        response = self._post("/api/pid-digitalization/text-detection/123", json=json_payload)
 
         # assert
         assert response.status_code == 400
 
+        self.assertEqual(self.streamed_uploads, {})
+        self.blob_storage_client_mock.upload_bytes.assert_not_called()
+
+    def test_dispatch_uploads_large_image_in_chunks(self):
+        # arrange
+        _, buffer = cv2.imencode('.png', np.random.default_rng(0).integers(0, 256, (500, 500, 3), dtype=np.uint8))
+        image_bytes = buffer.tobytes()
+
+        # act
+        response = self._post("/api/pid-digitalization/symbol-detection/123", files={"file": ("test.png", image_bytes)})
+
+        # assert
+        assert response.status_code == 200
+        chunks = self.streamed_uploads["123/symbol-detection/123.png"]
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b''.join(chunks), image_bytes)
+
+    def test_dispatch_image_upload_error_returns_500(self):
+        # arrange
+        self.blob_storage_client_mock.upload_stream = AsyncMock(side_effect=Exception('error'))
+
+        # act
+        response = self._post("/api/pid-digitalization/symbol-detection/123", files={"file": ("test.png", _encode_image('png'))})
+
+        # assert
+        assert response.status_code == 500
+        self.blob_storage_client_mock.upload_bytes.assert_not_called()
+
+    def test_dispatch_response_upload_error_does_not_fail_request(self):
+        # arrange
+        self.blob_storage_client_mock.upload_bytes = AsyncMock(side_effect=Exception('error'))
+
+        # act
+        response = self._post("/api/pid-digitalization/symbol-detection/123", files={"file": ("test.png", _encode_image('png'))})
+
+        # assert
+        assert response.status_code == 200
+        self.blob_storage_client_mock.upload_bytes.assert_awaited_once()
+
+    def test_dispatch_get_request_is_not_archived(self):
+        # act
+        response = self.client.get("/api/pid-digitalization/symbol-detection/123")
+
+        # assert
+        assert response.status_code == 200
+        assert response.json() == {"id": "123"}
+        self.blob_storage_client_mock.upload_bytes.assert_not_called()
+        self.blob_storage_client_mock.upload_stream.assert_not_called()
+
+    def test_dispatch_batch_request_is_not_archived(self):
+        # act
+        response = self._post("/api/pid-digitalization/batch/symbol-detection/123",
+                              files=[("files", ("test.png", _encode_image('png'))), ("files", ("test.pdf", b"%PDF-"))])
+
+        # assert
+        assert response.status_code == 200
+        assert response.json() == {"id": "123", "files_count": 2}
         self.blob_storage_client_mock.upload_bytes.assert_not_called()
+        self.blob_storage_client_mock.upload_stream.assert_not_called()
+
+    def test_dispatch_response_is_sent_before_it_is_archived(self):
+        # arrange
+        async def create_event():
+            return asyncio.Event()
+
+        release_upload = self.client.portal.call(create_event)
+
+        async def upload_bytes(blob_name, data):
+            await release_upload.wait()
+
+        self.blob_storage_client_mock.upload_bytes = AsyncMock(side_effect=upload_bytes)
+
+        # act
+        response = self.client.post("/api/pid-digitalization/symbol-detection/123", files={"file": ("test.png", _encode_image('png'))})
+        self.client.portal.call(release_upload.set)
+        self.client.portal.call(self.archiver.flush)
+
+        # assert
+        assert response.status_code == 200
+        self.blob_storage_client_mock.upload_bytes.assert_awaited_once()
@@ -0,0 +1,132 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
+from app.services.graph_construction.candidate_matching_pool import CandidateMatchingPool, \
+    get_candidate_matching_workers_count
+
+
+def _square(value):
+    return value * value
+
+
+def _exit_worker():
+    os._exit(1)
+
+
+# pool inherited by the forked process in test_forked_process_starts_own_pool
+_forked_pool = None
+
+
+def _run_on_forked_pool():
+    result = _forked_pool.run(_square, [(2,)])
+    _forked_pool.shutdown()
+    return result
+
+
+class TestCandidateMatchingPool(unittest.TestCase):
+    def setUp(self):
+        config = MagicMock()
+        config.workers_count_for_data_batch = 2
+        self.pool = CandidateMatchingPool(config)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_run_starts_pool_on_first_use(self):
+        # act
+        result = self.pool.run(_square, [(1,), (2,), (3,)])
+
+        # assert
+        self.assertEqual(sorted(result), [1, 4, 9])
+        self.assertIsNotNone(self.pool._executor)
+
+    def test_init_reuses_running_pool(self):
+        # arrange
+        self.pool.init()
+        executor = self.pool._executor
+
+        # act
+        self.pool.init()
+        self.pool.run(_square, [(2,)])
+
+        # assert
+        self.assertIs(self.pool._executor, executor)
+
+    def test_shutdown_stops_pool(self):
+        # arrange
+        self.pool.init()
+
+        # act
+        self.pool.shutdown()
+
+        # assert
+        self.assertIsNone(self.pool._executor)
+
+    def test_forked_process_starts_own_pool(self):
+        # arrange
+        global _forked_pool
+        _forked_pool = self.pool
+        self.pool.init()
+
+        # act
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            result = executor.submit(_run_on_forked_pool).result(timeout=30)
+
+        # assert
+        self.assertEqual(result, [4])
+        self.assertEqual(self.pool.run(_square, [(3,)]), [9])
+
+    def test_broken_pool_is_restarted_on_next_use(self):
+        # act
+        with pytest.raises(BrokenProcessPool):
+            self.pool.run(_exit_worker, [()])
+
+        result = self.pool.run(_square, [(3,)])
+
+        # assert
+        self.assertEqual(result, [9])
+
+
+class TestGetCandidateMatchingWorkersCount(unittest.TestCase):
+    def test_configured_workers_count(self):
+        # arrange
+        config = MagicMock()
+        config.workers_count_for_data_batch = 3
+
+        # act
+        result = get_candidate_matching_workers_count(config)
+
+        # assert
+        self.assertEqual(result, 3)
+
+    def test_workers_count_from_available_cpus(self):
+        # arrange
+        config = MagicMock()
+        config.workers_count_for_data_batch = None
+
+        # act
+        with patch('app.services.graph_construction.candidate_matching_pool.get_available_cpu_count', return_value=4):
+            result = get_candidate_matching_workers_count(config)
+
+        # assert
+        self.assertEqual(result, 3)
+
+    def test_at_least_one_worker(self):
+        # arrange
+        config = MagicMock()
+        config.workers_count_for_data_batch = None
+
+        # act
+        with patch('app.services.graph_construction.candidate_matching_pool.get_available_cpu_count', return_value=1):
+            result = get_candidate_matching_workers_count(config)
+
+        # assert
+        self.assertEqual(result, 1)
@@ -3,11 +3,17 @@
 from http.client import HTTPException
 import math
 import os
+import random
+from types import SimpleNamespace
 import sys
 from unittest.mock import MagicMock, patch
 import unittest
 import pytest
+from parameterized import parameterized
+import numpy as np
+import shapely
 from shapely import LineString, Polygon, Point
+from collections import OrderedDict
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
 from app.models.graph_construction.extended_line_segment \
@@ -16,12 +22,19 @@ from app.models.line_detection.line_segment import LineSegment
 from app.services.graph_construction.create_line_connection_candidates import \
   create_line_connection_candidates_helper, \
   create_line_connection_candidates, \
-  create_line_to_line_connection_candidates
+  create_line_to_line_connection_candidates, \
+  create_line_to_line_connection_candidates_batch, \
+  process_line_segments_with_spatial_index, \
+  process_line_segments_from_shared_memory, \
+  plan_line_segments_batches
 from app.models.enums.graph_node_type import GraphNodeType
+from app.models.enums.candidate_matching_engine import CandidateMatchingEngine
+from app.services.graph_construction.extend_lines import extend_lines
 from app.models.text_detection.symbol_and_text_associated import SymbolAndTextAssociated
 from app.models.text_detection.text_recognized import TextRecognized
 from app.models.bounding_box import BoundingBox
 from app.utils import shapely_utils
+from app.utils.shared_memory_utils import copy_arrays_to_shared_memory
 
 
 class TestCreateLineConnectionCandidates(unittest.TestCase):
@@ -2190,3 +2203,347 @@ class TestCreateLineToLineConnectionCandidates(unittest.TestCase):
         }
 
         self.assertEqual(result, expected_result)  # check to see that horizontal lines are connected
+
+
+class TestCreateLineConnectionCandidatesSpatialIndex(unittest.TestCase):
+    graph_line_buffer = 0.002
+    graph_distance_threshold_for_symbols = 0.004
+    graph_distance_threshold_for_text = 0.004
+    graph_distance_threshold_for_lines = 0.02
+
+    def _create_sheet(self, seed: int, lines_count: int, symbols_count: int, text_count: int):
+        rng = random.Random(seed)
+        line_segments = []
+        for _ in range(lines_count):
+            x1, y1 = round(rng.uniform(0.05, 0.95), 3), round(rng.uniform(0.05, 0.95), 3)
+            length = rng.uniform(0.01, 0.2)
+            orientation = rng.random()
+            if orientation < 0.45:
+                x2, y2 = min(x1 + length, 1.0), y1
+            elif orientation < 0.9:
+                x2, y2 = x1, min(y1 + length, 1.0)
+            else:
+                x2, y2 = min(x1 + length, 1.0), min(y1 + length, 1.0)
+            line_segments.append(LineSegment(startX=x1, startY=y1, endX=round(x2, 3), endY=round(y2, 3)))
+
+        symbols = []
+        for i in range(symbols_count):
+            x, y = rng.uniform(0.0, 0.97), rng.uniform(0.0, 0.97)
+            symbols.append(SymbolAndTextAssociated(id=i, label='test', score=0.9, topX=x, topY=y,
+                                                   bottomX=x + rng.uniform(0.005, 0.03), bottomY=y + rng.uniform(0.005, 0.03)))
+        texts = []
+        for _ in range(text_count):
+            x, y = rng.uniform(0.0, 0.97), rng.uniform(0.0, 0.97)
+            texts.append(TextRecognized(text='test', topX=x, topY=y,
+                                        bottomX=x + rng.uniform(0.005, 0.03), bottomY=y + rng.uniform(0.002, 0.01)))
+
+        return line_segments, extend_lines(line_segments, 0.2), symbols, texts
+
+    def _create_candidates(self, engine: CandidateMatchingEngine, line_segments, extended_lines, symbols, texts,
+                           min_lines_per_worker: int = 1):
+        config = MagicMock()
+        config.workers_count_for_data_batch = 3
+        config.graph_candidate_matching_engine = engine
+        config.graph_candidate_matching_min_lines_per_worker = min_lines_per_worker
+        config.graph_candidate_matching_chunks_per_worker = 4
+        config.job_queue_consumers_count = 1
+
+        with patch('app.services.graph_construction.create_line_connection_candidates.config', config):
+            return create_line_connection_candidates(
+                line_segments,
+                extended_lines,
+                symbols,
+                texts,
+                self.graph_line_buffer,
+                self.graph_distance_threshold_for_symbols,
+                self.graph_distance_threshold_for_text,
+                self.graph_distance_threshold_for_lines)
+
+    def test_happy_path_simple_symbol_text(self):
+        # Arrange
+        line_segments = [LineSegment(startX=0.1, startY=0.5, endX=0.9, endY=0.5)]
+        extended_line_segments = [ExtendedLineSegment(startX=0.05, startY=0.5, endX=0.95, endY=0.5, slope=0.0)]
+        text_and_symbols_associated_list = [
+            SymbolAndTextAssociated(**{
+                'id': '0', 'label': 'test', 'score': 0.9, 'topX': 0.0, 'topY': 0.0, 'bottomX': 0.05, 'bottomY': 0.05}),
+            SymbolAndTextAssociated(**{
+                'id': '1', 'label': 'test', 'score': 0.9, 'topX': 0.9, 'topY': 0.45, 'bottomX': 1.0, 'bottomY': 0.55})]
+        text_results = [
+            TextRecognized(**{'topX': 0.1, 'topY': 0.5, 'bottomX': 0.2, 'bottomY': 0.51, 'text': 'test'})
+        ]
+
+        expected_result_candidates = {
+            '0': {
+                'start': {
+                    'node': '0',
+                    'type': GraphNodeType.text,
+                    'distance': 0.0,
+                    'intersection': False
+                },
+                'end': {
+                    'node': '1',
+                    'type': GraphNodeType.symbol,
+                    'distance': 0.0,
+                    'intersection': False
+                }
+            }
+        }
+
+        # Act
+        actual_result_candidates = self._create_candidates(
+            CandidateMatchingEngine.spatial_index,
+            line_segments,
+            extended_line_segments,
+            text_and_symbols_associated_list,
+            text_results)
+
+        # Assert
+        self.assertEqual(actual_result_candidates, expected_result_candidates)
+
+    def test_no_symbols_and_text(self):
+        # Arrange
+        line_segments = [
+            LineSegment(startX=0.1, startY=0.5, endX=0.5, endY=0.5),
+            LineSegment(startX=0.5, startY=0.5, endX=0.9, endY=0.5)]
+        extended_line_segments = extend_lines(line_segments, 0.2)
+
+        # Act
+        brute_force_result = self._create_candidates(
+            CandidateMatchingEngine.brute_force, line_segments, extended_line_segments, [], [])
+        spatial_index_result = self._create_candidates(
+            CandidateMatchingEngine.spatial_index, line_segments, extended_line_segments, [], [])
+
+        # Assert
+        self.assertEqual(spatial_index_result, brute_force_result)
+
+    def test_invalid_item_bounding_box_raises_value_error(self):
+        # Arrange
+        line_segments = [LineSegment(startX=0.1, startY=0.5, endX=0.9, endY=0.5)]
+        extended_line_segments = extend_lines(line_segments, 0.2)
+
+        # Act & Assert
+        with pytest.raises(ValueError):
+            self._create_candidates(
+                CandidateMatchingEngine.spatial_index,
+                line_segments,
+                extended_line_segments,
+                [SimpleNamespace(topX=None, topY=0.0, bottomX=0.1, bottomY=0.1)],
+                [])
+
+    def test_matches_brute_force_on_synthetic_sheets(self):
+        for seed in range(2):
+            # Arrange
+            line_segments, extended_line_segments, symbols, texts = self._create_sheet(seed, 100, 20, 30)
+
+            # Act
+            brute_force_result = self._create_candidates(
+                CandidateMatchingEngine.brute_force, line_segments, extended_line_segments, symbols, texts)
+            spatial_index_result = self._create_candidates(
+                CandidateMatchingEngine.spatial_index, line_segments, extended_line_segments, symbols, texts)
+
+            # Assert
+            self.assertEqual(spatial_index_result, brute_force_result)
+
+    @parameterized.expand([(CandidateMatchingEngine.brute_force,), (CandidateMatchingEngine.spatial_index,)])
+    def test_pool_resolves_symbol_ids(self, engine):
+        # Arrange
+        line_segments, extended_line_segments, symbols, texts = self._create_sheet(2, 60, 30, 10)
+        for symbol in symbols:
+            symbol.id = f'symbol-{symbol.id}'
+        expected_result = dict(
+            (str(source_line_index), result) for source_line_index, result in process_line_segments_with_spatial_index(
+                range(len(line_segments)),
+                line_segments,
+                extended_line_segments,
+                symbols,
+                texts,
+                self.graph_line_buffer,
+                self.graph_distance_threshold_for_symbols,
+                self.graph_distance_threshold_for_text,
+                self.graph_distance_threshold_for_lines))
+
+        # Act
+        result = self._create_candidates(engine, line_segments, extended_line_segments, symbols, texts)
+
+        # Assert
+        self.assertEqual(result, expected_result)
+        self.assertTrue(any(connection['type'] is GraphNodeType.symbol and connection['node'].startswith('symbol-')
+                            for candidates in result.values() for connection in candidates.values()))
+
+    @parameterized.expand([(CandidateMatchingEngine.brute_force,), (CandidateMatchingEngine.spatial_index,)])
+    def test_pool_tasks_only_carry_line_segment_ranges(self, engine):
+        # Arrange
+        line_segments, extended_line_segments, symbols, texts = self._create_sheet(4, 60, 10, 10)
+        tasks = []
+
+        def run_sequentially(func, func_tasks):
+            tasks.extend(func_tasks)
+            return [func(*args) for args in func_tasks]
+
+        # Act
+        with patch('app.services.graph_construction.create_line_connection_candidates.candidate_matching_pool.run',
+                   side_effect=run_sequentially) as run:
+            self._create_candidates(engine, line_segments, extended_line_segments, symbols, texts)
+
+        # Assert
+        self.assertIs(run.call_args.args[0], process_line_segments_from_shared_memory)
+        self.assertEqual(len(tasks), 12)
+        self.assertEqual([(args[2], args[3]) for args in tasks], [(i, min(i + 5, 60)) for i in range(0, 60, 5)])
+        self.assertTrue(all(args[4] is engine and args[5] == 1 for args in tasks))
+        self.assertFalse(any(isinstance(arg, list) for args in tasks for arg in args))
+
+    def test_worker_builds_each_sheet_once_when_jobs_are_interleaved(self):
+        # Arrange
+        sheets = [self._create_sheet(seed, 20, 5, 5) for seed in range(2)]
+        shared_memories = []
+        for line_segments, extended_line_segments, symbols, texts in sheets:
+            shared_memories.append(copy_arrays_to_shared_memory({
+                'line_segments': shapely_utils.lines_to_coordinates(line_segments),
+                'extended_lines': shapely_utils.lines_to_coordinates(extended_line_segments),
+                'symbols': shapely_utils.bounding_boxes_to_coordinates(symbols),
+                'text': shapely_utils.bounding_boxes_to_coordinates(texts)
+            }))
+        thresholds = (self.graph_distance_threshold_for_symbols, self.graph_distance_threshold_for_text,
+                      self.graph_distance_threshold_for_lines)
+
+        # Act
+        try:
+            with patch('app.services.graph_construction.create_line_connection_candidates._worker_sheet_cache', OrderedDict()):
+                timings = [process_line_segments_from_shared_memory(shm.name, layout, start_index, start_index + 5,
+                                                                    CandidateMatchingEngine.brute_force, 2, self.graph_line_buffer,
+                                                                    *thresholds)[1]
+                           for start_index in range(0, 20, 5) for shm, layout in shared_memories]
+        finally:
+            for shm, _ in shared_memories:
+                shm.close()
+                shm.unlink()
+
+        # Assert
+        self.assertEqual(sum('index_build' in task_timings for task_timings in timings), 2)
+
+    def test_in_process_matches_pool(self):
+        # Arrange
+        line_segments, extended_line_segments, symbols, texts = self._create_sheet(3, 60, 10, 10)
+
+        for engine in CandidateMatchingEngine:
+            # Act
+            pool_result = self._create_candidates(
+                engine, line_segments, extended_line_segments, symbols, texts)
+            in_process_result = self._create_candidates(
+                engine, line_segments, extended_line_segments, symbols, texts, min_lines_per_worker=1000)
+
+            # Assert
+            self.assertEqual(in_process_result, pool_result)
+
+
+class TestCreateLineToLineConnectionCandidatesBatch(unittest.TestCase):
+    line_distance_threshold = 0.02
+    graph_line_buffer = 0.002
+
+    def _empty_candidates(self):
+        return {
+            'start': {'node': None, 'type': GraphNodeType.unknown, 'distance': None, 'intersection': False},
+            'end': {'node': None, 'type': GraphNodeType.unknown, 'distance': None, 'intersection': False}
+        }
+
+    def _create_batch_candidates(self, line_segments, extended_line_segments, source_line_index, target_line_indexes):
+        line_strings = shapely_utils.convert_lines_to_line_strings(line_segments)
+        extended_line_polygons = shapely.buffer(
+            shapely_utils.convert_lines_to_line_strings(extended_line_segments), self.graph_line_buffer)
+        source_line_segment = line_segments[source_line_index]
+
+        return create_line_to_line_connection_candidates_batch(
+            target_line_indexes,
+            source_line_index,
+            line_strings,
+            shapely.get_point(line_strings, 0),
+            shapely.get_point(line_strings, -1),
+            extended_line_polygons,
+            extended_line_polygons[source_line_index],
+            Point((source_line_segment.startX, source_line_segment.startY)),
+            Point((source_line_segment.endX, source_line_segment.endY)),
+            self._empty_candidates(),
+            self.line_distance_threshold)
+
+    def test_matches_single_line_version(self):
+        # Arrange
+        line_segments = [
+            LineSegment(startX=0.1, startY=0.2, endX=0.3, endY=0.2),  # horizontal
+            LineSegment(startX=0.31, startY=0.2, endX=0.31, endY=0.4),  # vertical, close to the end
+            LineSegment(startX=0.1, startY=0.1, endX=0.1, endY=0.2),  # vertical, touching the start
+            LineSegment(startX=0.5, startY=0.5, endX=0.6, endY=0.6),  # angled, far away
+            LineSegment(startX=0.2, startY=0.19, endX=0.2, endY=0.3)  # vertical, crossing
+        ]
+        extended_line_segments = extend_lines(line_segments, 0.2)
+
+        expected_result = self._empty_candidates()
+        source_line_polygon_extended = shapely_utils.convert_line_to_line_string(
+            extended_line_segments[0]).buffer(self.graph_line_buffer)
+        for index in range(1, len(line_segments)):
+            expected_result = create_line_to_line_connection_candidates(
+                line_segments[index],
+                extended_line_segments[index],
+                str(index),
+                "0",
+                source_line_polygon_extended,
+                Point((line_segments[0].startX, line_segments[0].startY)),
+                Point((line_segments[0].endX, line_segments[0].endY)),
+                expected_result,
+                self.line_distance_threshold,
+                self.graph_line_buffer)
+
+        # Act
+        result = self._create_batch_candidates(line_segments, extended_line_segments, 0, range(len(line_segments)))
+
+        # Assert
+        self.assertEqual(result, expected_result)
+        self.assertEqual(result['start']['node'], '2')
+        self.assertEqual(result['end']['node'], '1')
+
+    def test_no_target_lines_returns_candidates_unchanged(self):
+        # Arrange
+        line_segments = [LineSegment(startX=0.1, startY=0.2, endX=0.3, endY=0.2)]
+        extended_line_segments = extend_lines(line_segments, 0.2)
+
+        # Act
+        result = self._create_batch_candidates(line_segments, extended_line_segments, 0, np.array([0]))
+
+        # Assert
+        self.assertEqual(result, self._empty_candidates())
+
+
+class TestPlanLineSegmentsBatches(unittest.TestCase):
+    def test_small_sheet_is_processed_in_process(self):
+        # Act
+        result = plan_line_segments_batches(150, 4, 100, 4)
+
+        # Assert
+        self.assertEqual(result, (1, 150))
+
+    def test_workers_are_limited_by_sheet_size(self):
+        # Act
+        result = plan_line_segments_batches(250, 4, 100, 4)
+
+        # Assert
+        self.assertEqual(result, (2, 32))
+
+    def test_workers_are_limited_by_max_workers(self):
+        # Act
+        result = plan_line_segments_batches(3000, 3, 100, 4)
+
+        # Assert
+        self.assertEqual(result, (3, 250))
+
+    def test_single_worker_is_processed_in_process(self):
+        # Act
+        result = plan_line_segments_batches(3000, 1, 100, 4)
+
+        # Assert
+        self.assertEqual(result, (1, 3000))
+
+    def test_no_line_segments(self):
+        # Act
+        result = plan_line_segments_batches(0, 4, 100, 4)
+
+        # Assert
+        self.assertEqual(result, (1, 1))
@@ -0,0 +1,45 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from concurrent.futures import ThreadPoolExecutor
+import os
+import unittest
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
+from app.models.bounding_box import BoundingBox
+from app.models.enums.flow_direction import FlowDirection
+from app.models.graph_construction.connected_symbols_connection_item import ConnectedSymbolsConnectionItem
+from app.models.graph_construction.connected_symbols_item import ConnectedSymbolsItem
+from app.services.graph_construction.draw_persistent_graph import render_persistent_graph_networkx
+
+
+def _create_assets(assets_count: int) -> list[ConnectedSymbolsItem]:
+    bounding_box = BoundingBox(topX=0, topY=0, bottomX=1, bottomY=1)
+    return [
+        ConnectedSymbolsItem(
+            id=i,
+            label='Equipment/Pump',
+            text_associated=f'pump {i}',
+            bounding_box=bounding_box,
+            connections=[
+                ConnectedSymbolsConnectionItem(
+                    id=(i + 1) % assets_count,
+                    label='Equipment/Pump',
+                    text_associated=f'pump {(i + 1) % assets_count}',
+                    flow_direction=FlowDirection.downstream,
+                    bounding_box=bounding_box,
+                    segments=[])])
+        for i in range(assets_count)]
+
+
+class TestRenderPersistentGraphNetworkx(unittest.TestCase):
+    def test_concurrent_renders_keep_their_figure_size(self):
+        # arrange
+        assets_list = [_create_assets(assets_count) for assets_count in [2, 3, 4, 5, 6, 7, 8, 9]]
+
+        # act
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            images = list(executor.map(lambda assets: render_persistent_graph_networkx(assets, {'Equipment/'}), assets_list))
+
+        # assert
+        self.assertEqual([image.shape for image in images], [(800, 1200, 3)] * len(assets_list))
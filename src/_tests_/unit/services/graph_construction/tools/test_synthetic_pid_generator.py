@@ -0,0 +1,60 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import sys
+import unittest
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..', '..'))
+from app.config import config
+from app.services.graph_construction.tools.synthetic_pid_generator import generate_synthetic_sheet
+
+
+class TestGenerateSyntheticSheet(unittest.TestCase):
+    def test_happy_path_generates_requested_counts(self):
+        # act
+        sheet = generate_synthetic_sheet(line_segments_count=101, symbols_count=10, texts_count=15, arrows_count=3,
+                                         t_junctions_count=4, image_width=2000, image_height=1500, seed=1)
+
+        # assert
+        request = sheet.graph_construction_request
+        symbols = [symbol for symbol in request.text_and_symbols_associated_list if symbol.label != config.arrow_symbol_label]
+        arrows = [symbol for symbol in request.text_and_symbols_associated_list if symbol.label == config.arrow_symbol_label]
+        self.assertEqual(sheet.line_detection_response.line_segments_count, 101)
+        self.assertEqual(len(sheet.line_detection_response.line_segments), 101)
+        self.assertEqual(len(symbols), 10)
+        self.assertEqual(len(arrows), 3)
+        self.assertEqual(len(request.all_text_list), 15)
+        self.assertEqual(len(set(symbol.id for symbol in request.text_and_symbols_associated_list)), 13)
+
+    def test_coordinates_are_normalized_and_image_matches_details(self):
+        # act
+        sheet = generate_synthetic_sheet(line_segments_count=200, symbols_count=20, texts_count=30, arrows_count=5,
+                                         t_junctions_count=5, image_width=1200, image_height=800, seed=2)
+
+        # assert
+        request = sheet.graph_construction_request
+        coordinates = [value for line_segment in sheet.line_detection_response.line_segments
+                       for value in (line_segment.startX, line_segment.startY, line_segment.endX, line_segment.endY)]
+        coordinates += [value for box in request.text_and_symbols_associated_list + request.all_text_list
+                        for value in (box.topX, box.topY, box.bottomX, box.bottomY)]
+        self.assertTrue(all(0 <= value <= 1 for value in coordinates))
+
+        image = cv2.imdecode(np.frombuffer(sheet.image_bytes, np.uint8), cv2.IMREAD_COLOR)
+        self.assertEqual(image.shape[:2], (800, 1200))
+
+    def test_same_seed_generates_same_sheet(self):
+        # act
+        sheet = generate_synthetic_sheet(line_segments_count=50, symbols_count=5, texts_count=5, image_width=800, image_height=600, seed=3)
+        same_seed_sheet = generate_synthetic_sheet(line_segments_count=50, symbols_count=5, texts_count=5,
+                                                   image_width=800, image_height=600, seed=3)
+
+        # assert
+        self.assertEqual(sheet.line_detection_response, same_seed_sheet.line_detection_response)
+        self.assertEqual(sheet.graph_construction_request, same_seed_sheet.graph_construction_request)
+
+    def test_raises_when_not_enough_symbols_to_connect(self):
+        # act / assert
+        with self.assertRaises(ValueError):
+            generate_synthetic_sheet(line_segments_count=10, symbols_count=1, texts_count=0)
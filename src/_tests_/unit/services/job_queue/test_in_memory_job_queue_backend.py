@@ -0,0 +1,50 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import sys
+import unittest
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
+from app.services.job_queue.in_memory_job_queue_backend import InMemoryJobQueueBackend
+from app.services.job_queue.job_queue_backend import QueueFullError
+
+
+def _job(*args):
+    return args
+
+
+class TestInMemoryJobQueueBackend(unittest.TestCase):
+    def test_happy_path(self):
+        # arrange
+        backend = InMemoryJobQueueBackend(max_size=2)
+        backend.init()
+
+        # act
+        first_job_id = backend.put((_job, ('1',)))
+        second_job_id = backend.put((_job, ('2',)))
+        first_job = backend.get(timeout=0.1)
+        second_job = backend.get(timeout=0.1)
+
+        # assert
+        self.assertEqual(first_job, (first_job_id, _job, ('1',)))
+        self.assertEqual(second_job, (second_job_id, _job, ('2',)))
+
+    def test_get_returns_none_on_timeout(self):
+        # arrange
+        backend = InMemoryJobQueueBackend(max_size=2)
+
+        # act
+        result = backend.get(timeout=0.01)
+
+        # assert
+        self.assertIsNone(result)
+
+    def test_put_on_full_queue_raises_queue_full_error(self):
+        # arrange
+        backend = InMemoryJobQueueBackend(max_size=1)
+        backend.put((_job, ('1',)))
+
+        # act & assert
+        with pytest.raises(QueueFullError):
+            backend.put((_job, ('2',)))
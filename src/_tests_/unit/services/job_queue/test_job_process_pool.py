@@ -0,0 +1,85 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from concurrent.futures.process import BrokenProcessPool
+import os
+import sys
+import threading
+import unittest
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
+from app.services.job_queue.job_process_pool import JobProcessPool, call_in_parent, is_job_worker_process
+
+_parent_calls = []
+_parent_calls_received = threading.Event()
+
+
+def _get_pid():
+    return os.getpid()
+
+
+def _is_job_worker_process():
+    return is_job_worker_process()
+
+
+def _record_parent_call(value):
+    _parent_calls.append((value, os.getpid()))
+    if len(_parent_calls) == 2:
+        _parent_calls_received.set()
+
+
+def _job_calling_parent():
+    call_in_parent(_record_parent_call, 'in_progress')
+    call_in_parent(_record_parent_call, 'done')
+
+
+def _exit_worker():
+    os._exit(1)
+
+
+class TestJobProcessPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = JobProcessPool(max_workers=1, max_tasks_per_child=2)
+        self.pool.init()
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_runs_job_in_worker_process(self):
+        # act
+        result = self.pool.run(_get_pid, ())
+
+        # assert
+        self.assertNotEqual(result, os.getpid())
+        self.assertTrue(self.pool.run(_is_job_worker_process, ()))
+        self.assertFalse(is_job_worker_process())
+
+    def test_calls_from_worker_process_are_made_in_parent_in_order(self):
+        # arrange
+        _parent_calls.clear()
+        _parent_calls_received.clear()
+
+        # act
+        self.pool.run(_job_calling_parent, ())
+
+        # assert
+        self.assertTrue(_parent_calls_received.wait(timeout=5))
+        self.assertEqual(_parent_calls, [('in_progress', os.getpid()), ('done', os.getpid())])
+
+    def test_worker_processes_are_recycled(self):
+        # act
+        pids = [self.pool.run(_get_pid, ()) for _ in range(3)]
+
+        # assert
+        self.assertEqual(pids[0], pids[1])
+        self.assertNotEqual(pids[1], pids[2])
+
+    def test_broken_pool_is_restarted_on_next_job(self):
+        # act
+        with pytest.raises(BrokenProcessPool):
+            self.pool.run(_exit_worker, ())
+
+        result = self.pool.run(_get_pid, ())
+
+        # assert
+        self.assertNotEqual(result, os.getpid())
@@ -0,0 +1,66 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import sys
+import tempfile
+import unittest
+import parameterized
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
+from app.services.job_queue.in_memory_job_queue_backend import InMemoryJobQueueBackend
+from app.services.job_queue.job_queue_backend import QueueFullError
+from app.services.job_queue.sqlite_job_queue_backend import SqliteJobQueueBackend
+
+
+def _job(*args):
+    return args
+
+
+class TestJobQueueBackendContract(unittest.TestCase):
+    '''The capacity contract shared by all the job queue backends.'''
+
+    def setUp(self):
+        self.database_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.database_dir.cleanup()
+
+    def _create_backend(self, backend_type: str, max_size: int):
+        if backend_type == 'in_memory':
+            backend = InMemoryJobQueueBackend(max_size)
+        else:
+            database_path = os.path.join(self.database_dir.name, 'job_queue.sqlite3')
+            backend = SqliteJobQueueBackend(database_path, max_size, poll_interval_seconds=0.01)
+        backend.init()
+        return backend
+
+    @parameterized.parameterized.expand([('in_memory',), ('sqlite',)])
+    def test_put_on_full_queue_raises_queue_full_error(self, backend_type: str):
+        # arrange
+        backend = self._create_backend(backend_type, max_size=2)
+        backend.put((_job, ('1',)))
+        backend.put((_job, ('2',)))
+
+        # act & assert
+        self.assertTrue(backend.is_full())
+        with pytest.raises(QueueFullError):
+            backend.put((_job, ('3',)))
+
+    @parameterized.parameterized.expand([('in_memory',), ('sqlite',)])
+    def test_jobs_in_progress_do_not_count_towards_max_size(self, backend_type: str):
+        # arrange
+        backend = self._create_backend(backend_type, max_size=1)
+        backend.put((_job, ('1',)))
+        backend.get(timeout=0.1)
+
+        # act
+        is_full = backend.is_full()
+        backend.put((_job, ('2',)))
+
+        # assert
+        self.assertFalse(is_full)
+        self.assertTrue(backend.is_full())
+        with pytest.raises(QueueFullError):
+            backend.put((_job, ('3',)))
+        self.assertEqual(backend.get(timeout=0.1)[1:], (_job, ('2',)))
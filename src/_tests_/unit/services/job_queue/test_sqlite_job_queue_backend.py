@@ -0,0 +1,121 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import sys
+import tempfile
+import threading
+import unittest
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
+from app.services.job_queue.sqlite_job_queue_backend import SqliteJobQueueBackend
+from app.services.job_queue.job_queue_backend import QueueFullError
+
+
+def _job(*args):
+    return args
+
+
+class TestSqliteJobQueueBackend(unittest.TestCase):
+    def setUp(self):
+        self.database_dir = tempfile.TemporaryDirectory()
+        self.database_path = os.path.join(self.database_dir.name, 'job_queue.sqlite3')
+
+    def tearDown(self):
+        self.database_dir.cleanup()
+
+    def _create_backend(self, max_size: int = 2) -> SqliteJobQueueBackend:
+        backend = SqliteJobQueueBackend(self.database_path, max_size, poll_interval_seconds=0.01)
+        backend.init()
+        return backend
+
+    def test_happy_path(self):
+        # arrange
+        backend = self._create_backend()
+
+        # act
+        first_job_id = backend.put((_job, ('1',)))
+        second_job_id = backend.put((_job, ('2',)))
+        first_job = backend.get(timeout=0.1)
+        second_job = backend.get(timeout=0.1)
+
+        # assert
+        self.assertEqual(first_job, (first_job_id, _job, ('1',)))
+        self.assertEqual(second_job, (second_job_id, _job, ('2',)))
+
+    def test_get_returns_none_on_timeout(self):
+        # arrange
+        backend = self._create_backend()
+
+        # act
+        result = backend.get(timeout=0.05)
+
+        # assert
+        self.assertIsNone(result)
+
+    def test_get_is_woken_up_by_put(self):
+        # arrange
+        backend = SqliteJobQueueBackend(self.database_path, 2, poll_interval_seconds=10)
+        backend.init()
+        timer = threading.Timer(0.05, backend.put, args=((_job, ('1',)),))
+
+        # act
+        timer.start()
+        result = backend.get(timeout=5)
+        timer.join()
+
+        # assert
+        self.assertEqual(result[1:], (_job, ('1',)))
+
+    def test_put_on_full_queue_raises_queue_full_error(self):
+        # arrange
+        backend = self._create_backend(max_size=1)
+        backend.put((_job, ('1',)))
+
+        # act & assert
+        with pytest.raises(QueueFullError):
+            backend.put((_job, ('2',)))
+
+    def test_ack_frees_queue_slot(self):
+        # arrange
+        backend = self._create_backend(max_size=1)
+        backend.put((_job, ('1',)))
+        job_id, _, _ = backend.get(timeout=0.1)
+
+        # act
+        backend.ack(job_id)
+        backend.put((_job, ('2',)))
+
+        # assert
+        self.assertEqual(backend.get(timeout=0.1)[1:], (_job, ('2',)))
+
+    def test_queued_jobs_survive_restart(self):
+        # arrange
+        backend = self._create_backend()
+        job_id = backend.put((_job, ('1',)))
+
+        # act
+        restarted_backend = self._create_backend()
+        result = restarted_backend.get(timeout=0.1)
+
+        # assert
+        self.assertEqual(result, (job_id, _job, ('1',)))
+
+    def test_unfinished_jobs_are_delivered_again_on_init(self):
+        # arrange
+        backend = self._create_backend()
+        job_id = backend.put((_job, ('1',)))
+        finished_job_id = backend.put((_job, ('2',)))
+        backend.get(timeout=0.1)
+        backend.get(timeout=0.1)
+        backend.ack(finished_job_id)
+
+        # act
+        restarted_backend = SqliteJobQueueBackend(self.database_path, 2, poll_interval_seconds=0.01)
+        redelivered_jobs_count = restarted_backend.init()
+        result = restarted_backend.get(timeout=0.1)
+
+        # assert
+        self.assertEqual(redelivered_jobs_count, 1)
+        self.assertEqual(result, (job_id, _job, ('1',)))
+        self.assertIsNone(restarted_backend.get(timeout=0.01))
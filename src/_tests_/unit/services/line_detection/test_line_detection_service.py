@@ -15,6 +15,7 @@ from app.models.text_detection.text_recognized import TextRecognized
 from app.models.text_detection.text_detection_inference_response import TextDetectionInferenceResponse
 from app.models.bounding_box import BoundingBox
 from app.models.image_details import ImageDetails
+from app.models.enums.line_detection_algorithm import LineDetectionAlgorithm
 
 
 class TestDetectLines(unittest.TestCase):
@@ -164,6 +165,7 @@ class TestDetectLines(unittest.TestCase):
             line_segments=self.line_segments_service_results,
             image_url=f'{self.pid_id}.png',
             line_segments_count=2,
+            line_segments_count_before_merging=2,
             image_details=ImageDetails(height=self.image_height, width=self.image_width)
         )
         self.assertEqual(result, expected_result)
@@ -182,6 +184,7 @@ class TestDetectLines(unittest.TestCase):
             self.rho,
             self.theta_param,
             self.bounding_box_inclusive_denormalized,
+            LineDetectionAlgorithm.hough
         )
 
     def test_happy_path_no_thinning(self):
@@ -221,6 +224,7 @@ class TestDetectLines(unittest.TestCase):
             line_segments=self.line_segments_service_results,
             image_url=f'{self.pid_id}.png',
             line_segments_count=2,
+            line_segments_count_before_merging=2,
             image_details=ImageDetails(height=self.image_height, width=self.image_width)
         )
         self.assertEqual(result, expected_result)
@@ -239,4 +243,48 @@ class TestDetectLines(unittest.TestCase):
             self.rho,
             self.theta_param,
             self.bounding_box_inclusive_denormalized,
+            LineDetectionAlgorithm.hough
         )
+
+    @patch('app.services.line_detection.line_detection_service.config')
+    def test_merges_line_segments_when_enabled(self, mock_config):
+        # arrange
+        mock_config.debug = False
+        mock_config.line_detection_merge_enabled = True
+        mock_config.line_detection_merge_distance_tolerance_pixels = 2.0
+        mock_config.line_detection_merge_gap_tolerance_pixels = 3.0
+        mock_config.line_detection_merge_angle_tolerance_degrees = 1.0
+        merged_line_segments = [LineSegment(startX=0.1, startY=0.1, endX=0.5, endY=0.5)]
+
+        # act
+        with patch('app.services.line_detection.line_detection_service.detect_line_segments') as mock_detect_line_segments, \
+                patch('app.services.line_detection.line_detection_service.merge_line_segments') as mock_merge_line_segments, \
+                patch('app.services.line_detection.line_detection_service.LineDetectionImagePreprocessor.preprocess') as mock_preprocess:
+            mock_preprocess.return_value = self.image
+            mock_detect_line_segments.return_value = self.line_segments_service_results
+            mock_merge_line_segments.return_value = merged_line_segments
+
+            result = detect_lines(
+                pid_id=self.pid_id,
+                image_bytes=self.image,
+                text_detection_results=self.text_detection_results,
+                enable_thinning=False,
+                threshold=self.threshold,
+                max_line_gap=self.max_line_gap,
+                min_line_length=self.min_line_length,
+                rho=self.rho,
+                theta_param=self.theta_param,
+                bounding_box_inclusive=self.bounding_box_inclusive_normalized,
+                image_height=self.image_height,
+                image_width=self.image_width,
+                debug_image_preprocessed_path=None,
+                debug_image_preprocessed_before_thinning_path=None,
+                output_image_line_segments_path=None
+            )
+
+        # assert
+        mock_merge_line_segments.assert_called_once_with(
+            self.line_segments_service_results, self.image_height, self.image_width, 2.0, 3.0, 1.0)
+        self.assertEqual(result.line_segments, merged_line_segments)
+        self.assertEqual(result.line_segments_count, 1)
+        self.assertEqual(result.line_segments_count_before_merging, 2)
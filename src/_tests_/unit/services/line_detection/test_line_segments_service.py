@@ -4,13 +4,18 @@ import json
 import os
 import unittest
 import sys
+from unittest.mock import patch
 import cv2
+import numpy as np
 
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
 
 from app.models.bounding_box import BoundingBox
-from app.services.line_detection.line_segments_service import detect_line_segments
+from app.models.enums.line_detection_algorithm import LineDetectionAlgorithm
+from app.models.line_detection.line_segment import LineSegment
+from app.services.line_detection.line_segments_service import detect_line_segments, merge_line_segments
+from app.utils.image_utils import is_data_element_within_bounding_box
 input_data_path = os.path.join(os.path.dirname(__file__), 'data', 'input')
 expect_data_path = os.path.join(os.path.dirname(__file__), 'data', 'expect')
 
@@ -145,3 +150,159 @@ class TestDetectLineSegments(unittest.TestCase):
         # assert that the expected line segments are all returned
         result = [elem.dict() for elem in result]
         assert result == expected_output
+
+
+class TestHoughTilesSelection(unittest.TestCase):
+    @patch('app.services.line_detection.line_segments_service.cv2.HoughLinesP')
+    @patch('app.services.line_detection.line_segments_service.detect_line_segments_in_tiles')
+    @patch('app.services.line_detection.line_segments_service.config')
+    def test_tiles_enabled_uses_tiled_hough_transform(self, mock_config, mock_detect_in_tiles, mock_hough):
+        # arrange
+        mock_config.line_detection_hough_tiles_enabled = True
+        mock_config.line_detection_hough_tile_size_pixels = 2048
+        mock_config.line_detection_hough_tile_overlap_pixels = 64
+        mock_detect_in_tiles.return_value = np.array([[[10, 20, 90, 20]]], dtype=np.int32)
+        image = np.zeros((100, 200), dtype=np.uint8)
+
+        # act
+        result = detect_line_segments('pid_id', image, 100, 200, None, 5, 10, 0.1, 1080, None)
+
+        # assert
+        mock_hough.assert_not_called()
+        _, kwargs = mock_detect_in_tiles.call_args
+        self.assertEqual(kwargs['tile_size'], 2048)
+        self.assertEqual(kwargs['tile_overlap'], 64)
+        self.assertEqual(len(result), 1)
+        self.assertEqual((result[0].startX, result[0].startY, result[0].endX, result[0].endY), (0.05, 0.2, 0.45, 0.2))
+
+    @patch('app.services.line_detection.line_segments_service.detect_line_segments_in_tiles')
+    @patch('app.services.line_detection.line_segments_service.config')
+    def test_tiles_disabled_uses_hough_transform(self, mock_config, mock_detect_in_tiles):
+        # arrange
+        mock_config.line_detection_hough_tiles_enabled = False
+        image = np.zeros((100, 200), dtype=np.uint8)
+        image[20, 10:91] = 255
+
+        # act
+        result = detect_line_segments('pid_id', image, 100, 200, None, 5, 10, 0.1, 1080, None)
+
+        # assert
+        mock_detect_in_tiles.assert_not_called()
+        self.assertEqual(len(result), 1)
+
+
+class TestMorphologyLineDetectionAlgorithm(unittest.TestCase):
+    def test_axis_aligned_and_diagonal_lines_are_detected(self):
+        # arrange
+        image = np.zeros((100, 200), dtype=np.uint8)
+        cv2.line(image, (150, 80), (10, 80), 255, 1)
+        cv2.line(image, (180, 90), (180, 10), 255, 1)
+        cv2.line(image, (20, 10), (70, 60), 255, 1)
+
+        # act
+        result = detect_line_segments('pid_id', image, 100, 200, None, 5, 10, 0.1, 1080, None,
+                                      LineDetectionAlgorithm.morphology)
+
+        # assert
+        line_segments = [(line.startX * 200, line.startY * 100, line.endX * 200, line.endY * 100) for line in result]
+        self.assertEqual(len(line_segments), 3)
+        self.assertEqual(line_segments[0], (10, 80, 150, 80))
+        self.assertEqual(line_segments[1], (180, 10, 180, 90))
+        self.assertEqual(line_segments[2], (20, 10, 70, 60))
+
+    @patch('app.services.line_detection.line_segments_service.cv2.HoughLinesP', return_value=None)
+    def test_bounding_box_inclusive_filters_axis_aligned_lines(self, _):
+        # arrange
+        image = np.zeros((100, 200), dtype=np.uint8)
+        cv2.line(image, (10, 80), (150, 80), 255, 1)
+        cv2.line(image, (0, 2), (199, 2), 255, 1)
+        bounding_box = BoundingBox(topX=5.0, topY=5.0, bottomX=195.0, bottomY=95.0)
+
+        # act
+        result = detect_line_segments('pid_id', image, 100, 200, None, 5, 10, 0.1, 1080, bounding_box,
+                                      LineDetectionAlgorithm.morphology)
+
+        # assert
+        self.assertEqual(len(result), 1)
+        self.assertEqual((result[0].startX, result[0].startY, result[0].endX, result[0].endY), (0.05, 0.8, 0.75, 0.8))
+
+
+class TestMergeLineSegments(unittest.TestCase):
+    def test_collinear_line_segments_are_merged_and_others_unchanged(self):
+        # arrange
+        line_segments = [
+            LineSegment(startX=10 / 200, startY=20 / 100, endX=80 / 200, endY=20 / 100),
+            LineSegment(startX=33 / 200, startY=5 / 100, endX=71 / 200, endY=60 / 100),
+            LineSegment(startX=60 / 200, startY=21 / 100, endX=150 / 200, endY=21 / 100),
+            LineSegment(startX=151 / 200, startY=20 / 100, endX=170 / 200, endY=20 / 100),
+        ]
+
+        # act
+        result = merge_line_segments(line_segments, 100, 200, 2.0, 2.0, 2.0)
+
+        # assert
+        self.assertEqual(result, [
+            LineSegment(startX=10 / 200, startY=20 / 100, endX=170 / 200, endY=20 / 100),
+            line_segments[1],
+        ])
+
+    def test_merged_line_segment_end_points_are_sorted(self):
+        # arrange
+        line_segments = [
+            LineSegment(startX=50 / 200, startY=90 / 100, endX=50 / 200, endY=40 / 100),
+            LineSegment(startX=50 / 200, startY=10 / 100, endX=50 / 200, endY=45 / 100),
+        ]
+
+        # act
+        result = merge_line_segments(line_segments, 100, 200, 2.0, 2.0, 2.0)
+
+        # assert
+        self.assertEqual(result, [LineSegment(startX=50 / 200, startY=10 / 100, endX=50 / 200, endY=90 / 100)])
+
+    def test_no_line_segments(self):
+        # act
+        result = merge_line_segments([], 100, 200, 2.0, 2.0, 2.0)
+
+        # assert
+        self.assertEqual(result, [])
+
+
+class TestLineSegmentsPostProcessing(unittest.TestCase):
+    def _expected_line_segments(self, hough_results, bounding_box, image_height, image_width):
+        # the end points sorting and bounding box filtering of each line segment, one at a time
+        expected = []
+        for x1, y1, x2, y2 in hough_results.reshape(-1, 4).tolist():
+            if x1 > x2 or (x1 == x2 and y1 > y2):
+                x1, y1, x2, y2 = x2, y2, x1, y1
+            if is_data_element_within_bounding_box(bounding_box, x1, y1, x2, y2):
+                expected.append(LineSegment(startX=x1 / image_width, startY=y1 / image_height,
+                                            endX=x2 / image_width, endY=y2 / image_height))
+        return expected
+
+    @patch('app.services.line_detection.line_segments_service.cv2.HoughLinesP')
+    def test_end_points_are_sorted_and_line_segments_filtered_like_each_line_segment(self, mock_hough):
+        # arrange
+        rng = np.random.default_rng(0)
+        hough_results = rng.integers(0, 50, size=(2000, 1, 4), dtype=np.int32)
+        hough_results[:500, 0, 3] = hough_results[:500, 0, 1]
+        hough_results[500:1000, 0, 2] = hough_results[500:1000, 0, 0]
+        mock_hough.return_value = hough_results
+        bounding_box = BoundingBox(topX=5.0, topY=10.0, bottomX=45.5, bottomY=40.0)
+
+        for box in [None, bounding_box]:
+            with self.subTest(bounding_box=box):
+                # act
+                result = detect_line_segments('pid_id', np.zeros((60, 80), dtype=np.uint8), 60, 80,
+                                              None, 5, 10, 0.1, 1080, box)
+
+                # assert
+                self.assertEqual(result, self._expected_line_segments(hough_results, box, 60, 80))
+                self.assertTrue(all(type(line.startX) is float for line in result))
+
+    @patch('app.services.line_detection.line_segments_service.cv2.HoughLinesP', return_value=None)
+    def test_no_line_segments(self, _):
+        # act
+        result = detect_line_segments('pid_id', np.zeros((60, 80), dtype=np.uint8), 60, 80, None, 5, 10, 0.1, 1080, None)
+
+        # assert
+        self.assertEqual(result, [])
@@ -0,0 +1,56 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..', '..'))
+from app.services.line_detection.tools.benchmark import compare_line_segments, compute_coverage
+
+
+class TestCompareLineSegments(unittest.TestCase):
+    def test_same_lines_split_differently_match(self):
+        # arrange
+        reference = np.array([[10, 50, 190, 50]])
+        line_segments = np.array([[10, 51, 100, 51], [101, 50, 190, 50]])
+
+        # act
+        result = compare_line_segments(reference, line_segments, 100, 200)
+
+        # assert
+        self.assertEqual(result, {'recall': 1.0, 'precision': 1.0})
+
+    def test_missing_and_extra_lines_lower_recall_and_precision(self):
+        # arrange
+        reference = np.array([[0, 20, 99, 20], [0, 80, 99, 80]])
+        line_segments = np.array([[0, 20, 99, 20], [50, 0, 50, 9]])
+
+        # act
+        result = compare_line_segments(reference, line_segments, 100, 200)
+
+        # assert
+        self.assertEqual(result['recall'], 0.5)
+        self.assertEqual(result['precision'], 100 / 110)
+
+
+class TestComputeCoverage(unittest.TestCase):
+    def test_ratio_of_the_pixels_within_tolerance_of_the_line_segments(self):
+        # arrange
+        image = np.zeros((100, 200), dtype=np.uint8)
+        image[20, 0:100] = 255
+        image[80, 0:100] = 255
+        line_segments = np.array([[0, 21, 99, 21]])
+
+        # act
+        result = compute_coverage(image, line_segments)
+
+        # assert
+        self.assertEqual(result, 0.5)
+
+    def test_empty_image_is_covered(self):
+        # act
+        result = compute_coverage(np.zeros((10, 10), dtype=np.uint8), np.zeros((0, 4), dtype=np.int32))
+
+        # assert
+        self.assertEqual(result, 1.0)
@@ -0,0 +1,27 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..', '..'))
+from app.services.line_detection.tools.preprocessing_benchmark import run_benchmark
+
+
+class TestRunBenchmark(unittest.TestCase):
+    def test_preprocessings_have_the_same_results(self):
+        # act
+        report = run_benchmark(
+            text_boxes_counts=[50],
+            symbol_boxes_count=10,
+            repeat=1,
+            seed=0,
+            image_width=600,
+            image_height=400)
+
+        # assert
+        self.assertEqual(len(report['runs']), 1)
+        run = report['runs'][0]
+        self.assertEqual(run['different_pixels'], 0)
+        self.assertEqual(set(run['preprocessings']), {'per_box', 'grayscale_masking'})
+        self.assertGreater(run['preprocessings']['grayscale_masking']['speedup'], 0)
@@ -0,0 +1,188 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import json
+import os
+import sys
+import unittest
+from unittest.mock import patch
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..', '..'))
+from app.models.bounding_box import BoundingBox
+from app.services.line_detection.tools.benchmark import compare_line_segments
+from app.services.line_detection.utils.hough_tiling import build_tiles, detect_line_segments_in_tiles, \
+    stitch_tiles_line_segments
+from app.services.line_detection.utils.line_detection_image_preprocessor import LineDetectionImagePreprocessor
+
+input_data_path = os.path.join(os.path.dirname(__file__), 'data', 'input')
+
+
+def run_sequentially(func, tasks):
+    return [func(*args) for args in tasks]
+
+
+class TestBuildTiles(unittest.TestCase):
+    def test_tiles_cover_the_image_in_row_major_order(self):
+        # act
+        tiles = build_tiles(image_height=250, image_width=300, tile_size=128)
+
+        # assert
+        self.assertEqual(tiles, [
+            (0, 0, 128, 128), (128, 0, 256, 128), (256, 0, 300, 128),
+            (0, 128, 128, 250), (128, 128, 256, 250), (256, 128, 300, 250)])
+
+    def test_image_smaller_than_a_tile_is_a_single_tile(self):
+        # act
+        tiles = build_tiles(image_height=100, image_width=50, tile_size=128)
+
+        # assert
+        self.assertEqual(tiles, [(0, 0, 50, 100)])
+
+
+class TestStitchTilesLineSegments(unittest.TestCase):
+    tiles = [(0, 0, 100, 100), (100, 0, 200, 100)]
+    tile_overlap = 20
+
+    def _stitch(self, left_tile_line_segments, right_tile_line_segments):
+        return stitch_tiles_line_segments(
+            [np.array(left_tile_line_segments, dtype=np.int32).reshape(-1, 4),
+             np.array(right_tile_line_segments, dtype=np.int32).reshape(-1, 4)],
+            self.tiles,
+            self.tile_overlap,
+            image_height=100,
+            image_width=200)
+
+    def _sorted(self, line_segments):
+        return sorted(map(tuple, np.asarray(line_segments).reshape(-1, 4).tolist()))
+
+    def test_line_segment_split_at_the_seam_is_stitched(self):
+        # arrange
+        left = [[10, 50, 119, 50]]
+        right = [[81, 50, 190, 50]]
+
+        # act
+        result = self._stitch(left, right)
+
+        # assert
+        self.assertEqual(self._sorted(result), [(10, 50, 190, 50)])
+
+    def test_line_segment_within_the_overlap_is_deduplicated(self):
+        # arrange
+        left = [[85, 10, 115, 11]]
+        right = [[85, 10, 115, 10]]
+
+        # act
+        result = self._stitch(left, right)
+
+        # assert
+        self.assertEqual(len(result), 1)
+        x1, y1, x2, y2 = np.asarray(result).reshape(4)
+        self.assertEqual((min(x1, x2), max(x1, x2)), (85, 115))
+
+    def test_line_segments_inside_the_tiles_are_kept(self):
+        # arrange
+        left = [[10, 10, 60, 10], [30, 20, 30, 90]]
+        right = [[130, 40, 170, 80]]
+
+        # act
+        result = self._stitch(left, right)
+
+        # assert
+        self.assertEqual(self._sorted(result), [(10, 10, 60, 10), (30, 20, 30, 90), (130, 40, 170, 80)])
+
+    def test_crossing_line_segments_are_not_stitched(self):
+        # arrange
+        left = [[10, 50, 119, 50]]
+        right = [[100, 10, 100, 90]]
+
+        # act
+        result = self._stitch(left, right)
+
+        # assert
+        self.assertEqual(self._sorted(result), [(10, 50, 119, 50), (100, 10, 100, 90)])
+
+    def test_collinear_line_segments_of_the_same_tile_are_not_stitched(self):
+        # arrange
+        left = [[10, 50, 90, 50], [92, 50, 119, 50]]
+
+        # act
+        result = self._stitch(left, [])
+
+        # assert
+        self.assertEqual(self._sorted(result), [(10, 50, 90, 50), (92, 50, 119, 50)])
+
+    def test_parallel_line_segments_are_not_stitched(self):
+        # arrange
+        left = [[10, 50, 119, 50]]
+        right = [[81, 58, 190, 58]]
+
+        # act
+        result = self._stitch(left, right)
+
+        # assert
+        self.assertEqual(self._sorted(result), [(10, 50, 119, 50), (81, 58, 190, 58)])
+
+
+@patch('app.services.line_detection.utils.hough_tiling.candidate_matching_pool.run', side_effect=run_sequentially)
+class TestDetectLineSegmentsInTiles(unittest.TestCase):
+    def test_lines_crossing_tiles_are_detected_as_single_line_segments(self, _):
+        # arrange
+        image = np.zeros((300, 400), dtype=np.uint8)
+        cv2.line(image, (20, 150), (380, 150), 255, 1)
+        cv2.line(image, (200, 20), (200, 280), 255, 1)
+        cv2.line(image, (30, 40), (90, 40), 255, 1)
+
+        # act
+        result = detect_line_segments_in_tiles(
+            image, rho=0.1, theta=np.pi / 1080, threshold=5, min_line_length=10, max_line_gap=None,
+            tile_size=128, tile_overlap=32)
+
+        # assert
+        self.assertEqual(result.shape[1:], (1, 4))
+        line_segments = sorted(map(tuple, result.reshape(-1, 4).tolist()))
+        self.assertEqual(len(line_segments), 3)
+        for expected in [(20, 150, 380, 150), (200, 20, 200, 280), (30, 40, 90, 40)]:
+            self.assertTrue(any(
+                np.abs(np.array(segment) - expected).max() <= 1 or
+                np.abs(np.array(segment) - (expected[2], expected[3], expected[0], expected[1])).max() <= 1
+                for segment in line_segments), f'{expected} not found in {line_segments}')
+
+    def test_image_fitting_in_a_tile_is_not_sent_to_the_workers(self, mock_run):
+        # arrange
+        image = np.zeros((100, 100), dtype=np.uint8)
+        cv2.line(image, (10, 50), (90, 50), 255, 1)
+
+        # act
+        result = detect_line_segments_in_tiles(
+            image, rho=0.1, theta=np.pi / 1080, threshold=5, min_line_length=10, max_line_gap=None,
+            tile_size=128, tile_overlap=32)
+
+        # assert
+        mock_run.assert_not_called()
+        self.assertEqual(len(result), 1)
+
+    def test_line_segments_match_the_whole_image_transform(self, _):
+        # arrange
+        with open(os.path.join(input_data_path, 'image.png'), 'rb') as f:
+            image_bytes = f.read()
+        preprocessed_image = LineDetectionImagePreprocessor.apply_thinning(LineDetectionImagePreprocessor.preprocess(
+            image_bytes,
+            self._get_bounding_boxes_from_file(os.path.join(input_data_path, 'symbols.json')),
+            self._get_bounding_boxes_from_file(os.path.join(input_data_path, 'text.json'))))
+        image_height, image_width = preprocessed_image.shape
+        expected = cv2.HoughLinesP(preprocessed_image, 0.1, np.pi / 1080, 5, minLineLength=10, maxLineGap=None)
+
+        # act
+        result = detect_line_segments_in_tiles(
+            preprocessed_image, rho=0.1, theta=np.pi / 1080, threshold=5, min_line_length=10, max_line_gap=None,
+            tile_size=512, tile_overlap=64)
+
+        # assert
+        comparison = compare_line_segments(expected, result, image_height, image_width)
+        self.assertGreaterEqual(comparison['recall'], 0.97)
+        self.assertGreaterEqual(comparison['precision'], 0.97)
+
+    def _get_bounding_boxes_from_file(self, file_path):
+        with open(file_path) as f:
+            return [BoundingBox(**elem) for elem in json.load(f)]
@@ -10,7 +10,10 @@ import unittest
 from app.models.bounding_box import BoundingBox
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..', '..'))
-from app.services.line_detection.utils.line_detection_image_preprocessor import LineDetectionImagePreprocessor
+from app.services.line_detection.tools.preprocessing_benchmark import preprocess_per_box
+from app.services.line_detection.utils.line_detection_image_preprocessor import LineDetectionImagePreprocessor, \
+    get_pixel_bounding_boxes
+from app.utils.image_context import ImageContext
 
 input_data_path = os.path.join(os.path.dirname(__file__), 'data', 'input')
 
@@ -61,6 +64,67 @@ class TestLineDetectionImagePreprocessor(unittest.TestCase):
         for bb in bounding_boxes:
             self.assertTrue(np.all(output_image[int(bb.bottomY):int(bb.topY), int(bb.bottomX):int(bb.topX)] == output_image[int(bb.bottomY)][int(bb.bottomX)]))
 
+    def test_preprocess_matches_the_per_box_clearing_of_the_color_image(self):
+        # arrange
+        with open(os.path.join(input_data_path, 'image.png'), 'rb') as f:
+            image_bytes = f.read()
+        symbol_bounding_boxes = self._get_bounding_boxes_from_file(os.path.join(input_data_path, 'symbols.json'))
+        text_bounding_boxes = self._get_bounding_boxes_from_file(os.path.join(input_data_path, 'text.json'))
+        expected = preprocess_per_box(image_bytes, symbol_bounding_boxes, text_bounding_boxes)
+
+        # act
+        processed_image = LineDetectionImagePreprocessor.preprocess(image_bytes, symbol_bounding_boxes, text_bounding_boxes)
+        processed_image_from_context = LineDetectionImagePreprocessor.preprocess(
+            ImageContext.from_bytes(image_bytes), symbol_bounding_boxes, text_bounding_boxes)
+
+        # assert
+        np.testing.assert_array_equal(processed_image, expected)
+        np.testing.assert_array_equal(processed_image_from_context, expected)
+
+    def test_clear_bounding_boxes_matches_fill_poly(self):
+        # arrange
+        random = np.random.default_rng(0)
+        image = random.integers(0, 256, size=(200, 300), dtype=np.uint8)
+        bounding_boxes = [
+            BoundingBox(topX=10.7, topY=20.2, bottomX=50.9, bottomY=40.5),
+            BoundingBox(topX=80, topY=90, bottomX=60, bottomY=70),
+            BoundingBox(topX=-15.5, topY=150, bottomX=20, bottomY=250),
+            BoundingBox(topX=290, topY=-5, bottomX=320, bottomY=10),
+            BoundingBox(topX=400, topY=10, bottomX=420, bottomY=20),
+        ]
+        expected = image.copy()
+        for bb in bounding_boxes:
+            points = np.array([[bb.bottomX, bb.topY], [bb.bottomX, bb.bottomY], [bb.topX, bb.bottomY], [bb.topX, bb.topY]], np.int32)
+            cv2.fillPoly(expected, [points], 7)
+
+        # act
+        output_image = LineDetectionImagePreprocessor.clear_bounding_boxes(image, bounding_boxes, background_value=7)
+
+        # assert
+        np.testing.assert_array_equal(output_image, expected)
+
+    def test_get_pixel_bounding_boxes_are_truncated_and_clipped(self):
+        # arrange
+        bounding_boxes = [
+            BoundingBox(topX=10.7, topY=20.2, bottomX=50.9, bottomY=40.5),
+            BoundingBox(topX=80, topY=90, bottomX=60, bottomY=70),
+            BoundingBox(topX=-15.5, topY=150, bottomX=20, bottomY=250),
+            BoundingBox(topX=400, topY=10, bottomX=420, bottomY=20),
+        ]
+
+        # act
+        pixel_bounding_boxes = get_pixel_bounding_boxes(bounding_boxes, 200, 300)
+
+        # assert
+        self.assertEqual(pixel_bounding_boxes.tolist(), [[10, 20, 50, 40], [60, 70, 80, 90], [0, 150, 20, 199]])
+
+    def test_get_pixel_bounding_boxes_without_bounding_boxes(self):
+        # act
+        pixel_bounding_boxes = get_pixel_bounding_boxes([], 200, 300)
+
+        # assert
+        self.assertEqual(pixel_bounding_boxes.shape, (0, 4))
+
     def _get_bounding_boxes_from_file(self, file_path):
         file = open(file_path)
         file_data = json.load(file)
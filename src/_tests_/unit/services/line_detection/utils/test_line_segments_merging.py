@@ -0,0 +1,178 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import json
+import os
+import sys
+import unittest
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..', '..'))
+from app.models.bounding_box import BoundingBox
+from app.services.line_detection.tools.benchmark import compare_line_segments
+from app.services.line_detection.utils.line_detection_image_preprocessor import LineDetectionImagePreprocessor
+from app.services.line_detection.utils.line_segments_merging import find_collinear_pairs, find_overlapping_pairs, \
+    merge_collinear_line_segments, merge_line_segment_pairs
+
+input_data_path = os.path.join(os.path.dirname(__file__), 'data', 'input')
+
+
+def sorted_pairs(pairs):
+    return sorted(map(tuple, np.sort(pairs, axis=1).tolist()))
+
+
+class TestFindOverlappingPairs(unittest.TestCase):
+    def test_overlapping_and_close_intervals_are_paired(self):
+        # arrange
+        starts = np.array([0, 20, 5, 31, 100])
+        ends = np.array([10, 30, 8, 40, 110])
+
+        # act
+        pairs = find_overlapping_pairs(starts, ends, 1)
+
+        # assert
+        self.assertEqual(sorted_pairs(pairs), [(0, 2), (1, 3)])
+
+    def test_no_pairs(self):
+        # act
+        pairs = find_overlapping_pairs(np.array([0, 20]), np.array([10, 30]), 1)
+
+        # assert
+        self.assertEqual(pairs.shape, (0, 2))
+
+
+class TestFindCollinearPairs(unittest.TestCase):
+    def test_pairs_have_close_orientations_and_offsets(self):
+        # arrange
+        line_segments = np.array([
+            [0, 10, 100, 10],
+            [150, 11, 300, 11],
+            [0, 30, 100, 30],
+            [50, 0, 50, 100],
+            [0, 0, 100, 100],
+        ])
+
+        # act
+        pairs = find_collinear_pairs(line_segments, distance_tolerance=2, angle_tolerance_degrees=2)
+
+        # assert
+        self.assertEqual(sorted_pairs(pairs), [(0, 1)])
+
+    def test_nearly_horizontal_line_segments_of_opposite_directions_are_paired(self):
+        # arrange
+        line_segments = np.array([
+            [0, 50, 200, 51],
+            [400, 50, 200, 51],
+        ])
+
+        # act
+        pairs = find_collinear_pairs(line_segments, distance_tolerance=2, angle_tolerance_degrees=2)
+
+        # assert
+        self.assertEqual(sorted_pairs(pairs), [(0, 1)])
+
+    def test_orientations_at_the_border_of_two_bins_are_paired(self):
+        # arrange
+        angle = np.radians(2.0)
+        line_segments = np.array([
+            [0, 0, 1000 * np.cos(angle - 0.001), 1000 * np.sin(angle - 0.001)],
+            [0, 0, 1000 * np.cos(angle + 0.001), 1000 * np.sin(angle + 0.001)],
+        ])
+
+        # act
+        pairs = find_collinear_pairs(line_segments, distance_tolerance=2, angle_tolerance_degrees=1)
+
+        # assert
+        self.assertEqual(sorted_pairs(pairs), [(0, 1)])
+
+
+class TestMergeLineSegmentPairs(unittest.TestCase):
+    def test_overlapping_duplicates_and_adjacent_line_segments_are_merged(self):
+        # arrange
+        line_segments = np.array([
+            [10, 50, 100, 50],
+            [40, 51, 80, 51],
+            [102, 50, 150, 50],
+        ], dtype=np.int32)
+        pairs = np.array([[0, 1], [0, 2]])
+
+        # act
+        result = merge_line_segment_pairs(line_segments, pairs, 2, 2, 0.05)
+
+        # assert
+        self.assertEqual(result.tolist(), [[10, 50, 150, 50]])
+        self.assertEqual(result.dtype, np.int32)
+
+    def test_distant_parallel_and_crossing_line_segments_are_not_merged(self):
+        # arrange
+        line_segments = np.array([
+            [10, 50, 100, 50],
+            [10, 54, 100, 54],
+            [105, 50, 150, 50],
+            [50, 0, 50, 100],
+        ])
+        pairs = np.array([[0, 1], [0, 2], [0, 3]])
+
+        # act
+        result = merge_line_segment_pairs(line_segments, pairs, 2, 2, 0.05)
+
+        # assert
+        np.testing.assert_array_equal(result, line_segments)
+
+    def test_groups_are_in_the_order_of_their_first_line_segment(self):
+        # arrange
+        line_segments = np.array([
+            [0, 0, 0, 50],
+            [10, 50, 100, 50],
+            [0, 50, 0, 60],
+            [100, 50, 150, 50],
+        ])
+        pairs = np.array([[1, 3], [0, 2]])
+
+        # act
+        result = merge_line_segment_pairs(line_segments, pairs, 2, 2, 0.05)
+
+        # assert
+        self.assertEqual(result.tolist(), [[0, 0, 0, 60], [10, 50, 150, 50]])
+
+
+class TestMergeCollinearLineSegments(unittest.TestCase):
+    def test_fragmented_line_is_merged(self):
+        # arrange
+        line_segments = np.array([
+            [300, 20, 200, 20],
+            [0, 20, 120, 20],
+            [118, 21, 201, 21],
+            [0, 0, 60, 60],
+            [60, 60, 90, 90],
+        ])
+
+        # act
+        result = merge_collinear_line_segments(line_segments, 2, 2, 2)
+
+        # assert
+        self.assertEqual(sorted(map(tuple, result.tolist())), [(0, 0, 90, 90), (0, 20, 300, 20)])
+
+    def test_merged_line_segments_of_the_hough_transform_cover_the_same_pixels(self):
+        # arrange
+        with open(os.path.join(input_data_path, 'image.png'), 'rb') as f:
+            image_bytes = f.read()
+        preprocessed_image = LineDetectionImagePreprocessor.preprocess(
+            image_bytes,
+            self._get_bounding_boxes_from_file(os.path.join(input_data_path, 'symbols.json')),
+            self._get_bounding_boxes_from_file(os.path.join(input_data_path, 'text.json')))
+        image_height, image_width = preprocessed_image.shape
+        line_segments = cv2.HoughLinesP(preprocessed_image, 0.1, np.pi / 1080, 5, minLineLength=10, maxLineGap=None).reshape(-1, 4)
+
+        # act
+        result = merge_collinear_line_segments(line_segments, 2, 2, 2)
+
+        # assert
+        self.assertLess(len(result), len(line_segments) * 0.8)
+        comparison = compare_line_segments(line_segments, result, image_height, image_width)
+        self.assertGreaterEqual(comparison['recall'], 0.99)
+        self.assertGreaterEqual(comparison['precision'], 0.99)
+
+    def _get_bounding_boxes_from_file(self, file_path):
+        with open(file_path) as f:
+            return [BoundingBox(**elem) for elem in json.load(f)]
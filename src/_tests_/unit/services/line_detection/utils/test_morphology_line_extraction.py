@@ -0,0 +1,113 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import json
+import os
+import sys
+import unittest
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..', '..'))
+from app.models.bounding_box import BoundingBox
+from app.services.line_detection.tools.benchmark import compare_line_segments
+from app.services.line_detection.utils.line_detection_image_preprocessor import LineDetectionImagePreprocessor
+from app.services.line_detection.utils.morphology_line_extraction import extract_axis_aligned_line_segments
+
+input_data_path = os.path.join(os.path.dirname(__file__), 'data', 'input')
+
+
+class TestExtractAxisAlignedLineSegments(unittest.TestCase):
+    def test_horizontal_and_vertical_lines_are_extracted(self):
+        # arrange
+        image = np.zeros((100, 200), dtype=np.uint8)
+        cv2.line(image, (10, 20), (150, 20), 255, 1)
+        cv2.line(image, (180, 5), (180, 95), 255, 1)
+        cv2.line(image, (0, 99), (199, 99), 255, 1)
+
+        # act
+        line_segments, residual = extract_axis_aligned_line_segments(image, min_run_length=30, max_line_gap=None)
+
+        # assert
+        self.assertEqual(sorted(map(tuple, line_segments.tolist())),
+                         [(0, 99, 199, 99), (10, 20, 150, 20), (180, 5, 180, 95)])
+        self.assertEqual(np.count_nonzero(residual), 0)
+
+    def test_diagonal_lines_and_short_runs_are_left_in_the_residual_image(self):
+        # arrange
+        image = np.zeros((100, 200), dtype=np.uint8)
+        cv2.line(image, (10, 10), (90, 90), 255, 1)
+        cv2.line(image, (120, 50), (140, 50), 255, 1)
+
+        # act
+        line_segments, residual = extract_axis_aligned_line_segments(image, min_run_length=30, max_line_gap=None)
+
+        # assert
+        self.assertEqual(len(line_segments), 0)
+        np.testing.assert_array_equal(residual, image)
+
+    def test_crossing_lines_are_cleared_from_the_residual_image(self):
+        # arrange
+        image = np.zeros((100, 100), dtype=np.uint8)
+        cv2.line(image, (10, 50), (90, 50), 255, 1)
+        cv2.line(image, (50, 10), (50, 90), 255, 1)
+        cv2.line(image, (10, 10), (40, 40), 255, 1)
+
+        # act
+        line_segments, residual = extract_axis_aligned_line_segments(image, min_run_length=30, max_line_gap=None)
+
+        # assert
+        self.assertEqual(sorted(map(tuple, line_segments.tolist())), [(10, 50, 90, 50), (50, 10, 50, 90)])
+        self.assertEqual(np.count_nonzero(residual[45:56, :]), 0)
+        self.assertEqual(np.count_nonzero(residual[:, 45:56]), 0)
+        self.assertEqual(np.count_nonzero(residual), 31)
+
+    def test_gaps_of_dashed_lines_are_joined(self):
+        # arrange
+        image = np.zeros((50, 200), dtype=np.uint8)
+        for x in range(10, 190, 15):
+            cv2.line(image, (x, 25), (x + 9, 25), 255, 1)
+
+        # act
+        line_segments, _ = extract_axis_aligned_line_segments(image, min_run_length=30, max_line_gap=6)
+
+        # assert
+        self.assertEqual(line_segments.tolist(), [[10, 25, 184, 25]])
+
+    def test_gaps_are_not_joined_without_max_line_gap(self):
+        # arrange
+        image = np.zeros((50, 200), dtype=np.uint8)
+        for x in range(10, 190, 15):
+            cv2.line(image, (x, 25), (x + 9, 25), 255, 1)
+
+        # act
+        line_segments, residual = extract_axis_aligned_line_segments(image, min_run_length=30, max_line_gap=None)
+
+        # assert
+        self.assertEqual(len(line_segments), 0)
+        np.testing.assert_array_equal(residual, image)
+
+    def test_line_segments_with_hough_fallback_match_the_hough_transform(self):
+        # arrange
+        with open(os.path.join(input_data_path, 'image.png'), 'rb') as f:
+            image_bytes = f.read()
+        preprocessed_image = LineDetectionImagePreprocessor.apply_thinning(LineDetectionImagePreprocessor.preprocess(
+            image_bytes,
+            self._get_bounding_boxes_from_file(os.path.join(input_data_path, 'symbols.json')),
+            self._get_bounding_boxes_from_file(os.path.join(input_data_path, 'text.json'))))
+        image_height, image_width = preprocessed_image.shape
+        expected = cv2.HoughLinesP(preprocessed_image, 0.1, np.pi / 1080, 5, minLineLength=10, maxLineGap=None)
+
+        # act
+        line_segments, residual = extract_axis_aligned_line_segments(preprocessed_image, min_run_length=30, max_line_gap=None)
+        residual_line_segments = cv2.HoughLinesP(residual, 0.1, np.pi / 1080, 5, minLineLength=10, maxLineGap=None)
+
+        # assert
+        self.assertLess(np.count_nonzero(residual), np.count_nonzero(preprocessed_image) / 2)
+        result = np.concatenate([line_segments, residual_line_segments.reshape(-1, 4)])
+        comparison = compare_line_segments(expected, result, image_height, image_width)
+        self.assertGreaterEqual(comparison['recall'], 0.95)
+        self.assertGreaterEqual(comparison['precision'], 0.95)
+
+    def _get_bounding_boxes_from_file(self, file_path):
+        with open(file_path) as f:
+            return [BoundingBox(**elem) for elem in json.load(f)]
@@ -1,8 +1,14 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
+import asyncio
+import json
 import os
+import threading
+import time
 import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import MagicMock
+import httpx
 import pytest
 from requests import HTTPError
 import sys
@@ -11,53 +17,185 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
 from app.services.symbol_detection.symbol_detection_endpoint_client import SymbolDetectionEndpointClient
 
 
-class TestSendRequest(unittest.TestCase):
-    def test_happy_path(self):
+class InferenceServerStandIn:
+    '''Local stand-in of the symbol detection inference endpoint, answering after a delay.'''
+
+    def __init__(self, delay_seconds: float = 0.0, status_codes: tuple = ()):
+        self.delay_seconds = delay_seconds
+        # the status codes of the first responses, the next ones are 200; None closes the connection without a response
+        self.status_codes = list(status_codes)
+        self.requests: list[dict] = []
+        self.in_flight_requests = 0
+        self.max_in_flight_requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._create_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _create_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                with server._lock:
+                    server.requests.append({'path': self.path, 'headers': dict(self.headers), 'body': body})
+                    server.in_flight_requests += 1
+                    server.max_in_flight_requests = max(server.max_in_flight_requests, server.in_flight_requests)
+                    status_code = server.status_codes.pop(0) if server.status_codes else 200
+
+                time.sleep(server.delay_seconds)
+
+                with server._lock:
+                    server.in_flight_requests -= 1
+
+                if status_code is None:
+                    self.close_connection = True
+                    return
+
+                content = json.dumps({'boxes': []} if status_code == 200 else {'error': 'error'}).encode('utf-8')
+                self.send_response(status_code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def create_config(url: str, max_in_flight_requests: int = 4, retry_count: int = 3) -> MagicMock:
+    config = MagicMock()
+    config.symbol_detection_api = url
+    config.symbol_detection_api_bearer_token = 'bearer-token'
+    config.symbol_detection_max_in_flight_requests = max_in_flight_requests
+    config.inference_service_retry_count = retry_count
+    config.inference_service_retry_backoff_factor = 0.01
+    return config
+
+
+class TestSendRequest(unittest.IsolatedAsyncioTestCase):
+    async def test_happy_path(self):
         # arrange
-        bearer_token = 'bearer-token'
+        with InferenceServerStandIn() as server:
+            symbol_detection_endpoint_client = SymbolDetectionEndpointClient(create_config(server.url), MagicMock())
 
-        config = MagicMock()
-        config.symbol_detection_api = 'http://inference-endpoint'
-        config.symbol_detection_api_bearer_token = bearer_token
-        session = MagicMock()
-        session.post.return_value = MagicMock()
-        session.post.return_value.json.return_value = { 'predictions': [] }
-        session.post.return_value.raise_for_status.return_value = None
-        symbol_detection_endpoint_client = SymbolDetectionEndpointClient(config, session)
+            # act
+            response = await symbol_detection_endpoint_client.send_request(b'image-bytes')
+            await symbol_detection_endpoint_client.close()
 
-        # act
-        response = symbol_detection_endpoint_client.send_request(b'image-bytes')
+        # assert
+        self.assertEqual(response, {'boxes': []})
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(server.requests[0]['path'], '/score')
+        self.assertEqual(server.requests[0]['headers']['Authorization'], 'Bearer bearer-token')
+        self.assertIn(b'name="image"', server.requests[0]['body'])
+        self.assertIn(b'image-bytes', server.requests[0]['body'])
+
+    async def test_raises_http_status_error_when_response_status_code_is_400(self):
+        # arrange
+        with InferenceServerStandIn(status_codes=[400]) as server:
+            symbol_detection_endpoint_client = SymbolDetectionEndpointClient(create_config(server.url), MagicMock())
+
+            # act
+            with pytest.raises(httpx.HTTPStatusError) as e:
+                await symbol_detection_endpoint_client.send_request(b'image-bytes')
+            await symbol_detection_endpoint_client.close()
 
         # assert
-        session.post.assert_called_once_with(
-            'http://inference-endpoint/score',
-            files={ 'image': b'image-bytes' },
-            headers={ 'Authorization': f'Bearer {bearer_token}' })
-        self.assertEqual(response, { 'predictions': [] })
+        self.assertEqual(e.value.response.status_code, 400)
+        self.assertEqual(len(server.requests), 1)
 
-    def test_raises_http_error_when_response_status_code_is_400(self):
+    async def test_retries_when_response_status_code_is_503(self):
         # arrange
-        bearer_token = 'bearer-token'
-        error = HTTPError('error')
+        with InferenceServerStandIn(status_codes=[503, 504]) as server:
+            symbol_detection_endpoint_client = SymbolDetectionEndpointClient(create_config(server.url), MagicMock())
 
-        config = MagicMock()
-        config.symbol_detection_api = 'http://inference-endpoint'
-        config.symbol_detection_api_bearer_token = bearer_token
-        session = MagicMock()
-        session.post.return_value = MagicMock()
-        session.post.return_value.raise_for_status.side_effect = error
-        symbol_detection_endpoint_client = SymbolDetectionEndpointClient(config, session)
+            # act
+            response = await symbol_detection_endpoint_client.send_request(b'image-bytes')
+            await symbol_detection_endpoint_client.close()
 
-        # act
-        with pytest.raises(HTTPError) as e:
-            symbol_detection_endpoint_client.send_request(b'image-bytes')
+        # assert
+        self.assertEqual(response, {'boxes': []})
+        self.assertEqual(len(server.requests), 3)
+
+    async def test_retries_when_connection_is_closed_without_response(self):
+        # arrange
+        with InferenceServerStandIn(status_codes=[None]) as server:
+            symbol_detection_endpoint_client = SymbolDetectionEndpointClient(create_config(server.url), MagicMock())
+
+            # act
+            response = await symbol_detection_endpoint_client.send_request(b'image-bytes')
+            await symbol_detection_endpoint_client.close()
 
         # assert
-        session.post.assert_called_once_with(
-            'http://inference-endpoint/score',
-            files={ 'image': b'image-bytes' },
-            headers={ 'Authorization': f'Bearer {bearer_token}' })
-        self.assertEqual(e.value, error)
+        self.assertEqual(response, {'boxes': []})
+        self.assertEqual(len(server.requests), 2)
+
+    async def test_raises_http_status_error_when_retries_are_exhausted(self):
+        # arrange
+        with InferenceServerStandIn(status_codes=[503, 503, 503]) as server:
+            symbol_detection_endpoint_client = SymbolDetectionEndpointClient(
+                create_config(server.url, retry_count=2), MagicMock())
+
+            # act
+            with pytest.raises(httpx.HTTPStatusError) as e:
+                await symbol_detection_endpoint_client.send_request(b'image-bytes')
+            await symbol_detection_endpoint_client.close()
+
+        # assert
+        self.assertEqual(e.value.response.status_code, 503)
+        self.assertEqual(len(server.requests), 3)
+
+    async def test_concurrent_requests_are_limited_to_max_in_flight_requests(self):
+        # arrange
+        with InferenceServerStandIn(delay_seconds=0.05) as server:
+            symbol_detection_endpoint_client = SymbolDetectionEndpointClient(
+                create_config(server.url, max_in_flight_requests=2), MagicMock())
+
+            # act
+            responses = await asyncio.gather(*(symbol_detection_endpoint_client.send_request(b'image-bytes') for _ in range(8)))
+            await symbol_detection_endpoint_client.close()
+
+        # assert
+        self.assertEqual(responses, [{'boxes': []}] * 8)
+        self.assertEqual(len(server.requests), 8)
+        self.assertEqual(server.max_in_flight_requests, 2)
+
+    async def test_requests_do_not_block_the_event_loop(self):
+        # arrange
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        with InferenceServerStandIn(delay_seconds=0.2) as server:
+            symbol_detection_endpoint_client = SymbolDetectionEndpointClient(create_config(server.url), MagicMock())
+            ticker = asyncio.ensure_future(tick())
+
+            # act
+            await symbol_detection_endpoint_client.send_request(b'image-bytes')
+            ticker.cancel()
+            await symbol_detection_endpoint_client.close()
+
+        # assert
+        self.assertGreater(ticks, 5)
 
 
 class TestCheckHealth(unittest.TestCase):
@@ -2,10 +2,10 @@
 # Licensed under the MIT license.
 import os
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from fastapi import HTTPException
 import pytest
-from requests import HTTPError
+import httpx
 import sys
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..', '..'))
@@ -35,7 +35,7 @@ class TestRunInferencing(unittest.IsolatedAsyncioTestCase):
         ]
 
         symbol_detection_endpoint_client = MagicMock()
-        symbol_detection_endpoint_client.send_request = MagicMock(return_value={'boxes': boxes})
+        symbol_detection_endpoint_client.send_request = AsyncMock(return_value={'boxes': boxes})
 
         blob_storage_client = MagicMock()
         blob_storage_client.upload_bytes = MagicMock(wraps=mock_upload_bytes_coroutine)
@@ -86,7 +86,7 @@ class TestRunInferencing(unittest.IsolatedAsyncioTestCase):
         ]
 
         symbol_detection_endpoint_client = MagicMock()
-        symbol_detection_endpoint_client.send_request = MagicMock(return_value={'boxes': boxes})
+        symbol_detection_endpoint_client.send_request = AsyncMock(return_value={'boxes': boxes})
 
         blob_storage_client = MagicMock()
         blob_storage_client.upload_bytes = MagicMock(wraps=mock_upload_bytes_coroutine)
@@ -141,7 +141,7 @@ class TestRunInferencing(unittest.IsolatedAsyncioTestCase):
         ]
 
         symbol_detection_endpoint_client = MagicMock()
-        symbol_detection_endpoint_client.send_request = MagicMock(return_value={'boxes': boxes})
+        symbol_detection_endpoint_client.send_request = AsyncMock(return_value={'boxes': boxes})
 
         blob_storage_client = MagicMock()
         blob_storage_client.upload_bytes = MagicMock(wraps=mock_upload_bytes_coroutine)
@@ -187,7 +187,7 @@ class TestRunInferencing(unittest.IsolatedAsyncioTestCase):
         bounding_box_inclusive = BoundingBox(bottomX=0.0, bottomY=0.0, topX=1.0, topY=1.0)
 
         symbol_detection_endpoint_client = MagicMock()
-        symbol_detection_endpoint_client.send_request = MagicMock(side_effect=Exception('error'))
+        symbol_detection_endpoint_client.send_request = AsyncMock(side_effect=Exception('error'))
 
         # act
         with patch("app.services.symbol_detection.symbol_detection_endpoint_client", symbol_detection_endpoint_client):
@@ -208,8 +208,8 @@ class TestRunInferencing(unittest.IsolatedAsyncioTestCase):
         bounding_box_inclusive = BoundingBox(bottomX=0.0, bottomY=0.0, topX=1.0, topY=1.0)
 
         symbol_detection_endpoint_client = MagicMock()
-        http_error = HTTPError(response=MagicMock(status_code=400, text='error'))
-        symbol_detection_endpoint_client.send_request = MagicMock(side_effect=http_error)
+        http_error = httpx.HTTPStatusError("error", request=MagicMock(), response=MagicMock(status_code=400, text='error'))
+        symbol_detection_endpoint_client.send_request = AsyncMock(side_effect=http_error)
 
         # act
         with patch("app.services.symbol_detection.symbol_detection_service.symbol_detection_endpoint_client", symbol_detection_endpoint_client):
@@ -230,8 +230,8 @@ class TestRunInferencing(unittest.IsolatedAsyncioTestCase):
         bounding_box_inclusive = BoundingBox(bottomX=0.0, bottomY=0.0, topX=1.0, topY=1.0)
 
         symbol_detection_endpoint_client = MagicMock()
-        http_error = HTTPError(response=MagicMock(status_code=500, text='error'))
-        symbol_detection_endpoint_client.send_request = MagicMock(side_effect=http_error)
+        http_error = httpx.HTTPStatusError("error", request=MagicMock(), response=MagicMock(status_code=500, text='error'))
+        symbol_detection_endpoint_client.send_request = AsyncMock(side_effect=http_error)
 
         # act
         with patch("app.services.symbol_detection.symbol_detection_service.symbol_detection_endpoint_client", symbol_detection_endpoint_client):
@@ -0,0 +1,341 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceNotFoundError, ResourceNotModifiedError
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+from app.config import Config
+from app.models.enums.blob_storage_backend_type import BlobStorageBackendType
+from app.models.downloaded_blob import DownloadedBlob
+from app.services.async_blob_storage_client import AzureAsyncBlobStorageClient, CachedAsyncBlobStorageClient, \
+    LocalAsyncBlobStorageClient, create_async_blob_storage_client
+from app.services.blob_cache import BlobCache
+
+
+class TestLocalAsyncBlobStorageClient(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temporary_directory.cleanup)
+        self.root_path = os.path.join(self.temporary_directory.name, 'blobs')
+        self.client = LocalAsyncBlobStorageClient(self.root_path)
+        await self.client.init()
+
+    async def test_happy_path_upload_and_download_bytes(self):
+        # act
+        await self.client.upload_bytes('123/symbol-detection/123.png', b'bytes')
+        await self.client.upload_bytes('123/symbol-detection/response.json', '{"a": "é"}')
+
+        # assert
+        self.assertEqual(await self.client.download_bytes('123/symbol-detection/123.png'), b'bytes')
+        self.assertEqual(await self.client.download_bytes('123/symbol-detection/response.json'), '{"a": "é"}'.encode('utf-8'))
+        self.assertEqual(sorted(os.listdir(os.path.join(self.root_path, '123', 'symbol-detection'))),
+                         ['123.png', 'response.json'])
+
+    async def test_upload_overwrites_blob(self):
+        # act
+        await self.client.upload_bytes('123/status.json', b'submitted')
+        await self.client.upload_bytes('123/status.json', b'done')
+
+        # assert
+        self.assertEqual(await self.client.download_bytes('123/status.json'), b'done')
+        self.assertEqual(os.listdir(os.path.join(self.root_path, '123')), ['status.json'])
+
+    async def test_happy_path_upload_stream(self):
+        # arrange
+        async def chunks():
+            yield b'by'
+            yield b'tes'
+
+        # act
+        await self.client.upload_stream('123/symbol-detection/123.png', chunks())
+
+        # assert
+        self.assertEqual(await self.client.download_bytes('123/symbol-detection/123.png'), b'bytes')
+        self.assertEqual(os.listdir(os.path.join(self.root_path, '123', 'symbol-detection')), ['123.png'])
+
+    async def test_failed_upload_stream_leaves_blob_unchanged(self):
+        # arrange
+        await self.client.upload_bytes('123/symbol-detection/123.png', b'bytes')
+
+        async def chunks():
+            yield b'partial'
+            raise Exception('error')
+
+        # act
+        with self.assertRaises(Exception):
+            await self.client.upload_stream('123/symbol-detection/123.png', chunks())
+
+        # assert
+        self.assertEqual(await self.client.download_bytes('123/symbol-detection/123.png'), b'bytes')
+        self.assertEqual(os.listdir(os.path.join(self.root_path, '123', 'symbol-detection')), ['123.png'])
+
+    async def test_blob_exists(self):
+        # arrange
+        await self.client.upload_bytes('123/status.json', b'done')
+
+        # act / assert
+        self.assertTrue(await self.client.blob_exists('123/status.json'))
+        self.assertFalse(await self.client.blob_exists('123/response.json'))
+        self.assertFalse(await self.client.blob_exists('123'))
+
+    async def test_download_missing_blob_raises_resource_not_found_error(self):
+        # act / assert
+        with self.assertRaises(ResourceNotFoundError):
+            await self.client.download_bytes('123/response.json')
+
+    async def test_happy_path_download_blob_if_exists_with_etag(self):
+        # arrange
+        await self.client.upload_bytes('123/status.json', b'submitted')
+
+        # act
+        missing_blob = await self.client.download_blob_if_exists('123/response.json')
+        blob = await self.client.download_blob_if_exists('123/status.json')
+        not_modified_blob = await self.client.download_blob_if_exists('123/status.json', blob.etag)
+        await self.client.upload_bytes('123/status.json', b'done')
+        modified_blob = await self.client.download_blob_if_exists('123/status.json', blob.etag)
+
+        # assert
+        self.assertIsNone(missing_blob)
+        self.assertEqual(blob.content, b'submitted')
+        self.assertFalse(not_modified_blob.modified)
+        self.assertEqual(not_modified_blob.etag, blob.etag)
+        self.assertEqual(modified_blob.content, b'done')
+        self.assertNotEqual(modified_blob.etag, blob.etag)
+
+    async def test_happy_path_download_bytes_if_exists(self):
+        # arrange
+        await self.client.upload_bytes('123/status.json', b'')
+
+        # act / assert
+        self.assertEqual(await self.client.download_bytes_if_exists('123/status.json'), b'')
+        self.assertIsNone(await self.client.download_bytes_if_exists('123/response.json'))
+
+    async def test_blob_name_outside_of_root_path_raises_value_error(self):
+        # act / assert
+        with self.assertRaises(ValueError):
+            await self.client.upload_bytes('../123.png', b'bytes')
+        with self.assertRaises(ValueError):
+            await self.client.blob_exists('/etc/passwd')
+
+
+class TestAzureAsyncBlobStorageClient(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.config = Config(blob_storage_max_concurrency=8)
+        self.blob_client = MagicMock()
+        self.container_client = MagicMock()
+        self.container_client.get_blob_client.return_value = self.blob_client
+        self.client = AzureAsyncBlobStorageClient(self.config, MagicMock())
+        self.client._container_client = self.container_client
+
+    async def test_happy_path_upload_bytes_with_max_concurrency(self):
+        # arrange
+        self.blob_client.upload_blob = AsyncMock()
+
+        # act
+        await self.client.upload_bytes('blob-name', b'bytes')
+
+        # assert
+        self.container_client.get_blob_client.assert_called_once_with('blob-name')
+        self.blob_client.upload_blob.assert_awaited_once_with(b'bytes', overwrite=True, max_concurrency=8)
+
+    async def test_happy_path_upload_stream_with_max_concurrency(self):
+        # arrange
+        self.blob_client.upload_blob = AsyncMock()
+        chunks = MagicMock()
+
+        # act
+        await self.client.upload_stream('blob-name', chunks)
+
+        # assert
+        self.blob_client.upload_blob.assert_awaited_once_with(chunks, overwrite=True, max_concurrency=8)
+
+    async def test_happy_path_download_bytes_with_max_concurrency(self):
+        # arrange
+        downloader = MagicMock()
+        downloader.readall = AsyncMock(return_value=b'bytes')
+        self.blob_client.download_blob = AsyncMock(return_value=downloader)
+
+        # act
+        result = await self.client.download_bytes('blob-name')
+
+        # assert
+        self.assertEqual(result, b'bytes')
+        self.blob_client.download_blob.assert_awaited_once_with(max_concurrency=8)
+
+    async def test_happy_path_download_blob_if_exists(self):
+        # arrange
+        downloader = MagicMock()
+        downloader.readall = AsyncMock(return_value=b'bytes')
+        downloader.properties.etag = '"etag"'
+        self.blob_client.download_blob = AsyncMock(return_value=downloader)
+
+        # act
+        result = await self.client.download_blob_if_exists('blob-name')
+
+        # assert
+        self.assertEqual((result.content, result.etag), (b'bytes', '"etag"'))
+        self.blob_client.download_blob.assert_awaited_once_with(max_concurrency=8)
+
+    async def test_download_blob_if_exists_returns_none_when_blob_does_not_exist(self):
+        # arrange
+        self.blob_client.download_blob = AsyncMock(side_effect=ResourceNotFoundError('not found'))
+
+        # act
+        result = await self.client.download_bytes_if_exists('blob-name')
+
+        # assert
+        self.assertIsNone(result)
+
+    async def test_download_blob_if_exists_does_not_download_blob_matching_etag(self):
+        # arrange
+        self.blob_client.download_blob = AsyncMock(side_effect=ResourceNotModifiedError('not modified'))
+
+        # act
+        result = await self.client.download_blob_if_exists('blob-name', '"etag"')
+
+        # assert
+        self.assertFalse(result.modified)
+        self.assertEqual(result.etag, '"etag"')
+        self.blob_client.download_blob.assert_awaited_once_with(
+            max_concurrency=8, etag='"etag"', match_condition=MatchConditions.IfModified)
+
+    async def test_happy_path_blob_exists(self):
+        # arrange
+        self.blob_client.exists = AsyncMock(return_value=True)
+
+        # act
+        result = await self.client.blob_exists('blob-name')
+
+        # assert
+        self.assertTrue(result)
+
+    async def test_not_initialized_throws_exception(self):
+        # arrange
+        client = AzureAsyncBlobStorageClient(self.config, MagicMock())
+
+        # act
+        with self.assertRaises(Exception) as e:
+            await client.download_bytes('blob-name')
+
+        # assert
+        self.assertEqual(str(e.exception), 'Blob storage client is not initialized')
+
+
+class TestCachedAsyncBlobStorageClient(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.cache = BlobCache(1000, 5.0, clock=lambda: self.now)
+        self.inner_client = MagicMock()
+        self.inner_client.download_blob_if_exists = AsyncMock(return_value=DownloadedBlob(content=b'done', etag='"1"'))
+        self.inner_client.upload_bytes = AsyncMock()
+        self.client = CachedAsyncBlobStorageClient(self.inner_client, self.cache)
+
+    async def test_happy_path_serves_fresh_blob_from_cache(self):
+        # act
+        first = await self.client.download_bytes_if_exists('123/status.json')
+        second = await self.client.download_bytes_if_exists('123/status.json')
+
+        # assert
+        self.assertEqual((first, second), (b'done', b'done'))
+        self.inner_client.download_blob_if_exists.assert_awaited_once_with('123/status.json', None)
+
+    async def test_stale_blob_is_validated_with_its_etag(self):
+        # arrange
+        await self.client.download_blob_if_exists('123/status.json')
+        self.inner_client.download_blob_if_exists = AsyncMock(return_value=DownloadedBlob(etag='"1"'))
+        self.now = 10.0
+
+        # act
+        result = await self.client.download_blob_if_exists('123/status.json')
+
+        # assert
+        self.assertEqual(result.content, b'done')
+        self.inner_client.download_blob_if_exists.assert_awaited_once_with('123/status.json', '"1"')
+        self.assertTrue(self.cache.is_fresh(self.cache.get('123/status.json')))
+
+    async def test_stale_modified_blob_is_downloaded_again(self):
+        # arrange
+        await self.client.download_blob_if_exists('123/status.json')
+        self.inner_client.download_blob_if_exists = AsyncMock(return_value=DownloadedBlob(content=b'failure', etag='"2"'))
+        self.now = 10.0
+
+        # act
+        result = await self.client.download_blob_if_exists('123/status.json')
+
+        # assert
+        self.assertEqual((result.content, result.etag), (b'failure', '"2"'))
+        self.assertEqual(self.cache.get('123/status.json').blob.etag, '"2"')
+
+    async def test_cached_blob_matching_if_none_match_is_not_modified(self):
+        # arrange
+        await self.client.download_blob_if_exists('123/status.json')
+
+        # act
+        result = await self.client.download_blob_if_exists('123/status.json', '"1"')
+
+        # assert
+        self.assertFalse(result.modified)
+        self.assertEqual(result.etag, '"1"')
+        self.inner_client.download_blob_if_exists.assert_awaited_once()
+
+    async def test_upload_invalidates_cached_blob(self):
+        # arrange
+        await self.client.download_blob_if_exists('123/status.json')
+
+        # act
+        await self.client.upload_bytes('123/status.json', b'failure')
+        await self.client.download_blob_if_exists('123/status.json')
+
+        # assert
+        self.inner_client.upload_bytes.assert_awaited_once_with('123/status.json', b'failure')
+        self.assertEqual(self.inner_client.download_blob_if_exists.await_count, 2)
+
+    async def test_upload_stream_invalidates_cached_blob(self):
+        # arrange
+        await self.client.download_blob_if_exists('123/status.json')
+        self.inner_client.upload_stream = AsyncMock()
+
+        # act
+        await self.client.upload_stream('123/status.json', MagicMock())
+
+        # assert
+        self.assertIsNone(self.cache.get('123/status.json'))
+
+    async def test_missing_blob_is_not_cached(self):
+        # arrange
+        self.inner_client.download_blob_if_exists = AsyncMock(return_value=None)
+
+        # act
+        first = await self.client.download_blob_if_exists('123/status.json')
+        second = await self.client.download_blob_if_exists('123/status.json')
+
+        # assert
+        self.assertIsNone(first)
+        self.assertIsNone(second)
+        self.assertEqual(self.inner_client.download_blob_if_exists.await_count, 2)
+
+
+class TestCreateAsyncBlobStorageClient(unittest.TestCase):
+    def test_happy_path_creates_client_of_backend(self):
+        # act
+        local_client = create_async_blob_storage_client(
+            Config(blob_storage_backend=BlobStorageBackendType.local, blob_storage_cache_max_bytes=0))
+        azure_client = create_async_blob_storage_client(
+            Config(blob_storage_backend=BlobStorageBackendType.azure, blob_storage_cache_max_bytes=0))
+
+        # assert
+        self.assertIsInstance(local_client, LocalAsyncBlobStorageClient)
+        self.assertIsInstance(azure_client, AzureAsyncBlobStorageClient)
+
+    def test_happy_path_creates_client_behind_cache_when_enabled(self):
+        # act
+        client = create_async_blob_storage_client(Config(blob_storage_backend=BlobStorageBackendType.local))
+
+        # assert
+        self.assertIsInstance(client, CachedAsyncBlobStorageClient)
+        self.assertIsInstance(client._client, LocalAsyncBlobStorageClient)
@@ -0,0 +1,52 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import sys
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+from app.config import Config
+from app.services.blob_archiver import BlobArchiver, blob_archive_failures
+
+
+class TestBlobArchiver(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.blob_storage_client = MagicMock()
+        self.blob_storage_client.upload_bytes = AsyncMock()
+        self.archiver = BlobArchiver(self.blob_storage_client, Config(tracing_archive_workers_count=2, tracing_archive_queue_max_size=1))
+
+    async def asyncTearDown(self):
+        await self.archiver.close()
+
+    async def test_happy_path_uploads_archived_bodies(self):
+        # act
+        for i in range(5):
+            await self.archiver.archive(f'{i}/symbol-detection/response.json', b'{}')
+        await self.archiver.flush()
+
+        # assert
+        self.assertEqual(sorted(upload.args[0] for upload in self.blob_storage_client.upload_bytes.await_args_list),
+                         [f'{i}/symbol-detection/response.json' for i in range(5)])
+
+    async def test_upload_error_is_counted_and_not_raised(self):
+        # arrange
+        self.blob_storage_client.upload_bytes = AsyncMock(side_effect=[Exception('error'), None])
+        failures_before = blob_archive_failures._value.get()
+
+        # act
+        await self.archiver.archive('123/symbol-detection/response.json', b'{}')
+        await self.archiver.archive('123/text-detection/response.json', b'{}')
+        await self.archiver.flush()
+
+        # assert
+        self.assertEqual(blob_archive_failures._value.get() - failures_before, 1)
+        self.assertEqual(self.blob_storage_client.upload_bytes.await_count, 2)
+
+    async def test_close_uploads_queued_bodies(self):
+        # act
+        await self.archiver.archive('123/symbol-detection/response.json', b'{}')
+        await self.archiver.close()
+
+        # assert
+        self.blob_storage_client.upload_bytes.assert_awaited_once_with('123/symbol-detection/response.json', b'{}')
@@ -0,0 +1,92 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+from app.models.downloaded_blob import DownloadedBlob
+from app.services.blob_cache import BlobCache
+
+
+class TestBlobCache(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.cache = BlobCache(10, 5.0, clock=lambda: self.now)
+
+    def test_happy_path_put_and_get(self):
+        # act
+        self.cache.put('a', DownloadedBlob(content=b'123', etag='"1"'), self.cache.generation('a'))
+        entry = self.cache.get('a')
+
+        # assert
+        self.assertEqual(entry.blob.content, b'123')
+        self.assertTrue(self.cache.is_fresh(entry))
+        self.assertIsNone(self.cache.get('b'))
+
+    def test_entry_is_stale_after_ttl_until_validated(self):
+        # arrange
+        self.cache.put('a', DownloadedBlob(content=b'123', etag='"1"'), self.cache.generation('a'))
+
+        # act
+        self.now = 5.0
+        stale = self.cache.is_fresh(self.cache.get('a'))
+        self.cache.put('a', DownloadedBlob(etag='"1"'), self.cache.generation('a'))
+        validated = self.cache.is_fresh(self.cache.get('a'))
+
+        # assert
+        self.assertFalse(stale)
+        self.assertTrue(validated)
+
+    def test_least_recently_used_entries_are_evicted_over_max_bytes(self):
+        # arrange
+        self.cache.put('a', DownloadedBlob(content=b'1234'), self.cache.generation('a'))
+        self.cache.put('b', DownloadedBlob(content=b'1234'), self.cache.generation('b'))
+        self.cache.get('a')
+
+        # act
+        self.cache.put('c', DownloadedBlob(content=b'1234'), self.cache.generation('c'))
+
+        # assert
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('c'))
+
+    def test_blob_larger_than_cache_is_not_cached(self):
+        # act
+        self.cache.put('a', DownloadedBlob(content=b'12345678901'), self.cache.generation('a'))
+
+        # assert
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_invalidate_removes_entry(self):
+        # arrange
+        self.cache.put('a', DownloadedBlob(content=b'123'), self.cache.generation('a'))
+
+        # act
+        self.cache.invalidate('a')
+
+        # assert
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_blob_downloaded_during_invalidation_is_not_cached(self):
+        # arrange
+        generation = self.cache.generation('a')
+
+        # act
+        self.cache.invalidate('a')
+        self.cache.put('a', DownloadedBlob(content=b'123'), generation)
+
+        # assert
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_blob_downloaded_during_invalidation_of_another_blob_is_cached(self):
+        # arrange
+        generation = self.cache.generation('b')
+
+        # act
+        self.cache.invalidate('a')
+        self.cache.put('b', DownloadedBlob(content=b'123'), generation)
+
+        # assert
+        self.assertIsNotNone(self.cache.get('b'))
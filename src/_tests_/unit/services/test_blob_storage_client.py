@@ -1,12 +1,20 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
+import mmap
 import os
+import tempfile
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
+from azure.core.exceptions import ResourceNotFoundError
+import cv2
+import numpy as np
 import sys
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
-from app.services.blob_storage_client import BlobStorageClient
+from app.config import Config
+from app.models.enums.blob_storage_backend_type import BlobStorageBackendType
+from app.services.blob_storage_client import BlobStorageClient, LocalBlobStorageClient, _invalidate_cached_blob, create_blob_storage_client
+from app.utils.image_context import ImageContext
 
 
 class TestUploadBytes(unittest.IsolatedAsyncioTestCase):
@@ -86,6 +94,57 @@ class TestDownloadBytes(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(str(e.exception), 'Blob storage client is not initialized')
 
 
+class TestUploadBytesInvalidatesCache(unittest.TestCase):
+    def test_happy_path(self):
+        # arrange
+        container_client = MagicMock()
+        blob_storage_client = BlobStorageClient(MagicMock(), MagicMock())
+        blob_storage_client._container_client = container_client
+        blob_cache = MagicMock()
+
+        # act
+        with patch('app.services.blob_storage_client.blob_cache', blob_cache):
+            blob_storage_client.upload_bytes('blob-name', b'bytes')
+
+        # assert
+        blob_cache.invalidate.assert_called_once_with('blob-name')
+
+
+class TestDownloadBytesIfExists(unittest.TestCase):
+    def test_happy_path(self):
+        # arrange
+        blob_client = MagicMock()
+        blob_client.download_blob.return_value.readall.return_value = b'bytes'
+
+        container_client = MagicMock()
+        container_client.get_blob_client.return_value = blob_client
+        blob_storage_client = BlobStorageClient(MagicMock(), MagicMock())
+        blob_storage_client._container_client = container_client
+
+        # act
+        result = blob_storage_client.download_bytes_if_exists('blob-name')
+
+        # assert
+        self.assertEqual(result, b'bytes')
+        blob_client.exists.assert_not_called()
+
+    def test_blob_not_exists_returns_none(self):
+        # arrange
+        blob_client = MagicMock()
+        blob_client.download_blob.side_effect = ResourceNotFoundError('not found')
+
+        container_client = MagicMock()
+        container_client.get_blob_client.return_value = blob_client
+        blob_storage_client = BlobStorageClient(MagicMock(), MagicMock())
+        blob_storage_client._container_client = container_client
+
+        # act
+        result = blob_storage_client.download_bytes_if_exists('blob-name')
+
+        # assert
+        self.assertIsNone(result)
+
+
 class TestBlobExists(unittest.IsolatedAsyncioTestCase):
     async def test_happy_path(self):
         # arrange
@@ -121,3 +180,97 @@ class TestBlobExists(unittest.IsolatedAsyncioTestCase):
 
         # assert
         self.assertEqual(str(e.exception), 'Blob storage client is not initialized')
+
+
+class TestLocalBlobStorageClient(unittest.TestCase):
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temporary_directory.cleanup)
+        self.root_path = os.path.join(self.temporary_directory.name, 'blobs')
+        self.client = LocalBlobStorageClient(self.root_path)
+        self.client.init()
+
+    def test_happy_path_upload_and_download_bytes(self):
+        # act
+        self.client.upload_bytes('123/symbol-detection/123.png', b'bytes')
+
+        # assert
+        self.assertTrue(self.client.initialized)
+        self.assertEqual(self.client.download_bytes('123/symbol-detection/123.png'), b'bytes')
+        self.assertTrue(self.client.blob_exists('123/symbol-detection/123.png'))
+        self.assertFalse(self.client.blob_exists('123/response.json'))
+        self.assertIsNone(self.client.download_bytes_if_exists('123/response.json'))
+
+    def test_happy_path_download_image_buffer_is_decoded_without_copy(self):
+        # arrange
+        image = np.zeros((10, 20, 3), dtype=np.uint8)
+        image[2:4, 5:15] = 255
+        self.client.upload_bytes('123/symbol-detection/123.png', cv2.imencode('.png', image)[1].tobytes())
+
+        # act
+        image_buffer = self.client.download_image_buffer('123/symbol-detection/123.png')
+        image_context = ImageContext(lambda: image_buffer)
+
+        # assert
+        self.assertIsInstance(image_buffer, mmap.mmap)
+        self.assertEqual(image_context.dimensions, (10, 20))
+        self.assertTrue(np.array_equal(image_context.image, image))
+
+    def test_download_image_buffer_of_empty_blob_is_empty(self):
+        # arrange
+        self.client.upload_bytes('123/symbol-detection/123.png', b'')
+
+        # act
+        result = self.client.download_image_buffer('123/symbol-detection/123.png')
+
+        # assert
+        self.assertEqual(result, b'')
+
+    def test_download_missing_blob_raises_resource_not_found_error(self):
+        # act / assert
+        with self.assertRaises(ResourceNotFoundError):
+            self.client.download_bytes('123/response.json')
+        with self.assertRaises(ResourceNotFoundError):
+            self.client.download_image_buffer('123/symbol-detection/123.png')
+
+    def test_upload_invalidates_cache(self):
+        # arrange
+        blob_cache = MagicMock()
+
+        # act
+        with patch('app.services.blob_storage_client.blob_cache', blob_cache):
+            self.client.upload_bytes('123/status.json', b'done')
+
+        # assert
+        blob_cache.invalidate.assert_called_once_with('123/status.json')
+
+    def test_upload_in_job_worker_process_invalidates_cache_of_app_process(self):
+        # arrange
+        blob_cache = MagicMock()
+        call_in_parent = MagicMock()
+
+        # act
+        with patch('app.services.blob_storage_client.blob_cache', blob_cache), \
+                patch('app.services.blob_storage_client.is_job_worker_process', return_value=True), \
+                patch('app.services.blob_storage_client.call_in_parent', call_in_parent):
+            self.client.upload_bytes('123/response.json', b'{}')
+
+        # assert
+        blob_cache.invalidate.assert_called_once_with('123/response.json')
+        call_in_parent.assert_called_once_with(_invalidate_cached_blob, '123/response.json')
+
+    def test_blob_name_outside_of_root_path_raises_value_error(self):
+        # act / assert
+        with self.assertRaises(ValueError):
+            self.client.download_bytes('../123.png')
+
+
+class TestCreateBlobStorageClient(unittest.TestCase):
+    def test_happy_path_creates_client_of_backend(self):
+        # act
+        local_client = create_blob_storage_client(Config(blob_storage_backend=BlobStorageBackendType.local))
+        azure_client = create_blob_storage_client(Config(blob_storage_backend=BlobStorageBackendType.azure))
+
+        # assert
+        self.assertIsInstance(local_client, LocalBlobStorageClient)
+        self.assertIsInstance(azure_client, BlobStorageClient)
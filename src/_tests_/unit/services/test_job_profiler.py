@@ -0,0 +1,62 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+from app.services.job_profiler import job_stage_wall_seconds, observe_stage_metrics, profile_job, profile_stage
+
+
+class TestProfileStage(unittest.TestCase):
+    def test_happy_path_records_stage_in_job_profile(self):
+        # act
+        with profile_job('123') as job_profiler:
+            with profile_stage('test.stage') as stage:
+                stage.counts['items'] = 3
+        job_profile = job_profiler.to_job_profile()
+
+        # assert
+        self.assertEqual(job_profile.pid_id, '123')
+        self.assertEqual(len(job_profile.stages), 1)
+        self.assertEqual(job_profile.stages[0].name, 'test.stage')
+        self.assertEqual(job_profile.stages[0].counts, {'items': 3})
+        self.assertGreaterEqual(job_profile.stages[0].wall_seconds, 0)
+        self.assertGreaterEqual(job_profile.stages[0].cpu_seconds, 0)
+        self.assertGreater(job_profile.stages[0].peak_rss_bytes, 0)
+
+    def test_stage_is_recorded_when_it_raises(self):
+        # act
+        with profile_job('123') as job_profiler:
+            with self.assertRaises(ValueError):
+                with profile_stage('test.failing_stage'):
+                    raise ValueError('error')
+
+        # assert
+        self.assertEqual([stage.name for stage in job_profiler.to_job_profile().stages], ['test.failing_stage'])
+
+    def test_stage_outside_of_job_observes_metrics(self):
+        # arrange
+        sum_before = job_stage_wall_seconds.labels('test.no_job')._sum.get()
+
+        # act
+        with patch('time.perf_counter', MagicMock(side_effect=[1.0, 3.5])):
+            with profile_stage('test.no_job'):
+                pass
+
+        # assert
+        self.assertEqual(job_stage_wall_seconds.labels('test.no_job')._sum.get() - sum_before, 2.5)
+
+    def test_job_worker_process_sends_metrics_to_parent(self):
+        # arrange
+        call_in_parent = MagicMock()
+
+        # act
+        with patch('app.services.job_profiler.is_job_worker_process', MagicMock(return_value=True)), \
+             patch('app.services.job_profiler.call_in_parent', call_in_parent):
+            with profile_stage('test.worker') as stage:
+                pass
+
+        # assert
+        call_in_parent.assert_called_once_with(observe_stage_metrics, 'test.worker', stage.wall_seconds, stage.cpu_seconds)
@@ -0,0 +1,85 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+from app.config import Config
+from app.models.enums.inference_result import InferenceResult
+from app.models.graph_construction.graph_construction_response import GraphConstructionInferenceResponse
+from app.models.image_details import ImageDetails
+from app.models.line_detection.line_detection_response import LineDetectionInferenceResponse
+from app.models.line_detection.line_segment import LineSegment
+from app.services.output_image_renderer import render_output_image
+
+
+class TestRenderOutputImage(unittest.TestCase):
+    def setUp(self):
+        self.blobs = {}
+        self.blob_storage_client = MagicMock()
+        self.blob_storage_client.download_bytes_if_exists = MagicMock(side_effect=self.blobs.get)
+        self.blob_storage_client.download_bytes = MagicMock(side_effect=lambda blob_name: self.blobs[blob_name])
+        self.blob_storage_client.upload_bytes = MagicMock(side_effect=self.blobs.__setitem__)
+        patcher = patch('app.services.output_image_renderer.blob_storage_client.blob_storage_client', self.blob_storage_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        _, buffer = cv2.imencode('.png', np.full((100, 200, 3), 255, dtype=np.uint8))
+        self.blobs['123/symbol-detection/123.png'] = buffer.tobytes()
+
+    def test_happy_path_renders_and_stores_line_detection_output_image(self):
+        # arrange
+        line_detection_response = LineDetectionInferenceResponse(
+            image_url='123.png',
+            image_details=ImageDetails(format='png', width=200, height=100),
+            line_segments_count=1,
+            line_segments=[LineSegment(startX=0.1, startY=0.5, endX=0.9, endY=0.5)])
+        self.blobs['123/graph-construction/response_line-detection.json'] = line_detection_response.json()
+
+        # act
+        result = render_output_image('123', InferenceResult.line_detection)
+
+        # assert
+        self.assertEqual(self.blobs['123/graph-construction/output_123_line-detection.png'], result)
+        image = cv2.imdecode(np.frombuffer(result, np.uint8), cv2.IMREAD_COLOR)
+        self.assertEqual(image.shape, (100, 200, 3))
+        self.assertEqual(image[50, 100].tolist(), [0, 155, 0])
+        self.assertEqual(image[10, 100].tolist(), [255, 255, 255])
+
+    def test_happy_path_renders_and_stores_graph_construction_output_image(self):
+        # arrange
+        graph_construction_response = GraphConstructionInferenceResponse(
+            image_url='123.png',
+            image_details=ImageDetails(format='png', width=200, height=100),
+            connected_symbols=[])
+        self.blobs['123/graph-construction/response_graph-construction.json'] = graph_construction_response.json()
+        render_persistent_graph_networkx = MagicMock(return_value=np.zeros((8, 12, 3), dtype=np.uint8))
+        config = Config(symbol_label_prefixes_to_include_in_graph_image_output='Equipment/')
+
+        # act
+        with patch('app.services.output_image_renderer.render_persistent_graph_networkx', render_persistent_graph_networkx):
+            result = render_output_image('123', InferenceResult.graph_construction, config)
+
+        # assert
+        render_persistent_graph_networkx.assert_called_once_with([], {'Equipment/'})
+        self.assertEqual(self.blobs['123/graph-construction/output_123_graph-construction.png'], result)
+
+    def test_returns_none_when_inference_response_does_not_exist(self):
+        # act
+        result = render_output_image('123', InferenceResult.line_detection)
+
+        # assert
+        self.assertIsNone(result)
+        self.blob_storage_client.upload_bytes.assert_not_called()
+
+    def test_returns_none_for_request_steps(self):
+        # act
+        result = render_output_image('123', InferenceResult.symbol_detection)
+
+        # assert
+        self.assertIsNone(result)
+        self.blob_storage_client.download_bytes_if_exists.assert_not_called()
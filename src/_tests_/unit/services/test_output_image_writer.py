@@ -0,0 +1,197 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import sys
+import threading
+import unittest
+from unittest.mock import ANY, MagicMock, patch
+import cv2
+import numpy as np
+from parameterized import parameterized
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+from app.config import Config
+from app.services.output_image_writer import OutputImageUploadError, OutputImageWriter, encode_image, \
+    output_image_upload_queued_bytes
+
+
+class TestEncodeImage(unittest.TestCase):
+    @parameterized.expand([
+        ('123/output.png', b'\x89PNG'),
+        ('123/debug.jpg', b'\xff\xd8'),
+        ('123/debug.JPEG', b'\xff\xd8'),
+        ('123/debug.webp', b'RIFF'),
+        ('123/output', b'\x89PNG'),
+    ])
+    def test_happy_path_encodes_in_format_of_extension(self, file_path, expected_signature):
+        # arrange
+        image = np.zeros((10, 20, 3), dtype=np.uint8)
+
+        # act
+        result = encode_image(file_path, image, Config())
+
+        # assert
+        self.assertTrue(result.startswith(expected_signature))
+        self.assertEqual(cv2.imdecode(np.frombuffer(result, np.uint8), cv2.IMREAD_COLOR).shape, (10, 20, 3))
+
+
+class TestOutputImageWriter(unittest.TestCase):
+    def setUp(self):
+        self.blob_storage_client = MagicMock()
+        patcher = patch('app.services.output_image_writer.blob_storage_client.blob_storage_client', self.blob_storage_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.config = Config(output_image_upload_workers_count=1, output_image_upload_queue_max_bytes=1000)
+        self.writer = OutputImageWriter(self.config)
+        self.addCleanup(self.writer.shutdown)
+
+    def test_happy_path_uploads_encoded_copy_of_image(self):
+        # arrange
+        image = np.zeros((10, 20, 3), dtype=np.uint8)
+
+        # act
+        result = self.writer.write('123/output.png', image)
+        image[:] = 255
+        flushed = self.writer.flush(timeout=10)
+
+        # assert
+        self.assertTrue(result)
+        self.assertTrue(flushed)
+        self.blob_storage_client.upload_bytes.assert_called_once()
+        blob_name, image_bytes = self.blob_storage_client.upload_bytes.call_args.args
+        self.assertEqual(blob_name, '123/output.png')
+        uploaded_image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+        self.assertTrue(np.all(uploaded_image == 0))
+
+    def test_write_returns_before_upload_completes(self):
+        # arrange
+        upload_started = threading.Event()
+        release_upload = threading.Event()
+
+        def upload_bytes(*args):
+            upload_started.set()
+            release_upload.wait(10)
+
+        self.blob_storage_client.upload_bytes = MagicMock(side_effect=upload_bytes)
+        queued_bytes_before = output_image_upload_queued_bytes._value.get()
+
+        # act
+        self.writer.write('123/output.png', np.zeros((10, 10), dtype=np.uint8))
+        upload_started.wait(10)
+        flushed_while_uploading = self.writer.flush(timeout=0.1)
+        queued_bytes_while_uploading = output_image_upload_queued_bytes._value.get() - queued_bytes_before
+        release_upload.set()
+        flushed = self.writer.flush(timeout=10)
+
+        # assert
+        self.assertFalse(flushed_while_uploading)
+        self.assertEqual(queued_bytes_while_uploading, 100)
+        self.assertTrue(flushed)
+        self.assertEqual(output_image_upload_queued_bytes._value.get() - queued_bytes_before, 0)
+
+    def test_write_blocks_while_queue_is_full(self):
+        # arrange
+        release_upload = threading.Event()
+        self.blob_storage_client.upload_bytes = MagicMock(side_effect=lambda *args: release_upload.wait(10))
+        self.writer.write('123/first.png', np.zeros((20, 40), dtype=np.uint8))
+        second_write = threading.Thread(target=self.writer.write, args=('123/second.png', np.zeros((20, 40), dtype=np.uint8)))
+
+        # act
+        second_write.start()
+        second_write.join(0.2)
+        blocked = second_write.is_alive()
+        release_upload.set()
+        second_write.join(10)
+        self.writer.flush(timeout=10)
+
+        # assert
+        self.assertTrue(blocked)
+        self.assertEqual(self.blob_storage_client.upload_bytes.call_count, 2)
+
+    def test_upload_error_is_logged_and_not_raised(self):
+        # arrange
+        self.blob_storage_client.upload_bytes = MagicMock(side_effect=[Exception('error'), None])
+
+        # act
+        self.writer.write('123/failing.png', np.zeros((5, 5), dtype=np.uint8))
+        self.writer.write('123/output.png', np.zeros((5, 5), dtype=np.uint8))
+        flushed = self.writer.flush(timeout=10)
+
+        # assert
+        self.assertTrue(flushed)
+        self.assertEqual(self.blob_storage_client.upload_bytes.call_args.args[0], '123/output.png')
+
+    def test_tracked_writes_wait_only_for_their_images(self):
+        # arrange
+        release_upload = threading.Event()
+        self.blob_storage_client.upload_bytes = MagicMock(
+            side_effect=lambda blob_name, *args: release_upload.wait(10) if blob_name == '456/output.png' else None)
+        self.config.output_image_upload_workers_count = 2
+        self.writer.write('456/output.png', np.zeros((5, 5), dtype=np.uint8))
+
+        # act
+        with self.writer.track_writes() as writes:
+            self.writer.write('123/output.png', np.zeros((5, 5), dtype=np.uint8))
+        uploaded = writes.wait(timeout=10)
+        flushed_while_other_upload_is_pending = self.writer.flush(timeout=0.1)
+        release_upload.set()
+
+        # assert
+        self.assertTrue(uploaded)
+        self.assertFalse(flushed_while_other_upload_is_pending)
+        self.blob_storage_client.upload_bytes.assert_any_call('123/output.png', ANY)
+
+    def test_tracked_writes_raise_upload_errors(self):
+        # arrange
+        def upload_bytes(blob_name, *args):
+            if 'failing' in blob_name:
+                raise Exception('error')
+
+        self.blob_storage_client.upload_bytes = MagicMock(side_effect=upload_bytes)
+
+        # act
+        with self.writer.track_writes() as writes:
+            self.writer.write('123/failing.png', np.zeros((5, 5), dtype=np.uint8))
+            self.writer.write('123/output.png', np.zeros((5, 5), dtype=np.uint8))
+        with self.writer.track_writes() as other_writes:
+            self.writer.write('456/output.png', np.zeros((5, 5), dtype=np.uint8))
+
+        # assert
+        with self.assertRaises(OutputImageUploadError) as context:
+            writes.wait(timeout=10)
+        self.assertEqual(context.exception.file_paths, ['123/failing.png'])
+        self.assertTrue(other_writes.wait(timeout=10))
+
+    def test_shutdown_uploads_queued_images(self):
+        # act
+        for i in range(3):
+            self.writer.write(f'123/output_{i}.png', np.zeros((5, 5), dtype=np.uint8))
+        self.writer.shutdown()
+
+        # assert
+        self.assertEqual(self.blob_storage_client.upload_bytes.call_count, 3)
+
+    def test_tiles_are_uploaded_for_output_images_when_enabled(self):
+        # arrange
+        self.config.output_image_tiles_enabled = True
+        self.config.output_image_tile_size_pixels = 16
+        self.config.output_image_upload_queue_max_bytes = 10000
+
+        # act
+        self.writer.write('123/text-detection/output_123_text-detection.png', np.zeros((20, 40, 3), dtype=np.uint8))
+        self.writer.write('123/text-detection/debug_123_text.png', np.zeros((20, 40, 3), dtype=np.uint8))
+        self.writer.flush(timeout=10)
+
+        # assert
+        blob_names = [upload.args[0] for upload in self.blob_storage_client.upload_bytes.call_args_list]
+        tile_names = [blob_name for blob_name in blob_names if '_tiles/' in blob_name]
+        self.assertTrue(all(blob_name.startswith('123/text-detection/output_123_text-detection_tiles/') for blob_name in tile_names))
+        # 2x3 tiles at full resolution, 1x2 at half resolution, 1 at quarter resolution, and the manifest last
+        self.assertEqual(len(tile_names), 6 + 2 + 1 + 1)
+        self.assertEqual(tile_names[-1], '123/text-detection/output_123_text-detection_tiles/manifest.json')
+
+    def test_empty_image_raises_value_error(self):
+        # act / assert
+        with self.assertRaises(ValueError):
+            self.writer.write('123/output.png', None)
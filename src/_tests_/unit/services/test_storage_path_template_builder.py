@@ -3,9 +3,11 @@
 import os
 import unittest
 import sys
+from unittest.mock import patch
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 from app.services import storage_path_template_builder
+from app.models.enums.image_format import ImageFormat
 from app.models.enums.inference_result import InferenceResult
 
 class TestBuildImagePath(unittest.TestCase):
@@ -42,6 +44,17 @@ class TestBuildDebugImagePath(unittest.TestCase):
         # assert
         self.assertEqual(result, f'{pid_id}/text-detection/debug_{pid_id}_{postfix}.png')
 
+    def test_happy_path_with_debug_image_format(self):
+        # arrange
+        pid_id = 'pid-id'
+
+        # act
+        with patch('app.services.storage_path_template_builder.config.debug_image_format', ImageFormat.jpg):
+            result = storage_path_template_builder.build_debug_image_path(pid_id, InferenceResult.line_detection, 'preprocessed')
+
+        # assert
+        self.assertEqual(result, f'{pid_id}/line-detection/debug_{pid_id}_preprocessed.jpg')
+
 
 class TestBuildInferenceResponsePath(unittest.TestCase):
     def test_happy_path(self):
@@ -77,4 +90,38 @@ class TestBuildInferenceJobStatusPath(unittest.TestCase):
         result = storage_path_template_builder.build_inference_job_status_path(pid_id, inference_result)
 
         # assert
-        self.assertEqual(result, f'{pid_id}/graph-construction/job_status.json')
\ No newline at end of file
+        self.assertEqual(result, f'{pid_id}/graph-construction/job_status.json')
+
+
+class TestBuildInferenceJobProfilePath(unittest.TestCase):
+    def test_happy_path(self):
+        # arrange
+        pid_id = 'pid-id'
+        inference_result = InferenceResult.graph_construction
+
+        # act
+        result = storage_path_template_builder.build_inference_job_profile_path(pid_id, inference_result)
+
+        # assert
+        self.assertEqual(result, f'{pid_id}/graph-construction/profile.json')
+
+
+class TestBuildImageTilesPaths(unittest.TestCase):
+    def test_happy_path(self):
+        # arrange
+        image_path = '123/graph-construction/output_123_line-detection.png'
+
+        # act
+        manifest_path = storage_path_template_builder.build_image_tiles_manifest_path(image_path)
+        tile_path = storage_path_template_builder.build_image_tile_path(image_path, 2, 3, 4)
+
+        # assert
+        self.assertEqual(manifest_path, '123/graph-construction/output_123_line-detection_tiles/manifest.json')
+        self.assertEqual(tile_path, '123/graph-construction/output_123_line-detection_tiles/2/3_4.png')
+
+    def test_is_output_image_path(self):
+        # act / assert
+        self.assertTrue(storage_path_template_builder.is_output_image_path(
+            storage_path_template_builder.build_output_image_path('123', InferenceResult.text_detection, 'text-detection')))
+        self.assertFalse(storage_path_template_builder.is_output_image_path(
+            storage_path_template_builder.build_debug_image_path('123', InferenceResult.text_detection, 'text')))
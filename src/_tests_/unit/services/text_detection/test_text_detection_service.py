@@ -155,7 +155,8 @@ class TestRunInferencing(unittest.TestCase):
         )
         self.assertEqual(result, expected_result)
 
-        mock_preprocess.assert_called_once_with(self.image)
+        mock_preprocess.assert_called_once_with(ANY)
+        self.assertEqual(mock_preprocess.call_args.args[0].image_bytes, self.image)
         mock_read_text.assert_called_once()
         mock_correlate_symbols_with_text.assert_called_once_with(
             self.all_text_list,
@@ -205,7 +206,8 @@ class TestRunInferencing(unittest.TestCase):
         )
         self.assertEqual(result, expected_result)
 
-        mock_preprocess.assert_called_once_with(self.image)
+        mock_preprocess.assert_called_once_with(ANY)
+        self.assertEqual(mock_preprocess.call_args.args[0].image_bytes, self.image)
         mock_read_text.assert_called_once()
         mock_correlate_symbols_with_text.assert_called_once_with(
             self.all_text_list,
@@ -227,7 +229,7 @@ class TestRunInferencing(unittest.TestCase):
         mock_draw_bounding_boxes.assert_has_calls(
             calls=[
                 call(
-                    self.image,
+                    ANY,
                     self.symbol_detection_result.image_details,
                     expected_ids_call1,
                     expected_bounding_boxes_call1,
@@ -235,7 +237,7 @@ class TestRunInferencing(unittest.TestCase):
                     valid_bit_array1
                 ),
                 call(
-                    self.image,
+                    ANY,
                     self.symbol_detection_result.image_details,
                     expected_ids_call2,
                     expected_bounding_boxes_call2,
@@ -0,0 +1,108 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from app.models.enums.job_execution_mode import JobExecutionMode
+from app.models.enums.job_queue_backend_type import JobQueueBackendType
+from app.services.job_queue.job_process_pool import JobProcessPool
+from app.services.job_queue.in_memory_job_queue_backend import InMemoryJobQueueBackend
+from app.services.job_queue.sqlite_job_queue_backend import SqliteJobQueueBackend
+import app.queue_consumer as queue_consumer
+
+
+class TestCreateJobQueueBackend(unittest.TestCase):
+    def test_in_memory_backend(self):
+        # arrange
+        config = MagicMock()
+        config.job_queue_backend = JobQueueBackendType.in_memory
+
+        # act
+        result = queue_consumer.create_job_queue_backend(config)
+
+        # assert
+        self.assertIsInstance(result, InMemoryJobQueueBackend)
+
+    def test_sqlite_backend(self):
+        # arrange
+        config = MagicMock()
+        config.job_queue_backend = JobQueueBackendType.sqlite
+
+        # act
+        result = queue_consumer.create_job_queue_backend(config)
+
+        # assert
+        self.assertIsInstance(result, SqliteJobQueueBackend)
+
+
+class TestCreateJobProcessPool(unittest.TestCase):
+    def test_thread_execution_mode(self):
+        # arrange
+        config = MagicMock()
+        config.job_execution_mode = JobExecutionMode.thread
+
+        # act
+        result = queue_consumer.create_job_process_pool(config)
+
+        # assert
+        self.assertIsNone(result)
+
+    def test_process_execution_mode(self):
+        # arrange
+        config = MagicMock()
+        config.job_execution_mode = JobExecutionMode.process
+        config.job_queue_consumers_count = 2
+        config.job_process_max_tasks_per_child = 10
+
+        # act
+        result = queue_consumer.create_job_process_pool(config)
+
+        # assert
+        self.assertIsInstance(result, JobProcessPool)
+
+
+class TestConsumerWorker(unittest.TestCase):
+    def test_runs_and_acknowledges_jobs(self):
+        # arrange
+        func = MagicMock(__name__='func', side_effect=[None, Exception('error')])
+
+        def get(timeout):
+            if queue.get.call_count > 3:
+                queue_consumer._kill_now = True
+            return [(1, func, ('1',)), None, (2, func, ('2',)), None][queue.get.call_count - 1]
+
+        queue = MagicMock()
+        queue.get = MagicMock(side_effect=get)
+
+        # act
+        with patch('app.queue_consumer._queue', queue), patch('app.queue_consumer._kill_now', False):
+            queue_consumer.consumer_worker()
+
+        # assert
+        self.assertEqual(func.call_count, 2)
+        self.assertEqual([c.args for c in queue.ack.call_args_list], [(1,), (2,)])
+
+    def test_runs_jobs_on_job_process_pool(self):
+        # arrange
+        func = MagicMock(__name__='func')
+
+        def get(timeout):
+            queue_consumer._kill_now = True
+            return (1, func, ('1',))
+
+        queue = MagicMock()
+        queue.get = MagicMock(side_effect=get)
+        job_process_pool = MagicMock()
+
+        # act
+        with patch('app.queue_consumer._queue', queue), patch('app.queue_consumer._kill_now', False), \
+                patch('app.queue_consumer._job_process_pool', job_process_pool):
+            queue_consumer.consumer_worker()
+
+        # assert
+        func.assert_not_called()
+        job_process_pool.run.assert_called_once_with(func, ('1',))
+        queue.ack.assert_called_once_with(1)
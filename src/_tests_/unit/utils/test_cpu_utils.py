@@ -0,0 +1,103 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+from app.utils.cpu_utils import get_available_cpu_count, get_cgroup_cpu_quota
+
+
+class TestGetCgroupCpuQuota(unittest.TestCase):
+    def setUp(self):
+        self.cgroup_dir = tempfile.TemporaryDirectory()
+        self.cgroup_path = self.cgroup_dir.name
+
+    def tearDown(self):
+        self.cgroup_dir.cleanup()
+
+    def _write(self, file_name: str, content: str):
+        path = os.path.join(self.cgroup_path, file_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def test_cgroup_v2_quota(self):
+        # arrange
+        self._write('cpu.max', '150000 100000\n')
+
+        # act
+        result = get_cgroup_cpu_quota(self.cgroup_path)
+
+        # assert
+        self.assertEqual(result, 1.5)
+
+    def test_cgroup_v2_no_quota(self):
+        # arrange
+        self._write('cpu.max', 'max 100000\n')
+
+        # act
+        result = get_cgroup_cpu_quota(self.cgroup_path)
+
+        # assert
+        self.assertIsNone(result)
+
+    def test_cgroup_v1_quota(self):
+        # arrange
+        self._write(os.path.join('cpu', 'cpu.cfs_quota_us'), '200000\n')
+        self._write(os.path.join('cpu', 'cpu.cfs_period_us'), '100000\n')
+
+        # act
+        result = get_cgroup_cpu_quota(self.cgroup_path)
+
+        # assert
+        self.assertEqual(result, 2.0)
+
+    def test_cgroup_v1_no_quota(self):
+        # arrange
+        self._write(os.path.join('cpu', 'cpu.cfs_quota_us'), '-1\n')
+        self._write(os.path.join('cpu', 'cpu.cfs_period_us'), '100000\n')
+
+        # act
+        result = get_cgroup_cpu_quota(self.cgroup_path)
+
+        # assert
+        self.assertIsNone(result)
+
+    def test_no_cgroup(self):
+        # act
+        result = get_cgroup_cpu_quota(self.cgroup_path)
+
+        # assert
+        self.assertIsNone(result)
+
+
+class TestGetAvailableCpuCount(unittest.TestCase):
+    def test_limited_by_cpu_quota(self):
+        # act
+        with patch('app.utils.cpu_utils.os.sched_getaffinity', return_value={0, 1, 2, 3}, create=True), \
+                patch('app.utils.cpu_utils.get_cgroup_cpu_quota', return_value=1.5):
+            result = get_available_cpu_count()
+
+        # assert
+        self.assertEqual(result, 2)
+
+    def test_limited_by_cpu_affinity(self):
+        # act
+        with patch('app.utils.cpu_utils.os.sched_getaffinity', return_value={0, 1}, create=True), \
+                patch('app.utils.cpu_utils.get_cgroup_cpu_quota', return_value=None):
+            result = get_available_cpu_count()
+
+        # assert
+        self.assertEqual(result, 2)
+
+    def test_at_least_one_cpu(self):
+        # act
+        with patch('app.utils.cpu_utils.os.sched_getaffinity', return_value={0}, create=True), \
+                patch('app.utils.cpu_utils.get_cgroup_cpu_quota', return_value=0.1):
+            result = get_available_cpu_count()
+
+        # assert
+        self.assertEqual(result, 1)
@@ -0,0 +1,87 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import io
+import os
+import sys
+import tempfile
+import unittest
+import cv2
+import numpy as np
+import pypdfium2
+from parameterized import parameterized
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+from app.utils.document_utils import TooManyPagesError, split_document_pages
+
+
+def _encode_image(extension: str, width: int = 20) -> bytes:
+    _, buffer = cv2.imencode(f'.{extension}', np.zeros((10, width, 3), dtype=np.uint8))
+    return buffer.tobytes()
+
+
+def _create_tiff(widths: list[int]) -> bytes:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'document.tiff')
+        cv2.imwritemulti(path, [np.zeros((10, width, 3), dtype=np.uint8) for width in widths])
+        with open(path, 'rb') as f:
+            return f.read()
+
+
+def _create_pdf(page_sizes_points: list[tuple[int, int]]) -> bytes:
+    pdf = pypdfium2.PdfDocument.new()
+    for width, height in page_sizes_points:
+        pdf.new_page(width, height)
+    buffer = io.BytesIO()
+    pdf.save(buffer)
+    pdf.close()
+    return buffer.getvalue()
+
+
+def _decode_shape(image_bytes: bytes) -> tuple:
+    return cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR).shape
+
+
+class TestSplitDocumentPages(unittest.TestCase):
+    @parameterized.expand([('png'), ('jpg')])
+    def test_image_is_returned_as_is(self, extension):
+        # arrange
+        image_bytes = _encode_image(extension)
+
+        # act
+        pages = split_document_pages(image_bytes, 10)
+
+        # assert
+        self.assertEqual(pages, [image_bytes])
+
+    def test_tiff_pages_are_encoded_as_png(self):
+        # act
+        pages = split_document_pages(_create_tiff([20, 30, 40]), 10)
+
+        # assert
+        self.assertEqual(len(pages), 3)
+        self.assertTrue(all(page.startswith(b'\x89PNG') for page in pages))
+        self.assertEqual([_decode_shape(page) for page in pages], [(10, 20, 3), (10, 30, 3), (10, 40, 3)])
+
+    def test_pdf_pages_are_rendered_at_300_dpi(self):
+        # act
+        pages = split_document_pages(_create_pdf([(72, 36), (144, 72)]), 10)
+
+        # assert
+        self.assertEqual(len(pages), 2)
+        self.assertTrue(all(page.startswith(b'\x89PNG') for page in pages))
+        self.assertEqual([_decode_shape(page) for page in pages], [(150, 300, 3), (300, 600, 3)])
+
+    @parameterized.expand([
+        ('tiff', lambda: _create_tiff([20, 30, 40])),
+        ('pdf', lambda: _create_pdf([(72, 36), (72, 36), (72, 36)])),
+    ])
+    def test_raises_too_many_pages_error_when_document_has_too_many_pages(self, _, create_document):
+        # act / assert
+        with self.assertRaises(TooManyPagesError):
+            split_document_pages(create_document(), 2)
+
+    @parameterized.expand([(b'test'), (b'%PDF-invalid'), (b'II*\x00invalid')])
+    def test_raises_value_error_when_document_is_invalid(self, document_bytes):
+        # act / assert
+        with self.assertRaises(ValueError):
+            split_document_pages(document_bytes, 10)
@@ -0,0 +1,99 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+from app.utils.image_context import ImageContext, decode_image
+
+
+def _encode_image(image: np.ndarray) -> bytes:
+    _, buffer = cv2.imencode('.png', image)
+    return buffer.tobytes()
+
+
+class TestImageContext(unittest.TestCase):
+    def setUp(self):
+        image = np.full((20, 30, 3), 255, dtype=np.uint8)
+        cv2.rectangle(image, (5, 5), (15, 15), (0, 0, 0), 2)
+        self.image_bytes = _encode_image(image)
+
+    def test_happy_path_loads_and_decodes_once(self):
+        # arrange
+        load_image_bytes = MagicMock(return_value=self.image_bytes)
+        image_context = ImageContext(load_image_bytes)
+
+        # act
+        with patch('app.utils.image_context.cv2.imdecode', MagicMock(wraps=cv2.imdecode)) as imdecode:
+            image = image_context.image
+            binary_image = image_context.binary_image
+            image_again = image_context.image
+
+        # assert
+        load_image_bytes.assert_called_once()
+        imdecode.assert_called_once()
+        self.assertIs(image, image_again)
+        self.assertEqual((image_context.height, image_context.width), (20, 30))
+        self.assertEqual(binary_image.shape, (20, 30))
+        self.assertEqual(binary_image[10, 5], 255)
+        self.assertEqual(binary_image[0, 0], 0)
+
+    def test_images_are_read_only_and_copies_are_writable(self):
+        # arrange
+        image_context = ImageContext.from_bytes(self.image_bytes)
+
+        # act
+        image_copy = image_context.copy_image()
+        image_copy[0, 0] = 0
+
+        # assert
+        self.assertFalse(image_context.image.flags.writeable)
+        self.assertFalse(image_context.grayscale_image.flags.writeable)
+        self.assertFalse(image_context.binary_image.flags.writeable)
+        self.assertTrue(np.all(image_context.image[0, 0] == 255))
+
+    def test_release_when_leaving_with_block(self):
+        # arrange
+        load_image_bytes = MagicMock(return_value=self.image_bytes)
+
+        # act
+        with ImageContext(load_image_bytes) as image_context:
+            image_context.binary_image
+
+        # assert
+        self.assertIsNone(image_context._image_bytes)
+        self.assertIsNone(image_context._image)
+        self.assertIsNone(image_context._binary_image)
+
+        image_context.image
+        self.assertEqual(load_image_bytes.call_count, 2)
+
+    def test_image_is_none_when_it_cannot_be_decoded(self):
+        # arrange
+        image_context = ImageContext.from_bytes(b'123')
+
+        # act
+        image = image_context.copy_image()
+
+        # assert
+        self.assertIsNone(image)
+
+
+class TestDecodeImage(unittest.TestCase):
+    def test_decode_image_from_bytes_and_from_image_context(self):
+        # arrange
+        image_bytes = _encode_image(np.zeros((4, 6, 3), dtype=np.uint8))
+        image_context = ImageContext.from_bytes(image_bytes)
+
+        # act
+        image_from_bytes = decode_image(image_bytes)
+        image_from_context = decode_image(image_context)
+
+        # assert
+        self.assertTrue(np.array_equal(image_from_bytes, image_from_context))
+        self.assertTrue(image_from_context.flags.writeable)
+        self.assertIsNot(image_from_context, image_context.image)
@@ -0,0 +1,116 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import sys
+import unittest
+import numpy as np
+from parameterized import parameterized
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+from app.models.bounding_box import BoundingBox
+from app.utils.image_tiles import build_image_pyramid, crop_image_region, fit_image, get_level_dimensions, read_image_region
+
+
+def _create_image(height: int, width: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+
+class TestBuildImagePyramid(unittest.TestCase):
+    @parameterized.expand([
+        ((100, 200), 512, 1),
+        ((512, 512), 512, 1),
+        ((513, 300), 512, 2),
+        ((1500, 2100), 512, 4),
+    ])
+    def test_happy_path_levels_count(self, shape, tile_size, expected_levels_count):
+        # act
+        manifest, _ = build_image_pyramid(_create_image(*shape), tile_size)
+
+        # assert
+        self.assertEqual(manifest.levels_count, expected_levels_count)
+        self.assertEqual((manifest.height, manifest.width), shape)
+        self.assertLessEqual(max(get_level_dimensions(manifest, manifest.levels_count - 1)), tile_size)
+
+    def test_happy_path_tiles_cover_each_level(self):
+        # arrange
+        image = _create_image(300, 500)
+
+        # act
+        manifest, tiles = build_image_pyramid(image, 128)
+        tiles = {(level, row, column): tile for level, row, column, tile in tiles}
+
+        # assert
+        for level in range(manifest.levels_count):
+            level_height, level_width = get_level_dimensions(manifest, level)
+            level_tiles = {key: tile for key, tile in tiles.items() if key[0] == level}
+            self.assertEqual(sum(tile.shape[0] * tile.shape[1] for tile in level_tiles.values()), level_height * level_width)
+        self.assertTrue(np.array_equal(tiles[(0, 1, 2)], image[128:256, 256:384]))
+        self.assertEqual(tiles[(0, 2, 3)].shape, (300 - 256, 500 - 384, 3))
+
+
+class TestReadImageRegion(unittest.TestCase):
+    def setUp(self):
+        self.image = _create_image(300, 500)
+        self.manifest, tiles = build_image_pyramid(self.image, 128)
+        self.tiles = {(level, row, column): tile for level, row, column, tile in tiles}
+        self.loaded_tiles = []
+
+    def _load_tile(self, level, row, column):
+        self.loaded_tiles.append((level, row, column))
+        return self.tiles[(level, row, column)]
+
+    def test_happy_path_reads_full_resolution_region_from_its_tiles(self):
+        # arrange
+        bounding_box = BoundingBox(topX=0.2, topY=0.4, bottomX=0.3, bottomY=0.5)
+
+        # act
+        result = read_image_region(self.manifest, self._load_tile, bounding_box, 1000)
+
+        # assert
+        self.assertTrue(np.array_equal(result, self.image[120:150, 100:150]))
+        self.assertEqual(sorted(self.loaded_tiles), [(0, 0, 0), (0, 0, 1), (0, 1, 0), (0, 1, 1)])
+
+    def test_happy_path_reads_large_region_from_lower_resolution_level(self):
+        # arrange
+        bounding_box = BoundingBox(topX=0.0, topY=0.0, bottomX=1.0, bottomY=1.0)
+
+        # act
+        result = read_image_region(self.manifest, self._load_tile, bounding_box, 128)
+
+        # assert
+        self.assertEqual(result.shape, (75, 125, 3))
+        self.assertEqual({level for level, _, _ in self.loaded_tiles}, {2})
+
+
+class TestCropImageRegion(unittest.TestCase):
+    def test_happy_path_crops_and_fits_region(self):
+        # arrange
+        image = _create_image(300, 500)
+
+        # act
+        cropped = crop_image_region(image, BoundingBox(topX=0.2, topY=0.4, bottomX=0.3, bottomY=0.5), 1000)
+        fitted = crop_image_region(image, BoundingBox(topX=0.0, topY=0.0, bottomX=1.0, bottomY=1.0), 100)
+
+        # assert
+        self.assertTrue(np.array_equal(cropped, image[120:150, 100:150]))
+        self.assertEqual(fitted.shape, (60, 100, 3))
+
+    def test_empty_region_is_one_pixel(self):
+        # act
+        result = crop_image_region(_create_image(10, 10), BoundingBox(topX=1.0, topY=1.0, bottomX=1.0, bottomY=1.0), 100)
+
+        # assert
+        self.assertEqual(result.shape, (1, 1, 3))
+
+
+class TestFitImage(unittest.TestCase):
+    def test_small_image_is_not_resized(self):
+        # arrange
+        image = _create_image(10, 20)
+
+        # act
+        result = fit_image(image, 20)
+
+        # assert
+        self.assertIs(result, image)
@@ -4,13 +4,23 @@ import os
 import unittest
 import sys
 import pytest
+from unittest.mock import patch
+import cv2
+import numpy as np
+from parameterized import parameterized
 
 from app.models.bounding_box import BoundingBox
-from app.utils.image_utils import get_image_dimensions, is_data_element_within_bounding_box, validate_normalized_bounding_box
+from app.utils.image_utils import get_image_dimensions, is_data_element_within_bounding_box, probe_image_dimensions, \
+    validate_normalized_bounding_box
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 
 
+def _encode_image(extension: str, height: int, width: int) -> bytes:
+    _, buffer = cv2.imencode(extension, np.zeros((height, width, 3), dtype=np.uint8))
+    return buffer.tobytes()
+
+
 class TestGetImageDimensions(unittest.TestCase):
     def test_happy_path(self):
         # arrange
@@ -24,6 +34,76 @@ class TestGetImageDimensions(unittest.TestCase):
         # assert
         self.assertEqual(result, (768, 1110))
 
+    def test_png_and_jpeg_are_not_decoded(self):
+        # arrange
+        png_bytes = _encode_image('.png', 30, 50)
+        jpeg_bytes = _encode_image('.jpg', 40, 60)
+
+        # act
+        with patch('app.utils.image_utils.cv2.imdecode') as imdecode:
+            png_result = get_image_dimensions(png_bytes)
+            jpeg_result = get_image_dimensions(jpeg_bytes)
+
+        # assert
+        imdecode.assert_not_called()
+        self.assertEqual(png_result, (30, 50))
+        self.assertEqual(jpeg_result, (40, 60))
+
+    def test_other_formats_are_decoded(self):
+        # arrange
+        bmp_bytes = _encode_image('.bmp', 30, 50)
+
+        # act
+        result = get_image_dimensions(bmp_bytes)
+
+        # assert
+        self.assertEqual(result, (30, 50))
+
+
+class TestProbeImageDimensions(unittest.TestCase):
+    @parameterized.expand([
+        ('.png', []),
+        ('.jpg', []),
+        ('.jpg', [cv2.IMWRITE_JPEG_PROGRESSIVE, 1]),
+        ('.png', [cv2.IMWRITE_PNG_COMPRESSION, 9]),
+    ])
+    def test_happy_path_matches_decoded_dimensions(self, extension, params):
+        # arrange
+        _, buffer = cv2.imencode(extension, np.zeros((1234, 567, 3), dtype=np.uint8), params)
+        image_bytes = buffer.tobytes()
+
+        # act
+        result = probe_image_dimensions(image_bytes)
+
+        # assert
+        self.assertEqual(result, cv2.imdecode(buffer, -1).shape[:2])
+
+    def test_jpeg_with_app_segments_before_frame(self):
+        # arrange
+        jpeg_bytes = _encode_image('.jpg', 40, 60)
+        app1_segment = b'\xff\xe1' + (2 + 100).to_bytes(2, 'big') + b'\x00' * 100
+        jpeg_bytes = jpeg_bytes[:2] + app1_segment + jpeg_bytes[2:]
+
+        # act
+        result = probe_image_dimensions(jpeg_bytes)
+
+        # assert
+        self.assertEqual(result, (40, 60))
+
+    @parameterized.expand([
+        (b'test',),
+        (b'',),
+        (b'\x89PNG\r\n\x1a\n\x00\x00',),
+        (b'\xff\xd8\xff\xda\x00\x08',),
+        (b'\xff\xd8\xff\xc0\x00\x11\x08\x00',),
+    ])
+    def test_invalid_or_truncated_header_returns_none(self, image_bytes):
+        # act
+        result = probe_image_dimensions(image_bytes)
+
+        # assert
+        self.assertIsNone(result)
+
 
 class TestValidateNormalizedBoundingBox(unittest.IsolatedAsyncioTestCase):
     def test_valid_bounding_box_does_not_raise_error(self):
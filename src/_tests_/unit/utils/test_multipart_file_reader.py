@@ -0,0 +1,71 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import sys
+import unittest
+from parameterized import parameterized
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+from app.utils.multipart_file_reader import MultipartFileReader
+
+CONTENT_TYPE = 'multipart/form-data; boundary=boundary'
+
+
+def _create_body(file_content: bytes) -> bytes:
+    return (b'--boundary\r\n'
+            b'Content-Disposition: form-data; name="bounding_box_inclusive_str"\r\n\r\n'
+            b'{"topX": 0.0}\r\n'
+            b'--boundary\r\n'
+            b'Content-Disposition: form-data; name="file"; filename="123.png"\r\n'
+            b'Content-Type: image/png\r\n\r\n'
+            + file_content +
+            b'\r\n--boundary--\r\n')
+
+
+class TestMultipartFileReader(unittest.TestCase):
+    @parameterized.expand([(1,), (7,), (1024,)])
+    def test_happy_path_reads_file_in_chunks(self, chunk_size):
+        # arrange
+        file_content = bytes(range(256)) * 10
+        body = _create_body(file_content)
+        reader = MultipartFileReader(CONTENT_TYPE, 'file')
+
+        # act
+        data = []
+        for offset in range(0, len(body), chunk_size):
+            data.extend(reader.write(body[offset:offset + chunk_size]))
+
+        # assert
+        self.assertEqual(b''.join(data), file_content)
+        self.assertEqual(reader.filename, '123.png')
+        self.assertTrue(reader.file_complete)
+
+    def test_file_is_not_complete_until_its_part_ends(self):
+        # arrange
+        body = _create_body(b'content')
+        reader = MultipartFileReader(CONTENT_TYPE, 'file')
+
+        # act
+        data = reader.write(body[:body.index(b'content') + 3])
+
+        # assert
+        self.assertEqual(reader.filename, '123.png')
+        self.assertFalse(reader.file_complete)
+        self.assertEqual(b''.join(data), b'con')
+
+    def test_other_field_is_not_read(self):
+        # arrange
+        reader = MultipartFileReader(CONTENT_TYPE, 'image')
+
+        # act
+        data = reader.write(_create_body(b'content'))
+
+        # assert
+        self.assertEqual(data, [])
+        self.assertIsNone(reader.filename)
+        self.assertFalse(reader.file_complete)
+
+    def test_content_type_without_boundary_raises_value_error(self):
+        # act / assert
+        with self.assertRaises(ValueError):
+            MultipartFileReader('multipart/form-data', 'file')
@@ -7,7 +7,10 @@ import shapely
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 from app.models.bounding_box import BoundingBox
-from app.utils.shapely_utils import is_high_overlap, is_high_overlap_in_horizontal_region, is_high_overlap_in_vertical_region, horizontal_shape_padding, vertical_shape_padding
+from app.models.line_detection.line_segment import LineSegment
+from app.utils.shapely_utils import is_high_overlap, is_high_overlap_in_horizontal_region, is_high_overlap_in_vertical_region, \
+    horizontal_shape_padding, vertical_shape_padding, bounding_box_to_polygon, bounding_boxes_to_polygons, \
+    convert_line_to_line_string, convert_lines_to_line_strings
 
 
 class TestIsHighOverlap(unittest.TestCase):
@@ -157,3 +160,49 @@ class TestVerticalShapePadding(unittest.TestCase):
         # assert
         expect = shapely.Polygon([(0.0, -0.05), (0.1, -0.05), (0.1, 0.15), (0.0, 0.15), (0.0, -0.05)])
         self.assertTrue(expect, result)
+
+
+class TestBoundingBoxesToPolygons(unittest.TestCase):
+    def test_happy_path(self):
+        # arrange
+        bounding_boxes = [
+            BoundingBox(topX=0.0, topY=0.0, bottomX=0.1, bottomY=0.1),
+            BoundingBox(topX=0.2, topY=0.3, bottomX=0.4, bottomY=0.5)]
+
+        # act
+        result = bounding_boxes_to_polygons(bounding_boxes)
+
+        # assert
+        self.assertEqual(len(result), 2)
+        for bounding_box, polygon in zip(bounding_boxes, result):
+            self.assertTrue(shapely.equals_exact(polygon, bounding_box_to_polygon(bounding_box), tolerance=0))
+
+    def test_empty_list_returns_empty_array(self):
+        # act
+        result = bounding_boxes_to_polygons([])
+
+        # assert
+        self.assertEqual(len(result), 0)
+
+
+class TestConvertLinesToLineStrings(unittest.TestCase):
+    def test_happy_path(self):
+        # arrange
+        lines = [
+            LineSegment(startX=0.0, startY=0.0, endX=0.1, endY=0.0),
+            LineSegment(startX=0.2, startY=0.3, endX=0.2, endY=0.5)]
+
+        # act
+        result = convert_lines_to_line_strings(lines)
+
+        # assert
+        self.assertEqual(len(result), 2)
+        for line, line_string in zip(lines, result):
+            self.assertTrue(shapely.equals_exact(line_string, convert_line_to_line_string(line), tolerance=0))
+
+    def test_empty_list_returns_empty_array(self):
+        # act
+        result = convert_lines_to_line_strings([])
+
+        # assert
+        self.assertEqual(len(result), 0)
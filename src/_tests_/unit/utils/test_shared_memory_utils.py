@@ -0,0 +1,90 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from multiprocessing import shared_memory
+import os
+import unittest
+import sys
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+from app.utils.shared_memory_utils import copy_arrays_to_shared_memory, read_array_region_from_shared_memory, \
+    read_arrays_from_shared_memory
+
+
+class TestSharedMemoryArrays(unittest.TestCase):
+    def test_happy_path(self):
+        # arrange
+        arrays = {
+            'lines': np.array([[0.1, 0.2, 0.3, 0.4], [0.5, 0.6, 0.7, 0.8]]),
+            'ids': np.array([1, 2, 3], dtype=np.int32)
+        }
+
+        # act
+        shm, layout = copy_arrays_to_shared_memory(arrays)
+        try:
+            result = read_arrays_from_shared_memory(shm.name, layout)
+        finally:
+            shm.close()
+            shm.unlink()
+
+        # assert
+        self.assertEqual(result.keys(), arrays.keys())
+        for name, array in arrays.items():
+            np.testing.assert_array_equal(result[name], array)
+            self.assertEqual(result[name].dtype, array.dtype)
+
+    def test_empty_arrays(self):
+        # arrange
+        arrays = {'symbols': np.empty((0, 4))}
+
+        # act
+        shm, layout = copy_arrays_to_shared_memory(arrays)
+        try:
+            result = read_arrays_from_shared_memory(shm.name, layout)
+        finally:
+            shm.close()
+            shm.unlink()
+
+        # assert
+        self.assertEqual(result['symbols'].shape, (0, 4))
+
+    def test_read_unlinked_shared_memory_raises_file_not_found_error(self):
+        # arrange
+        shm, layout = copy_arrays_to_shared_memory({'lines': np.zeros((1, 4))})
+        shm.close()
+        shm.unlink()
+
+        # act & assert
+        with pytest.raises(FileNotFoundError):
+            read_arrays_from_shared_memory(shm.name, layout)
+
+    def test_read_copies_arrays_out_of_shared_memory(self):
+        # arrange
+        shm, layout = copy_arrays_to_shared_memory({'lines': np.zeros((1, 4))})
+
+        # act
+        result = read_arrays_from_shared_memory(shm.name, layout)
+        shm.close()
+        shm.unlink()
+
+        # assert
+        np.testing.assert_array_equal(result['lines'], np.zeros((1, 4)))
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=shm.name)
+
+    def test_read_array_region_copies_region_out_of_shared_memory(self):
+        # arrange
+        image = np.arange(48, dtype=np.uint8).reshape(6, 8)
+        shm, layout = copy_arrays_to_shared_memory({'lines': np.zeros((1, 4)), 'image': image})
+
+        # act
+        tile = read_array_region_from_shared_memory(shm.name, layout, 'image', (slice(1, 4), slice(2, 7)))
+        rows = read_array_region_from_shared_memory(shm.name, layout, 'image', (slice(2, 4), slice(None)))
+        shm.close()
+        shm.unlink()
+
+        # assert
+        np.testing.assert_array_equal(tile, image[1:4, 2:7])
+        np.testing.assert_array_equal(rows, image[2:4])
+        self.assertTrue(tile.flags['C_CONTIGUOUS'])
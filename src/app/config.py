@@ -1,6 +1,13 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 from pydantic import BaseSettings, root_validator, validator
+from app.models.enums.blob_storage_backend_type import BlobStorageBackendType
+from app.models.enums.candidate_matching_engine import CandidateMatchingEngine
+from app.models.enums.image_format import ImageFormat
+from app.models.enums.job_execution_mode import JobExecutionMode
+from app.models.enums.job_queue_backend_type import JobQueueBackendType
+from app.models.enums.line_detection_algorithm import LineDetectionAlgorithm
+from app.models.enums.output_image_rendering_mode import OutputImageRenderingMode
 
 from typing import Union, Optional
 
@@ -8,15 +15,25 @@ from typing import Union, Optional
 class Config(BaseSettings):
     arrow_symbol_label: str = 'Piping/Fittings/Mid arrow flow direction'
     blob_storage_account_url: str = str()
+    blob_storage_backend: BlobStorageBackendType = BlobStorageBackendType.azure
+    blob_storage_cache_max_bytes: int = 64 * 1024 * 1024
+    blob_storage_cache_ttl_seconds: float = 5.0
+    blob_storage_connection_pool_size: int = 100
     blob_storage_container_name: str = str()
+    blob_storage_local_path: str = 'blob_storage'
+    blob_storage_max_concurrency: int = 4
     centroid_distance_threshold: float = 0.5
     debug: bool = False
+    debug_image_format: ImageFormat = ImageFormat.png
     detect_dotted_lines: bool = False
     enable_preprocessing_text_detection: bool = True
     enable_thinning_preprocessing_line_detection: bool = True
     flow_direction_asset_prefixes: Union[str, set[str]] = \
         {'Equipment/', 'Piping/Endpoint/Pagination'}
     form_recognizer_endpoint: str = str()
+    graph_candidate_matching_chunks_per_worker: int = 4
+    graph_candidate_matching_engine: CandidateMatchingEngine = CandidateMatchingEngine.brute_force
+    graph_candidate_matching_min_lines_per_worker: int = 100
     graph_db_authenticate_with_azure_ad: bool = False
     graph_db_connection_string: str = str()
     graph_distance_threshold_for_lines_pixels: int = 50
@@ -28,6 +45,13 @@ class Config(BaseSettings):
     inference_score_threshold: float = 0.5
     inference_service_retry_count: int = 3
     inference_service_retry_backoff_factor: float = 0.3
+    job_execution_mode: JobExecutionMode = JobExecutionMode.thread
+    job_process_max_tasks_per_child: int = 10
+    job_queue_backend: JobQueueBackendType = JobQueueBackendType.in_memory
+    job_queue_consumers_count: int = 1
+    job_queue_max_size: int = 20
+    job_queue_sqlite_path: str = 'job_queue.sqlite3'
+    line_detection_algorithm: LineDetectionAlgorithm = LineDetectionAlgorithm.hough
     line_detection_hough_max_line_gap: Optional[int] = None  # Note conditional validation below based on detect_dotted_lines
     line_detection_hough_min_line_length: Optional[int] = 10  # Note conditional validation below based on detect_dotted_lines
     # line_detection_hough_max_line_gap value helps with returning the smaller dashed line segments
@@ -38,12 +62,30 @@ class Config(BaseSettings):
     line_detection_hough_rho: float = 0.1
     line_detection_hough_theta: int = 1080
     line_detection_hough_threshold: int = 5
+    line_detection_hough_tile_overlap_pixels: int = 64
+    line_detection_hough_tile_size_pixels: int = 2048
+    line_detection_hough_tiles_enabled: bool = False
     line_detection_job_timeout_seconds: int = 300
+    line_detection_merge_angle_tolerance_degrees: float = 2.0
+    line_detection_merge_distance_tolerance_pixels: float = 2.0
+    line_detection_merge_enabled: bool = False
+    line_detection_merge_gap_tolerance_pixels: float = 2.0
+    line_detection_morphology_min_run_length_pixels: int = 30
     line_segment_padding_default: float = 0.2
+    output_image_jpeg_quality: int = 90
+    output_image_png_compression_level: int = 3
+    output_image_rendering_mode: OutputImageRenderingMode = OutputImageRenderingMode.eager
+    output_image_tile_size_pixels: int = 512
+    output_image_tiles_enabled: bool = False
+    output_image_upload_queue_max_bytes: int = 512 * 1024 * 1024
+    output_image_upload_workers_count: int = 2
+    output_image_webp_quality: int = 90
 
     port: int = 8000
     symbol_detection_api: str = str()
     symbol_detection_api_bearer_token: str = str()
+    symbol_detection_batch_max_sheets: int = 50
+    symbol_detection_max_in_flight_requests: int = 4
     symbol_label_prefixes_to_connect_if_close: Union[str, set[str]] = \
         {'Equipment', 'Instrument/Valve/', 'Piping/Fittings/Mid arrow flow direction', 'Piping/Fittings/Flanged connection'}
     symbol_label_prefixes_to_include_in_graph_image_output: Union[str, set[str]] = \
@@ -53,10 +95,12 @@ class Config(BaseSettings):
     symbol_overlap_threshold: float = 0.6
     text_detection_area_intersection_ratio_threshold: float = 0.8
     text_detection_distance_threshold: float = 0.01
+    tracing_archive_queue_max_size: int = 100
+    tracing_archive_workers_count: int = 4
     symbol_label_for_connectors: Union[str, set[str]] = \
         {'Piping/Endpoint/Pagination'}
     valve_symbol_prefix: str = 'Instrument/Valve/'
-    workers_count_for_data_batch: int = 3
+    workers_count_for_data_batch: Optional[int] = None
 
     class Config:
         env_file = '.env'
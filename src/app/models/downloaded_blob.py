@@ -0,0 +1,17 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from pydantic import BaseModel
+from typing import Optional
+
+
+class DownloadedBlob(BaseModel):
+    """
+    This class represents a blob downloaded with its ETag.
+    The content is None when the blob was not modified since the ETag given to the download.
+    """
+    content: Optional[bytes] = None
+    etag: Optional[str] = None
+
+    @property
+    def modified(self) -> bool:
+        return self.content is not None
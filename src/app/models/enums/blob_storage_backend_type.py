@@ -0,0 +1,9 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from enum import Enum
+
+
+class BlobStorageBackendType(str, Enum):
+    '''Enum for the blob storage backend type'''
+    azure = "azure"
+    local = "local"
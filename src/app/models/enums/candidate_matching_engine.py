@@ -0,0 +1,9 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from enum import Enum
+
+
+class CandidateMatchingEngine(str, Enum):
+    '''Enum for the line connection candidate matching engine'''
+    brute_force = "brute_force"
+    spatial_index = "spatial_index"
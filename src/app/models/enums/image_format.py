@@ -0,0 +1,10 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from enum import Enum
+
+
+class ImageFormat(str, Enum):
+    '''Enum for the encoding format of the output and debug images'''
+    png = "png"
+    jpg = "jpg"
+    webp = "webp"
@@ -0,0 +1,9 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from enum import Enum
+
+
+class JobExecutionMode(str, Enum):
+    '''Enum for the job execution mode'''
+    thread = "thread"
+    process = "process"
@@ -0,0 +1,9 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from enum import Enum
+
+
+class JobQueueBackendType(str, Enum):
+    '''Enum for the job queue backend type'''
+    in_memory = "in_memory"
+    sqlite = "sqlite"
@@ -0,0 +1,9 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from enum import Enum
+
+
+class LineDetectionAlgorithm(str, Enum):
+    '''Enum for the line segments detection algorithm'''
+    hough = "hough"
+    morphology = "morphology"
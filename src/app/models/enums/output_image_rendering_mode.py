@@ -0,0 +1,9 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from enum import Enum
+
+
+class OutputImageRenderingMode(str, Enum):
+    '''Enum for when the output images of the graph construction jobs are rendered'''
+    eager = "eager"
+    lazy = "lazy"
@@ -3,6 +3,7 @@
 from typing import Optional
 from ..text_detection.text_detection_inference_response import TextDetectionInferenceResponse
 from ..bounding_box import BoundingBox
+from ..enums.line_detection_algorithm import LineDetectionAlgorithm
 
 
 class GraphConstructionInferenceRequest(TextDetectionInferenceResponse):
@@ -15,5 +16,6 @@ class GraphConstructionInferenceRequest(TextDetectionInferenceResponse):
     hough_rho: Optional[float]
     hough_theta: Optional[int]
     thinning_enabled: Optional[bool]
+    line_detection_algorithm: Optional[LineDetectionAlgorithm]
     bounding_box_inclusive: Optional[BoundingBox]
     propagation_pass_exhaustive_search: bool = False
@@ -1,11 +1,14 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 from fastapi import Response
+from typing import Optional
 
 
 class ImageResponse(Response):
-    def __init__(self, image, filename):
+    def __init__(self, image, filename, etag: Optional[str] = None):
         headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+        if etag is not None:
+            headers['ETag'] = etag
         super().__init__(content=image, media_type="application/octet-stream", headers=headers)
 
     def __eq__(self, other):
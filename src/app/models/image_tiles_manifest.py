@@ -0,0 +1,16 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from pydantic import BaseModel
+
+
+class ImageTilesManifest(BaseModel):
+    """
+    This class represents the tiled pyramid of an output image.
+    Level 0 holds the tiles of the full resolution image, each next level halves the resolution
+    of the previous one, up to the level where the whole image fits in a single tile.
+    """
+    width: int
+    height: int
+    tile_size: int
+    levels_count: int
+    format: str = 'png'
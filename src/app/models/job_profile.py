@@ -0,0 +1,26 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime
+
+
+class StageProfile(BaseModel):
+    """
+    This class represents the resource usage of a stage of a job.
+    """
+    name: str
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    peak_rss_bytes: Optional[int] = None
+    counts: dict[str, int] = Field(default_factory=dict)
+
+
+class JobProfile(BaseModel):
+    """
+    This class represents the resource usage of a job, by stage.
+    """
+    pid_id: str
+    started_at: datetime
+    wall_seconds: float
+    stages: list[StageProfile]
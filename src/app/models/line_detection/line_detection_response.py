@@ -1,5 +1,6 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
+from typing import Optional
 from pydantic import BaseModel
 from app.models.line_detection.line_segment import LineSegment
 from app.models.image_details import ImageDetails
@@ -8,8 +9,11 @@ from app.models.image_details import ImageDetails
 class LineDetectionInferenceResponse(BaseModel):
     """
     This class represents the response of the line detection service.
+    line_segments_count_before_merging is the number of line segments detected before the collinear
+    line segments were merged, it is not set in the responses stored before the merging was added.
     """
     image_url: str
     image_details: ImageDetails
     line_segments_count: int
+    line_segments_count_before_merging: Optional[int] = None
     line_segments: list[LineSegment]
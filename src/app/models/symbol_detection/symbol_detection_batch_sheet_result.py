@@ -0,0 +1,19 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from typing import Optional
+from pydantic import BaseModel
+from app.models.symbol_detection.symbol_detection_inference_response import SymbolDetectionInferenceResponse
+
+
+class SymbolDetectionBatchSheetResult(BaseModel):
+    """
+    This class represents the symbol detection result of a sheet of a batch request.
+    The sheet is a P&ID image of the batch, or a page of a PDF or TIFF document of the batch, and
+    its inference results are stored under its pid id like those of a single image request.
+    Result is set when the detection succeeded, otherwise detail holds the error message.
+    """
+    index: int
+    pid_id: str
+    status_code: int
+    result: Optional[SymbolDetectionInferenceResponse] = None
+    detail: Optional[str] = None
@@ -1,19 +1,66 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
-from queue import Queue
 import threading
+from multiprocessing.util import Finalize
+from typing import Optional
+from app.config import Config, config
+from app.models.enums.job_execution_mode import JobExecutionMode
+from app.models.enums.job_queue_backend_type import JobQueueBackendType
+from app.services.blob_storage_client import blob_storage_client
+from app.services.graph_construction.candidate_matching_pool import candidate_matching_pool
+from app.services.output_image_writer import output_image_writer
+from app.services.job_queue.job_process_pool import JobProcessPool
+from app.services.job_queue.job_queue_backend import JobQueueBackend
+from app.services.job_queue.in_memory_job_queue_backend import InMemoryJobQueueBackend
+from app.services.job_queue.sqlite_job_queue_backend import SqliteJobQueueBackend
 import logger_config
 import signal
 
 logger = logger_config.get_logger(__name__)
 
-_queue = Queue(20)
+_GET_TIMEOUT_SECONDS = 1.0
+
+
+def create_job_queue_backend(config: Config) -> JobQueueBackend:
+    """
+    This function creates the job queue backend selected in the configuration
+    """
+    if config.job_queue_backend == JobQueueBackendType.sqlite:
+        return SqliteJobQueueBackend(config.job_queue_sqlite_path, config.job_queue_max_size)
+    return InMemoryJobQueueBackend(config.job_queue_max_size)
+
+
+def init_job_worker_process():
+    """
+    This function initializes a job worker process forked from the app process
+    """
+    # the connections of the blob storage client are not shared with the app process
+    if blob_storage_client.initialized:
+        blob_storage_client.init()
+    # the candidate matching pool of the job worker process is started on first use and stopped when it exits,
+    # before the multiprocessing queues of the pool are closed by their own finalizers (exitpriority=10)
+    Finalize(candidate_matching_pool, candidate_matching_pool.shutdown, exitpriority=100)
+    # the images queued by the last job of the job worker process are uploaded before it exits
+    Finalize(output_image_writer, output_image_writer.shutdown, exitpriority=100)
+
+
+def create_job_process_pool(config: Config) -> Optional[JobProcessPool]:
+    """
+    This function creates the pool of job worker processes when the jobs run in processes
+    """
+    if config.job_execution_mode != JobExecutionMode.process:
+        return None
+    return JobProcessPool(config.job_queue_consumers_count, config.job_process_max_tasks_per_child, init_job_worker_process)
+
+
+_queue = create_job_queue_backend(config)
+_job_process_pool = create_job_process_pool(config)
 _kill_now = False
 
 
 def exit_gracefully(signum, frame):
     global _kill_now
-    logger.info("Received signal to exit queue consumer thread")
+    logger.info("Received signal to exit queue consumer threads")
     _kill_now = True
 
 
@@ -23,35 +70,60 @@ signal.signal(signal.SIGTERM, exit_gracefully)
 
 def submit_job(func, args):
     """
-    This function submits a job to the queue
+    This function submits a job to the queue without blocking,
+    it raises QueueFullError when the queue is full
     """
     _queue.put((func, args))
 
 
+def is_queue_full() -> bool:
+    """
+    This function checks if the queue is full, in which case submitting a job raises QueueFullError
+    """
+    return _queue.is_full()
+
+
 def consumer_worker():
     """
-    This is the worker thread function to process the job submitted to the queue
+    This is the worker thread function to process the jobs submitted to the queue
     """
+    logger.info("Waiting for queue")
     while (not _kill_now):
-        logger.info("Waiting for queue")
-        (func, args) = _queue.get()
+        job = _queue.get(timeout=_GET_TIMEOUT_SECONDS)
+        if job is None:
+            continue
+
+        (job_id, func, args) = job
         logger.info(f"Got a job from queue: {func.__name__}: {args}")
         try:
-            func(*args)
+            if _job_process_pool is not None:
+                _job_process_pool.run(func, args)
+            else:
+                func(*args)
             logger.info(f"Finished job from queue: {func.__name__}: {args}")
         except Exception as e:
             logger.error(f"Error processing job from queue: {func.__name__}: {args}: {e}")
+        finally:
+            _queue.ack(job_id)
 
 
-consumer_thread = threading.Thread(target=consumer_worker)
+consumer_threads: list[threading.Thread] = []
 
 
 def start_consumer_worker():
     """
-    This function starts the worker thread
+    This function starts the worker threads
     """
-    if consumer_thread.is_alive() is False:
+    if any(consumer_thread.is_alive() for consumer_thread in consumer_threads):
+        logger.info("Queue consumer threads are already running")
+        return
+
+    _queue.init()
+    if _job_process_pool is not None:
+        _job_process_pool.init()
+    consumer_threads.clear()
+    for i in range(config.job_queue_consumers_count):
+        consumer_thread = threading.Thread(target=consumer_worker, name=f'queue-consumer-{i}')
         consumer_thread.start()
-        logger.info("Started queue consumer thread")
-    else:
-        logger.info("Queue consumer thread is already running")
+        consumer_threads.append(consumer_thread)
+    logger.info(f"Started {len(consumer_threads)} queue consumer threads")
@@ -5,7 +5,11 @@ from fastapi import FastAPI, Depends
 from fastapi_health import health
 from app.routes.controllers.pid_digitization_controller import router as pid_digitalization_router
 from app.services.symbol_detection.symbol_detection_endpoint_client import symbol_detection_endpoint_client
+from app.services.async_blob_storage_client import async_blob_storage_client
+from app.services.blob_archiver import blob_archiver
 from app.services.blob_storage_client import blob_storage_client
+from app.services.graph_construction.candidate_matching_pool import candidate_matching_pool
+from app.services.output_image_writer import output_image_writer
 import logger_config
 from app.routes.tracing_middleware import TracingMiddleware
 
@@ -40,12 +44,22 @@ def is_dependency_online(startup_status: bool = Depends(symbol_detection_endpoin
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     blob_storage_client.init()
+    await async_blob_storage_client.init()
+    await blob_archiver.start()
+    await symbol_detection_endpoint_client.init()
+    candidate_matching_pool.init()
+    output_image_writer.init()
     yield
+    candidate_matching_pool.shutdown()
+    output_image_writer.shutdown()
+    await blob_archiver.close()
+    await symbol_detection_endpoint_client.close()
+    await async_blob_storage_client.close()
     return
 
 
 app = FastAPI(lifespan=lifespan)
-app.add_middleware(TracingMiddleware, blob_storage_client=blob_storage_client)
+app.add_middleware(TracingMiddleware, blob_storage_client=async_blob_storage_client, archiver=blob_archiver)
 app.add_api_route("/health/liveness", health([is_application_live]), include_in_schema=False)
 app.add_api_route("/health/readiness", health([is_application_ready]), include_in_schema=False)
 app.add_api_route("/health/startup", health([is_dependency_online]), include_in_schema=False)
@@ -4,7 +4,9 @@ from pydantic import Json
 from app.config import config
 from app.models.enums.inference_result import InferenceResult
 from app.models.enums.job_status import JobStatus
+from app.models.enums.output_image_rendering_mode import OutputImageRenderingMode
 from app.models.job_status_details import JobStatusDetails
+from app.models.symbol_detection.symbol_detection_batch_sheet_result import SymbolDetectionBatchSheetResult
 from app.models.symbol_detection.symbol_detection_inference_response import SymbolDetectionInferenceResponse
 from app.models.text_detection.text_detection_inference_response import TextDetectionInferenceResponse
 from app.models.graph_construction.graph_construction_request import GraphConstructionInferenceRequest
@@ -14,27 +16,43 @@ from app.services import (
     text_detection,
     line_detection,
     graph_construction,
-    graph_persistence
+    graph_persistence,
+    output_image_renderer
 )
+from app.services.async_blob_storage_client import async_blob_storage_client
 from app.services.blob_storage_client import blob_storage_client
+from app.services.job_profiler import JobProfiler, profile_job, profile_stage
+from app.services.output_image_writer import OutputImageUploadError, OutputImageWrites, encode_image, output_image_writer
 from app.models.bounding_box import BoundingBox
+from app.models.downloaded_blob import DownloadedBlob
 from app.models.enums.job_step import JobStep
 from app.models.line_detection.line_detection_response import LineDetectionInferenceResponse
+from app.utils import document_utils
+from app.utils.image_context import ImageContext, decode_image
+from app.utils.image_tiles import crop_image_region, read_image_region
 from app.utils.image_utils import validate_normalized_bounding_box
-from fastapi import APIRouter, Form, UploadFile, HTTPException, File, Body, Path, status
+from fastapi import APIRouter, Form, UploadFile, HTTPException, File, Body, Header, Path, Query, Response, status
 from fastapi.concurrency import run_in_threadpool
+import anyio
+import asyncio
 import json
 import logger_config
-from typing import Optional, Union
+from typing import Annotated, AsyncIterator, List, Optional, Union
 from datetime import datetime
-from app.queue_consumer import submit_job
+from app.queue_consumer import is_queue_full, submit_job
+from app.services.job_queue.job_process_pool import call_in_parent, is_job_worker_process
 from app.models.graph_construction.graph_construction_response import GraphConstructionInferenceResponse
 from app.models.image_response import ImageResponse
-from fastapi.responses import StreamingResponse
+from app.models.image_tiles_manifest import ImageTilesManifest
+from fastapi.responses import JSONResponse, StreamingResponse
 import io
 
 
 logger = logger_config.get_logger(__name__)
+JOB_QUEUE_FULL_RETRY_AFTER_SECONDS = 30
+OUTPUT_IMAGE_REGION_MAX_SIZE_PIXELS = 2048
+# created on first use, in the event loop of the app
+_job_submission_lock: Optional[asyncio.Lock] = None
 router = APIRouter(
     prefix='/api/pid-digitization',
     tags=['pid-digitization']
@@ -51,37 +69,82 @@ def _get_corrected_inference_result_path(
     return corrected_inference_result_path_map[inference_result_type]
 
 
-def _exists_file(
+def _download_image(
+    pid_image_path: str
+):
+    # the local storage backend maps the image file, the image is decoded without copying it in memory
+    try:
+        pid_image = blob_storage_client.download_image_buffer(pid_image_path)
+    except Exception as e:
+        logger.error(f'Exception while downloading the image: {e}')
+        raise HTTPException(status_code=500, detail='Internal server error while downloading.')
+    return pid_image
+
+
+async def _exists_file_async(
     inference_result_path: str
 ):
     try:
-        file_exists = blob_storage_client.blob_exists(inference_result_path)
+        file_exists = await async_blob_storage_client.blob_exists(inference_result_path)
     except Exception as e:
         logger.error(f'Exception while checking if blob exists: {e}')
         raise HTTPException(status_code=500, detail='Internal server error while checking if blob exists.')
     return file_exists
 
 
-def _download_file(
+async def _download_file_async(
     inference_result_path: str
 ):
     try:
-        inference_results_bytes = blob_storage_client.download_bytes(inference_result_path)
+        inference_results_bytes = await async_blob_storage_client.download_bytes(inference_result_path)
+    except Exception as e:
+        logger.error(f'Exception while downloading inference results: {e}')
+        raise HTTPException(status_code=500, detail='Internal server error while downloading.')
+    return inference_results_bytes
+
+
+async def _download_file_if_exists_async(
+    inference_result_path: str
+) -> Optional[bytes]:
+    # a single storage round-trip, the file may be deleted or written between an existence check and a download
+    try:
+        inference_results_bytes = await async_blob_storage_client.download_bytes_if_exists(inference_result_path)
     except Exception as e:
         logger.error(f'Exception while downloading inference results: {e}')
         raise HTTPException(status_code=500, detail='Internal server error while downloading.')
     return inference_results_bytes
 
 
-def _check_if_job_exists(
+async def _download_blob_if_exists_async(
+    inference_result_path: str,
+    if_none_match: Optional[str] = None
+) -> Optional[DownloadedBlob]:
+    try:
+        blob = await async_blob_storage_client.download_blob_if_exists(inference_result_path, if_none_match)
+    except Exception as e:
+        logger.error(f'Exception while downloading inference results: {e}')
+        raise HTTPException(status_code=500, detail='Internal server error while downloading.')
+    return blob
+
+
+def _get_etag_headers(blob: DownloadedBlob) -> dict[str, str]:
+    return {} if blob.etag is None else {'ETag': blob.etag}
+
+
+def _not_modified_response(blob: DownloadedBlob) -> Response:
+    # the client already holds the content matching its If-None-Match header
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=_get_etag_headers(blob))
+
+
+async def _check_if_job_exists(
         pid_id: str,
         inference_result_path: str,
         timeout: int
 ):
     job_status_path = storage_path_template_builder.build_inference_job_status_path(pid_id, inference_result_path)
 
-    if _exists_file(job_status_path):
-        job_status_bytes = _download_file(job_status_path)
+    job_status_bytes = await _download_file_if_exists_async(job_status_path)
+    if job_status_bytes is not None:
         job_status_details = json.loads(job_status_bytes, object_hook=lambda d: JobStatusDetails(**d))
 
         job_status_to_wait_timeout_list = [JobStatus.submitted, JobStatus.in_progress]
@@ -95,14 +158,71 @@ def _check_if_job_exists(
 def _update_job_status(
         pid_id: str, job_step: JobStep, status: JobStatus, message: Optional[str] = None
 ):
+    dt = datetime.utcnow().isoformat()
+
+    if is_job_worker_process():
+        # the job status is written by the app process, in the order of the updates
+        call_in_parent(_write_job_status, pid_id, job_step, status, message, dt)
+    else:
+        _write_job_status(pid_id, job_step, status, message, dt)
+
+
+async def _update_job_status_async(
+        pid_id: str, job_step: JobStep, status: JobStatus, message: Optional[str] = None
+):
+    job_status_path, job_status = _build_job_status(pid_id, job_step, status, message, datetime.utcnow().isoformat())
+    await async_blob_storage_client.upload_bytes(job_status_path, job_status)
+
+
+def _build_job_status(
+        pid_id: str, job_step: JobStep, status: JobStatus, message: Optional[str], updated_at: str
+) -> tuple[str, str]:
     job_status_path = storage_path_template_builder\
         .build_inference_job_status_path(pid_id,
                                          InferenceResult.graph_construction)
-    dt = datetime.utcnow().isoformat()
     job_status_details = JobStatusDetails(status=status, step=job_step,
-                                          message=message, updated_at=dt)
-    blob_storage_client.upload_bytes(job_status_path,
-                                     json.dumps(job_status_details.dict(), default=str))
+                                          message=message, updated_at=updated_at)
+    return job_status_path, json.dumps(job_status_details.dict(), default=str)
+
+
+def _write_job_status(
+        pid_id: str, job_step: JobStep, status: JobStatus, message: Optional[str], updated_at: str
+):
+    blob_storage_client.upload_bytes(*_build_job_status(pid_id, job_step, status, message, updated_at))
+
+
+async def _wait_for_output_images_async(
+    pid_id: str,
+    output_image_writes: OutputImageWrites
+):
+    # the output images are uploaded in the background, they must be available once the results are returned
+    try:
+        await run_in_threadpool(output_image_writes.wait)
+    except OutputImageUploadError as e:
+        logger.error(f'Exception while uploading the output images for pid id {pid_id}: {e}')
+        raise HTTPException(status_code=500, detail='Internal server error while uploading the output images.')
+
+
+def _parse_bounding_box_inclusive(
+    pid_id: str,
+    bounding_box_inclusive_str: dict
+) -> BoundingBox:
+    try:
+        bounding_box_inclusive = BoundingBox(**bounding_box_inclusive_str)
+        validate_normalized_bounding_box(bounding_box_inclusive)
+    except ValueError as e:
+        logger.warning(f'The bounding box provided for isolating the P&ID graph for image {pid_id} has invalid coordinates: {e}')
+        raise HTTPException(status_code=400,
+                            detail=f'The bounding_box_inclusive_str JSON string value provided for P&ID image {pid_id} is invalid.'
+                            + ' Make sure that all coordinates (topX, topY, bottomX, bottomY) are present and in the range [0, 1].')
+    return bounding_box_inclusive
+
+
+BOUNDING_BOX_INCLUSIVE_STR_DESCRIPTION = "The bounding box of the P&ID image without extraneous legend information." \
+    + "This should be provided as a JSON string with the following format: " \
+    + "{\"topX\": 0.0, \"topY\": 0.0, \"bottomX\": 1.0, \"bottomY\": 1.0}. " \
+    + " The coordinates should be normalized to the range [0, 1]." \
+    + " The default value is the entire image."
 
 
 @router.post(
@@ -112,11 +232,7 @@ def _update_job_status(
 async def detect_symbols(
     pid_id: str,
     bounding_box_inclusive_str: Json = Form({'topX': 0.0, 'topY': 0.0, 'bottomX': 1.0, 'bottomY': 1.0},
-                                            description="The bounding box of the P&ID image without extraneous legend information."
-                                                        + "This should be provided as a JSON string with the following format: "
-                                                        + "{\"topX\": 0.0, \"topY\": 0.0, \"bottomX\": 1.0, \"bottomY\": 1.0}. "
-                                                        + " The coordinates should be normalized to the range [0, 1]."
-                                                        + " The default value is the entire image."),
+                                            description=BOUNDING_BOX_INCLUSIVE_STR_DESCRIPTION),
     file: UploadFile = File(..., description="The P&ID image to detect symbols in."),
 ):
     '''Detects symbols in an image and returns the bounding boxes of the detected symbols.
@@ -127,15 +243,7 @@ async def detect_symbols(
     return: The bounding boxes of the detected symbols.
     rtype: symbol_detection.ObjectDetectionPrediction
     '''
-
-    try:
-        bounding_box_inclusive = BoundingBox(**bounding_box_inclusive_str)
-        validate_normalized_bounding_box(bounding_box_inclusive)
-    except ValueError as e:
-        logger.warning(f'The bounding box provided for isolating the P&ID graph for image {pid_id} has invalid coordinates: {e}')
-        raise HTTPException(status_code=400,
-                            detail=f'The bounding_box_inclusive_str JSON string value provided for P&ID image {pid_id} is invalid.'
-                            + ' Make sure that all coordinates (topX, topY, bottomX, bottomY) are present and in the range [0, 1].')
+    bounding_box_inclusive = _parse_bounding_box_inclusive(pid_id, bounding_box_inclusive_str)
 
     logger.info(f"Detecting symbols for pid id {pid_id}")
     image_bytes = await file.read()
@@ -143,16 +251,133 @@ async def detect_symbols(
     output_image_path = storage_path_template_builder.build_output_image_path(pid_id,
                                                                               InferenceResult.symbol_detection,
                                                                               InferenceResult.symbol_detection.value)
-    result = await symbol_detection.run_inferencing(
-        pid_id,
-        bounding_box_inclusive,
-        config.inference_score_threshold,
-        image_bytes,
-        output_image_path,
-    )
+    with output_image_writer.track_writes() as output_image_writes:
+        result = await symbol_detection.run_inferencing(
+            pid_id,
+            bounding_box_inclusive,
+            config.inference_score_threshold,
+            image_bytes,
+            output_image_path,
+        )
+    await _wait_for_output_images_async(pid_id, output_image_writes)
     return result
 
 
+async def _upload_sheet_file_async(
+    blob_name: str,
+    data: Union[bytes, str]
+):
+    try:
+        await async_blob_storage_client.upload_bytes(blob_name, data)
+    except Exception as e:
+        logger.error(f'Exception while uploading {blob_name}: {e}')
+        raise HTTPException(status_code=500, detail='Internal server error while uploading.')
+
+
+async def _detect_sheet_symbols(
+    index: int,
+    pid_id: str,
+    bounding_box_inclusive: BoundingBox,
+    image_bytes: bytes
+) -> SymbolDetectionBatchSheetResult:
+    try:
+        output_image_path = storage_path_template_builder.build_output_image_path(pid_id,
+                                                                                  InferenceResult.symbol_detection,
+                                                                                  InferenceResult.symbol_detection.value)
+        # the sheet is stored like the image of a single image request, the next steps of the sheet download it
+        with output_image_writer.track_writes() as output_image_writes:
+            _, result = await asyncio.gather(
+                _upload_sheet_file_async(
+                    storage_path_template_builder.build_image_path(pid_id, InferenceResult.symbol_detection), image_bytes),
+                symbol_detection.run_inferencing(
+                    pid_id,
+                    bounding_box_inclusive,
+                    config.inference_score_threshold,
+                    image_bytes,
+                    output_image_path,
+                ))
+        await _upload_sheet_file_async(
+            storage_path_template_builder.build_inference_response_path(pid_id, InferenceResult.symbol_detection), result.json())
+        await _wait_for_output_images_async(pid_id, output_image_writes)
+    except HTTPException as e:
+        logger.warning(f'The symbols of sheet {pid_id} could not be detected: {e.detail}')
+        return SymbolDetectionBatchSheetResult(index=index, pid_id=pid_id, status_code=e.status_code, detail=str(e.detail))
+    except Exception as e:
+        logger.error(f'Exception while detecting the symbols of sheet {pid_id}: {e}')
+        return SymbolDetectionBatchSheetResult(index=index, pid_id=pid_id, status_code=500,
+                                               detail='Internal server error while detecting the symbols.')
+
+    return SymbolDetectionBatchSheetResult(index=index, pid_id=pid_id, status_code=200, result=result)
+
+
+async def _stream_sheet_results(
+    batch_id: str,
+    bounding_box_inclusive: BoundingBox,
+    sheets: list[bytes]
+) -> AsyncIterator[str]:
+    # the sheets are detected concurrently, the symbol detection endpoint client limits the requests in flight
+    tasks = [
+        asyncio.ensure_future(_detect_sheet_symbols(index, f'{batch_id}-{index}', bounding_box_inclusive, image_bytes))
+        for index, image_bytes in enumerate(sheets)
+    ]
+    try:
+        for task in asyncio.as_completed(tasks):
+            sheet_result = await task
+            yield sheet_result.json() + '\n'
+    finally:
+        # the sheets left when the client disconnects are not detected
+        for task in tasks:
+            task.cancel()
+
+
+@router.post(
+    '/batch/symbol-detection/{batch_id}',
+    response_class=StreamingResponse,
+    responses={200: {
+        'content': {'application/x-ndjson': {}},
+        'description': 'A SymbolDetectionBatchSheetResult JSON line per sheet, as the sheets complete.'
+    }}
+)
+async def detect_symbols_batch(
+    batch_id: str = Path(..., description="The batch id, the sheets are stored under the pid ids {batch_id}-{index}"),
+    bounding_box_inclusive_str: Json = Form({'topX': 0.0, 'topY': 0.0, 'bottomX': 1.0, 'bottomY': 1.0},
+                                            description=BOUNDING_BOX_INCLUSIVE_STR_DESCRIPTION
+                                            + " The bounding box applies to all the sheets of the batch."),
+    files: List[UploadFile] = File(..., description="The P&ID images, or the PDF and TIFF documents with a P&ID sheet per page."),
+):
+    '''
+    This endpoint detects the symbols of many P&ID sheets at once. The sheets are the png and jpg images and
+    the pages of the PDF and TIFF documents of the request, in order, and sheet {index} is stored under the
+    pid id {batch_id}-{index}, so that the next steps of each sheet are run like those of a single image request.
+
+    The symbol detection requests of the sheets are sent concurrently, and the response streams a
+    SymbolDetectionBatchSheetResult JSON line per sheet as soon as the sheet completes, in completion order.
+    A sheet that fails does not fail the batch, its line holds the status code and detail of the error.
+    '''
+    bounding_box_inclusive = _parse_bounding_box_inclusive(batch_id, bounding_box_inclusive_str)
+
+    sheets: list[bytes] = []
+    for file in files:
+        document_bytes = await file.read()
+        try:
+            # the PDF pages are rendered, and the TIFF pages decoded, off the event loop. A document is only
+            # rendered if its pages fit in the sheets left in the batch
+            sheets += await run_in_threadpool(
+                document_utils.split_document_pages, document_bytes, config.symbol_detection_batch_max_sheets - len(sheets))
+        except document_utils.TooManyPagesError:
+            logger.warning(f'The batch {batch_id} has more than {config.symbol_detection_batch_max_sheets} sheets')
+            raise HTTPException(status_code=400,
+                                detail=f'The batch {batch_id} has more than {config.symbol_detection_batch_max_sheets} sheets.')
+        except ValueError as e:
+            logger.warning(f'The file {file.filename} of batch {batch_id} is invalid: {e}')
+            raise HTTPException(status_code=400, detail=f'The file {file.filename} of batch {batch_id} is invalid: {e}')
+
+    logger.info(f"Detecting symbols for the {len(sheets)} sheets of batch id {batch_id}")
+    return StreamingResponse(
+        _stream_sheet_results(batch_id, bounding_box_inclusive, sheets),
+        media_type='application/x-ndjson')
+
+
 @router.post(
     '/text-detection/{pid_id}',
     response_model=TextDetectionInferenceResponse
@@ -172,15 +397,9 @@ async def detect_text(
     '''
 
     logger.info(f"Detecting text for pid id {pid_id}")
-    pid_image_path = storage_path_template_builder.build_image_path(pid_id, InferenceResult.symbol_detection)
-
-    if not _exists_file(pid_image_path):
-        logger.warning(f'Image not found for pid id {pid_id}')
-        raise HTTPException(status_code=422,
-                            detail=f'Pid image {pid_id} does not exist. Run symbol detection first.')
-
     bounding_box_inclusive = corrected_symbol_detection_results.bounding_box_inclusive
 
+    # the request is validated before the image is downloaded
     if bounding_box_inclusive is not None:
         try:
             validate_normalized_bounding_box(bounding_box_inclusive)
@@ -190,7 +409,13 @@ async def detect_text(
                                 detail=f'The bounding_box_inclusive value provided for P&ID image {pid_id} is invalid.'
                                 + ' Make sure that coordinates are normalized and in the range [0, 1].')
 
-    pid_image = _download_file(pid_image_path)
+    pid_image_path = storage_path_template_builder.build_image_path(pid_id, InferenceResult.symbol_detection)
+    pid_image = await _download_file_if_exists_async(pid_image_path)
+
+    if pid_image is None:
+        logger.warning(f'Image not found for pid id {pid_id}')
+        raise HTTPException(status_code=422,
+                            detail=f'Pid image {pid_id} does not exist. Run symbol detection first.')
 
     debug_image_text_path = storage_path_template_builder.build_debug_image_path(pid_id, InferenceResult.text_detection, 'text')
     output_image_symbol_and_text_path = storage_path_template_builder.build_output_image_path(pid_id,
@@ -199,16 +424,18 @@ async def detect_text(
 
     # sending the request in this manner will not block other requests
     # the request will take a bit longer to complete, but the other requests can go through in the meantime
-    result = await run_in_threadpool(
-        text_detection.run_inferencing,
-        pid_id,
-        corrected_symbol_detection_results,
-        pid_image,
-        config.text_detection_area_intersection_ratio_threshold,
-        config.text_detection_distance_threshold,
-        config.symbol_label_prefixes_with_text,
-        debug_image_text_path,
-        output_image_symbol_and_text_path)
+    with output_image_writer.track_writes() as output_image_writes:
+        result = await run_in_threadpool(
+            text_detection.run_inferencing,
+            pid_id,
+            corrected_symbol_detection_results,
+            pid_image,
+            config.text_detection_area_intersection_ratio_threshold,
+            config.text_detection_distance_threshold,
+            config.symbol_label_prefixes_with_text,
+            debug_image_text_path,
+            output_image_symbol_and_text_path)
+    await _wait_for_output_images_async(pid_id, output_image_writes)
     return result
 
 
@@ -228,7 +455,7 @@ async def detect_lines_and_construct_graph(
     logger.info(f"Submitting graph construction job for pid id {pid_id}")
     pid_image_path = storage_path_template_builder.build_image_path(pid_id, InferenceResult.symbol_detection)
 
-    if not _exists_file(pid_image_path):
+    if not await _exists_file_async(pid_image_path):
         logger.warning(f'Image not found for pid id {pid_id}')
         raise HTTPException(status_code=422,
                             detail=f'Pid image {pid_id} does not exist. Run symbol detection first.')
@@ -244,10 +471,24 @@ async def detect_lines_and_construct_graph(
                                 detail=f'The bounding_box_inclusive value provided for P&ID image {pid_id} is invalid.'
                                 + ' Make sure that coordinates are normalized and in the range [0, 1].')
 
-    _check_if_job_exists(pid_id, InferenceResult.graph_construction, config.line_detection_job_timeout_seconds)
-    _update_job_status(pid_id, JobStep.line_detection, JobStatus.submitted)
+    global _job_submission_lock
+    if _job_submission_lock is None:
+        _job_submission_lock = asyncio.Lock()
+
+    # the jobs are only submitted here and the consumers only free up the queue, so the queue can't get
+    # full between the check and the submission, and a rejected job leaves the previous job status untouched
+    async with _job_submission_lock:
+        await _check_if_job_exists(pid_id, InferenceResult.graph_construction, config.line_detection_job_timeout_seconds)
 
-    submit_job(func=process_line_detection_and_graph_construction_job, args=(pid_id, graph_construction_request,))
+        if is_queue_full():
+            logger.warning(f'Graph construction job for pid id {pid_id} was rejected: the job queue is full')
+            raise HTTPException(status_code=503,
+                                detail='Too many graph construction jobs are queued, retry later.',
+                                headers={'Retry-After': str(JOB_QUEUE_FULL_RETRY_AFTER_SECONDS)})
+
+        # the job status is written before the job is submitted, so that it can't overwrite the status written by the job
+        await _update_job_status_async(pid_id, JobStep.line_detection, JobStatus.submitted)
+        submit_job(func=process_line_detection_and_graph_construction_job, args=(pid_id, graph_construction_request,))
 
     return {"message": "Graph construction job submitted successfully."}
 
@@ -278,15 +519,43 @@ async def persist_graph(
 
 
 def process_line_detection_and_graph_construction_job(pid_id: str, text_detection_results: GraphConstructionInferenceRequest):
-    line_detection_results = process_line_detection(pid_id, text_detection_results)
-    process_graph_construction(pid_id, text_detection_results, line_detection_results)
+    pid_image_path = storage_path_template_builder.build_image_path(pid_id, InferenceResult.symbol_detection)
 
+    # the image is downloaded and decoded once for both steps, and released when the job completes
+    with profile_job(pid_id) as job_profiler, ImageContext(lambda: _download_image(pid_image_path)) as pid_image:
+        try:
+            line_detection_results = process_line_detection(pid_id, text_detection_results, pid_image)
+            process_graph_construction(pid_id, text_detection_results, line_detection_results, pid_image)
+        finally:
+            _upload_job_profile(pid_id, job_profiler)
 
-def process_line_detection(pid_id: str, text_detection_results: GraphConstructionInferenceRequest):
-    _update_job_status(pid_id, JobStep.line_detection, JobStatus.in_progress)
 
+def _upload_job_profile(pid_id: str, job_profiler: JobProfiler):
+    job_profile_path = storage_path_template_builder.build_inference_job_profile_path(pid_id, InferenceResult.graph_construction)
+    try:
+        blob_storage_client.upload_bytes(job_profile_path, job_profiler.to_job_profile().json())
+    except Exception as e:
+        # the profile is informational, it must not fail the job
+        logger.error(f'Exception while uploading the job profile for pid id {pid_id}: {e}')
+
+
+def _is_lazy_output_image_rendering() -> bool:
+    return config.output_image_rendering_mode == OutputImageRenderingMode.lazy
+
+
+def _create_pid_image_context(pid_id: str) -> ImageContext:
     pid_image_path = storage_path_template_builder.build_image_path(pid_id, InferenceResult.symbol_detection)
-    pid_image = _download_file(pid_image_path)
+    return ImageContext(lambda: _download_image(pid_image_path))
+
+
+def process_line_detection(
+        pid_id: str, text_detection_results: GraphConstructionInferenceRequest,
+        pid_image: Optional[ImageContext] = None):
+    _update_job_status(pid_id, JobStep.line_detection, JobStatus.in_progress)
+
+    pid_image = pid_image or _create_pid_image_context(pid_id)
+    with profile_stage('line_detection.download'):
+        pid_image.image_bytes
 
     debug_image_preprocessed_path = storage_path_template_builder.build_debug_image_path(pid_id,
                                                                                          InferenceResult.graph_construction,
@@ -296,6 +565,9 @@ def process_line_detection(pid_id: str, text_detection_results: GraphConstructio
     output_image_line_segments_path = storage_path_template_builder.build_output_image_path(pid_id,
                                                                                             InferenceResult.graph_construction,
                                                                                             InferenceResult.line_detection.value)
+    if _is_lazy_output_image_rendering():
+        # the output image is rendered by get_output_inference_images on first access
+        output_image_line_segments_path = None
 
     try:
         logger.info(f"Start line detection job for pid id {pid_id}")
@@ -320,30 +592,39 @@ def process_line_detection(pid_id: str, text_detection_results: GraphConstructio
             else text_detection_results.hough_rho
         theta = config.line_detection_hough_theta if text_detection_results.hough_theta is None \
             else text_detection_results.hough_theta
-
-        # Call line detection phase
-        line_detection_response = line_detection.detect_lines(
-            pid_id,
-            pid_image,
-            text_detection_results,
-            enable_thinning,
-            threshold,
-            max_line_gap,
-            min_line_length,
-            rho,
-            theta,
-            text_detection_results.bounding_box_inclusive,
-            text_detection_results.image_details.height,
-            text_detection_results.image_details.width,
-            debug_image_preprocessed_path,
-            debug_image_preprocessed_before_thinning_path,
-            output_image_line_segments_path
-        )
+        line_detection_algorithm = config.line_detection_algorithm if text_detection_results.line_detection_algorithm is None \
+            else text_detection_results.line_detection_algorithm
+
+        # Call line detection phase, the output images are the ones written by this job
+        with output_image_writer.track_writes() as output_image_writes:
+            line_detection_response = line_detection.detect_lines(
+                pid_id,
+                pid_image,
+                text_detection_results,
+                enable_thinning,
+                threshold,
+                max_line_gap,
+                min_line_length,
+                rho,
+                theta,
+                text_detection_results.bounding_box_inclusive,
+                text_detection_results.image_details.height,
+                text_detection_results.image_details.width,
+                debug_image_preprocessed_path,
+                debug_image_preprocessed_before_thinning_path,
+                output_image_line_segments_path,
+                line_detection_algorithm
+            )
 
         line_detection_response_path = storage_path_template_builder.build_inference_response_path(pid_id,
                                                                                                    InferenceResult.graph_construction,
                                                                                                    InferenceResult.line_detection.value)
-        blob_storage_client.upload_bytes(line_detection_response_path, json.dumps(line_detection_response.dict()))
+        with profile_stage('line_detection.upload_response'):
+            blob_storage_client.upload_bytes(line_detection_response_path, json.dumps(line_detection_response.dict()))
+
+        # the output images are uploaded in the background, they must be available once the step is done
+        with profile_stage('line_detection.flush_output_images'):
+            output_image_writes.wait()
 
         logger.info(f"Line detection job for pid id {pid_id} completed successfully")
         _update_job_status(pid_id, JobStep.line_detection, JobStatus.done)
@@ -356,12 +637,14 @@ def process_line_detection(pid_id: str, text_detection_results: GraphConstructio
 
 def process_graph_construction(
         pid_id, text_detection_results: GraphConstructionInferenceRequest,
-        line_detection_results: LineDetectionInferenceResponse):
+        line_detection_results: LineDetectionInferenceResponse,
+        pid_image: Optional[ImageContext] = None):
 
     _update_job_status(pid_id, JobStep.graph_construction, JobStatus.in_progress)
 
-    pid_image_path = storage_path_template_builder.build_image_path(pid_id, InferenceResult.symbol_detection)
-    pid_image = _download_file(pid_image_path)
+    pid_image = pid_image or _create_pid_image_context(pid_id)
+    with profile_stage('graph_construction.download'):
+        pid_image.image_bytes
 
     output_image_graph_path = storage_path_template_builder.build_output_image_path(pid_id,
                                                                                     InferenceResult.graph_construction,
@@ -371,25 +654,32 @@ def process_graph_construction(
                                                                                               'graph_connections')
     debug_image_graph_with_lines_and_symbols_path = storage_path_template_builder.build_debug_image_path(
         pid_id, InferenceResult.graph_construction, 'graph_with_lines_and_symbols')
+    if _is_lazy_output_image_rendering():
+        # the output image is rendered by get_output_inference_images on first access,
+        # the debug images can't be rendered afterwards, they are only rendered in debug mode
+        output_image_graph_path = None
+        if not config.debug:
+            debug_image_graph_connections_path = None
+            debug_image_graph_with_lines_and_symbols_path = None
 
     try:
         logger.info(f"Start graph construction job for pid id {pid_id}")
 
-        # Call graph construction phase
-        connected_symbols, arrow_nodes = graph_construction.construct_graph(pid_id,
-                                                                            pid_image,
-                                                                            text_detection_results,
-                                                                            line_detection_results,
-                                                                            output_image_graph_path,
-                                                                            debug_image_graph_connections_path,
-                                                                            debug_image_graph_with_lines_and_symbols_path,
-                                                                            config.symbol_label_prefixes_to_include_in_graph_image_output)
+        # Call graph construction phase, the output images are the ones written by this job
+        with output_image_writer.track_writes() as output_image_writes:
+            connected_symbols, arrow_nodes = graph_construction.construct_graph(
+                pid_id,
+                pid_image,
+                text_detection_results,
+                line_detection_results,
+                output_image_graph_path,
+                debug_image_graph_connections_path,
+                debug_image_graph_with_lines_and_symbols_path,
+                config.symbol_label_prefixes_to_include_in_graph_image_output)
 
         arrows_line_source_response_path = storage_path_template_builder.build_inference_response_path(pid_id,
                                                                                                        InferenceResult.graph_construction,
                                                                                                        'arrows_line_source')
-        blob_storage_client.upload_bytes(arrows_line_source_response_path, json.dumps(arrow_nodes))
-
         graph_construction_response = GraphConstructionInferenceResponse(
             image_url=text_detection_results.image_url,
             image_details=text_detection_results.image_details,
@@ -399,7 +689,13 @@ def process_graph_construction(
             pid_id,
             InferenceResult.graph_construction,
             InferenceResult.graph_construction.value)
-        blob_storage_client.upload_bytes(graph_construction_response_path, json.dumps(graph_construction_response.dict()))
+
+        with profile_stage('graph_construction.upload_response'):
+            blob_storage_client.upload_bytes(arrows_line_source_response_path, json.dumps(arrow_nodes))
+            blob_storage_client.upload_bytes(graph_construction_response_path, json.dumps(graph_construction_response.dict()))
+
+        with profile_stage('graph_construction.flush_output_images'):
+            output_image_writes.wait()
 
         logger.info(f"Graph construction job for pid id {pid_id} completed successfully")
         _update_job_status(pid_id, JobStep.graph_construction, JobStatus.done)
@@ -417,26 +713,29 @@ def process_graph_construction(
 )
 async def get_inference_results(
     inference_result_type: InferenceResult,
-    pid_id: str
+    pid_id: str,
+    if_none_match: Annotated[Optional[str], Header()] = None
 ):
     '''Gets the inference results for a given pid id and inference result type.
 
     param pid: The PID id.
     param inference_result_type: The inference result type.
-    return: The inference results.
+    param if_none_match: The ETag of the inference results held by the client, if any.
+    return: The inference results, or 304 Not Modified if they match the If-None-Match header.
     rtype: symbol_detection.InferenceResponse
     '''
 
     logger.info(f"Getting inference results for pid {pid_id} and inference result type of {inference_result_type}")
 
     # Check if corrected inference results exist
-    inference_result_path = None
+    inference_results = None
     if inference_result_type == InferenceResult.symbol_detection or \
        inference_result_type == InferenceResult.text_detection:
         inference_result_path = storage_path_template_builder.build_inference_request_path(pid_id, _get_corrected_inference_result_path(
             inference_result_type))
+        inference_results = await _download_blob_if_exists_async(inference_result_path, if_none_match)
 
-    if inference_result_path is None or not _exists_file(inference_result_path):
+    if inference_results is None:
         if inference_result_type == InferenceResult.symbol_detection or inference_result_type == InferenceResult.text_detection:
             inference_result_path = storage_path_template_builder.build_inference_response_path(pid_id, inference_result_type)
         elif inference_result_type == InferenceResult.line_detection or inference_result_type == InferenceResult.graph_construction:
@@ -447,26 +746,31 @@ async def get_inference_results(
             inference_result_path = storage_path_template_builder.build_inference_response_path(pid_id,
                                                                                                 InferenceResult.graph_persistence)
 
-        if not _exists_file(inference_result_path):
+        inference_results = await _download_blob_if_exists_async(inference_result_path, if_none_match)
+        if inference_results is None:
             logger.warning(f'Inference results not found for pid id {pid_id}')
             raise HTTPException(status_code=404, detail=f'Inference results not found for pid {pid_id}.')
 
-    inference_results_bytes = _download_file(inference_result_path)
+    if not inference_results.modified:
+        return _not_modified_response(inference_results)
 
-    headers = {'Content-Disposition': f'attachment; filename={inference_result_type.value}.json'}
+    headers = {'Content-Disposition': f'attachment; filename={inference_result_type.value}.json',
+               **_get_etag_headers(inference_results)}
 
-    return StreamingResponse(io.BytesIO(inference_results_bytes), headers=headers)
+    return StreamingResponse(io.BytesIO(inference_results.content), headers=headers)
 
 
 @router.get(
     '/graph-construction/{pid_id}/status'
 )
 async def get_job_status(
-    pid_id: str
+    pid_id: str,
+    if_none_match: Annotated[Optional[str], Header()] = None
 ):
     '''Gets the inference job status for a given pid id .
     param pid: The PID id.
-    return: The JobStatus of pid_id.
+    param if_none_match: The ETag of the job status held by the client, if any.
+    return: The JobStatus of pid_id, or 304 Not Modified if it matches the If-None-Match header.
     rtype: JobStatus
     '''
 
@@ -475,12 +779,52 @@ async def get_job_status(
     # Check if corrected inference results exist
     inference_status_path = storage_path_template_builder.build_inference_job_status_path(pid_id, InferenceResult.graph_construction)
 
-    if not _exists_file(inference_status_path):
+    job_status = await _download_blob_if_exists_async(inference_status_path, if_none_match)
+    if job_status is None:
         logger.warning(f'Inference results not found for pid id {pid_id}')
         raise HTTPException(status_code=404, detail=f'Inference results not found for pid {pid_id}.')
 
-    inference_results_bytes = _download_file(inference_status_path)
-    return json.loads(inference_results_bytes)
+    if not job_status.modified:
+        return _not_modified_response(job_status)
+
+    return JSONResponse(json.loads(job_status.content), headers=_get_etag_headers(job_status))
+
+
+def _get_output_image_path(pid_id: str, inference_result_type: InferenceResult) -> tuple[str, str]:
+    postfix = inference_result_type.value
+
+    # the line detection output image is written by the graph construction job
+    if inference_result_type == InferenceResult.line_detection:
+        inference_result_type = InferenceResult.graph_construction
+
+    output_image_path = storage_path_template_builder.build_output_image_path(pid_id,
+                                                                              inference_result_type,
+                                                                              postfix)
+    return output_image_path, postfix
+
+
+async def _get_output_image(
+    pid_id: str,
+    inference_result_type: InferenceResult,
+    output_image_path: str,
+    if_none_match: Optional[str] = None
+) -> DownloadedBlob:
+    image = await _download_blob_if_exists_async(output_image_path, if_none_match)
+    if image is None and _is_lazy_output_image_rendering():
+        # the output images of the jobs run with lazy rendering are rendered on first access. In eager mode,
+        # the image may still be uploaded in the background after the response was, so it is not rendered again
+        image_bytes = await run_in_threadpool(output_image_renderer.render_output_image, pid_id, inference_result_type)
+        if image_bytes is not None:
+            image = DownloadedBlob(content=image_bytes)
+
+    if image is None:
+        if inference_result_type == InferenceResult.line_detection:
+            inference_result_type = InferenceResult.graph_construction
+        logger.warning(f'Inference image not found for pid id {pid_id} and inference result type {inference_result_type}')
+        raise HTTPException(status_code=404,
+                            detail=f'Inference image not found for pid id {pid_id} and inference result type {inference_result_type}')
+
+    return image
 
 
 @router.get(
@@ -488,34 +832,149 @@ async def get_job_status(
 )
 async def get_output_inference_images(
     pid_id: str,
-    inference_result_type: InferenceResult
+    inference_result_type: InferenceResult,
+    if_none_match: Annotated[Optional[str], Header()] = None
 ):
     '''
     Gets the inference output image for a given pid id and inference result type.
     param pid: The PID id.
     param inference_result_type: The inference result type.
+    param if_none_match: The ETag of the image held by the client, if any.
     rtype: ImageResponse
     The inference output image has information overlayed on the original image
     that provides user insight into what was done in the inferencing service.
     '''
+    output_image_path, postfix = _get_output_image_path(pid_id, inference_result_type)
+    image = await _get_output_image(pid_id, inference_result_type, output_image_path, if_none_match)
+    if not image.modified:
+        return _not_modified_response(image)
 
-    postfix = inference_result_type.value
+    # file name with pid and detection step
+    file_name = f'{pid_id}_{postfix}.png'
+    return ImageResponse(image=image.content, filename=file_name, etag=image.etag)
 
-    if inference_result_type == InferenceResult.line_detection:
-        inference_result_type = InferenceResult.graph_construction
-        postfix = InferenceResult.line_detection.value
 
-    output_image_path = storage_path_template_builder.build_output_image_path(pid_id,
-                                                                              inference_result_type,
-                                                                              postfix)
+@router.get(
+    '/{inference_result_type}/{pid_id}/images/tiles',
+    response_model=ImageTilesManifest
+)
+async def get_output_inference_image_tiles_manifest(
+    pid_id: str,
+    inference_result_type: InferenceResult
+):
+    '''
+    Gets the manifest of the tiled pyramid of the inference output image for a given pid id and inference result type.
+    param pid: The PID id.
+    param inference_result_type: The inference result type.
+    rtype: ImageTilesManifest
+    The tiles are stored with the output images when OUTPUT_IMAGE_TILES_ENABLED is true.
+    '''
+    output_image_path, _ = _get_output_image_path(pid_id, inference_result_type)
+    manifest_path = storage_path_template_builder.build_image_tiles_manifest_path(output_image_path)
 
-    if not _exists_file(output_image_path):
-        logger.warning(f'Inference image not found for pid id {pid_id} and inference result type {inference_result_type}')
+    manifest_bytes = await _download_file_if_exists_async(manifest_path)
+    if manifest_bytes is None:
+        logger.warning(f'Inference image tiles not found for pid id {pid_id} and inference result type {inference_result_type}')
         raise HTTPException(status_code=404,
-                            detail=f'Inference image not found for pid id {pid_id} and inference result type {inference_result_type}')
+                            detail=f'Inference image tiles not found for pid id {pid_id} and inference result type {inference_result_type}')
 
-    image = _download_file(output_image_path)
+    return ImageTilesManifest.parse_raw(manifest_bytes)
 
-    # file name with pid and detection step
-    file_name = f'{pid_id}_{postfix}.png'
-    return ImageResponse(image=image, filename=file_name)
+
+@router.get(
+    '/{inference_result_type}/{pid_id}/images/tiles/{level}/{row}/{column}'
+)
+async def get_output_inference_image_tile(
+    pid_id: str,
+    inference_result_type: InferenceResult,
+    level: int = Path(..., ge=0, description="The level of the tile, 0 being the full resolution"),
+    row: int = Path(..., ge=0, description="The row of the tile in the level"),
+    column: int = Path(..., ge=0, description="The column of the tile in the level"),
+    if_none_match: Annotated[Optional[str], Header()] = None
+):
+    '''
+    Gets a tile of the tiled pyramid of the inference output image for a given pid id and inference result type.
+    param pid: The PID id.
+    param inference_result_type: The inference result type.
+    param level: The level of the tile, each level halves the resolution of the previous one.
+    param row: The row of the tile.
+    param column: The column of the tile.
+    param if_none_match: The ETag of the tile held by the client, if any.
+    rtype: ImageResponse
+    '''
+    output_image_path, postfix = _get_output_image_path(pid_id, inference_result_type)
+    tile_path = storage_path_template_builder.build_image_tile_path(output_image_path, level, row, column)
+
+    tile = await _download_blob_if_exists_async(tile_path, if_none_match)
+    if tile is None:
+        logger.warning(f'Inference image tile {level}/{row}/{column} not found for pid id {pid_id}')
+        raise HTTPException(status_code=404,
+                            detail=f'Inference image tile {level}/{row}/{column} not found for pid id {pid_id} '
+                            + f'and inference result type {inference_result_type}')
+
+    if not tile.modified:
+        return _not_modified_response(tile)
+
+    return ImageResponse(image=tile.content, etag=tile.etag, filename=f'{pid_id}_{postfix}_{level}_{row}_{column}.png')
+
+
+def _read_output_image_region(
+    output_image_path: str,
+    manifest_bytes: Optional[bytes],
+    image: Optional[bytes],
+    bounding_box: BoundingBox,
+    max_size: int
+) -> bytes:
+    if manifest_bytes is not None:
+        def load_tile(level: int, row: int, column: int):
+            tile_path = storage_path_template_builder.build_image_tile_path(output_image_path, level, row, column)
+            # the tiles are read in a worker thread of the thread pool, through the async client of the event loop
+            return decode_image(anyio.from_thread.run(_download_file_async, tile_path))
+
+        region = read_image_region(ImageTilesManifest.parse_raw(manifest_bytes), load_tile, bounding_box, max_size)
+    else:
+        region = crop_image_region(decode_image(image), bounding_box, max_size)
+
+    return encode_image('region.png', region)
+
+
+@router.get(
+    '/{inference_result_type}/{pid_id}/images/region'
+)
+async def get_output_inference_image_region(
+    pid_id: str,
+    inference_result_type: InferenceResult,
+    topX: float = Query(..., description="The normalized top x coordinate of the region"),
+    topY: float = Query(..., description="The normalized top y coordinate of the region"),
+    bottomX: float = Query(..., description="The normalized bottom x coordinate of the region"),
+    bottomY: float = Query(..., description="The normalized bottom y coordinate of the region"),
+    max_size: int = Query(OUTPUT_IMAGE_REGION_MAX_SIZE_PIXELS, gt=0,
+                          description="The maximum width and height of the returned image, in pixels")
+):
+    '''
+    Gets a region of the inference output image for a given pid id and inference result type.
+    param pid: The PID id.
+    param inference_result_type: The inference result type.
+    param topX, topY, bottomX, bottomY: The normalized coordinates of the region.
+    param max_size: The maximum width and height of the returned image, the region is downscaled to fit.
+    rtype: ImageResponse
+    When the output image has tiles, only the tiles of the region are downloaded, at the lowest resolution
+    that fits max_size. Otherwise the whole output image is downloaded and cropped.
+    '''
+    bounding_box = BoundingBox(topX=topX, topY=topY, bottomX=bottomX, bottomY=bottomY)
+    try:
+        validate_normalized_bounding_box(bounding_box)
+    except ValueError as e:
+        logger.warning(f'The region requested for the output image of pid id {pid_id} has invalid coordinates: {e}')
+        raise HTTPException(status_code=400,
+                            detail='The region coordinates are invalid. Make sure that coordinates are normalized and in the range [0, 1].')
+
+    output_image_path, postfix = _get_output_image_path(pid_id, inference_result_type)
+    manifest_path = storage_path_template_builder.build_image_tiles_manifest_path(output_image_path)
+
+    manifest_bytes, image = await _download_file_if_exists_async(manifest_path), None
+    if manifest_bytes is None:
+        image = (await _get_output_image(pid_id, inference_result_type, output_image_path)).content
+
+    region = await run_in_threadpool(_read_output_image_region, output_image_path, manifest_bytes, image, bounding_box, max_size)
+    return ImageResponse(image=region, filename=f'{pid_id}_{postfix}_region.png')
@@ -0,0 +1,263 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, Optional, Union
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+from app.models.downloaded_blob import DownloadedBlob
+from app.models.enums.inference_result import InferenceResult
+from app.routes.controllers import pid_digitization_controller
+from app.routes.tracing_middleware import TracingMiddleware
+from app.services import storage_path_template_builder
+from app.services.async_blob_storage_client import AsyncBlobStorageClient
+from app.services.blob_archiver import BlobArchiver
+from logger_config import get_logger
+
+
+logger = get_logger(__name__)
+
+PID_ID = 'benchmark'
+NO_MIDDLEWARE = 'none'
+BASE_HTTP_MIDDLEWARE = 'base_http_middleware'
+ASGI_MIDDLEWARE = 'asgi_middleware'
+MIDDLEWARES = [NO_MIDDLEWARE, BASE_HTTP_MIDDLEWARE, ASGI_MIDDLEWARE]
+ENDPOINTS = {
+    'job_status': f'/api/pid-digitization/graph-construction/{PID_ID}/status',
+    'inference_results': f'/api/pid-digitization/symbol-detection/{PID_ID}',
+}
+
+
+class InMemoryAsyncBlobStorageClient(AsyncBlobStorageClient):
+    '''Async blob storage stand-in keeping the blobs in memory, so the benchmark measures the request handling only.'''
+
+    def __init__(self):
+        self.blobs: dict[str, bytes] = {}
+
+    async def init(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def upload_bytes(self, blob_name: str, data: Union[bytes, str]):
+        self.blobs[blob_name] = data.encode('utf-8') if isinstance(data, str) else data
+
+    async def download_bytes(self, blob_name: str) -> bytes:
+        return self.blobs[blob_name]
+
+    async def download_blob_if_exists(self, blob_name: str, if_none_match: Optional[str] = None) -> Optional[DownloadedBlob]:
+        if blob_name not in self.blobs:
+            return None
+        etag = f'"{hash(self.blobs[blob_name])}"'
+        if etag == if_none_match:
+            return DownloadedBlob(etag=etag)
+        return DownloadedBlob(content=self.blobs[blob_name], etag=etag)
+
+    async def blob_exists(self, blob_name: str) -> bool:
+        return blob_name in self.blobs
+
+
+class BaseHTTPTracingMiddleware(BaseHTTPMiddleware):
+    '''The former BaseHTTPMiddleware implementation of the tracing middleware, as it handles the GET requests.'''
+
+    async def dispatch(self, request: Request, call_next):
+        is_log_needed = request.url.path.startswith("/api")
+        response = await call_next(request)
+        if is_log_needed:
+            logger.info(f"Logging response for {request.url.path}")
+        return response
+
+
+@contextmanager
+def in_memory_async_blob_storage() -> Iterator[InMemoryAsyncBlobStorageClient]:
+    '''Replaces the async blob storage client of the endpoints by an in-memory stand-in holding the blobs they read.'''
+    blob_storage = InMemoryAsyncBlobStorageClient()
+    blob_storage.blobs[storage_path_template_builder.build_inference_job_status_path(PID_ID, InferenceResult.graph_construction)] = \
+        json.dumps({'status': 'done', 'step': 'graph-construction', 'message': ''}).encode('utf-8')
+    blob_storage.blobs[storage_path_template_builder.build_inference_response_path(PID_ID, InferenceResult.symbol_detection)] = \
+        json.dumps({'image_url': f'{PID_ID}.png', 'image_details': {'format': 'png', 'width': 7000, 'height': 5000}, 'label': [
+            {'id': i, 'topX': 0.1, 'topY': 0.1, 'bottomX': 0.2, 'bottomY': 0.2, 'label': 'Equipment/Tank', 'score': 0.9}
+            for i in range(100)]}).encode('utf-8')
+
+    async_blob_storage_client = pid_digitization_controller.async_blob_storage_client
+    pid_digitization_controller.async_blob_storage_client = blob_storage
+    try:
+        yield blob_storage
+    finally:
+        pid_digitization_controller.async_blob_storage_client = async_blob_storage_client
+
+
+def create_app(middleware: str, blob_storage: AsyncBlobStorageClient) -> FastAPI:
+    '''Creates the application with the P&ID digitization endpoints behind the given middleware.
+
+    :param middleware: The middleware, none, base_http_middleware or asgi_middleware
+    :type middleware: str
+    :param blob_storage: The blob storage of the tracing middleware
+    :type blob_storage: AsyncBlobStorageClient
+    :return: The application
+    :rtype: FastAPI
+    '''
+    app = FastAPI()
+    if middleware == BASE_HTTP_MIDDLEWARE:
+        app.add_middleware(BaseHTTPTracingMiddleware)
+    elif middleware == ASGI_MIDDLEWARE:
+        app.add_middleware(TracingMiddleware, blob_storage_client=blob_storage, archiver=BlobArchiver(blob_storage))
+    app.include_router(pid_digitization_controller.router)
+    return app
+
+
+async def measure_requests_per_second(app: FastAPI, path: str, requests_count: int, concurrency: int) -> float:
+    '''Sends GET requests to the application in-process, without network, and measures its throughput.
+
+    :param app: The application
+    :type app: FastAPI
+    :param path: The path of the GET endpoint
+    :type path: str
+    :param requests_count: The number of requests to send
+    :type requests_count: int
+    :param concurrency: The number of requests in flight
+    :type concurrency: int
+    :return: The number of requests handled per second
+    :rtype: float
+    '''
+    remaining = requests_count
+
+    async def send_requests():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+                'path': path, 'raw_path': path.encode('utf-8'), 'root_path': '', 'query_string': b'',
+                'headers': [(b'host', b'benchmark')], 'client': ('127.0.0.1', 0), 'server': ('benchmark', 80)
+            }
+            status_codes = []
+            request_received = False
+            response_sent = asyncio.Event()
+
+            async def receive():
+                nonlocal request_received
+                if not request_received:
+                    request_received = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # the streaming responses listen for the disconnection of the client
+                await response_sent.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status_codes.append(message['status'])
+                elif message['type'] == 'http.response.body' and not message.get('more_body', False):
+                    response_sent.set()
+
+            await app(scope, receive, send)
+            if status_codes != [200]:
+                raise RuntimeError(f'GET {path} returned {status_codes}')
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send_requests() for _ in range(concurrency)))
+    return requests_count / (time.perf_counter() - start)
+
+
+def run_benchmark(middlewares: list[str], requests_count: int, concurrency: int, repeat: int) -> dict:
+    '''Measures the throughput of the GET endpoints behind each middleware.
+
+    :param middlewares: The middlewares to compare
+    :type middlewares: list[str]
+    :param requests_count: The number of requests per run
+    :type requests_count: int
+    :param concurrency: The number of requests in flight
+    :type concurrency: int
+    :param repeat: The number of runs per middleware and endpoint
+    :type repeat: int
+    :return: The benchmark report
+    :rtype: dict
+    '''
+    results = {}
+    with in_memory_async_blob_storage() as blob_storage:
+        for middleware in middlewares:
+            app = create_app(middleware, blob_storage)
+            results[middleware] = {}
+            for endpoint, path in ENDPOINTS.items():
+                # the first run warms up the routing and validation caches
+                asyncio.run(measure_requests_per_second(app, path, min(requests_count, 100), concurrency))
+                runs = [asyncio.run(measure_requests_per_second(app, path, requests_count, concurrency)) for _ in range(repeat)]
+                results[middleware][endpoint] = {
+                    'requests_per_second_median': statistics.median(runs),
+                    'requests_per_second_max': max(runs),
+                }
+
+    speedups = {}
+    if BASE_HTTP_MIDDLEWARE in results and ASGI_MIDDLEWARE in results:
+        speedups = {
+            endpoint: results[ASGI_MIDDLEWARE][endpoint]['requests_per_second_median']
+            / results[BASE_HTTP_MIDDLEWARE][endpoint]['requests_per_second_median']
+            for endpoint in ENDPOINTS
+        }
+
+    return {
+        'created_at': datetime.utcnow().isoformat(),
+        'environment': {
+            'python_version': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'parameters': {
+            'middlewares': middlewares,
+            'requests_count': requests_count,
+            'concurrency': concurrency,
+            'repeat': repeat,
+        },
+        'results': results,
+        'asgi_middleware_speedups': speedups
+    }
+
+
+def _get_args():
+    parser = argparse.ArgumentParser(description='Benchmarks the throughput of the GET endpoints behind the tracing middleware.')
+    parser.add_argument(
+        '--middlewares',
+        dest='middlewares',
+        type=lambda value: value.split(','),
+        default=MIDDLEWARES,
+        help=f'Comma separated middlewares to compare: {", ".join(MIDDLEWARES)}'
+    )
+    parser.add_argument('--requests', dest='requests_count', type=int, default=5000, help='Number of requests per run')
+    parser.add_argument('--concurrency', dest='concurrency', type=int, default=10, help='Number of requests in flight')
+    parser.add_argument('--repeat', dest='repeat', type=int, default=3, help='Number of runs per middleware and endpoint')
+    parser.add_argument('--output-path', dest='output_path', type=str, default=None,
+                        help='Path of the JSON report, printed to stdout when not set')
+    parser.add_argument('--verbose', dest='verbose', action='store_true', help='Keep the info logs of the endpoints')
+    args = parser.parse_args()
+
+    unknown_middlewares = set(args.middlewares) - set(MIDDLEWARES)
+    if unknown_middlewares:
+        parser.error(f'Unknown middlewares: {", ".join(sorted(unknown_middlewares))}')
+
+    return args
+
+
+if __name__ == '__main__':
+    args = _get_args()
+
+    if not args.verbose:
+        logging.disable(logging.INFO)
+
+    report = run_benchmark(args.middlewares, args.requests_count, args.concurrency, args.repeat)
+
+    if args.output_path is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output_path)), exist_ok=True)
+        with open(args.output_path, 'w') as f:
+            json.dump(report, f, indent=2)
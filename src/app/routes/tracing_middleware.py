@@ -1,43 +1,189 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
-from fastapi import FastAPI, HTTPException, Request, Response, UploadFile
-from starlette.types import Message
-from starlette.middleware.base import BaseHTTPMiddleware
+import asyncio
+import json
+from typing import AsyncIterator, Callable, List, Optional
+from fastapi import HTTPException, Response
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import logger_config
-from app.services.blob_storage_client import BlobStorageClient
+from app.services.async_blob_storage_client import AsyncBlobStorageClient
+from app.services.blob_archiver import BlobArchiver
 from app.models.enums.inference_result import InferenceResult
 from app.services import storage_path_template_builder
+from app.utils import image_utils
+from app.utils.multipart_file_reader import MultipartFileReader
 
 logger = logger_config.get_logger(__name__)
 
+# the chunks of the request image waiting to be uploaded, the endpoint is slowed down past this
+REQUEST_IMAGE_UPLOAD_QUEUE_MAX_CHUNKS = 16
+# the path segment of the batch endpoints, in place of the inference method
+BATCH_PATH_SEGMENT = 'batch'
 
-class TracingMiddleware(BaseHTTPMiddleware):
+
+class RequestImageUpload:
+    '''Uploads the image of a multipart request to blob storage in chunks, while the endpoint receives it.
+
+    The body is parsed as it goes through: the file name is validated as soon as the headers of the file
+    are parsed, and the image header once the image is received. A validation error is raised to the endpoint
+    reading the body and cancels the upload, so that an invalid image is never stored.
+    '''
+
+    def __init__(self, blob_storage_client: AsyncBlobStorageClient, blob_name: str, content_type: str,
+                 validate_file_name: Callable[[str], None], validate_image: Callable[[bytes], None]):
+        '''Initializes a new instance of the RequestImageUpload class.
+
+        :param blob_storage_client: The client uploading the image
+        :type blob_storage_client: AsyncBlobStorageClient
+        :param blob_name: The name of the blob to upload the image to
+        :type blob_name: str
+        :param content_type: The Content-Type header of the request
+        :type content_type: str
+        :param validate_file_name: Raises an HTTPException if the file name is not valid
+        :type validate_file_name: Callable[[str], None]
+        :param validate_image: Raises an HTTPException if the image header is not valid
+        :type validate_image: Callable[[bytes], None]
+        '''
+        self._blob_storage_client = blob_storage_client
+        self._blob_name = blob_name
+        self._reader = MultipartFileReader(content_type, 'file')
+        self._validate_file_name = validate_file_name
+        self._validate_image = validate_image
+        self._file_name_validated = False
+        self._image_header: Optional[bytearray] = bytearray()
+        self._chunks: asyncio.Queue = asyncio.Queue(maxsize=REQUEST_IMAGE_UPLOAD_QUEUE_MAX_CHUNKS)
+        self._upload_task: Optional[asyncio.Task] = None
+        self.complete = False
+        self.error: Optional[HTTPException] = None
+
+    def wrap_receive(self, receive: Receive) -> Receive:
+        '''Wraps the receive channel of the request, to upload the image as the endpoint receives it.
+
+        :param receive: The receive channel of the request
+        :type receive: Receive
+        :return: The receive channel to give to the endpoint
+        :rtype: Receive
+        '''
+        async def receive_and_upload() -> Message:
+            message = await receive()
+            if message['type'] == 'http.request' and self.error is None and not self.complete:
+                await self._write(message.get('body', b''))
+            return message
+
+        return receive_and_upload
+
+    async def finish(self) -> bool:
+        '''Waits for the upload of the image, or cancels it if the image was not entirely received.
+
+        :return: True if the image was uploaded
+        :rtype: bool
+        '''
+        if self._upload_task is None:
+            return False
+        if not self.complete:
+            await self.cancel()
+            return False
+
+        await self._upload_task
+        return True
+
+    async def cancel(self):
+        '''Cancels the upload of the image, the blob is left unchanged.'''
+        if self._upload_task is not None and not self._upload_task.done():
+            self._upload_task.cancel()
+            try:
+                await self._upload_task
+            except asyncio.CancelledError:
+                pass
+
+    async def _write(self, body: bytes):
+        try:
+            data_chunks = self._reader.write(body)
+
+            if self._reader.filename is not None and not self._file_name_validated:
+                self._validate_file_name(self._reader.filename)
+                self._file_name_validated = True
+
+            for data in data_chunks:
+                if self._image_header is not None:
+                    self._image_header += data
+                    # the image header is kept until it can be read
+                    if image_utils.probe_image_dimensions(self._image_header) is not None:
+                        self._image_header = None
+
+                if self._upload_task is None:
+                    self._upload_task = asyncio.ensure_future(
+                        self._blob_storage_client.upload_stream(self._blob_name, self._read_chunks()))
+                    self._upload_task.add_done_callback(self._on_upload_done)
+                await self._put(data)
+
+            if self._reader.file_complete:
+                if self._image_header is not None:
+                    self._validate_image(bytes(self._image_header))
+                self.complete = True
+                await self._put(None)
+        except HTTPException as ex:
+            self.error = ex
+            await self.cancel()
+            raise
+        except BaseException:
+            await self.cancel()
+            raise
+
+    async def _put(self, data: Optional[bytes]):
+        # once the upload failed, its error is raised by `finish` and the chunks are dropped
+        if self._upload_task is not None and not self._upload_task.done():
+            await self._chunks.put(data)
+
+    async def _read_chunks(self) -> AsyncIterator[bytes]:
+        while True:
+            data = await self._chunks.get()
+            if data is None:
+                return
+            yield data
+
+    def _on_upload_done(self, _):
+        # unblocks the endpoint if it is waiting for the failed upload to make room in the queue
+        while not self._chunks.empty():
+            self._chunks.get_nowait()
+
+
+class TracingMiddleware:
     '''
     This class is used to log the requests and responses of the API.
+
+    It is a pure ASGI middleware, the requests that are not traced go straight to the application. The request image
+    is uploaded in chunks while the endpoint receives it, and must be stored before the response is sent. The request
+    and response JSON bodies are archived by a background queue, off the request path.
     '''
-    def __init__(self, app: FastAPI, blob_storage_client: BlobStorageClient):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp, blob_storage_client: AsyncBlobStorageClient, archiver: Optional[BlobArchiver] = None):
+        '''Initializes a new instance of the TracingMiddleware class.
+
+        :param app: The application to trace
+        :type app: ASGIApp
+        :param blob_storage_client: The client uploading the request images
+        :type blob_storage_client: AsyncBlobStorageClient
+        :param archiver: The queue archiving the request and response bodies, a new one uploading with the client by default
+        :type archiver: Optional[BlobArchiver]
+        '''
+        self.app = app
         self.enable_storing_data = True
         self.blob_storage_client = blob_storage_client
-
-    async def set_body(self, request: Request, body: bytes):
-        async def receive() -> Message:
-            return {"type": "http.request", "body": body}
-        request._receive = receive
-
-    async def get_form(self, request: Request) -> bytes:
-        body = await request.body()
-        form = await request.form()
-        await self.set_body(request, body)
-        return form
+        self.archiver = archiver if archiver is not None else BlobArchiver(blob_storage_client)
 
     def validate_file_to_upload(self, file_name: str) -> bool:
         file_name = file_name.lower()
         if not (file_name.endswith(".jpg") or file_name.endswith(".jpeg") or file_name.endswith(".png")):
             raise HTTPException(status_code=400, detail="Bad Request")
 
-    async def validate_body_to_upload(self, id: str, request: Request) -> bool:
-        body = await request.json()
+    def validate_image_to_upload(self, file_content: bytes):
+        # only the header of the image is read, the image is decoded later by the inference steps
+        if image_utils.probe_image_dimensions(file_content) is None:
+            raise HTTPException(status_code=400, detail="Bad Request. The file is not a valid png or jpg image")
+
+    def validate_body_to_upload(self, id: str, body: bytes) -> bool:
+        body = json.loads(body)
 
         if 'image_url' in body:
             image_url = body.get('image_url').rsplit('.', 1)[0]
@@ -45,67 +191,158 @@ class TracingMiddleware(BaseHTTPMiddleware):
             if not id == image_url:
                 raise HTTPException(status_code=400, detail="Bad Request. The id in the url and the image_url in the body are not the same")
 
-    async def dispatch(self, request: Request, call_next):
-        try:
-            is_log_needed = request.url.path.startswith("/api")
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or not scope['path'].startswith('/api'):
+            await self.app(scope, receive, send)
+            return
 
-            # log the content of the form data
-            if is_log_needed and request.method == "POST":
-                logger.info(f"Logging request for {request.url.path}")
+        if scope['method'] != 'POST':
+            logger.info(f"Logging response for {scope['path']}")
+            await self.app(scope, receive, send)
+            return
 
-                await self.set_body(request, await request.body())
-                form_data = await self.get_form(request)
+        if _is_batch_path(scope['path']):
+            # the batch endpoints store the image and results of each sheet themselves
+            logger.info(f"Logging request for {scope['path']}")
+            await self.app(scope, receive, send)
+            return
 
-                qualifiers = request.url.path.split("/")
-                method_name = qualifiers[qualifiers.index("api") + 2]
-                id = qualifiers[qualifiers.index("api") + 3]
+        await self.trace(scope, receive, send)
 
-                # Validate the method name
-                inference_method = InferenceResult(method_name)
+    async def trace(self, scope: Scope, receive: Receive, send: Send):
+        '''Traces a POST request: archives its image or JSON body, and its response JSON body if it succeeded.'''
+        path = scope['path']
+        image_upload: Optional[RequestImageUpload] = None
+        response_started = False
+        error_response: Optional[Response] = None
+        try:
+            logger.info(f"Logging request for {path}")
 
-                # checking the existance of the file in the form data
-                if 'file' in form_data:
-                    file = UploadFile(form_data['file'])
+            qualifiers = path.split("/")
+            method_name = qualifiers[qualifiers.index("api") + 2]
+            id = qualifiers[qualifiers.index("api") + 3]
 
-                    # only will upload jpg/png files
-                    self.validate_file_to_upload(file.file.filename)
+            # Validate the method name
+            inference_method = InferenceResult(method_name)
 
-                    blob_name = storage_path_template_builder.build_image_path(id, inference_method)
-                    file_content = await file.file.read()
+            content_type = Headers(scope=scope).get('Content-Type', '')
 
-                    self.blob_storage_client.upload_bytes(blob_name, file_content)
+            # the image in the form data is uploaded while the endpoint reads it
+            if content_type.startswith('multipart/form-data'):
+                image_blob_name = storage_path_template_builder.build_image_path(id, inference_method)
+                image_upload = RequestImageUpload(self.blob_storage_client, image_blob_name, content_type,
+                                                  self.validate_file_to_upload, self.validate_image_to_upload)
+                receive = image_upload.wrap_receive(receive)
 
-                    logger.info(f"Uploaded file to: {blob_name}")
+            if content_type == 'application/json':
+                body = await _read_body(receive)
+                self.validate_body_to_upload(id, body)
 
-                if request.headers['Content-Type'] == 'application/json':
-                    await self.validate_body_to_upload(id, request)
+                # upload the body of the request as a json file
+                await self.archiver.archive(storage_path_template_builder.build_inference_request_path(id, inference_method), body)
+                receive = _replay_body(body, receive)
 
-                    # upload the body of the request as a json file
-                    file_content = await request.body()
-                    blob_name = storage_path_template_builder.build_inference_request_path(id, inference_method)
-                    self.blob_storage_client.upload_bytes(blob_name, file_content)
-                    logger.info(f"Uploaded file to: {blob_name}")
+            response_blob_name = storage_path_template_builder.build_inference_response_path(id, inference_method)
+            response_chunks: Optional[List[bytes]] = None
 
-            response = await call_next(request)
+            async def send_and_archive(message: Message):
+                nonlocal response_started, response_chunks, error_response
+                if error_response is not None:
+                    # the response of the endpoint is replaced by the error response
+                    return
 
-            if is_log_needed:
-                logger.info(f"Logging response for {request.url.path}")
+                if message['type'] == 'http.response.start':
+                    error_response = await self._finish_image_upload(image_upload)
+                    if error_response is not None:
+                        return
+                    response_started = True
+                    logger.info(f"Logging response for {path}")
+                    if message['status'] == 200:
+                        response_chunks = []
+                elif message['type'] == 'http.response.body' and response_chunks is not None:
+                    response_chunks.append(message.get('body', b''))
 
-                # log the body of the response
-                if request.method == "POST" and response.status_code == 200:
-                    response_body = b""
-                    async for chunk in response.body_iterator:
-                        response_body += chunk
-                    blob_name = storage_path_template_builder.build_inference_response_path(id, inference_method)
-                    self.blob_storage_client.upload_bytes(blob_name, response_body.decode())
-                    logger.info(f"Uploaded file to: {blob_name}")
+                await send(message)
 
-                    return Response(content=response_body, status_code=response.status_code,
-                                    headers=dict(response.headers), media_type=response.media_type)
+                if message['type'] == 'http.response.body' and response_chunks is not None and not message.get('more_body', False):
+                    await self.archiver.archive(response_blob_name, b''.join(response_chunks))
+                    response_chunks = None
 
-            return response
+            try:
+                await self.app(scope, receive, send_and_archive)
+            except Exception:
+                if response_started:
+                    raise
+                if error_response is None:
+                    error_response = self._get_error_response(image_upload)
+                if error_response is None:
+                    raise
         except HTTPException as ex:
-            return Response(content=str(ex.detail), status_code=ex.status_code)
+            error_response = Response(content=str(ex.detail), status_code=ex.status_code)
+        except Exception as ex:
+            if response_started:
+                raise
+            logger.error(f"An error has occurred: {ex}")
+            error_response = Response(content="An error has occurred", status_code=500)
+        finally:
+            if image_upload is not None:
+                await image_upload.cancel()
+
+        if error_response is not None:
+            await error_response(scope, receive, send)
+
+    async def _finish_image_upload(self, image_upload: Optional[RequestImageUpload]) -> Optional[Response]:
+        # the image must be stored before the response is sent, the next steps download it
+        if image_upload is None:
+            return None
+
+        error_response = self._get_error_response(image_upload)
+        if error_response is not None:
+            return error_response
+
+        try:
+            if await image_upload.finish():
+                logger.info("Uploaded the request image")
         except Exception as ex:
             logger.error(f"An error has occurred: {ex}")
             return Response(content="An error has occurred", status_code=500)
+        return None
+
+    @staticmethod
+    def _get_error_response(image_upload: Optional[RequestImageUpload]) -> Optional[Response]:
+        if image_upload is None or image_upload.error is None:
+            return None
+        return Response(content=str(image_upload.error.detail), status_code=image_upload.error.status_code)
+
+
+def _is_batch_path(path: str) -> bool:
+    qualifiers = path.split("/")
+    if "api" not in qualifiers:
+        return False
+    method_index = qualifiers.index("api") + 2
+    return method_index < len(qualifiers) and qualifiers[method_index] == BATCH_PATH_SEGMENT
+
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] != 'http.request':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            break
+    return b''.join(chunks)
+
+
+def _replay_body(body: bytes, receive: Receive) -> Receive:
+    body_received = False
+
+    async def replay_receive() -> Message:
+        nonlocal body_received
+        if body_received:
+            return await receive()
+        body_received = True
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    return replay_receive
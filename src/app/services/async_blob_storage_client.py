@@ -0,0 +1,344 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from typing import AsyncIterable, Optional, Union
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceNotFoundError, ResourceNotModifiedError
+from azure.identity.aio import DefaultAzureCredential
+from azure.storage.blob.aio import BlobServiceClient, ContainerClient
+from fastapi.concurrency import run_in_threadpool
+from app.config import Config, config
+from app.models.downloaded_blob import DownloadedBlob
+from app.models.enums.blob_storage_backend_type import BlobStorageBackendType
+from app.services.blob_cache import BlobCache, blob_cache, blob_storage_cache_hits, blob_storage_cache_misses
+from app.services.blob_storage_client import LocalBlobStorageClient
+from logger_config import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class AsyncBlobStorageClient:
+    '''Base class of the async blob storage clients.
+
+    The request handlers and the tracing middleware use an async client, so that a slow blob call
+    never blocks the event loop. The blob names are the paths built by the storage path template builder.
+    '''
+
+    async def init(self):
+        '''Initializes the client, from the event loop that will use it.'''
+        raise NotImplementedError()
+
+    async def close(self):
+        '''Closes the connections of the client.'''
+        raise NotImplementedError()
+
+    async def upload_bytes(self, blob_name: str, data: Union[bytes, str]):
+        '''Uploads the given bytes to the blob, overwriting it if it exists.
+
+        :param blob_name: The name of the blob to upload to
+        :type blob_name: str
+        :param data: The bytes to upload, a string is encoded in UTF-8
+        :type data: Union[bytes, str]
+        '''
+        raise NotImplementedError()
+
+    async def upload_stream(self, blob_name: str, chunks: AsyncIterable[bytes]):
+        '''Uploads the given chunks to the blob as they are produced, overwriting it if it exists.
+        The blob is only overwritten once all the chunks are uploaded, it is left unchanged if the upload
+        is cancelled or fails.
+
+        :param blob_name: The name of the blob to upload to
+        :type blob_name: str
+        :param chunks: The chunks of the blob, of unknown total size
+        :type chunks: AsyncIterable[bytes]
+        '''
+        raise NotImplementedError()
+
+    async def download_bytes(self, blob_name: str) -> bytes:
+        '''Downloads the given blob.
+
+        :param blob_name: The name of the blob to download
+        :type blob_name: str
+        :raises ResourceNotFoundError: If the blob does not exist
+        :return: The bytes of the blob
+        :rtype: bytes
+        '''
+        raise NotImplementedError()
+
+    async def download_bytes_if_exists(self, blob_name: str) -> Optional[bytes]:
+        '''Downloads the given blob if it exists, in a single round-trip.
+
+        :param blob_name: The name of the blob to download
+        :type blob_name: str
+        :return: The bytes of the blob, or None if the blob does not exist
+        :rtype: Optional[bytes]
+        '''
+        blob = await self.download_blob_if_exists(blob_name)
+        return None if blob is None else blob.content
+
+    async def download_blob_if_exists(self, blob_name: str, if_none_match: Optional[str] = None) -> Optional[DownloadedBlob]:
+        '''Downloads the given blob and its ETag if it exists, in a single round-trip.
+
+        :param blob_name: The name of the blob to download
+        :type blob_name: str
+        :param if_none_match: The ETag of a copy of the blob held by the caller, the content is not downloaded if it still matches
+        :type if_none_match: Optional[str]
+        :return: The blob, without content if it was not modified, or None if the blob does not exist
+        :rtype: Optional[DownloadedBlob]
+        '''
+        raise NotImplementedError()
+
+    async def blob_exists(self, blob_name: str) -> bool:
+        '''Checks if the given blob exists.
+
+        :param blob_name: The name of the blob to check
+        :type blob_name: str
+        :return: True if the blob exists, False otherwise
+        :rtype: bool
+        '''
+        raise NotImplementedError()
+
+
+class AzureAsyncBlobStorageClient(AsyncBlobStorageClient):
+    '''Async client of the blob container of the Azure storage account.
+
+    The blob clients share the pipeline of the container client, and its connection pool.
+    Large blobs are transferred in chunks, with up to BLOB_STORAGE_MAX_CONCURRENCY concurrent connections.
+    '''
+    _container_client: Optional[ContainerClient] = None
+
+    def __init__(self, config: Config = config, credential=None):
+        '''Initializes a new instance of the AzureAsyncBlobStorageClient class.
+
+        :param config: The configuration to use
+        :type config: Config
+        :param credential: The async credential to use, DefaultAzureCredential by default
+        :type credential: AsyncTokenCredential
+        '''
+        self._config = config
+        self._credential = credential
+        self._session = None
+
+    def throw_if_not_initialized(self):
+        '''Throws an exception if the blob storage client is not initialized.'''
+        if self._container_client is None:
+            raise Exception('Blob storage client is not initialized')
+
+    async def init(self):
+        # aiohttp is only required by the Azure implementation
+        import aiohttp
+        from azure.core.pipeline.transport import AioHttpTransport
+
+        if self._credential is None:
+            self._credential = DefaultAzureCredential()
+
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self._config.blob_storage_connection_pool_size))
+        blob_service_client = BlobServiceClient(
+            self._config.blob_storage_account_url,
+            self._credential,
+            transport=AioHttpTransport(session=self._session, session_owner=False)
+        )
+        self._container_client = blob_service_client.get_container_client(self._config.blob_storage_container_name)
+
+    async def close(self):
+        if self._container_client is not None:
+            await self._container_client.close()
+            self._container_client = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._credential is not None:
+            await self._credential.close()
+
+    async def upload_bytes(self, blob_name: str, data: Union[bytes, str]):
+        logger.info(f'Uploading {blob_name} to blob storage')
+
+        self.throw_if_not_initialized()
+        blob_client = self._container_client.get_blob_client(blob_name)
+        return await blob_client.upload_blob(data, overwrite=True, max_concurrency=self._config.blob_storage_max_concurrency)
+
+    async def upload_stream(self, blob_name: str, chunks: AsyncIterable[bytes]):
+        logger.info(f'Uploading {blob_name} to blob storage in chunks')
+
+        self.throw_if_not_initialized()
+        blob_client = self._container_client.get_blob_client(blob_name)
+        # the chunks are staged as blocks, the blob is written when the block list is committed
+        return await blob_client.upload_blob(chunks, overwrite=True, max_concurrency=self._config.blob_storage_max_concurrency)
+
+    async def download_bytes(self, blob_name: str) -> bytes:
+        logger.info(f'Downloading {blob_name} from blob storage')
+
+        self.throw_if_not_initialized()
+        blob_client = self._container_client.get_blob_client(blob_name)
+        blob = await blob_client.download_blob(max_concurrency=self._config.blob_storage_max_concurrency)
+
+        return await blob.readall()
+
+    async def download_blob_if_exists(self, blob_name: str, if_none_match: Optional[str] = None) -> Optional[DownloadedBlob]:
+        logger.info(f'Downloading {blob_name} from blob storage if it exists')
+
+        self.throw_if_not_initialized()
+        blob_client = self._container_client.get_blob_client(blob_name)
+        conditions = {} if if_none_match is None else {'etag': if_none_match, 'match_condition': MatchConditions.IfModified}
+        try:
+            blob = await blob_client.download_blob(max_concurrency=self._config.blob_storage_max_concurrency, **conditions)
+        except ResourceNotFoundError:
+            return None
+        except ResourceNotModifiedError:
+            return DownloadedBlob(etag=if_none_match)
+
+        return DownloadedBlob(content=await blob.readall(), etag=blob.properties.etag)
+
+    async def blob_exists(self, blob_name: str) -> bool:
+        logger.info(f'Checking if {blob_name} exists in blob storage')
+
+        self.throw_if_not_initialized()
+        return await self._container_client.get_blob_client(blob_name).exists()
+
+
+class LocalAsyncBlobStorageClient(AsyncBlobStorageClient):
+    '''Async client of the local storage backend, storing the blobs as files under a local directory,
+    for offline runs and tests. The file operations run in the thread pool.
+    '''
+
+    def __init__(self, root_path: str):
+        '''Initializes a new instance of the LocalAsyncBlobStorageClient class.
+
+        :param root_path: The directory holding the blobs
+        :type root_path: str
+        '''
+        self._client = LocalBlobStorageClient(root_path)
+
+    async def init(self):
+        await run_in_threadpool(self._client.init)
+
+    async def close(self):
+        pass
+
+    async def upload_bytes(self, blob_name: str, data: Union[bytes, str]):
+        await run_in_threadpool(self._client.upload_bytes, blob_name, data)
+
+    async def upload_stream(self, blob_name: str, chunks: AsyncIterable[bytes]):
+        upload = await run_in_threadpool(self._client.create_upload, blob_name)
+        try:
+            async for chunk in chunks:
+                await run_in_threadpool(upload.write, chunk)
+            await run_in_threadpool(upload.commit)
+        except BaseException:
+            # not run in the thread pool, the task may be cancelled
+            upload.abort()
+            raise
+
+    async def download_bytes(self, blob_name: str) -> bytes:
+        return await run_in_threadpool(self._client.download_bytes, blob_name)
+
+    async def download_blob_if_exists(self, blob_name: str, if_none_match: Optional[str] = None) -> Optional[DownloadedBlob]:
+        return await run_in_threadpool(self._client.download_blob_if_exists, blob_name, if_none_match)
+
+    async def blob_exists(self, blob_name: str) -> bool:
+        return await run_in_threadpool(self._client.blob_exists, blob_name)
+
+
+class CachedAsyncBlobStorageClient(AsyncBlobStorageClient):
+    '''Async client serving the downloads of another client through the blob cache.
+
+    The uploads go to the other client and invalidate the cached blob. The blobs that do not exist
+    are not cached, a blob is available as soon as it is uploaded.
+    '''
+
+    def __init__(self, client: AsyncBlobStorageClient, cache: BlobCache = blob_cache):
+        '''Initializes a new instance of the CachedAsyncBlobStorageClient class.
+
+        :param client: The client downloading the blobs that are not cached
+        :type client: AsyncBlobStorageClient
+        :param cache: The blob cache
+        :type cache: BlobCache
+        '''
+        self._client = client
+        self._cache = cache
+
+    async def init(self):
+        await self._client.init()
+
+    async def close(self):
+        await self._client.close()
+
+    async def upload_bytes(self, blob_name: str, data: Union[bytes, str]):
+        try:
+            return await self._client.upload_bytes(blob_name, data)
+        finally:
+            self._cache.invalidate(blob_name)
+
+    async def upload_stream(self, blob_name: str, chunks: AsyncIterable[bytes]):
+        try:
+            return await self._client.upload_stream(blob_name, chunks)
+        finally:
+            self._cache.invalidate(blob_name)
+
+    async def download_bytes(self, blob_name: str) -> bytes:
+        blob = await self.download_blob_if_exists(blob_name)
+        if blob is None:
+            raise ResourceNotFoundError(f'The blob {blob_name} does not exist')
+        return blob.content
+
+    async def download_blob_if_exists(self, blob_name: str, if_none_match: Optional[str] = None) -> Optional[DownloadedBlob]:
+        entry = self._cache.get(blob_name)
+        if entry is not None and self._cache.is_fresh(entry):
+            blob_storage_cache_hits.inc()
+            return self._match(entry.blob, if_none_match)
+
+        generation = self._cache.generation(blob_name)
+        # a cached blob is validated with its ETag, its content is only downloaded again if it was modified
+        blob = await self._client.download_blob_if_exists(blob_name, if_none_match if entry is None else entry.blob.etag)
+        if blob is None:
+            blob_storage_cache_misses.inc()
+            self._cache.invalidate(blob_name)
+            return None
+
+        self._cache.put(blob_name, blob, generation)
+        if entry is not None and not blob.modified:
+            blob_storage_cache_hits.inc()
+            return self._match(entry.blob, if_none_match)
+
+        blob_storage_cache_misses.inc()
+        return blob
+
+    async def blob_exists(self, blob_name: str) -> bool:
+        entry = self._cache.get(blob_name)
+        if entry is not None and self._cache.is_fresh(entry):
+            return True
+        return await self._client.blob_exists(blob_name)
+
+    @staticmethod
+    def _match(blob: DownloadedBlob, if_none_match: Optional[str]) -> DownloadedBlob:
+        if if_none_match is not None and blob.etag == if_none_match:
+            return DownloadedBlob(etag=blob.etag)
+        return blob
+
+
+def create_async_blob_storage_client(config: Config = config, cache: Optional[BlobCache] = None) -> AsyncBlobStorageClient:
+    '''Creates the async blob storage client of the backend selected in the configuration,
+    behind the blob cache when it is enabled.
+
+    :param config: The configuration to use
+    :type config: Config
+    :param cache: The blob cache, a new cache with the configured size and TTL by default
+    :type cache: Optional[BlobCache]
+    :return: The async blob storage client, to be initialized with `init`
+    :rtype: AsyncBlobStorageClient
+    '''
+    if config.blob_storage_backend == BlobStorageBackendType.local:
+        client = LocalAsyncBlobStorageClient(config.blob_storage_local_path)
+    else:
+        client = AzureAsyncBlobStorageClient(config)
+
+    if config.blob_storage_cache_max_bytes > 0:
+        if cache is None:
+            cache = BlobCache(config.blob_storage_cache_max_bytes, config.blob_storage_cache_ttl_seconds)
+        return CachedAsyncBlobStorageClient(client, cache)
+    return client
+
+
+# the blob cache is shared with the sync blob storage client, which invalidates the blobs it uploads
+async_blob_storage_client = create_async_blob_storage_client(config, blob_cache)
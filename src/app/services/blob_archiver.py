@@ -0,0 +1,98 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from prometheus_client import Counter, Gauge
+from typing import List, Optional
+import asyncio
+from app.config import Config, config
+from app.services.async_blob_storage_client import AsyncBlobStorageClient, async_blob_storage_client
+from logger_config import get_logger
+
+
+logger = get_logger(__name__)
+
+blob_archive_queued_blobs = Gauge(
+    'blob_archive_queued_blobs',
+    'Number of request and response bodies waiting to be archived to the blob storage')
+
+blob_archive_failures = Counter(
+    'blob_archive_failures',
+    'Number of request and response bodies that could not be archived to the blob storage')
+
+
+class BlobArchiver:
+    '''Archives the request and response bodies to the blob storage from background tasks, off the request path.
+
+    The bodies are queued and uploaded by TRACING_ARCHIVE_WORKERS_COUNT tasks of the event loop. Queuing a body
+    waits while TRACING_ARCHIVE_QUEUE_MAX_SIZE bodies are waiting, so that a slow storage slows the requests down
+    instead of filling the memory. An upload error is logged, it does not fail the request.
+    '''
+
+    def __init__(self, blob_storage_client: AsyncBlobStorageClient, config: Config = config):
+        '''Initializes a new instance of the BlobArchiver class.
+
+        :param blob_storage_client: The client uploading the bodies
+        :type blob_storage_client: AsyncBlobStorageClient
+        :param config: The configuration holding the queue size and workers count
+        :type config: Config
+        '''
+        self._blob_storage_client = blob_storage_client
+        self._config = config
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self):
+        '''Starts the workers, from the event loop that will archive the bodies.'''
+        if self._queue is not None:
+            return
+
+        self._queue = asyncio.Queue(maxsize=self._config.tracing_archive_queue_max_size)
+        self._workers = [asyncio.ensure_future(self._work()) for _ in range(max(self._config.tracing_archive_workers_count, 1))]
+
+    async def archive(self, blob_name: str, data: bytes):
+        '''Queues the body to be uploaded to the blob, starting the workers if needed.
+
+        :param blob_name: The name of the blob to upload to
+        :type blob_name: str
+        :param data: The body to upload
+        :type data: bytes
+        '''
+        await self.start()
+        blob_archive_queued_blobs.inc()
+        await self._queue.put((blob_name, data))
+
+    async def flush(self):
+        '''Waits until the queued bodies are uploaded.'''
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self):
+        '''Uploads the queued bodies and stops the workers.'''
+        if self._queue is None:
+            return
+
+        await self.flush()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._queue = None
+        self._workers = []
+
+    async def _work(self):
+        while True:
+            blob_name, data = await self._queue.get()
+            try:
+                await self._upload(blob_name, data)
+            finally:
+                blob_archive_queued_blobs.dec()
+                self._queue.task_done()
+
+    async def _upload(self, blob_name: str, data: bytes):
+        try:
+            await self._blob_storage_client.upload_bytes(blob_name, data)
+            logger.info(f"Uploaded file to: {blob_name}")
+        except Exception as ex:
+            blob_archive_failures.inc()
+            logger.error(f"Failed to upload the archived body to {blob_name}: {ex}")
+
+
+blob_archiver = BlobArchiver(async_blob_storage_client)
@@ -0,0 +1,152 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from collections import OrderedDict
+from prometheus_client import Counter, Gauge
+from typing import Callable, Optional
+import threading
+import time
+from app.config import config
+from app.models.downloaded_blob import DownloadedBlob
+
+
+blob_storage_cache_hits = Counter(
+    'blob_storage_cache_hits',
+    'Number of blob downloads served from the blob storage cache, without downloading the blob')
+
+blob_storage_cache_misses = Counter(
+    'blob_storage_cache_misses',
+    'Number of blob downloads that were not served from the blob storage cache')
+
+blob_storage_cache_bytes = Gauge(
+    'blob_storage_cache_bytes',
+    'Size of the blobs held by the blob storage cache')
+
+
+class BlobCacheEntry:
+    '''A blob held by the blob cache.'''
+
+    def __init__(self, blob: DownloadedBlob, validated_at: float):
+        self.blob = blob
+        self.validated_at = validated_at
+        self.size = len(blob.content)
+
+
+class BlobCache:
+    '''Bounded LRU cache of the downloaded blobs, keyed by blob name.
+
+    A cached blob is served without a storage round-trip for `ttl_seconds` after it was downloaded or
+    validated, then it is validated again with its ETag. The least recently used blobs are evicted
+    when the cached blobs exceed `max_bytes`.
+
+    The blobs uploaded by the process are invalidated. A blob downloaded while the same blob was uploaded
+    is not cached, since it may hold the content from before the upload.
+    '''
+
+    def __init__(self, max_bytes: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        '''Initializes a new instance of the BlobCache class.
+
+        :param max_bytes: The maximum size of the cached blobs, 0 disables the cache
+        :type max_bytes: int
+        :param ttl_seconds: The time a blob is served without being validated
+        :type ttl_seconds: float
+        :param clock: The clock of the cache, in seconds
+        :type clock: Callable[[], float]
+        '''
+        self._max_bytes = max_bytes
+        self._ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, BlobCacheEntry] = OrderedDict()
+        self._size = 0
+        self._invalidations: dict[str, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_bytes > 0
+
+    def generation(self, blob_name: str) -> int:
+        '''Gets the number of invalidations of the blob, to be read before a download and given back to `put`.
+
+        :param blob_name: The name of the blob
+        :type blob_name: str
+        :return: The number of invalidations of the blob
+        :rtype: int
+        '''
+        with self._lock:
+            return self._invalidations.get(blob_name, 0)
+
+    def get(self, blob_name: str) -> Optional[BlobCacheEntry]:
+        '''Gets the cached blob and marks it as recently used.
+
+        :param blob_name: The name of the blob
+        :type blob_name: str
+        :return: The cache entry, or None if the blob is not cached
+        :rtype: Optional[BlobCacheEntry]
+        '''
+        with self._lock:
+            entry = self._entries.get(blob_name)
+            if entry is not None:
+                self._entries.move_to_end(blob_name)
+            return entry
+
+    def is_fresh(self, entry: BlobCacheEntry) -> bool:
+        '''Checks if the cached blob can be served without being validated.
+
+        :param entry: The cache entry
+        :type entry: BlobCacheEntry
+        :return: True if the blob was validated less than `ttl_seconds` ago
+        :rtype: bool
+        '''
+        return self._clock() - entry.validated_at < self._ttl_seconds
+
+    def put(self, blob_name: str, blob: DownloadedBlob, generation: int):
+        '''Caches a downloaded blob, or marks the cached blob as validated if the blob was not modified.
+
+        :param blob_name: The name of the blob
+        :type blob_name: str
+        :param blob: The downloaded blob
+        :type blob: DownloadedBlob
+        :param generation: The generation of the blob read before the download
+        :type generation: int
+        '''
+        with self._lock:
+            if generation != self._invalidations.get(blob_name, 0):
+                return
+
+            if not blob.modified:
+                entry = self._entries.get(blob_name)
+                if entry is not None and entry.blob.etag == blob.etag:
+                    entry.validated_at = self._clock()
+                return
+
+            self._remove(blob_name)
+            entry = BlobCacheEntry(blob, self._clock())
+            if entry.size > self._max_bytes:
+                return
+
+            self._entries[blob_name] = entry
+            self._size += entry.size
+            while self._size > self._max_bytes:
+                self._remove(next(iter(self._entries)))
+
+        blob_storage_cache_bytes.set(self._size)
+
+    def invalidate(self, blob_name: str):
+        '''Removes the blob from the cache, after it was uploaded or deleted.
+
+        :param blob_name: The name of the blob
+        :type blob_name: str
+        '''
+        with self._lock:
+            self._invalidations[blob_name] = self._invalidations.get(blob_name, 0) + 1
+            self._remove(blob_name)
+
+        blob_storage_cache_bytes.set(self._size)
+
+    def _remove(self, blob_name: str):
+        entry = self._entries.pop(blob_name, None)
+        if entry is not None:
+            self._size -= entry.size
+
+
+blob_cache = BlobCache(config.blob_storage_cache_max_bytes, config.blob_storage_cache_ttl_seconds)
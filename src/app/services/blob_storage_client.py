@@ -2,16 +2,101 @@
 # Licensed under the MIT license.
 from app.config import Config, config
 from typing import Optional
+from azure.core.exceptions import ResourceNotFoundError
 from azure.storage.blob import BlobServiceClient, ContainerClient
 from azure.identity import DefaultAzureCredential
 from typing import Union
+import mmap
+import os
+import tempfile
+from app.models.downloaded_blob import DownloadedBlob
+from app.models.enums.blob_storage_backend_type import BlobStorageBackendType
+from app.services.blob_cache import blob_cache
+from app.services.job_queue.job_process_pool import call_in_parent, is_job_worker_process
 from logger_config import get_logger
 
 
 logger = get_logger(__name__)
 
 
-class BlobStorageClient:
+def _invalidate_cached_blob(blob_name: str):
+    blob_cache.invalidate(blob_name)
+    if is_job_worker_process():
+        # the request handlers serve the blobs from the cache of the app process, it is invalidated
+        # before the job status updates sent after the upload
+        call_in_parent(_invalidate_cached_blob, blob_name)
+
+
+class BlobStorageBackend:
+    '''Base class of the storage backends of the blobs, keyed by the paths built by the storage path template builder.'''
+
+    @property
+    def initialized(self) -> bool:
+        '''True once `init` was called.'''
+        raise NotImplementedError()
+
+    def init(self):
+        '''Initializes the storage backend.'''
+        raise NotImplementedError()
+
+    def upload_bytes(self, blob_name: str, image_bytes: Union[bytes, str]):
+        '''Uploads the given bytes to the blob, overwriting it if it exists.
+
+        :param blob_name: The name of the blob to upload to
+        :type blob_name: str
+        :param image_bytes: The bytes to upload, a string is encoded in UTF-8
+        :type image_bytes: Union[bytes, str]
+        '''
+        raise NotImplementedError()
+
+    def download_bytes(self, blob_name: str) -> bytes:
+        '''Downloads the given blob.
+
+        :param blob_name: The name of the blob to download
+        :type blob_name: str
+        :raises ResourceNotFoundError: If the blob does not exist
+        :return: The bytes of the blob
+        :rtype: bytes
+        '''
+        raise NotImplementedError()
+
+    def download_bytes_if_exists(self, blob_name: str) -> Optional[bytes]:
+        '''Downloads the given blob if it exists, in a single round-trip.
+
+        :param blob_name: The name of the blob to download
+        :type blob_name: str
+        :return: The bytes of the blob, or None if the blob does not exist
+        :rtype: Optional[bytes]
+        '''
+        try:
+            return self.download_bytes(blob_name)
+        except ResourceNotFoundError:
+            return None
+
+    def download_image_buffer(self, blob_name: str) -> Union[bytes, mmap.mmap]:
+        '''Downloads the given encoded image, to be decoded from `np.frombuffer`.
+
+        :param blob_name: The name of the image blob
+        :type blob_name: str
+        :raises ResourceNotFoundError: If the blob does not exist
+        :return: The bytes of the image, or a read-only buffer of the image that is not copied in memory
+        :rtype: Union[bytes, mmap.mmap]
+        '''
+        return self.download_bytes(blob_name)
+
+    def blob_exists(self, blob_name: str) -> bool:
+        '''Checks if the given blob exists.
+
+        :param blob_name: The name of the blob to check
+        :type blob_name: str
+        :return: True if the blob exists, False otherwise
+        :rtype: bool
+        '''
+        raise NotImplementedError()
+
+
+class BlobStorageClient(BlobStorageBackend):
+    '''Storage backend of the blob container of the Azure storage account.'''
     _container_client: Optional[ContainerClient] = None
 
     def __init__(self, config: Config = config, credential=DefaultAzureCredential()):
@@ -42,7 +127,11 @@ class BlobStorageClient:
 
         self.throw_if_not_initialized()
         blob_client = self._container_client.get_blob_client(blob_name)
-        return blob_client.upload_blob(image_bytes, overwrite=True)
+        try:
+            return blob_client.upload_blob(image_bytes, overwrite=True)
+        finally:
+            # the blob downloaded by the request handlers is not served from the cache anymore
+            _invalidate_cached_blob(blob_name)
 
     def download_bytes(self, blob_name: str) -> bytes:
         '''Downloads the given blob from the blob storage account.
@@ -73,6 +162,10 @@ class BlobStorageClient:
         self.throw_if_not_initialized()
         return self._container_client.get_blob_client(blob_name).exists()
 
+    @property
+    def initialized(self) -> bool:
+        return self._container_client is not None
+
     def init(self):
         '''Initializes the blob storage client.'''
         blob_service_client = BlobServiceClient(
@@ -82,4 +175,171 @@ class BlobStorageClient:
         self._container_client = blob_service_client.get_container_client(self._config.blob_storage_container_name)
 
 
-blob_storage_client = BlobStorageClient(config, DefaultAzureCredential())
+class LocalBlobUpload:
+    '''Upload of a blob of the local storage backend, written in chunks to a temporary file
+    that replaces the blob file when the upload is committed.'''
+
+    def __init__(self, file_path: str):
+        '''Initializes a new instance of the LocalBlobUpload class.
+
+        :param file_path: The path of the file of the blob
+        :type file_path: str
+        '''
+        self._file_path = file_path
+        directory = os.path.dirname(file_path)
+        os.makedirs(directory, exist_ok=True)
+        file_descriptor, self._temporary_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        self._file = os.fdopen(file_descriptor, 'wb')
+
+    def write(self, data: bytes):
+        '''Appends the given bytes to the blob.
+
+        :param data: The bytes to append
+        :type data: bytes
+        '''
+        self._file.write(data)
+
+    def commit(self):
+        '''Replaces the blob file with the uploaded file.'''
+        self._file.close()
+        os.replace(self._temporary_path, self._file_path)
+
+    def abort(self):
+        '''Removes the uploaded file, leaving the blob unchanged.'''
+        self._file.close()
+        if os.path.exists(self._temporary_path):
+            os.remove(self._temporary_path)
+
+
+class LocalBlobStorageClient(BlobStorageBackend):
+    '''Storage backend keeping the blobs as files under a local directory, with the same directory structure
+    as the blob container, for local runs of the CLIs and deployments without a storage account.
+
+    A blob is written to a temporary file that replaces the blob file, so that a concurrent download never
+    reads a partially written blob. The images are read through a memory map, so they are decoded from the
+    page cache without being copied into Python bytes. The ETag of a blob is derived from the inode,
+    modification time and size of its file.
+    '''
+
+    def __init__(self, root_path: str):
+        '''Initializes a new instance of the LocalBlobStorageClient class.
+
+        :param root_path: The directory holding the blobs
+        :type root_path: str
+        '''
+        self._root_path = os.path.abspath(root_path)
+        self._initialized = False
+
+    @property
+    def initialized(self) -> bool:
+        return self._initialized
+
+    def init(self):
+        os.makedirs(self._root_path, exist_ok=True)
+        self._initialized = True
+
+    def get_file_path(self, blob_name: str) -> str:
+        '''Gets the path of the file of the blob.
+
+        :param blob_name: The name of the blob
+        :type blob_name: str
+        :raises ValueError: If the blob name is outside of the blob storage directory
+        :return: The absolute path of the file
+        :rtype: str
+        '''
+        file_path = os.path.abspath(os.path.join(self._root_path, blob_name))
+        if os.path.commonpath([self._root_path, file_path]) != self._root_path or file_path == self._root_path:
+            raise ValueError(f'The blob name {blob_name} is outside of the blob storage directory')
+        return file_path
+
+    def upload_bytes(self, blob_name: str, image_bytes: Union[bytes, str]):
+        logger.info(f'Uploading {blob_name} to local blob storage')
+
+        if isinstance(image_bytes, str):
+            image_bytes = image_bytes.encode('utf-8')
+
+        try:
+            upload = self.create_upload(blob_name)
+            try:
+                upload.write(image_bytes)
+                upload.commit()
+            except BaseException:
+                upload.abort()
+                raise
+        finally:
+            _invalidate_cached_blob(blob_name)
+
+    def create_upload(self, blob_name: str) -> 'LocalBlobUpload':
+        '''Starts an upload of the given blob written in chunks.
+
+        :param blob_name: The name of the blob to upload to
+        :type blob_name: str
+        :raises ValueError: If the blob name is outside of the blob storage directory
+        :return: The upload, to be committed or aborted
+        :rtype: LocalBlobUpload
+        '''
+        return LocalBlobUpload(self.get_file_path(blob_name))
+
+    def download_bytes(self, blob_name: str) -> bytes:
+        logger.info(f'Downloading {blob_name} from local blob storage')
+
+        blob = self.download_blob_if_exists(blob_name)
+        if blob is None:
+            raise ResourceNotFoundError(f'The blob {blob_name} does not exist')
+        return blob.content
+
+    def download_blob_if_exists(self, blob_name: str, if_none_match: Optional[str] = None) -> Optional[DownloadedBlob]:
+        '''Reads the given blob and its ETag if it exists.
+
+        :param blob_name: The name of the blob to read
+        :type blob_name: str
+        :param if_none_match: The ETag of a copy of the blob held by the caller, the content is not read if it still matches
+        :type if_none_match: Optional[str]
+        :return: The blob, without content if it was not modified, or None if the blob does not exist
+        :rtype: Optional[DownloadedBlob]
+        '''
+        try:
+            file = open(self.get_file_path(blob_name), 'rb')
+        except (FileNotFoundError, IsADirectoryError):
+            return None
+
+        with file:
+            # the ETag is read from the opened file, a blob replaced concurrently is a different file
+            file_stat = os.fstat(file.fileno())
+            etag = f'"{file_stat.st_ino:x}-{file_stat.st_mtime_ns:x}-{file_stat.st_size:x}"'
+            if etag == if_none_match:
+                return DownloadedBlob(etag=etag)
+            return DownloadedBlob(content=file.read(), etag=etag)
+
+    def download_image_buffer(self, blob_name: str) -> Union[bytes, mmap.mmap]:
+        logger.info(f'Mapping {blob_name} from local blob storage')
+
+        try:
+            with open(self.get_file_path(blob_name), 'rb') as file:
+                if os.fstat(file.fileno()).st_size == 0:
+                    return b''
+                # the map stays valid after the file is closed, and after the blob is replaced by an upload
+                return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, IsADirectoryError):
+            raise ResourceNotFoundError(f'The blob {blob_name} does not exist')
+
+    def blob_exists(self, blob_name: str) -> bool:
+        logger.info(f'Checking if {blob_name} exists in local blob storage')
+
+        return os.path.isfile(self.get_file_path(blob_name))
+
+
+def create_blob_storage_client(config: Config = config) -> BlobStorageBackend:
+    '''Creates the storage backend selected in the configuration.
+
+    :param config: The configuration to use
+    :type config: Config
+    :return: The storage backend, to be initialized with `init`
+    :rtype: BlobStorageBackend
+    '''
+    if config.blob_storage_backend == BlobStorageBackendType.local:
+        return LocalBlobStorageClient(config.blob_storage_local_path)
+    return BlobStorageClient(config, DefaultAzureCredential())
+
+
+blob_storage_client = create_blob_storage_client(config)
@@ -0,0 +1,115 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker
+from typing import Callable, Iterable, Optional
+import concurrent.futures
+import os
+import threading
+from app.config import Config, config
+from app.utils.cpu_utils import get_available_cpu_count
+from logger_config import get_logger
+
+
+logger = get_logger(__name__)
+
+
+def get_candidate_matching_workers_count(config: Config = config) -> int:
+    '''Gets the number of candidate matching worker processes.
+
+    Uses config.workers_count_for_data_batch when set, otherwise the number of CPUs available
+    to the app (CPU affinity and cgroup CPU quota) minus one, so that the app process is not
+    starved of CPU resources.
+
+    :param config: The configuration to use
+    :type config: Config
+    :return: The number of worker processes, at least 1
+    :rtype: int
+    '''
+    if config.workers_count_for_data_batch:
+        return config.workers_count_for_data_batch
+
+    return max(get_available_cpu_count() - 1, 1)
+
+
+def _warm_up():
+    '''No-op task used to start the worker processes ahead of the first job.'''
+    return None
+
+
+class CandidateMatchingPool:
+    '''Long-lived pool of worker processes for the line connection candidate matching.
+
+    The pool is started once by the app and reused for every job, so the worker start-up cost
+    is not paid per sheet and the workers can keep state (e.g. the spatial index of the sheet
+    being processed) between the tasks of the same job.
+    '''
+    _executor: Optional[ProcessPoolExecutor] = None
+
+    def __init__(self, config: Config = config):
+        '''Initializes a new instance of the CandidateMatchingPool class.
+
+        :param config: The configuration to use
+        :type config: Config
+        '''
+        self._config = config
+        self._lock = threading.Lock()
+        # a forked process (e.g. a job worker process) can't use the worker processes of its parent,
+        # it starts its own pool on first use
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def init(self):
+        '''Starts the worker processes if the pool is not running yet.'''
+        with self._lock:
+            if self._executor is not None:
+                return
+
+            max_workers = get_candidate_matching_workers_count(self._config)
+            # start the resource tracker before forking so that the workers share it with the app process,
+            # otherwise each worker would track the shared memory blocks it attaches to and warn about them on exit
+            resource_tracker.ensure_running()
+            self._executor = ProcessPoolExecutor(max_workers=max_workers)
+            wait([self._executor.submit(_warm_up) for _ in range(max_workers)])
+            logger.info(f'Started candidate matching pool with {max_workers} worker processes')
+
+    def shutdown(self):
+        '''Stops the worker processes.'''
+        with self._lock:
+            if self._executor is None:
+                return
+
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            logger.info('Stopped candidate matching pool')
+
+    def run(self, func: Callable, tasks: Iterable[tuple]) -> list:
+        '''Runs func for each task arguments tuple on the worker processes.
+
+        The pool is started on first use if the app did not start it. If a worker process dies,
+        the pool is discarded so that the next call starts a new one, and the error is raised.
+
+        :param func: The function to run, must be picklable
+        :type func: Callable
+        :param tasks: The arguments of each call to func
+        :type tasks: Iterable[tuple]
+        :return: The results, in completion order
+        :rtype: list
+        '''
+        self.init()
+        executor = self._executor
+
+        futures: list[Future] = [executor.submit(func, *args) for args in tasks]
+        try:
+            return [future.result() for future in concurrent.futures.as_completed(futures)]
+        except BrokenProcessPool:
+            logger.error('Candidate matching pool is broken, it will be restarted on next use')
+            self.shutdown()
+            raise
+
+
+candidate_matching_pool = CandidateMatchingPool()
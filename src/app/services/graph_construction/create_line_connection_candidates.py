@@ -1,20 +1,36 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
+import math
 import time
+from collections import OrderedDict
 from app.models.line_detection.line_segment import LineSegment
 from app.models.text_detection.symbol_and_text_associated import SymbolAndTextAssociated
 from app.models.text_detection.text_recognized import TextRecognized
+from app.models.bounding_box import BoundingBox
 from app.models.enums.graph_node_type import GraphNodeType
 from app.models.graph_construction.extended_line_segment import ExtendedLineSegment
 from app.models.graph_construction.connection_candidate import ConnectionCandidate
+from app.models.enums.candidate_matching_engine import CandidateMatchingEngine
 from app.config import config
+from app.services.graph_construction.candidate_matching_pool import candidate_matching_pool, get_candidate_matching_workers_count
 from app.utils import shapely_utils
+from app.utils.shared_memory_utils import copy_arrays_to_shared_memory, read_arrays_from_shared_memory
 from logger_config import get_logger
+from prometheus_client import Histogram
 from shapely import Point
-import concurrent.futures
+from typing import Optional
+import numpy as np
+import shapely
 
 logger = get_logger(__name__)
 
+line_candidate_matching_seconds = Histogram(
+    'line_candidate_matching_seconds',
+    'Time spent in the line connection candidate matching by phase (serialization, index_build, compute)',
+    ['phase'])
+
+DISTANCE_FILTER_RELATIVE_TOLERANCE = 1e-9
+
 
 def create_line_connection_candidates(
     line_segments: list[LineSegment],
@@ -42,46 +58,50 @@ def create_line_connection_candidates(
     logger.debug('Starting candidate matching on line segments from process file...')
     time_start = time.time()
     logger.info(f'Number of line segments: {len(line_segments)}')
-    # data batch size calculation based on the number of worker processes
-    batch_size = max(len(line_segments) // config.workers_count_for_data_batch, 1)
-    logger.info(f'Number of batches/processes: {batch_size}')
 
-    # Divide line segments into batches so that the batches can be processed in parallel
-    logger.info(f'Batch size for each process: {batch_size}')
-    lines_batch_data = list(batch(line_segments, batch_size))
+    # the spatial index engine only evaluates the elements whose geometry intersects the buffered
+    # extended line, the brute force engine evaluates every element and is kept as the reference
+    logger.info(f'Candidate matching engine: {config.graph_candidate_matching_engine}')
 
-    # max workers will depend on the cpu cores available, its advisable to use lesser workers
-    # than cpu cores so that current process is not starved of cpu resources
-    # and can perform its task efficiently. Each process can use a core depending upon
-    # the number of computations it has to perform. Each process will have its own memory space
-    # and will not share memory with other processes
-    max_workers_count = config.workers_count_for_data_batch
-
-    # Create a ProcessPoolExecutor
-    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers_count) as executor:
-        # Submit the tasks to the executor so that they get executed in parallel
-        futures = []
-        for batch_data_index_list in lines_batch_data:
-            future = executor.submit(process_line_segments,
-                                     batch_data_index_list,
-                                     line_segments,
-                                     extended_lines,
-                                     text_and_symbols_associated_list,
-                                     text_results,
-                                     graph_line_buffer,
-                                     graph_distance_threshold_for_symbols,
-                                     graph_distance_threshold_for_text,
-                                     graph_distance_threshold_for_lines)
-            futures.append(future)
-
-        # Collect the results from futures
-        line_connection_candidates = {}
-        for future in concurrent.futures.as_completed(futures):
-            # data available in the future object is in the same order as the futures list
-            # data is returned when the process is completed
-            results = future.result()
-            for source_line_index, result in results:
-                line_connection_candidates[str(source_line_index)] = result
+    workers_count, batch_size = plan_line_segments_batches(len(line_segments),
+                                                           get_candidate_matching_workers_count(config),
+                                                           config.graph_candidate_matching_min_lines_per_worker,
+                                                           config.graph_candidate_matching_chunks_per_worker)
+    lines_batch_data = list(batch(line_segments, batch_size))
+    strategy = 'in_process' if workers_count == 1 else 'pool'
+    logger.info(f'Candidate matching strategy: {strategy}, workers: {workers_count}, '
+                f'batches: {len(lines_batch_data)}, batch size: {batch_size}')
+
+    thresholds = (graph_distance_threshold_for_symbols, graph_distance_threshold_for_text, graph_distance_threshold_for_lines)
+    if strategy == 'in_process':
+        # the sheet is too small for the work to be worth dispatching to the worker processes
+        if config.graph_candidate_matching_engine == CandidateMatchingEngine.spatial_index:
+            process_line_segments_func = process_line_segments_with_spatial_index
+        else:
+            process_line_segments_func = process_line_segments
+        results = [process_line_segments_func(range(len(line_segments)),
+                                              line_segments,
+                                              extended_lines,
+                                              text_and_symbols_associated_list,
+                                              text_results,
+                                              graph_line_buffer,
+                                              *thresholds)]
+    else:
+        # the batches are processed by the long-lived worker processes of the candidate matching pool,
+        # many small batches are queued so that the workers that finish early pick up the remaining ones
+        results = process_line_segments_in_pool(config.graph_candidate_matching_engine,
+                                                lines_batch_data,
+                                                line_segments,
+                                                extended_lines,
+                                                text_and_symbols_associated_list,
+                                                text_results,
+                                                graph_line_buffer,
+                                                *thresholds)
+
+    # Collect the results of the batches
+    for batch_results in results:
+        for source_line_index, result in batch_results:
+            line_connection_candidates[str(source_line_index)] = result
 
     logger.info(f'***Time taken for candidate matching on line segments***: {time.time() - time_start} seconds')
     return line_connection_candidates
@@ -124,6 +144,304 @@ def process_line_segments(batch_data_index_list,
     return matched_candidates
 
 
+def process_line_segments_with_spatial_index(batch_data_index_list,
+                                             line_segments,
+                                             extended_lines,
+                                             text_and_symbols_associated_list,
+                                             text_results,
+                                             graph_line_buffer,
+                                             graph_distance_threshold_for_symbols,
+                                             graph_distance_threshold_for_text,
+                                             graph_distance_threshold_for_lines):
+    '''
+    Iterate through batched line segments and find connection candidates in a single process
+    using the spatial index engine, see LineConnectionSpatialIndex.
+    :param batch_data_index_list: Batched line segments
+    :param line_segments: Line segments detected in image
+    :param extended_lines: Extended line segments
+    :param text_and_symbols_associated_list: Text and symbols associated list
+    :param text_results: Text results
+    '''
+    for item in text_and_symbols_associated_list + text_results:
+        validate_bounding_box(item)
+
+    spatial_index = LineConnectionSpatialIndex(shapely_utils.lines_to_coordinates(line_segments),
+                                               shapely_utils.lines_to_coordinates(extended_lines),
+                                               shapely_utils.bounding_boxes_to_coordinates(text_and_symbols_associated_list),
+                                               shapely_utils.bounding_boxes_to_coordinates(text_results),
+                                               graph_line_buffer)
+    symbol_node_ids = [str(symbol.id) for symbol in text_and_symbols_associated_list]
+
+    matched_candidates = [(0, None)] * len(batch_data_index_list)
+    logger.debug(f'***Processing line segments with spatial index start: {batch_data_index_list}')
+    for i, source_line_index in enumerate(batch_data_index_list):
+        result = spatial_index.find_connection_candidates(source_line_index,
+                                                          symbol_node_ids,
+                                                          graph_distance_threshold_for_symbols,
+                                                          graph_distance_threshold_for_text,
+                                                          graph_distance_threshold_for_lines)
+        matched_candidates[i] = (source_line_index, result)
+    logger.debug(f'***Processing line segments with spatial index end: {batch_data_index_list}')
+    return matched_candidates
+
+
+def process_line_segments_in_pool(engine,
+                                  lines_batch_data,
+                                  line_segments,
+                                  extended_lines,
+                                  text_and_symbols_associated_list,
+                                  text_results,
+                                  graph_line_buffer,
+                                  graph_distance_threshold_for_symbols,
+                                  graph_distance_threshold_for_text,
+                                  graph_distance_threshold_for_lines) -> list:
+    '''
+    Finds the connection candidates of the batched line segments on the candidate matching pool.
+    The coordinates of the sheet are copied once into shared memory and the tasks only carry
+    the range of line segments to process, the symbol ids are resolved here.
+    :param engine: The candidate matching engine run by the workers
+    :param lines_batch_data: Batched line segments, each batch is a contiguous range of indexes
+    :param line_segments: Line segments detected in image
+    :param extended_lines: Extended line segments
+    :param text_and_symbols_associated_list: Text and symbols associated list
+    :param text_results: Text results
+    :return: The matched candidates of each batch
+    '''
+    for item in text_and_symbols_associated_list + text_results:
+        validate_bounding_box(item)
+
+    time_start = time.perf_counter()
+    shm, layout = copy_arrays_to_shared_memory({
+        'line_segments': shapely_utils.lines_to_coordinates(line_segments),
+        'extended_lines': shapely_utils.lines_to_coordinates(extended_lines),
+        'symbols': shapely_utils.bounding_boxes_to_coordinates(text_and_symbols_associated_list),
+        'text': shapely_utils.bounding_boxes_to_coordinates(text_results)
+    })
+    line_candidate_matching_seconds.labels('serialization').observe(time.perf_counter() - time_start)
+
+    try:
+        results = candidate_matching_pool.run(process_line_segments_from_shared_memory, [
+            (shm.name,
+             layout,
+             batch_data_index_list[0],
+             batch_data_index_list[-1] + 1,
+             engine,
+             max(config.job_queue_consumers_count, 1),
+             graph_line_buffer,
+             graph_distance_threshold_for_symbols,
+             graph_distance_threshold_for_text,
+             graph_distance_threshold_for_lines) for batch_data_index_list in lines_batch_data])
+    finally:
+        shm.close()
+        shm.unlink()
+
+    # the workers only know the symbol indexes
+    symbol_node_ids = [str(symbol.id) for symbol in text_and_symbols_associated_list]
+    matched_candidates = []
+    for batch_results, timings in results:
+        for phase, seconds in timings.items():
+            line_candidate_matching_seconds.labels(phase).observe(seconds)
+
+        for _, result in batch_results:
+            for connection in result.values():
+                if connection['type'] is GraphNodeType.symbol:
+                    connection['node'] = symbol_node_ids[int(connection['node'])]
+        matched_candidates.append(batch_results)
+
+    return matched_candidates
+
+
+# sheets processed by this worker process, spatial index or elements, by shared memory block and engine. The batches of
+# the jobs run at the same time are interleaved on the workers, so a sheet is kept per job to be built once per worker
+_worker_sheet_cache: OrderedDict = OrderedDict()
+
+
+def process_line_segments_from_shared_memory(shared_memory_name,
+                                             layout,
+                                             start_index,
+                                             stop_index,
+                                             engine,
+                                             max_cached_sheets,
+                                             graph_line_buffer,
+                                             graph_distance_threshold_for_symbols,
+                                             graph_distance_threshold_for_text,
+                                             graph_distance_threshold_for_lines):
+    '''
+    Finds the connection candidates of a range of line segments in a candidate matching pool worker.
+    The spatial index, or the elements of the sheet for the brute force engine, are built from the coordinates
+    in shared memory on the first task of a sheet and reused by the next tasks of the same sheet.
+    The symbol candidates reference the symbol indexes.
+    :param shared_memory_name: Name of the shared memory block with the coordinates of the sheet
+    :param layout: Layout of the shared memory block
+    :param start_index: Index of the first line segment to process
+    :param stop_index: Index after the last line segment to process
+    :param engine: The candidate matching engine
+    :param max_cached_sheets: Number of sheets kept by the worker, the number of jobs processed at the same time
+    :return: The matched candidates and the time spent in each phase
+    '''
+    timings = {}
+    cache_key = (shared_memory_name, engine, graph_line_buffer)
+    sheet = _worker_sheet_cache.get(cache_key)
+    if sheet is not None:
+        _worker_sheet_cache.move_to_end(cache_key)
+    else:
+        time_start = time.perf_counter()
+        coordinates = read_arrays_from_shared_memory(shared_memory_name, layout)
+        timings['serialization'] = time.perf_counter() - time_start
+
+        time_start = time.perf_counter()
+        if engine == CandidateMatchingEngine.spatial_index:
+            sheet = LineConnectionSpatialIndex(coordinates['line_segments'],
+                                               coordinates['extended_lines'],
+                                               coordinates['symbols'],
+                                               coordinates['text'],
+                                               graph_line_buffer)
+        else:
+            sheet = _coordinates_to_sheet_elements(coordinates)
+        timings['index_build'] = time.perf_counter() - time_start
+
+        _worker_sheet_cache[cache_key] = sheet
+        while len(_worker_sheet_cache) > max_cached_sheets:
+            _worker_sheet_cache.popitem(last=False)
+
+    time_start = time.perf_counter()
+    thresholds = (graph_distance_threshold_for_symbols, graph_distance_threshold_for_text, graph_distance_threshold_for_lines)
+    if engine == CandidateMatchingEngine.spatial_index:
+        matched_candidates = [(source_line_index, sheet.find_connection_candidates(source_line_index, None, *thresholds))
+                              for source_line_index in range(start_index, stop_index)]
+    else:
+        matched_candidates = process_line_segments(range(start_index, stop_index), *sheet, graph_line_buffer, *thresholds)
+    timings['compute'] = time.perf_counter() - time_start
+
+    return matched_candidates, timings
+
+
+def _coordinates_to_sheet_elements(coordinates: dict) -> tuple:
+    '''
+    Rebuilds the line segments, extended lines, symbols and text evaluated by the brute force engine from their
+    coordinates, the symbols get their index as id. The models are not validated again, they were in the parent.
+    '''
+    def to_line_segments(line_coordinates):
+        return [LineSegment.construct(startX=start_x, startY=start_y, endX=end_x, endY=end_y)
+                for start_x, start_y, end_x, end_y in line_coordinates.tolist()]
+
+    symbols = [SymbolAndTextAssociated.construct(id=i, topX=top_x, topY=top_y, bottomX=bottom_x, bottomY=bottom_y)
+               for i, (top_x, top_y, bottom_x, bottom_y) in enumerate(coordinates['symbols'].tolist())]
+    text = [BoundingBox.construct(topX=top_x, topY=top_y, bottomX=bottom_x, bottomY=bottom_y)
+            for top_x, top_y, bottom_x, bottom_y in coordinates['text'].tolist()]
+    return to_line_segments(coordinates['line_segments']), to_line_segments(coordinates['extended_lines']), symbols, text
+
+
+class LineConnectionSpatialIndex:
+    '''
+    Geometries of a sheet with one STRtree per element class (symbols, text and extended lines)
+    used by the spatial index engine. Each line segment only evaluates the elements whose envelope
+    intersects its buffered extended line, in the same order as the brute force engine,
+    so the results are identical.
+    '''
+
+    def __init__(self,
+                 line_coordinates: np.ndarray,
+                 extended_line_coordinates: np.ndarray,
+                 symbol_coordinates: np.ndarray,
+                 text_coordinates: np.ndarray,
+                 graph_line_buffer: float):
+        '''
+        :param line_coordinates: Line segments coordinates, one row of startX, startY, endX, endY per line
+        :param extended_line_coordinates: Extended line segments coordinates
+        :param symbol_coordinates: Symbols coordinates, one row of topX, topY, bottomX, bottomY per symbol
+        :param text_coordinates: Text coordinates
+        :param graph_line_buffer: Buffer added to the extended lines
+        '''
+        self.line_coordinates = line_coordinates
+        self.symbol_polygons = shapely_utils.bounding_box_coordinates_to_polygons(symbol_coordinates)
+        self.text_polygons = shapely_utils.bounding_box_coordinates_to_polygons(text_coordinates)
+        self.line_strings = shapely_utils.line_coordinates_to_line_strings(line_coordinates)
+        self.start_points = shapely.get_point(self.line_strings, 0)
+        self.end_points = shapely.get_point(self.line_strings, 1)
+        self.extended_line_polygons = shapely.buffer(
+            shapely_utils.line_coordinates_to_line_strings(extended_line_coordinates), graph_line_buffer)
+        # every extended line is used as a source geometry, so prepare them up front
+        shapely.prepare(self.extended_line_polygons)
+
+        self.symbol_tree = shapely.STRtree(self.symbol_polygons)
+        self.text_tree = shapely.STRtree(self.text_polygons)
+        self.extended_line_tree = shapely.STRtree(self.extended_line_polygons)
+
+    def find_connection_candidates(self,
+                                   source_line_index: int,
+                                   symbol_node_ids: Optional[list[str]],
+                                   graph_distance_threshold_for_symbols: float,
+                                   graph_distance_threshold_for_text: float,
+                                   graph_distance_threshold_for_lines: float) -> dict:
+        '''
+        Finds the connection candidates of a line segment
+        :param source_line_index: Index of the line segment
+        :param symbol_node_ids: Node ids of the symbols, the symbol indexes are used if None
+        :return: The connection candidates of the start and end of the line segment
+        '''
+        source_line_polygon_extended = self.extended_line_polygons[source_line_index]
+        start_x, start_y, end_x, end_y = self.line_coordinates[source_line_index]
+        source_start_point = Point(start_x, start_y)
+        source_end_point = Point(end_x, end_y)
+
+        current_connection_candidates = {
+            'start': ConnectionCandidate().__dict__,
+            'end': ConnectionCandidate().__dict__
+        }
+
+        # Candidate matching: line to symbol
+        symbol_indexes = _query_intersecting_indexes(self.symbol_tree, source_line_polygon_extended)
+        start_point_distances = shapely.distance(self.symbol_polygons[symbol_indexes], source_start_point)
+        end_point_distances = shapely.distance(self.symbol_polygons[symbol_indexes], source_end_point)
+        for symbol_index, start_point_distance, end_point_distance in \
+                zip(symbol_indexes, start_point_distances, end_point_distances):
+            current_connection_candidates = update_connection_candidates_with_element(
+                symbol_node_ids[symbol_index] if symbol_node_ids is not None else str(symbol_index),
+                GraphNodeType.symbol,
+                float(start_point_distance),
+                float(end_point_distance),
+                graph_distance_threshold_for_symbols,
+                current_connection_candidates)
+
+        # Candidate matching: line to text
+        text_indexes = _query_intersecting_indexes(self.text_tree, source_line_polygon_extended)
+        start_point_distances = shapely.distance(self.text_polygons[text_indexes], source_start_point)
+        end_point_distances = shapely.distance(self.text_polygons[text_indexes], source_end_point)
+        for text_index, start_point_distance, end_point_distance in \
+                zip(text_indexes, start_point_distances, end_point_distances):
+            current_connection_candidates = update_connection_candidates_with_element(
+                str(text_index),
+                GraphNodeType.text,
+                float(start_point_distance),
+                float(end_point_distance),
+                graph_distance_threshold_for_text,
+                current_connection_candidates)
+
+        # Candidate matching: line to line
+        # the envelope query is enough here, the batch evaluates the exact intersection itself
+        return create_line_to_line_connection_candidates_batch(
+            np.sort(self.extended_line_tree.query(source_line_polygon_extended)),
+            source_line_index,
+            self.line_strings,
+            self.start_points,
+            self.end_points,
+            self.extended_line_polygons,
+            source_line_polygon_extended,
+            source_start_point,
+            source_end_point,
+            current_connection_candidates,
+            graph_distance_threshold_for_lines)
+
+
+def _query_intersecting_indexes(tree: shapely.STRtree, geometry: shapely.Geometry) -> np.ndarray:
+    '''
+    Returns the indexes of the tree geometries intersecting the given geometry in ascending order,
+    which is the order the brute force engine evaluates them in.
+    '''
+    return np.sort(tree.query(geometry, predicate='intersects'))
+
+
 def process_line_segment(source_line_index,
                          source_line_segment,
                          source_extended_line_segment,
@@ -217,11 +535,7 @@ def create_line_connection_candidates_helper(
     connection candidates dictionary if the input symbol or text element is closer to the
     start or end point of the line segment than the current value in the connection candidates dict.
     '''
-    try:
-        if item.topX is None or item.topY is None or item.bottomX is None or item.bottomY is None:
-            raise ValueError('Item does not have proper bounding box')
-    except AttributeError:
-        raise ValueError('Item does not have proper bounding box')
+    validate_bounding_box(item)
 
     item_polygon = shapely_utils.bounding_box_to_polygon(item)
 
@@ -233,6 +547,37 @@ def create_line_connection_candidates_helper(
     start_point_distance = item_polygon.distance(start_point)
     end_point_distance = item_polygon.distance(end_point)
 
+    return update_connection_candidates_with_element(
+        id,
+        node_type,
+        start_point_distance,
+        end_point_distance,
+        category_distance_threshold,
+        current_connection_candidates)
+
+
+def validate_bounding_box(item):
+    '''
+    Raises a ValueError if the symbol or text element does not have a proper bounding box.
+    '''
+    try:
+        if item.topX is None or item.topY is None or item.bottomX is None or item.bottomY is None:
+            raise ValueError('Item does not have proper bounding box')
+    except AttributeError:
+        raise ValueError('Item does not have proper bounding box')
+
+
+def update_connection_candidates_with_element(
+            id,
+            node_type,
+            start_point_distance,
+            end_point_distance,
+            category_distance_threshold,
+            current_connection_candidates) -> dict:
+    '''
+    Updates the connection candidates with a symbol or text element intersecting the extended line,
+    given the distances of the element to the start and end point of the line segment.
+    '''
     # Update connection candidates if closer than existing current value or if current value is None
     if start_point_distance <= end_point_distance and \
             (start_point_distance <= category_distance_threshold and
@@ -297,6 +642,100 @@ def create_line_to_line_connection_candidates(
     start_line_distance = target_line_polygon.distance(source_start_point)
     end_line_distance = target_line_polygon.distance(source_end_point)
 
+    return update_connection_candidates_with_line(
+        target_line_id,
+        start_point_distance,
+        end_point_distance,
+        start_line_distance,
+        end_line_distance,
+        current_connection_candidates,
+        line_distance_threshold)
+
+
+def create_line_to_line_connection_candidates_batch(
+            target_line_indexes,
+            source_line_index,
+            line_strings,
+            start_points,
+            end_points,
+            extended_line_polygons,
+            source_line_polygon_extended,
+            source_start_point,
+            source_end_point,
+            current_connection_candidates,
+            line_distance_threshold):
+    '''
+    Batched version of create_line_to_line_connection_candidates.
+
+    Evaluates a source line against many target lines at once: the intersection test and the
+    point/line distances are computed with shapely vectorized operations over the precomputed
+    line strings, start/end points and buffered extended line polygons of all lines, and only the
+    candidate update (which depends on the previous candidate) is applied target by target,
+    in ascending target index order.
+    :param target_line_indexes: Indexes of the target lines to evaluate
+    :param source_line_index: Index of the source line
+    :param line_strings: Line strings of all the line segments
+    :param start_points: Start points of all the line segments
+    :param end_points: End points of all the line segments
+    :param extended_line_polygons: Buffered extended line polygons of all the line segments
+    '''
+    target_line_indexes = np.asarray(target_line_indexes, dtype=np.intp)
+
+    # skip comparing the same line segments and the target lines that do not intersect the source line
+    target_line_indexes = target_line_indexes[target_line_indexes != source_line_index]
+    target_line_indexes = target_line_indexes[
+        shapely.intersects(source_line_polygon_extended, extended_line_polygons[target_line_indexes])]
+
+    if len(target_line_indexes) == 0:
+        return current_connection_candidates
+
+    target_line_strings = line_strings[target_line_indexes]
+    start_line_distances = shapely.distance(target_line_strings, source_start_point)
+    end_line_distances = shapely.distance(target_line_strings, source_end_point)
+
+    # A target line can only update the candidates if one of cases 1-4 is below the threshold,
+    # and since the line distances are never greater than the point distances that reduces to the line distances.
+    # The tolerance keeps this a superset of the exact checks below in case of floating point rounding.
+    is_within_threshold = np.minimum(start_line_distances, end_line_distances) < \
+        line_distance_threshold * (1 + DISTANCE_FILTER_RELATIVE_TOLERANCE)
+    target_line_indexes = target_line_indexes[is_within_threshold]
+    start_line_distances = start_line_distances[is_within_threshold]
+    end_line_distances = end_line_distances[is_within_threshold]
+
+    # Calculate distances between source and target line points
+    target_start_points = start_points[target_line_indexes]
+    target_end_points = end_points[target_line_indexes]
+    start_point_distances = np.minimum(shapely.distance(target_start_points, source_start_point),
+                                       shapely.distance(target_end_points, source_start_point))
+    end_point_distances = np.minimum(shapely.distance(target_start_points, source_end_point),
+                                     shapely.distance(target_end_points, source_end_point))
+
+    for target_line_index, start_point_distance, end_point_distance, start_line_distance, end_line_distance in \
+            zip(target_line_indexes, start_point_distances, end_point_distances, start_line_distances, end_line_distances):
+        current_connection_candidates = update_connection_candidates_with_line(
+            str(target_line_index),
+            float(start_point_distance),
+            float(end_point_distance),
+            float(start_line_distance),
+            float(end_line_distance),
+            current_connection_candidates,
+            line_distance_threshold)
+
+    return current_connection_candidates
+
+
+def update_connection_candidates_with_line(
+            target_line_id,
+            start_point_distance,
+            end_point_distance,
+            start_line_distance,
+            end_line_distance,
+            current_connection_candidates,
+            line_distance_threshold) -> dict:
+    '''
+    Updates the connection candidates with a target line intersecting the source extended line,
+    given the distances of the target line end points and of the target line to the source line start and end points.
+    '''
     # Case 1.
     # Cases 1 and 2 are for when lines are connected either by start or end point (not a junction).
     # Update current_connection_candidates if the start point distance is below the threshold
@@ -393,6 +832,30 @@ def has_update_on_line_distance(connection: dict, line_distance: float) -> bool:
         previous_distance is None
 
 
+def plan_line_segments_batches(line_segments_count: int,
+                               max_workers_count: int,
+                               min_lines_per_worker: int,
+                               chunks_per_worker: int) -> tuple[int, int]:
+    '''
+    Plans the batches of the candidate matching based on the sheet size and the available workers.
+    Only as many workers as there are min_lines_per_worker line segments are used, and each worker
+    gets chunks_per_worker batches on average so that the load is balanced between the workers.
+    The batches only carry a range of line segments, the sheet is shared through shared memory and
+    built once per worker, so more batches don't copy or build the sheet more times.
+    :param line_segments_count: Number of line segments
+    :param max_workers_count: Maximum number of workers
+    :param min_lines_per_worker: Minimum number of line segments for a worker to be used
+    :param chunks_per_worker: Number of batches per worker
+    :return: Number of workers to use (1 means in-process) and batch size
+    '''
+    workers_count = max(min(max_workers_count, line_segments_count // max(min_lines_per_worker, 1)), 1)
+    if workers_count == 1:
+        return 1, max(line_segments_count, 1)
+
+    batches_count = workers_count * max(chunks_per_worker, 1)
+    return workers_count, max(math.ceil(line_segments_count / batches_count), 1)
+
+
 def batch(iterable, n=1):
     '''
     Generates batches of n elements from iterable
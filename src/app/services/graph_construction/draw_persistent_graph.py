@@ -6,13 +6,15 @@ import io
 import cv2
 import numpy as np
 import matplotlib
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from app.models.image_details import ImageDetails
 from app.models.graph_construction.connected_symbols_item import ConnectedSymbolsItem
 from app.services.graph_construction.config.symbol_node_keys_config import SymbolNodeKeysConfig
 from app.models.enums.flow_direction import FlowDirection
 from app.services.draw_elements import draw_annotation_on_image, draw_line
 from app.models.line_detection.line_segment import LineSegment
+from app.utils.image_context import ImageContext, decode_image
+from typing import Union
 matplotlib.use('pdf')
 
 
@@ -24,6 +26,20 @@ def draw_persistent_graph_networkx(
         Shows the output graph
         :param connectivites: Connectivities
     """
+    image = render_persistent_graph_networkx(assets, symbol_label_prefixes_to_include)
+
+    cv2.imwrite(file_path, image)
+
+
+def render_persistent_graph_networkx(
+        assets: list[ConnectedSymbolsItem],
+        symbol_label_prefixes_to_include: set[str]) -> np.ndarray:
+    """
+        Renders the output graph as a networkx plot
+        :param assets: List of assets (result of graph construction step)
+        :param symbol_label_prefixes_to_include: Symbol label prefixes of the assets to include in the plot
+        :return: The BGR image of the plot
+    """
     symbol_label_prefixes_to_include = {prefix.lower() for prefix in symbol_label_prefixes_to_include}
     g = nx.DiGraph()
     # Only add assets to this graph view if they are in the set of symbol label prefixes to include
@@ -71,7 +87,9 @@ def draw_persistent_graph_networkx(
         if not set_color:
             node_colors.append('black')  # if symbol category is not in color map, set color to black
 
-    fig, ax = plt.subplots(1, 1, squeeze=True)
+    # the figure is not created with pyplot, whose current figure is shared by the renders running concurrently
+    fig = Figure(figsize=(12, 8))
+    ax = fig.subplots(1, 1, squeeze=True)
 
     pos = nx.spring_layout(g, k=3, iterations=50)
     nx.draw_networkx(g,
@@ -84,29 +102,25 @@ def draw_persistent_graph_networkx(
                      font_size=14,)
 
     buf = io.BytesIO()
-
-    plt.gcf().set_size_inches(12, 8)
     fig.savefig(buf, format="png")
 
-    image = cv2.imdecode(np.frombuffer(buf.getvalue(), np.uint8), cv2.IMREAD_COLOR)
-
-    cv2.imwrite(file_path, image)
+    return cv2.imdecode(np.frombuffer(buf.getvalue(), np.uint8), cv2.IMREAD_COLOR)
 
 
 def draw_persistent_graph_annotated(
         assets: list[ConnectedSymbolsItem],
-        pid_image: bytes,
+        pid_image: Union[bytes, ImageContext],
         image_details: ImageDetails,
         output_file_path: str):
     '''
         Draws the computed graph connected on top of the input PID image.
         :param assets: List of assets (result of graph construction step)
-        :param pid_image: PID image in bytes
+        :param pid_image: PID image in bytes, or its image context
         :param image_details: Image details
         :param output_file_path: Output file path
   '''
 
-    img = cv2.imdecode(np.frombuffer(pid_image, np.uint8), cv2.IMREAD_COLOR)
+    img = decode_image(pid_image)
 
     # All assets are included in this debug view - this can be tuned in the future
     for asset in assets:
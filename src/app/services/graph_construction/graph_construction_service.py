@@ -22,6 +22,9 @@ from .connect_symbols_that_are_close import connect_symbols_that_are_close
 from .graph_service import GraphService
 from .utils.id_builder_util import create_node_id
 from .draw_persistent_graph import draw_persistent_graph_networkx, draw_persistent_graph_annotated
+from app.services.job_profiler import profile_stage
+from app.utils.image_context import ImageContext
+from typing import Optional, Union
 import time
 
 logger = logger_config.get_logger(__name__)
@@ -29,22 +32,22 @@ logger = logger_config.get_logger(__name__)
 
 def construct_graph(
             pid_id: str,
-            pid_image: bytes,
+            pid_image: Union[bytes, ImageContext],
             text_detection_results: GraphConstructionInferenceRequest,
             line_detection_results: LineDetectionInferenceResponse,
-            output_image_graph_path: str,
-            debug_image_graph_connections_path: str,
-            debug_image_graph_with_lines_and_symbols_path: str,
+            output_image_graph_path: Optional[str],
+            debug_image_graph_connections_path: Optional[str],
+            debug_image_graph_with_lines_and_symbols_path: Optional[str],
             symbol_label_prefixes_to_include_in_graph_image_output: set[str]):
     """
         Constructs the graph from the text detection and line detection results
         :param pid_id: PID ID
-        :param pid_image: PID image
+        :param pid_image: PID image, or its image context to decode it once
         :param text_detection_results: Text detection results
         :param line_detection_results: Line detection results
-        :param output_image_graph_path: Debug image graph path
-        :param debug_image_graph_with_lines_path: Debug image graph with lines path
-        :param debug_image_graph_with_lines_and_symbols_path: Debug image graph with lines and symbols path
+        :param output_image_graph_path: Output image graph path, or None to not draw it
+        :param debug_image_graph_connections_path: Debug image graph connections path, or None to not draw it
+        :param debug_image_graph_with_lines_and_symbols_path: Debug image graph with lines and symbols path, or None to not draw it
         :param symbol_label_prefixes_to_include_in_graph_image_output: Symbol label prefixes to include in graph image output
     """
     starting_time = time.time()
@@ -73,95 +76,102 @@ def construct_graph(
 
     # step 1: extending the lines
     logger.debug("Step 1: Extending the line up to max width and height of the image...")
-    start_time = time.time()
-    extended_lines = extend_lines(line_detection_results.line_segments, norm_line_segment_padding_default)
-    end_time = time.time()
-    logger.debug(f"Step 1: Total time taken for extending the lines: {end_time - start_time}")
+    with profile_stage('graph_construction.extend_lines') as stage:
+        extended_lines = extend_lines(line_detection_results.line_segments, norm_line_segment_padding_default)
+        stage.counts['line_segments'] = len(line_detection_results.line_segments)
+    logger.debug(f"Step 1: Total time taken for extending the lines: {stage.wall_seconds}")
 
     # step 2: removing all text outside of the main inclusive box
     logger.debug("Step 2: Removing all text outside of the main inclusive box...")
-    start_time = time.time()
-    text_results = remove_text_outside_main_inclusive_box(
-        text_detection_results.bounding_box_inclusive,
-        text_detection_results.all_text_list)
-    end_time = time.time()
-    logger.debug(f"Step 2: Total time taken for removing all text outside of the main inclusive box: {end_time - start_time}")
+    with profile_stage('graph_construction.remove_text_outside_main_inclusive_box') as stage:
+        text_results = remove_text_outside_main_inclusive_box(
+            text_detection_results.bounding_box_inclusive,
+            text_detection_results.all_text_list)
+        stage.counts['texts'] = len(text_results)
+    logger.debug(f"Step 2: Total time taken for removing all text outside of the main inclusive box: {stage.wall_seconds}")
 
     # step 3: initialize the graph
     logger.debug("Step 3: Creating the nodes on the graph...")
-    start_time = time.time()
-    graph = initialize_graph(text_detection_results.text_and_symbols_associated_list, line_detection_results.line_segments)
-    end_time = time.time()
-    logger.debug(f"Step 3: Total time taken for creating the nodes on the graph: {end_time - start_time}")
+    with profile_stage('graph_construction.initialize_graph') as stage:
+        graph = initialize_graph(text_detection_results.text_and_symbols_associated_list, line_detection_results.line_segments)
+        stage.counts['nodes'] = graph.G.number_of_nodes()
+    logger.debug(f"Step 3: Total time taken for creating the nodes on the graph: {stage.wall_seconds}")
 
     # step 4: line with symbol connection
     logger.info("Step 4: Create line start and end connection candidates...")
-    start_time = time.time()
-    line_connection_candidates = create_line_connection_candidates(
-        line_detection_results.line_segments,
-        extended_lines,
-        text_detection_results.text_and_symbols_associated_list,
-        text_results,
-        norm_graph_line_buffer,
-        norm_graph_distance_threshold_for_symbols,
-        norm_graph_distance_threshold_for_text,
-        norm_graph_distance_threshold_for_lines,)
-    end_time = time.time()
-    logger.info(f"Step 4: Total time taken for creating line start and end connection candidates: {end_time - start_time}")
+    with profile_stage('graph_construction.create_line_connection_candidates') as stage:
+        line_connection_candidates = create_line_connection_candidates(
+            line_detection_results.line_segments,
+            extended_lines,
+            text_detection_results.text_and_symbols_associated_list,
+            text_results,
+            norm_graph_line_buffer,
+            norm_graph_distance_threshold_for_symbols,
+            norm_graph_distance_threshold_for_text,
+            norm_graph_distance_threshold_for_lines,)
+        stage.counts['line_segments'] = len(line_detection_results.line_segments)
+        stage.counts['symbols'] = len(text_detection_results.text_and_symbols_associated_list)
+        stage.counts['texts'] = len(text_results)
+    logger.info(f"Step 4: Total time taken for creating line start and end connection candidates: {stage.wall_seconds}")
 
     # step 5: connecting lines with the closest elements
     logger.debug("Step 5: Connecting lines with the closest elements...")
-    start_time = time.time()
-    connect_lines_with_closest_elements(
-        graph,
-        line_connection_candidates,
-        text_detection_results.all_text_list,
-        line_detection_results.line_segments)
-    end_time = time.time()
-    logger.debug(f"Step 5: Total time taken for connecting lines with the closest elements: {end_time - start_time}")
+    with profile_stage('graph_construction.connect_lines_with_closest_elements') as stage:
+        connect_lines_with_closest_elements(
+            graph,
+            line_connection_candidates,
+            text_detection_results.all_text_list,
+            line_detection_results.line_segments)
+        stage.counts['edges'] = graph.G.number_of_edges()
+    logger.debug(f"Step 5: Total time taken for connecting lines with the closest elements: {stage.wall_seconds}")
 
     # step 6: connecting the symbols that are close
     logger.debug("Step 6: Connecting the symbols that are close")
-    start_time = time.time()
-    connect_symbols_that_are_close(graph,
-                                   text_detection_results.text_and_symbols_associated_list,
-                                   norm_graph_symbol_to_symbol_distance_threshold)
-    end_time = time.time()
-    logger.debug(f"Step 6: Total time taken for connecting the symbols that are close: {end_time - start_time}")
+    with profile_stage('graph_construction.connect_symbols_that_are_close') as stage:
+        connect_symbols_that_are_close(graph,
+                                       text_detection_results.text_and_symbols_associated_list,
+                                       norm_graph_symbol_to_symbol_distance_threshold)
+        stage.counts['edges'] = graph.G.number_of_edges()
+    logger.debug(f"Step 6: Total time taken for connecting the symbols that are close: {stage.wall_seconds}")
 
-    graph.draw_graph(text_detection_results.image_details, pid_image, debug_image_graph_with_lines_and_symbols_path)
+    if debug_image_graph_with_lines_and_symbols_path is not None:
+        with profile_stage('graph_construction.draw_graph_with_lines_and_symbols'):
+            graph.draw_graph(text_detection_results.image_details, pid_image, debug_image_graph_with_lines_and_symbols_path)
 
     # step 7: connecting the lines with arrows
     logger.debug("Step 7: Connecting the lines with arrows...")
-    start_time = time.time()
-    arrow_nodes = connect_lines_with_arrows(graph, line_detection_results.line_segments, extended_lines)
-    end_time = time.time()
-    logger.debug(f"Step 7: Total time taken for connecting the lines with arrows: {end_time - start_time}")
+    with profile_stage('graph_construction.connect_lines_with_arrows') as stage:
+        arrow_nodes = connect_lines_with_arrows(graph, line_detection_results.line_segments, extended_lines)
+        stage.counts['arrows'] = len(arrow_nodes)
+    logger.debug(f"Step 7: Total time taken for connecting the lines with arrows: {stage.wall_seconds}")
 
     # step 8: graph traversal for finding asset connectivities
     logger.info("Step 8: Graph traversal for finding asset connectivities...")
-    start_time = time.time()
-    pre_find_symbol_connectivities_result = pre_find_symbol_connectivities(graph)
-    symbol_connections = find_symbol_connectivities(
-        graph,
-        pre_find_symbol_connectivities_result,
-        text_detection_results.propagation_pass_exhaustive_search)
-    asset_connectivities = post_find_symbol_connectivities(
-        graph,
-        symbol_connections,
-        pre_find_symbol_connectivities_result.flow_direction_asset_ids,
-        pre_find_symbol_connectivities_result.asset_valve_symbol_ids)
-    end_time = time.time()
-    logger.info(f"Step 8: Total time taken for graph traversal for finding asset connectivities: {end_time - start_time}")
+    with profile_stage('graph_construction.find_symbol_connectivities') as stage:
+        pre_find_symbol_connectivities_result = pre_find_symbol_connectivities(graph)
+        symbol_connections = find_symbol_connectivities(
+            graph,
+            pre_find_symbol_connectivities_result,
+            text_detection_results.propagation_pass_exhaustive_search)
+        asset_connectivities = post_find_symbol_connectivities(
+            graph,
+            symbol_connections,
+            pre_find_symbol_connectivities_result.flow_direction_asset_ids,
+            pre_find_symbol_connectivities_result.asset_valve_symbol_ids)
+        stage.counts['connected_symbols'] = len(asset_connectivities)
+    logger.info(f"Step 8: Total time taken for graph traversal for finding asset connectivities: {stage.wall_seconds}")
 
-    draw_persistent_graph_networkx(asset_connectivities,
-                                   output_image_graph_path,
-                                   symbol_label_prefixes_to_include_in_graph_image_output)
+    with profile_stage('graph_construction.draw_output_images'):
+        if output_image_graph_path is not None:
+            draw_persistent_graph_networkx(asset_connectivities,
+                                           output_image_graph_path,
+                                           symbol_label_prefixes_to_include_in_graph_image_output)
 
-    draw_persistent_graph_annotated(asset_connectivities,
-                                    pid_image,
-                                    text_detection_results.image_details,
-                                    debug_image_graph_connections_path)
+        if debug_image_graph_connections_path is not None:
+            draw_persistent_graph_annotated(asset_connectivities,
+                                            pid_image,
+                                            text_detection_results.image_details,
+                                            debug_image_graph_connections_path)
 
     logger.info(f"Total time taken for constructing the graph: {time.time() - starting_time}")
     return (asset_connectivities, arrow_nodes)
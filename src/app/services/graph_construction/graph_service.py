@@ -12,7 +12,7 @@ from app.services.draw_elements import draw_annotation_on_image, draw_line
 from app.models.bounding_box import BoundingBox
 from app.config import config
 from app.models.graph_construction.traversal_connection import TraversalConnection
-import numpy as np
+from app.utils.image_context import ImageContext, decode_image
 from typing import Union
 
 
@@ -273,11 +273,11 @@ class GraphService:
             node = self.get_node(connected_node.node_id)
             node[key].add(last)
 
-    def draw_graph(self, image_details: ImageDetails, pid_image: bytes, file_path: str):
+    def draw_graph(self, image_details: ImageDetails, pid_image: Union[bytes, ImageContext], file_path: str):
         """
         This function will draw the graph based on line and symbol locations and save it to the file path.
         """
-        img = cv2.imdecode(np.frombuffer(pid_image, np.uint8), cv2.IMREAD_COLOR)
+        img = decode_image(pid_image)
 
         for node in self.G.nodes(data=True):
             node_info = node[1]
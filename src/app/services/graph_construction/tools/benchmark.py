@@ -0,0 +1,361 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import statistics
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, Optional, Union
+import numpy as np
+import app.utils.override_imwrite  # noqa: F401 the output images are written to the blob storage stand-in
+from app.config import config
+from app.models.enums.candidate_matching_engine import CandidateMatchingEngine
+from app.models.job_profile import JobProfile
+from app.services import blob_storage_client as blob_storage_client_module
+from app.services.blob_storage_client import BlobStorageBackend
+from app.services.graph_construction import graph_construction_service
+from app.services.graph_construction.candidate_matching_pool import candidate_matching_pool, get_candidate_matching_workers_count
+from app.services.graph_construction.tools.synthetic_pid_generator import SyntheticSheet, generate_synthetic_sheet
+from app.services.job_profiler import profile_job, profile_stage
+from app.services.line_detection import line_detection_service
+from app.services.output_image_writer import output_image_writer
+from app.utils.cpu_utils import get_available_cpu_count
+
+
+DEFAULT_SIZES = [100, 500, 1000, 2000, 5000, 10000, 20000]
+LINE_DETECTION = 'line_detection'
+GRAPH_CONSTRUCTION = 'graph_construction'
+
+
+class InMemoryBlobStorage(BlobStorageBackend):
+    '''Blob storage stand-in keeping the uploaded blobs in memory, so the benchmark does not depend on Azure.'''
+
+    def __init__(self):
+        self.blobs: dict[str, bytes] = {}
+
+    @property
+    def initialized(self) -> bool:
+        return True
+
+    def init(self):
+        pass
+
+    def upload_bytes(self, blob_name: str, image_bytes: Union[bytes, str]):
+        self.blobs[blob_name] = image_bytes
+
+    def download_bytes(self, blob_name: str) -> bytes:
+        return self.blobs[blob_name]
+
+    def download_bytes_if_exists(self, blob_name: str) -> Optional[bytes]:
+        return self.blobs.get(blob_name)
+
+    def blob_exists(self, blob_name: str) -> bool:
+        return blob_name in self.blobs
+
+
+@contextmanager
+def in_memory_blob_storage() -> Iterator[InMemoryBlobStorage]:
+    '''Replaces the blob storage client by an in-memory stand-in.'''
+    blob_storage = InMemoryBlobStorage()
+    blob_storage_client = blob_storage_client_module.blob_storage_client
+    blob_storage_client_module.blob_storage_client = blob_storage
+    try:
+        yield blob_storage
+    finally:
+        blob_storage_client_module.blob_storage_client = blob_storage_client
+
+
+def run_line_detection(sheet: SyntheticSheet):
+    '''Runs the line detection of the sheet with the configured parameters.
+
+    :param sheet: The sheet
+    :type sheet: SyntheticSheet
+    '''
+    request = sheet.graph_construction_request
+    line_detection_service.detect_lines(
+        sheet.pid_id,
+        sheet.image_bytes,
+        request,
+        config.enable_thinning_preprocessing_line_detection,
+        config.line_detection_hough_threshold,
+        config.line_detection_hough_max_line_gap,
+        config.line_detection_hough_min_line_length,
+        config.line_detection_hough_rho,
+        config.line_detection_hough_theta,
+        request.bounding_box_inclusive,
+        request.image_details.height,
+        request.image_details.width,
+        f'{sheet.pid_id}/debug_preprocessed.png',
+        f'{sheet.pid_id}/debug_preprocessed_before_thinning.png',
+        f'{sheet.pid_id}/output_line-detection.png')
+    # the output images are uploaded in the background, like the app the benchmark waits for them
+    with profile_stage('line_detection.flush_output_images'):
+        output_image_writer.flush()
+
+
+def run_graph_construction(sheet: SyntheticSheet):
+    '''Runs the graph construction of the sheet from its generated line segments.
+
+    :param sheet: The sheet
+    :type sheet: SyntheticSheet
+    '''
+    graph_construction_service.construct_graph(
+        sheet.pid_id,
+        sheet.image_bytes,
+        sheet.graph_construction_request,
+        sheet.line_detection_response,
+        f'{sheet.pid_id}/output_graph-construction.png',
+        f'{sheet.pid_id}/debug_graph_connections.png',
+        f'{sheet.pid_id}/debug_graph_with_lines_and_symbols.png',
+        config.symbol_label_prefixes_to_include_in_graph_image_output)
+    with profile_stage('graph_construction.flush_output_images'):
+        output_image_writer.flush()
+
+
+def summarize_stages(job_profiles: list[JobProfile]) -> dict:
+    '''Summarizes the stages of the repetitions of a job.
+
+    :param job_profiles: The profiles of the repetitions
+    :type job_profiles: list[JobProfile]
+    :return: The median and min wall time, the median CPU time, the max peak RSS and the counts of each stage, by stage name
+    :rtype: dict
+    '''
+    stages = {}
+    for job_profile in job_profiles:
+        for stage in job_profile.stages:
+            stages.setdefault(stage.name, []).append(stage)
+
+    return {
+        name: {
+            'wall_seconds_median': statistics.median(stage.wall_seconds for stage in stage_repetitions),
+            'wall_seconds_min': min(stage.wall_seconds for stage in stage_repetitions),
+            'cpu_seconds_median': statistics.median(stage.cpu_seconds for stage in stage_repetitions),
+            'peak_rss_bytes': max((stage.peak_rss_bytes or 0) for stage in stage_repetitions) or None,
+            'counts': stage_repetitions[0].counts
+        }
+        for name, stage_repetitions in stages.items()
+    }
+
+
+def fit_scaling_exponent(sizes: list[int], seconds: list[float]) -> Optional[float]:
+    '''Fits seconds = a * sizes ^ exponent, e.g. 1 for a linear stage and 2 for a quadratic one.
+
+    :param sizes: The sizes
+    :type sizes: list[int]
+    :param seconds: The time taken for each size
+    :type seconds: list[float]
+    :return: The exponent, or None if there are less than 2 sizes with a measurable time
+    :rtype: Optional[float]
+    '''
+    points = [(math.log(size), math.log(second)) for size, second in zip(sizes, seconds) if size > 0 and second > 0]
+    if len(set(x for x, _ in points)) < 2:
+        return None
+
+    x, y = zip(*points)
+    exponent, _ = np.polyfit(x, y, 1)
+    return round(float(exponent), 3)
+
+
+def run_benchmark(
+    sizes: list[int],
+    steps: list[str],
+    repeat: int,
+    seed: int,
+    symbols_ratio: float,
+    texts_ratio: float,
+    arrows_ratio: float,
+    t_junctions_ratio: float,
+    diagonal_lines_ratio: float,
+    image_width: int,
+    image_height: int
+) -> dict:
+    '''Runs the steps on synthetic sheets of each size and reports the time taken by stage.
+
+    :param sizes: The numbers of line segments of the sheets
+    :type sizes: list[int]
+    :param steps: The steps to run, line_detection and/or graph_construction
+    :type steps: list[str]
+    :param repeat: The number of times each step is run per size
+    :type repeat: int
+    :param seed: The seed of the sheets generator
+    :type seed: int
+    :param symbols_ratio: The number of symbols per line segment
+    :type symbols_ratio: float
+    :param texts_ratio: The number of text boxes per line segment
+    :type texts_ratio: float
+    :param arrows_ratio: The number of arrows per line segment
+    :type arrows_ratio: float
+    :param t_junctions_ratio: The number of T-junctions per line segment
+    :type t_junctions_ratio: float
+    :param diagonal_lines_ratio: The ratio of the pipes made of a diagonal line segment
+    :type diagonal_lines_ratio: float
+    :param image_width: The width of the sheets, in pixels
+    :type image_width: int
+    :param image_height: The height of the sheets, in pixels
+    :type image_height: int
+    :return: The benchmark report
+    :rtype: dict
+    '''
+    runs = []
+    with in_memory_blob_storage():
+        for size in sizes:
+            sheet = generate_synthetic_sheet(
+                line_segments_count=size,
+                symbols_count=max(int(size * symbols_ratio), 2),
+                texts_count=int(size * texts_ratio),
+                arrows_count=int(size * arrows_ratio),
+                t_junctions_count=int(size * t_junctions_ratio),
+                diagonal_lines_ratio=diagonal_lines_ratio,
+                image_width=image_width,
+                image_height=image_height,
+                seed=seed)
+
+            run = {
+                'line_segments': sheet.line_detection_response.line_segments_count,
+                'symbols': len(sheet.graph_construction_request.text_and_symbols_associated_list),
+                'texts': len(sheet.graph_construction_request.all_text_list),
+                'steps': {}
+            }
+            for step in steps:
+                job_profiles = []
+                for _ in range(repeat):
+                    with profile_job(sheet.pid_id) as job_profiler:
+                        if step == LINE_DETECTION:
+                            run_line_detection(sheet)
+                        else:
+                            run_graph_construction(sheet)
+                    job_profiles.append(job_profiler.to_job_profile())
+
+                wall_seconds_median = statistics.median(job_profile.wall_seconds for job_profile in job_profiles)
+                run['steps'][step] = {
+                    'wall_seconds_median': wall_seconds_median,
+                    'line_segments_per_second': size / wall_seconds_median if wall_seconds_median > 0 else None,
+                    'stages': summarize_stages(job_profiles)
+                }
+            runs.append(run)
+
+    scaling = {}
+    for step in steps:
+        stage_names = list(dict.fromkeys(name for run in runs for name in run['steps'][step]['stages']))
+        scaling[step] = {
+            'total': fit_scaling_exponent(sizes, [run['steps'][step]['wall_seconds_median'] for run in runs]),
+            'stages': {
+                name: fit_scaling_exponent(
+                    [size for size, run in zip(sizes, runs) if name in run['steps'][step]['stages']],
+                    [run['steps'][step]['stages'][name]['wall_seconds_median'] for run in runs if name in run['steps'][step]['stages']])
+                for name in stage_names
+            }
+        }
+
+    return {
+        'created_at': datetime.utcnow().isoformat(),
+        'environment': {
+            'python_version': platform.python_version(),
+            'platform': platform.platform(),
+            'available_cpu_count': get_available_cpu_count(),
+            'graph_candidate_matching_engine': config.graph_candidate_matching_engine,
+            'candidate_matching_workers_count': get_candidate_matching_workers_count(config),
+        },
+        'parameters': {
+            'sizes': sizes,
+            'steps': steps,
+            'repeat': repeat,
+            'seed': seed,
+            'symbols_ratio': symbols_ratio,
+            'texts_ratio': texts_ratio,
+            'arrows_ratio': arrows_ratio,
+            't_junctions_ratio': t_junctions_ratio,
+            'diagonal_lines_ratio': diagonal_lines_ratio,
+            'image_width': image_width,
+            'image_height': image_height,
+        },
+        'runs': runs,
+        'scaling_exponents': scaling
+    }
+
+
+def _get_args():
+    parser = argparse.ArgumentParser(description='Benchmarks the line detection and graph construction on synthetic P&ID sheets.')
+    parser.add_argument(
+        '--sizes',
+        dest='sizes',
+        type=lambda value: [int(size) for size in value.split(',')],
+        default=DEFAULT_SIZES,
+        help='Comma separated numbers of line segments of the generated sheets'
+    )
+    parser.add_argument(
+        '--steps',
+        dest='steps',
+        type=lambda value: value.split(','),
+        default=[LINE_DETECTION, GRAPH_CONSTRUCTION],
+        help=f'Comma separated steps to run: {LINE_DETECTION}, {GRAPH_CONSTRUCTION}'
+    )
+    parser.add_argument('--repeat', dest='repeat', type=int, default=3, help='Number of runs of each step per size')
+    parser.add_argument('--seed', dest='seed', type=int, default=0, help='Seed of the sheets generator')
+    parser.add_argument('--symbols-ratio', dest='symbols_ratio', type=float, default=0.125, help='Symbols per line segment')
+    parser.add_argument('--texts-ratio', dest='texts_ratio', type=float, default=0.2, help='Text boxes per line segment')
+    parser.add_argument('--arrows-ratio', dest='arrows_ratio', type=float, default=0.02, help='Arrows per line segment')
+    parser.add_argument('--t-junctions-ratio', dest='t_junctions_ratio', type=float, default=0.05,
+                        help='T-junctions per line segment')
+    parser.add_argument('--diagonal-lines-ratio', dest='diagonal_lines_ratio', type=float, default=0.1,
+                        help='Ratio of the pipes made of a diagonal line segment')
+    parser.add_argument('--image-width', dest='image_width', type=int, default=7000, help='Width of the sheets, in pixels')
+    parser.add_argument('--image-height', dest='image_height', type=int, default=5000, help='Height of the sheets, in pixels')
+    parser.add_argument(
+        '--engine',
+        dest='engine',
+        type=CandidateMatchingEngine,
+        choices=list(CandidateMatchingEngine),
+        default=None,
+        help='Candidate matching engine, defaults to GRAPH_CANDIDATE_MATCHING_ENGINE'
+    )
+    parser.add_argument('--output-path', dest='output_path', type=str, default=None,
+                        help='Path of the JSON report, printed to stdout when not set')
+    parser.add_argument('--verbose', dest='verbose', action='store_true', help='Keep the info logs of the steps')
+    args = parser.parse_args()
+
+    unknown_steps = set(args.steps) - {LINE_DETECTION, GRAPH_CONSTRUCTION}
+    if unknown_steps:
+        parser.error(f'Unknown steps: {", ".join(sorted(unknown_steps))}')
+
+    return args
+
+
+if __name__ == '__main__':
+    args = _get_args()
+
+    if not args.verbose:
+        logging.disable(logging.INFO)
+    if args.engine is not None:
+        config.graph_candidate_matching_engine = args.engine
+
+    candidate_matching_pool.init()
+    try:
+        report = run_benchmark(
+            sizes=args.sizes,
+            steps=args.steps,
+            repeat=args.repeat,
+            seed=args.seed,
+            symbols_ratio=args.symbols_ratio,
+            texts_ratio=args.texts_ratio,
+            arrows_ratio=args.arrows_ratio,
+            t_junctions_ratio=args.t_junctions_ratio,
+            diagonal_lines_ratio=args.diagonal_lines_ratio,
+            image_width=args.image_width,
+            image_height=args.image_height)
+    finally:
+        candidate_matching_pool.shutdown()
+        output_image_writer.shutdown()
+
+    if args.output_path is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output_path)), exist_ok=True)
+        with open(args.output_path, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,203 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import random
+import cv2
+import numpy as np
+from pydantic import BaseModel
+from app.config import config
+from app.models.graph_construction.graph_construction_request import GraphConstructionInferenceRequest
+from app.models.image_details import ImageDetails
+from app.models.line_detection.line_detection_response import LineDetectionInferenceResponse
+from app.models.line_detection.line_segment import LineSegment
+from app.models.text_detection.symbol_and_text_associated import SymbolAndTextAssociated
+from app.models.text_detection.text_recognized import TextRecognized
+
+
+# (label, text prefix) of the generated symbols, the texts are valid asset tags
+SYMBOL_TYPES = [
+    ('Equipment/Vessel/Tank', 'TK'),
+    ('Equipment/Pump/Centrifugal pump', 'P'),
+    ('Instrument/Valve/Gate valve', 'V'),
+    ('Instrument/Indicator/Field mounted', 'PI'),
+    ('Piping/Endpoint/Pagination', 'PG'),
+]
+SYMBOL_SIZE_PIXELS = (30, 80)
+ARROW_HALF_SIZE_PIXELS = 8
+TEXT_HEIGHT_PIXELS = 14
+TEXT_WIDTH_PIXELS_PER_CHARACTER = 9
+T_JUNCTION_LENGTH_PIXELS = (40, 300)
+
+
+class SyntheticSheet(BaseModel):
+    '''
+    This class represents a generated P&ID sheet, with the inputs of the line detection and graph construction steps.
+    '''
+    pid_id: str
+    image_bytes: bytes
+    graph_construction_request: GraphConstructionInferenceRequest
+    line_detection_response: LineDetectionInferenceResponse
+
+
+def generate_synthetic_sheet(
+    line_segments_count: int,
+    symbols_count: int,
+    texts_count: int,
+    arrows_count: int = 0,
+    t_junctions_count: int = 0,
+    diagonal_lines_ratio: float = 0.1,
+    image_width: int = 7000,
+    image_height: int = 5000,
+    seed: int = 0
+) -> SyntheticSheet:
+    '''Generates a synthetic P&ID sheet.
+
+    The symbols are connected by pipes made of an horizontal and a vertical line segment, or of a single
+    diagonal line segment. Arrows are placed in the middle of horizontal line segments, which are split
+    in two around the arrow like the line detection does, and T-junctions branch off vertically from
+    the middle of horizontal line segments. A text box is placed below each symbol with its tag, the
+    remaining text boxes are scattered over the sheet.
+
+    :param line_segments_count: The number of line segments, including the ones of the arrows and T-junctions
+    :type line_segments_count: int
+    :param symbols_count: The number of symbols, excluding the arrows, at least 2 if there are line segments
+    :type symbols_count: int
+    :param texts_count: The number of text boxes
+    :type texts_count: int
+    :param arrows_count: The number of arrows, capped by the number of horizontal line segments that can hold one
+    :type arrows_count: int
+    :param t_junctions_count: The number of T-junctions, capped like arrows_count
+    :type t_junctions_count: int
+    :param diagonal_lines_ratio: The ratio of the pipes made of a diagonal line segment
+    :type diagonal_lines_ratio: float
+    :param image_width: The width of the image, in pixels
+    :type image_width: int
+    :param image_height: The height of the image, in pixels
+    :type image_height: int
+    :param seed: The seed of the random generator, the same parameters and seed generate the same sheet
+    :type seed: int
+    :return: The generated sheet
+    :rtype: SyntheticSheet
+    '''
+    if line_segments_count > 0 and symbols_count < 2:
+        raise ValueError('At least 2 symbols are needed to generate line segments.')
+
+    rng = random.Random(seed)
+    margin = SYMBOL_SIZE_PIXELS[1] + TEXT_HEIGHT_PIXELS * 2
+
+    # symbols as (topX, topY, bottomX, bottomY, label, text) in pixels
+    symbols = []
+    for i in range(symbols_count):
+        width, height = rng.randint(*SYMBOL_SIZE_PIXELS), rng.randint(*SYMBOL_SIZE_PIXELS)
+        x, y = rng.randint(margin, image_width - margin), rng.randint(margin, image_height - margin)
+        label, text_prefix = SYMBOL_TYPES[i % len(SYMBOL_TYPES)]
+        symbols.append((x, y, x + width, y + height, label, f'{text_prefix}-{i + 1:04d}'))
+
+    # line segments as (startX, startY, endX, endY) in pixels, the arrows and T-junctions add one line segment each
+    arrows_and_t_junctions_count = arrows_count + t_junctions_count
+    pipes_line_segments_count = max(line_segments_count - arrows_and_t_junctions_count, 0)
+    line_segments = []
+    horizontal_line_segment_indexes = []
+    while len(line_segments) < pipes_line_segments_count:
+        source, target = rng.sample(symbols, 2)
+        source_x, source_y = source[2], (source[1] + source[3]) // 2
+        target_x = (target[0] + target[2]) // 2
+        if rng.random() < diagonal_lines_ratio or len(line_segments) + 1 == pipes_line_segments_count:
+            line_segments.append((source_x, source_y, target[0], (target[1] + target[3]) // 2))
+        else:
+            target_y = target[1] if target[1] > source_y else target[3]
+            horizontal_line_segment_indexes.append(len(line_segments))
+            line_segments.append((source_x, source_y, target_x, source_y))
+            line_segments.append((target_x, source_y, target_x, target_y))
+
+    # the arrows and T-junctions are placed on distinct horizontal line segments long enough to hold them
+    host_line_segment_indexes = [
+        i for i in horizontal_line_segment_indexes
+        if abs(line_segments[i][2] - line_segments[i][0]) > ARROW_HALF_SIZE_PIXELS * 4]
+    rng.shuffle(host_line_segment_indexes)
+    arrows_count = min(arrows_count, len(host_line_segment_indexes))
+    t_junctions_count = min(t_junctions_count, len(host_line_segment_indexes) - arrows_count)
+
+    arrows = []
+    for i in host_line_segment_indexes[:arrows_count]:
+        start_x, y, end_x, _ = line_segments[i]
+        direction = 1 if end_x > start_x else -1
+        middle_x = (start_x + end_x) // 2
+        line_segments[i] = (start_x, y, middle_x - direction * ARROW_HALF_SIZE_PIXELS, y)
+        line_segments.append((middle_x + direction * ARROW_HALF_SIZE_PIXELS, y, end_x, y))
+        arrows.append((middle_x - ARROW_HALF_SIZE_PIXELS, y - ARROW_HALF_SIZE_PIXELS,
+                       middle_x + ARROW_HALF_SIZE_PIXELS, y + ARROW_HALF_SIZE_PIXELS))
+
+    for i in host_line_segment_indexes[arrows_count:arrows_count + t_junctions_count]:
+        start_x, y, end_x, _ = line_segments[i]
+        middle_x = (start_x + end_x) // 2
+        length = rng.randint(*T_JUNCTION_LENGTH_PIXELS) * rng.choice([-1, 1])
+        line_segments.append((middle_x, y, middle_x, min(max(y + length, 0), image_height - 1)))
+
+    # texts as (topX, topY, bottomX, bottomY, text) in pixels, the first ones are the tags of the symbols
+    texts = []
+    for i in range(texts_count):
+        if i < len(symbols):
+            x, y, text = symbols[i][0], symbols[i][3] + 2, symbols[i][5]
+        else:
+            text = f'L-{i + 1:05d}'
+            x, y = rng.randint(0, image_width - margin), rng.randint(0, image_height - margin)
+        texts.append((x, y, x + len(text) * TEXT_WIDTH_PIXELS_PER_CHARACTER, y + TEXT_HEIGHT_PIXELS, text))
+
+    image_bytes = _render_image(image_width, image_height, symbols, arrows, line_segments, texts)
+
+    symbols_and_arrows = [
+        SymbolAndTextAssociated(id=i, label=label, score=1.0, text_associated=text,
+                                topX=top_x / image_width, topY=top_y / image_height,
+                                bottomX=bottom_x / image_width, bottomY=bottom_y / image_height)
+        for i, (top_x, top_y, bottom_x, bottom_y, label, text) in enumerate(symbols)]
+    symbols_and_arrows += [
+        SymbolAndTextAssociated(id=len(symbols) + i, label=config.arrow_symbol_label, score=1.0,
+                                topX=top_x / image_width, topY=top_y / image_height,
+                                bottomX=bottom_x / image_width, bottomY=bottom_y / image_height)
+        for i, (top_x, top_y, bottom_x, bottom_y) in enumerate(arrows)]
+
+    pid_id = f'synthetic_{line_segments_count}_{seed}'
+    image_url = f'{pid_id}.png'
+    image_details = ImageDetails(format='png', width=image_width, height=image_height)
+    normalized_line_segments = [
+        LineSegment(startX=start_x / image_width, startY=start_y / image_height,
+                    endX=end_x / image_width, endY=end_y / image_height)
+        for start_x, start_y, end_x, end_y in line_segments]
+
+    return SyntheticSheet(
+        pid_id=pid_id,
+        image_bytes=image_bytes,
+        graph_construction_request=GraphConstructionInferenceRequest(
+            image_url=image_url,
+            image_details=image_details,
+            all_text_list=[
+                TextRecognized(text=text, topX=top_x / image_width, topY=top_y / image_height,
+                               bottomX=bottom_x / image_width, bottomY=bottom_y / image_height)
+                for top_x, top_y, bottom_x, bottom_y, text in texts],
+            text_and_symbols_associated_list=symbols_and_arrows),
+        line_detection_response=LineDetectionInferenceResponse(
+            image_url=image_url,
+            image_details=image_details,
+            line_segments_count=len(normalized_line_segments),
+            line_segments=normalized_line_segments))
+
+
+def _render_image(image_width: int, image_height: int, symbols: list, arrows: list, line_segments: list, texts: list) -> bytes:
+    image = np.full((image_height, image_width, 3), 255, dtype=np.uint8)
+    black = (0, 0, 0)
+
+    for start_x, start_y, end_x, end_y in line_segments:
+        cv2.line(image, (start_x, start_y), (end_x, end_y), black, 2)
+
+    for top_x, top_y, bottom_x, bottom_y, _, _ in symbols:
+        cv2.rectangle(image, (top_x, top_y), (bottom_x, bottom_y), black, 2)
+
+    for top_x, top_y, bottom_x, bottom_y in arrows:
+        triangle = np.array([[top_x, top_y], [top_x, bottom_y], [bottom_x, (top_y + bottom_y) // 2]], np.int32)
+        cv2.fillPoly(image, [triangle], black)
+
+    for top_x, _, _, bottom_y, text in texts:
+        cv2.putText(image, text, (top_x, bottom_y), cv2.FONT_HERSHEY_SIMPLEX, 0.4, black, 1)
+
+    _, buffer = cv2.imencode('.png', image)
+    return buffer.tobytes()
@@ -0,0 +1,160 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from prometheus_client import Histogram
+from typing import Iterator, Optional
+import sys
+import threading
+import time
+from app.models.job_profile import JobProfile, StageProfile
+from app.services.job_queue.job_process_pool import call_in_parent, is_job_worker_process
+from logger_config import get_logger
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+logger = get_logger(__name__)
+
+STAGE_SECONDS_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+job_stage_wall_seconds = Histogram(
+    'job_stage_wall_seconds',
+    'Wall time of the stages of the graph construction jobs',
+    ['stage'],
+    buckets=STAGE_SECONDS_BUCKETS)
+
+job_stage_cpu_seconds = Histogram(
+    'job_stage_cpu_seconds',
+    'CPU time of the thread running the stages of the graph construction jobs',
+    ['stage'],
+    buckets=STAGE_SECONDS_BUCKETS)
+
+
+def get_peak_rss_bytes() -> Optional[int]:
+    '''Gets the peak resident set size of the current process.
+
+    :return: The peak resident set size in bytes, or None if it is not available on this platform.
+    :rtype: Optional[int]
+    '''
+    if resource is None:
+        return None
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def observe_stage_metrics(name: str, wall_seconds: float, cpu_seconds: float):
+    '''Records the wall and CPU time of a stage in the Prometheus histograms.
+
+    :param name: The name of the stage
+    :type name: str
+    :param wall_seconds: The wall time of the stage, in seconds
+    :type wall_seconds: float
+    :param cpu_seconds: The CPU time of the stage, in seconds
+    :type cpu_seconds: float
+    '''
+    job_stage_wall_seconds.labels(name).observe(wall_seconds)
+    job_stage_cpu_seconds.labels(name).observe(cpu_seconds)
+
+
+class JobProfiler:
+    '''Collects the profile of the stages of a job.'''
+
+    def __init__(self, pid_id: str):
+        '''Initializes a new instance of the JobProfiler class.
+
+        :param pid_id: The pid id of the job
+        :type pid_id: str
+        '''
+        self._pid_id = pid_id
+        self._started_at = datetime.utcnow()
+        self._start_time = time.perf_counter()
+        self._stages: list[StageProfile] = []
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage: StageProfile):
+        '''Adds a finished stage to the profile.
+
+        :param stage: The stage profile
+        :type stage: StageProfile
+        '''
+        with self._lock:
+            self._stages.append(stage)
+
+    def to_job_profile(self) -> JobProfile:
+        '''Gets the profile of the job so far.
+
+        :return: The job profile, with the stages in the order they finished
+        :rtype: JobProfile
+        '''
+        with self._lock:
+            stages = list(self._stages)
+
+        return JobProfile(pid_id=self._pid_id,
+                          started_at=self._started_at,
+                          wall_seconds=time.perf_counter() - self._start_time,
+                          stages=stages)
+
+
+_current_job_profiler: ContextVar[Optional[JobProfiler]] = ContextVar('current_job_profiler', default=None)
+
+
+@contextmanager
+def profile_job(pid_id: str) -> Iterator[JobProfiler]:
+    '''Makes the stages profiled in the current context part of the profile of the given job.
+
+    :param pid_id: The pid id of the job
+    :type pid_id: str
+    :return: The job profiler
+    :rtype: Iterator[JobProfiler]
+    '''
+    profiler = JobProfiler(pid_id)
+    token = _current_job_profiler.set(profiler)
+    try:
+        yield profiler
+    finally:
+        _current_job_profiler.reset(token)
+
+
+@contextmanager
+def profile_stage(name: str) -> Iterator[StageProfile]:
+    '''Measures the wall time, CPU time and peak RSS of the code run in the context.
+
+    The element counts of the stage can be set on the counts of the returned stage profile.
+    The stage is recorded in the Prometheus histograms and, when run as part of a job (see `profile_job`),
+    in the job profile, also when the code raises.
+
+    The CPU time is the one of the calling thread, the work done by other processes (e.g. the candidate
+    matching pool) is not included. The peak RSS is the high-water mark of the process at the end of the stage.
+
+    :param name: The name of the stage
+    :type name: str
+    :return: The stage profile, filled in when the context exits
+    :rtype: Iterator[StageProfile]
+    '''
+    stage = StageProfile(name=name)
+    start_time = time.perf_counter()
+    start_cpu_time = time.thread_time()
+    try:
+        yield stage
+    finally:
+        stage.wall_seconds = time.perf_counter() - start_time
+        stage.cpu_seconds = time.thread_time() - start_cpu_time
+        stage.peak_rss_bytes = get_peak_rss_bytes()
+        logger.debug(f'Stage {name} took {stage.wall_seconds} secs ({stage.cpu_seconds} secs of CPU time)')
+
+        profiler = _current_job_profiler.get()
+        if profiler is not None:
+            profiler.add_stage(stage)
+
+        if is_job_worker_process():
+            # the metrics are served by the app process
+            call_in_parent(observe_stage_metrics, name, stage.wall_seconds, stage.cpu_seconds)
+        else:
+            observe_stage_metrics(name, stage.wall_seconds, stage.cpu_seconds)
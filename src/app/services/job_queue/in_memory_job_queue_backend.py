@@ -0,0 +1,43 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from queue import Empty, Full, Queue
+from typing import Callable, Optional
+import itertools
+from app.services.job_queue.job_queue_backend import JobQueueBackend, QueueFullError
+
+
+class InMemoryJobQueueBackend(JobQueueBackend):
+    '''Job queue backend keeping the jobs in memory, the queued jobs are lost when the process stops.'''
+
+    def __init__(self, max_size: int):
+        '''Initializes a new instance of the InMemoryJobQueueBackend class.
+
+        :param max_size: The maximum number of queued jobs, the jobs in progress are not counted
+        :type max_size: int
+        '''
+        self._queue = Queue(max_size)
+        self._job_ids = itertools.count(1)
+
+    def init(self) -> int:
+        return 0
+
+    def put(self, job: tuple[Callable, tuple]) -> int:
+        func, args = job
+        job_id = next(self._job_ids)
+        try:
+            self._queue.put_nowait((job_id, func, args))
+        except Full:
+            raise QueueFullError(f'Job queue is full ({self._queue.maxsize} jobs)')
+        return job_id
+
+    def is_full(self) -> bool:
+        return self._queue.full()
+
+    def get(self, timeout: float) -> Optional[tuple[int, Callable, tuple]]:
+        try:
+            return self._queue.get(timeout=timeout)
+        except Empty:
+            return None
+
+    def ack(self, job_id: int):
+        self._queue.task_done()
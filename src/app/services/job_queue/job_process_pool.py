@@ -0,0 +1,144 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+import multiprocessing
+import threading
+from logger_config import get_logger
+
+
+logger = get_logger(__name__)
+
+# queue to the app process, only set in the job worker processes
+_parent_call_queue: Optional[multiprocessing.Queue] = None
+
+
+def _init_job_worker(parent_call_queue: multiprocessing.Queue, initializer: Optional[Callable]):
+    global _parent_call_queue
+    _parent_call_queue = parent_call_queue
+
+    if initializer is not None:
+        initializer()
+
+
+def is_job_worker_process() -> bool:
+    '''Returns whether the current process is a job worker process of a JobProcessPool.'''
+    return _parent_call_queue is not None
+
+
+def call_in_parent(func: Callable, *args: Any):
+    '''Calls func(*args) in the app process from a job worker process.
+
+    The calls are made asynchronously by a thread of the app process, in the order they were sent.
+
+    :param func: The function to call, must be picklable
+    :type func: Callable
+    '''
+    _parent_call_queue.put((func, args))
+
+
+class JobProcessPool:
+    '''Pool of worker processes running the jobs outside of the app process, so that the CPU bound
+    jobs don't hold the GIL of the process serving the HTTP requests.
+
+    The worker processes are recycled after max_tasks_per_child jobs on average to cap their memory growth.
+    ProcessPoolExecutor only supports max_tasks_per_child from Python 3.11, so the executor is replaced
+    as a whole every max_workers * max_tasks_per_child jobs, the jobs already submitted finish on the previous one.
+    '''
+    _executor: Optional[ProcessPoolExecutor] = None
+    _parent_call_queue: Optional[multiprocessing.Queue] = None
+    _parent_calls_thread: Optional[threading.Thread] = None
+
+    def __init__(self, max_workers: int, max_tasks_per_child: int, initializer: Optional[Callable] = None):
+        '''Initializes a new instance of the JobProcessPool class.
+
+        :param max_workers: The number of worker processes
+        :type max_workers: int
+        :param max_tasks_per_child: The number of jobs after which the worker processes are recycled
+        :type max_tasks_per_child: int
+        :param initializer: The function called in each worker process when it starts
+        :type initializer: Optional[Callable]
+        '''
+        self._max_workers = max_workers
+        self._max_tasks_per_child = max_tasks_per_child
+        self._initializer = initializer
+        self._lock = threading.Lock()
+        self._submitted_jobs_count = 0
+
+    def init(self):
+        '''Starts the thread making the calls sent by the worker processes, the worker processes are started on first use.'''
+        with self._lock:
+            self._init()
+
+    def _init(self):
+        if self._parent_call_queue is None:
+            self._parent_call_queue = multiprocessing.Queue()
+            self._parent_calls_thread = threading.Thread(target=self._make_parent_calls, name='job-process-pool-calls', daemon=True)
+            self._parent_calls_thread.start()
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self._max_workers,
+                                                 initializer=_init_job_worker,
+                                                 initargs=(self._parent_call_queue, self._initializer))
+            self._submitted_jobs_count = 0
+
+    def run(self, func: Callable, args: tuple) -> Any:
+        '''Runs func(*args) in a worker process and waits for the result.
+
+        If a worker process dies, the executor is discarded so that the next job starts new worker processes,
+        and the error is raised.
+
+        :param func: The function to run, must be picklable
+        :type func: Callable
+        :param args: The arguments, must be picklable
+        :type args: tuple
+        :return: The result of func
+        :rtype: Any
+        '''
+        with self._lock:
+            self._init()
+            executor = self._executor
+            future = executor.submit(func, *args)
+
+            self._submitted_jobs_count += 1
+            if self._submitted_jobs_count >= self._max_workers * self._max_tasks_per_child:
+                logger.info('Recycling job worker processes')
+                self._executor = None
+                executor.shutdown(wait=False)
+
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            logger.error('Job worker process died, the worker processes will be restarted on next job')
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False)
+            raise
+
+    def shutdown(self):
+        '''Stops the worker processes once the running jobs are finished.'''
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+            if self._parent_call_queue is not None:
+                self._parent_call_queue.put(None)
+                self._parent_calls_thread.join()
+                self._parent_call_queue = None
+                self._parent_calls_thread = None
+
+    def _make_parent_calls(self):
+        parent_call_queue = self._parent_call_queue
+        while True:
+            parent_call = parent_call_queue.get()
+            if parent_call is None:
+                return
+
+            func, args = parent_call
+            try:
+                func(*args)
+            except Exception as e:
+                logger.error(f'Error in call from job worker process: {func.__name__}: {e}')
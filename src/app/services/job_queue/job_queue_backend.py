@@ -0,0 +1,63 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from typing import Callable, Optional
+
+
+class QueueFullError(Exception):
+    '''Raised when a job is submitted to a job queue that is full.'''
+    pass
+
+
+class JobQueueBackend:
+    '''Base class of the job queue backends.
+
+    A job is a (func, args) tuple. A consumer gets a job, runs it and acknowledges it,
+    the jobs that were taken but not acknowledged are delivered again by `init` when the
+    backend supports it (at-least-once delivery).
+    '''
+
+    def init(self) -> int:
+        '''Initializes the backend before the consumers start.
+
+        :return: The number of unfinished jobs that will be delivered again
+        :rtype: int
+        '''
+        raise NotImplementedError()
+
+    def put(self, job: tuple[Callable, tuple]) -> int:
+        '''Adds a job to the queue without blocking.
+        Only the queued jobs count towards the maximum size, not the jobs taken by a consumer.
+
+        :param job: The function to run and its arguments
+        :type job: tuple[Callable, tuple]
+        :raises QueueFullError: If the queue is full
+        :return: The job id
+        :rtype: int
+        '''
+        raise NotImplementedError()
+
+    def is_full(self) -> bool:
+        '''Checks if the queue is full, in which case adding a job raises a QueueFullError.
+
+        :return: True if the queue is full
+        :rtype: bool
+        '''
+        raise NotImplementedError()
+
+    def get(self, timeout: float) -> Optional[tuple[int, Callable, tuple]]:
+        '''Takes the next job from the queue.
+
+        :param timeout: The maximum number of seconds to wait for a job
+        :type timeout: float
+        :return: The job id, function and arguments, or None if there was no job before the timeout
+        :rtype: Optional[tuple[int, Callable, tuple]]
+        '''
+        raise NotImplementedError()
+
+    def ack(self, job_id: int):
+        '''Acknowledges that a job taken from the queue is finished.
+
+        :param job_id: The job id
+        :type job_id: int
+        '''
+        raise NotImplementedError()
@@ -0,0 +1,133 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from typing import Callable, Optional
+import pickle
+import sqlite3
+import threading
+import time
+from app.services.job_queue.job_queue_backend import JobQueueBackend, QueueFullError
+from logger_config import get_logger
+
+
+logger = get_logger(__name__)
+
+_QUEUED = 'queued'
+_IN_PROGRESS = 'in_progress'
+
+
+class SqliteJobQueueBackend(JobQueueBackend):
+    '''Job queue backend persisting the jobs in a SQLite database, so that they survive a restart.
+
+    The function and arguments of a job are pickled, so the function must be importable
+    by name. The jobs that were in progress when the process stopped are delivered again on `init`,
+    which is why a database file must only be used by one process at a time.
+    '''
+    _connection: Optional[sqlite3.Connection] = None
+
+    def __init__(self, path: str, max_size: int, poll_interval_seconds: float = 1.0):
+        '''Initializes a new instance of the SqliteJobQueueBackend class.
+
+        :param path: The path of the SQLite database file
+        :type path: str
+        :param max_size: The maximum number of queued jobs, the jobs in progress are not counted
+        :type max_size: int
+        :param poll_interval_seconds: The interval to check for jobs added by another connection
+        :type poll_interval_seconds: float
+        '''
+        self._path = path
+        self._max_size = max_size
+        self._poll_interval_seconds = poll_interval_seconds
+        self._condition = threading.Condition()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self._path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'payload BLOB NOT NULL, '
+                'status TEXT NOT NULL, '
+                'updated_at REAL NOT NULL)')
+        return self._connection
+
+    def init(self) -> int:
+        with self._condition:
+            cursor = self._get_connection().execute(
+                'UPDATE jobs SET status = ?, updated_at = ? WHERE status = ?', (_QUEUED, time.time(), _IN_PROGRESS))
+            redelivered_jobs_count = cursor.rowcount
+
+        if redelivered_jobs_count > 0:
+            logger.warning(f'{redelivered_jobs_count} unfinished jobs will be delivered again')
+        return redelivered_jobs_count
+
+    def put(self, job: tuple[Callable, tuple]) -> int:
+        payload = pickle.dumps(job)
+
+        with self._condition:
+            connection = self._get_connection()
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                if self._is_full(connection):
+                    raise QueueFullError(f'Job queue is full ({self._max_size} jobs)')
+
+                cursor = connection.execute(
+                    'INSERT INTO jobs (payload, status, updated_at) VALUES (?, ?, ?)', (payload, _QUEUED, time.time()))
+                connection.execute('COMMIT')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+
+            self._condition.notify()
+            return cursor.lastrowid
+
+    def is_full(self) -> bool:
+        with self._condition:
+            return self._is_full(self._get_connection())
+
+    def get(self, timeout: float) -> Optional[tuple[int, Callable, tuple]]:
+        deadline = time.monotonic() + timeout
+
+        with self._condition:
+            while True:
+                row = self._take_next_job()
+                if row is not None:
+                    job_id, payload = row
+                    try:
+                        func, args = pickle.loads(payload)
+                    except Exception as e:
+                        logger.error(f'Discarding job {job_id} that can not be loaded: {e}')
+                        self._delete_job(job_id)
+                        continue
+                    return job_id, func, args
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._condition.wait(min(remaining, self._poll_interval_seconds))
+
+    def ack(self, job_id: int):
+        with self._condition:
+            self._delete_job(job_id)
+
+    def _is_full(self, connection: sqlite3.Connection) -> bool:
+        (queued_jobs_count,) = connection.execute(
+            'SELECT COUNT(*) FROM jobs WHERE status = ?', (_QUEUED,)).fetchone()
+        return queued_jobs_count >= self._max_size
+
+    def _take_next_job(self) -> Optional[tuple[int, bytes]]:
+        connection = self._get_connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT id, payload FROM jobs WHERE status = ? ORDER BY id LIMIT 1', (_QUEUED,)).fetchone()
+            if row is not None:
+                connection.execute(
+                    'UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?', (_IN_PROGRESS, time.time(), row[0]))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return row
+
+    def _delete_job(self, job_id: int):
+        self._get_connection().execute('DELETE FROM jobs WHERE id = ?', (job_id,))
@@ -4,20 +4,24 @@ from logger_config import get_logger
 from app.models.text_detection.text_detection_inference_response \
     import TextDetectionInferenceResponse
 from app.models.bounding_box import BoundingBox
+from app.models.enums.line_detection_algorithm import LineDetectionAlgorithm
 from app.services.line_detection.line_segments_service \
-    import detect_line_segments
+    import detect_line_segments, merge_line_segments
 from app.services.line_detection.utils.line_detection_image_preprocessor \
     import LineDetectionImagePreprocessor
+from app.utils.image_context import ImageContext, decode_image
 from app.utils.image_utils import denormalize_coordinates
 from app.models.text_detection.text_recognized import TextRecognized
 from app.models.text_detection.symbol_and_text_associated \
     import SymbolAndTextAssociated
 import cv2
-from typing import Optional, Union
 import numpy as np
+from typing import Optional, Union
+from app.models.line_detection.line_segment import LineSegment
 from app.models.line_detection.line_detection_response \
     import LineDetectionInferenceResponse
 from app.config import config
+from app.services.job_profiler import profile_stage
 import time
 
 logger = get_logger(__name__)
@@ -25,7 +29,7 @@ logger = get_logger(__name__)
 
 def detect_lines(
     pid_id: str,
-    image_bytes: bytes,
+    image_bytes: Union[bytes, ImageContext],
     text_detection_results: TextDetectionInferenceResponse,
     enable_thinning: bool,
     threshold: int,
@@ -38,7 +42,8 @@ def detect_lines(
     image_width: int,
     debug_image_preprocessed_path: Optional[str],
     debug_image_preprocessed_before_thinning_path: Optional[str],
-    output_image_line_segments_path: Optional[str]
+    output_image_line_segments_path: Optional[str],
+    line_detection_algorithm: LineDetectionAlgorithm = LineDetectionAlgorithm.hough
 ) -> LineDetectionInferenceResponse:
     """
     Detects the line segments in the image using the text detection
@@ -48,7 +53,7 @@ def detect_lines(
     3. Preprocesses the image - clears the symbol and text bounding boxes,
                                 converts to grayscale,
                                 binarizes and thins(if chosen)
-    4. Detects the line segments
+    4. Detects the line segments with the line detection algorithm
     """
     start_time = time.time()
     # denormalize the symbol bounding box coordinates
@@ -66,11 +71,14 @@ def detect_lines(
             bounding_box_inclusive, image_height, image_width)
 
     # preprocess the image first for better line detection
-    preprocessed_image = LineDetectionImagePreprocessor.preprocess(
-        image_bytes,
-        denormalized_symbol_coords,
-        denormalized_text_coords
-    )
+    with profile_stage('line_detection.preprocess') as stage:
+        preprocessed_image = LineDetectionImagePreprocessor.preprocess(
+            image_bytes,
+            denormalized_symbol_coords,
+            denormalized_text_coords
+        )
+        stage.counts['symbols'] = len(denormalized_symbol_coords)
+        stage.counts['texts'] = len(denormalized_text_coords)
 
     # thin the image if chosen and upload the image before thinning
     # to blob storage for observing the difference
@@ -87,8 +95,9 @@ def detect_lines(
                     f'{e}'
                 )
 
-        preprocessed_image = \
-            LineDetectionImagePreprocessor.apply_thinning(preprocessed_image)
+        with profile_stage('line_detection.thinning'):
+            preprocessed_image = \
+                LineDetectionImagePreprocessor.apply_thinning(preprocessed_image)
 
     # Upload preprocessed image to blob storage for debugging
     if (config.debug):
@@ -100,25 +109,81 @@ def detect_lines(
                 f'{e}'
             )
 
-    # detect the line segments using hough transform
-    line_segments = detect_line_segments(
-        pid_id,
-        preprocessed_image,
-        image_height,
-        image_width,
-        max_line_gap,
-        threshold,
-        min_line_length,
-        rho,
-        theta_param,
-        bounding_box_inclusive_denormalized
-    )
+    # detect the line segments using hough transform, or morphology and hough transform
+    with profile_stage('line_detection.hough') as stage:
+        line_segments = detect_line_segments(
+            pid_id,
+            preprocessed_image,
+            image_height,
+            image_width,
+            max_line_gap,
+            threshold,
+            min_line_length,
+            rho,
+            theta_param,
+            bounding_box_inclusive_denormalized,
+            line_detection_algorithm
+        )
+        stage.counts['line_segments'] = len(line_segments)
+
+    # merge the duplicated and fragmented collinear line segments,
+    # each line segment is a node of the graph construction
+    line_segments_count_before_merging = len(line_segments)
+    if config.line_detection_merge_enabled:
+        with profile_stage('line_detection.merge') as stage:
+            line_segments = merge_line_segments(
+                line_segments,
+                image_height,
+                image_width,
+                config.line_detection_merge_distance_tolerance_pixels,
+                config.line_detection_merge_gap_tolerance_pixels,
+                config.line_detection_merge_angle_tolerance_degrees
+            )
+            stage.counts['line_segments'] = len(line_segments)
+
+    if output_image_line_segments_path is not None:
+        with profile_stage('line_detection.draw_output_image'):
+            line_segments_output_image = draw_line_segments_output_image(
+                image_bytes, line_segments, image_height, image_width)
+
+        # Upload the image with detected lines to blob storage
+        with profile_stage('line_detection.upload_output_image'):
+            try:
+                cv2.imwrite(output_image_line_segments_path, line_segments_output_image)
+            except Exception as e:
+                logger.error(
+                    'Exception while uploading image with detected lines'
+                    ' to blob storage: '
+                    f'{e}'
+                )
+    # log line segments count
+    logger.info(f'Line segments detected count: {line_segments_count_before_merging}, '
+                f'after merging: {len(line_segments)}')
 
-    # Decode the original image from bytes
-    line_segments_output_image = cv2.imdecode(
-        np.frombuffer(image_bytes, np.uint8),
-        cv2.IMREAD_COLOR
+    line_service_response = LineDetectionInferenceResponse(
+        line_segments=line_segments,
+        line_segments_count=len(line_segments),
+        line_segments_count_before_merging=line_segments_count_before_merging,
+        image_details=text_detection_results.image_details,
+        image_url=text_detection_results.image_url
     )
+    end_time = time.time()
+    logger.info(f'Time taken for line detection: {end_time - start_time} secs')
+
+    return line_service_response
+
+
+def draw_line_segments_output_image(
+    image_bytes: Union[bytes, ImageContext],
+    line_segments: list[LineSegment],
+    image_height: int,
+    image_width: int
+) -> np.ndarray:
+    """
+    Draws the line segments on the original image.
+    """
+    # Decode the original image from bytes, or copy it from the image context
+    line_segments_output_image = decode_image(image_bytes)
 
     # draw line segments on the original image
     for line_segment in line_segments:
@@ -139,28 +204,7 @@ def detect_lines(
         cv2.line(line_segments_output_image, (startX, startY),
                  (endX, endY), color, 2)
 
-    # Upload the image with detected lines to blob storage
-    try:
-        cv2.imwrite(output_image_line_segments_path, line_segments_output_image)
-    except Exception as e:
-        logger.error(
-            'Exception while uploading image with detected lines'
-            ' to blob storage: '
-            f'{e}'
-        )
-    # log line segments count
-    logger.info(f'Line segments detected count: {len(line_segments)}')
-
-    line_service_response = LineDetectionInferenceResponse(
-        line_segments=line_segments,
-        line_segments_count=len(line_segments),
-        image_details=text_detection_results.image_details,
-        image_url=text_detection_results.image_url
-    )
-    end_time = time.time()
-    logger.info(f'Time taken for line detection: {end_time - start_time} secs')
-
-    return line_service_response
+    return line_segments_output_image
 
 
 def _get_denormalized_items(
@@ -4,10 +4,14 @@ from logger_config import get_logger
 import time
 import cv2
 import numpy as np
+from app.config import config
 from app.models.line_detection.line_segment import LineSegment
 from app.models.bounding_box import BoundingBox
+from app.models.enums.line_detection_algorithm import LineDetectionAlgorithm
+from app.services.line_detection.utils.hough_tiling import detect_line_segments_in_tiles
+from app.services.line_detection.utils.line_segments_merging import merge_collinear_line_segments
+from app.services.line_detection.utils.morphology_line_extraction import extract_axis_aligned_line_segments
 from typing import Optional
-from app.utils.image_utils import is_data_element_within_bounding_box
 
 logger = get_logger(__name__)
 
@@ -23,6 +27,7 @@ def detect_line_segments(pid_id: str,
                          theta_param: float,
                          bounding_box_inclusive:
                              Optional[BoundingBox],
+                         algorithm: LineDetectionAlgorithm = LineDetectionAlgorithm.hough
                          ) -> list[LineSegment]:
 
     """
@@ -40,12 +45,119 @@ def detect_line_segments(pid_id: str,
     min_line_length: The min line length
     rho: The distance resolution of the accumulator in pixels
     theta_param: The angle resolution of the accumulator in radians
+    algorithm: The line detection algorithm, the Hough transform or the extraction
+    of the horizontal and vertical lines by morphology with the Hough transform of the remaining pixels
     :return: A list of line segments
     """
-    logger.info('Starting to detect line segments using Hough transform')
+    logger.info(f'Starting to detect line segments using {algorithm.value} algorithm')
 
     start = time.perf_counter()
 
+    if algorithm == LineDetectionAlgorithm.morphology:
+        # the horizontal and vertical lines are extracted without the Hough transform,
+        # which only runs on the residual pixels of the diagonal lines and short segments
+        min_run_length = max(config.line_detection_morphology_min_run_length_pixels, min_line_length or 0)
+        axis_aligned_line_segments, residual_image = extract_axis_aligned_line_segments(
+            preprocessed_image, min_run_length, max_line_gap)
+        residual_line_segments = _run_hough_transform(
+            residual_image, max_line_gap, threshold, min_line_length, rho, theta_param)
+        hough_results_line_segments = np.concatenate(
+            [axis_aligned_line_segments.reshape(-1, 1, 4), np.asarray(residual_line_segments, dtype=np.int32).reshape(-1, 1, 4)])
+    else:
+        hough_results_line_segments = _run_hough_transform(
+            preprocessed_image, max_line_gap, threshold, min_line_length, rho, theta_param)
+
+    line_segments = _sort_end_points(np.asarray(hough_results_line_segments, dtype=np.int32).reshape(-1, 4))
+
+    # include lines that are within defined bounding box's coordinates
+    # (topX, topY, bottomX and bottomY) to avoid noise for line detection
+    if bounding_box_inclusive is not None:
+        line_segments = line_segments[
+            (line_segments[:, 0] >= bounding_box_inclusive.topX)
+            & (line_segments[:, 2] <= bounding_box_inclusive.bottomX)
+            & (line_segments[:, 1] >= bounding_box_inclusive.topY)
+            & (line_segments[:, 3] <= bounding_box_inclusive.bottomY)]
+
+    output_line_segments = _to_normalized_line_segments(line_segments, image_height, image_width)
+
+    end = time.perf_counter()
+
+    logger.info('Completed detecting line segments after {:.4f} seconds'
+                .format(end - start))
+
+    return output_line_segments
+
+
+def merge_line_segments(line_segments: list[LineSegment],
+                        image_height: int,
+                        image_width: int,
+                        distance_tolerance: float,
+                        gap_tolerance: float,
+                        angle_tolerance_degrees: float
+                        ) -> list[LineSegment]:
+    """
+    Merges the nearly collinear line segments that overlap or are adjacent,
+    e.g. the duplicated and fragmented line segments of the Hough transform,
+    into single line segments
+    line_segments: The normalized line segments
+    image_height: The image height
+    image_width: The image width
+    distance_tolerance: The maximum distance in pixels of the end points
+    of a line segment to the line of the other one
+    gap_tolerance: The maximum gap in pixels between the line segments along their line
+    angle_tolerance_degrees: The maximum angle in degrees between the line segments
+    :return: A list of line segments, the line segments that are not merged are unchanged
+    """
+    logger.info('Starting to merge collinear line segments')
+
+    start = time.perf_counter()
+
+    # the line segments are merged in pixels, the coordinates of the detected line segments are integers
+    denormalized_line_segments = np.rint(np.array(
+        [[line.startX * image_width, line.startY * image_height, line.endX * image_width, line.endY * image_height]
+         for line in line_segments], dtype=np.float64).reshape(-1, 4)).astype(np.int32)
+    merged_line_segments = merge_collinear_line_segments(
+        denormalized_line_segments, distance_tolerance, gap_tolerance, angle_tolerance_degrees)
+
+    output_line_segments = _to_normalized_line_segments(
+        _sort_end_points(merged_line_segments), image_height, image_width)
+
+    end = time.perf_counter()
+
+    logger.info('Completed merging {} line segments into {} line segments after {:.4f} seconds'
+                .format(len(line_segments), len(output_line_segments), end - start))
+
+    return output_line_segments
+
+
+def _sort_end_points(line_segments: np.ndarray) -> np.ndarray:
+    '''sorting start and end points of the line segments (x1, y1, x2, y2) such that
+    left most point is start and right most is end for horizontal and angled lines
+    and top most point is start and bottom most is end for vertical lines
+    this will help with line flow'''
+    x1, y1, x2, y2 = line_segments.T
+    swap = (x1 > x2) | ((x1 == x2) & (y1 > y2))
+    return np.where(swap[:, None], line_segments[:, [2, 3, 0, 1]], line_segments)
+
+
+def _to_normalized_line_segments(line_segments: np.ndarray,
+                                 image_height: int,
+                                 image_width: int) -> list[LineSegment]:
+    '''normalises the coordinates of the line segments (x1, y1, x2, y2) at once,
+    the line segment models are built without validation from the normalised floats'''
+    normalized_line_segments = line_segments / np.array([image_width, image_height, image_width, image_height])
+    return [
+        LineSegment.construct(startX=startX, startY=startY, endX=endX, endY=endY)
+        for startX, startY, endX, endY in normalized_line_segments.tolist()
+    ]
+
+
+def _run_hough_transform(preprocessed_image: np.ndarray,
+                         max_line_gap: int,
+                         threshold: int,
+                         min_line_length: int,
+                         rho: float,
+                         theta_param: float):
     # Apply the Hough line transform to detect lines
     # rho: Distance resolution of the accumulator in pixels.
     # theta: Angle resolution of the accumulator in radians.
@@ -55,61 +167,31 @@ def detect_line_segments(pid_id: str,
     # Line segments shorter than this are rejected.
     # maxLineGap: Maximum allowed gap between line segments
     # to treat them as a single line.
-    hough_results_line_segments = cv2.HoughLinesP(
-        preprocessed_image, rho=rho,
-        theta=np.pi/theta_param,
-        threshold=threshold,
-        minLineLength=min_line_length,
-        maxLineGap=max_line_gap
-    )
-
-    output_line_segments = []
-
-    for line in hough_results_line_segments:
-        x1, y1, x2, y2 = line[0]
-
-        '''sorting start and end points of the line segment such that
-        left most point is start and right most is end for horizontal lines
-        and top most point is start and bottom most is end for vertical lines
-        this will help with line flow'''
-        # Check if the line segment is horizontal
-        if y1 == y2:
-            if x1 > x2:
-                x1, x2 = x2, x1
-                y1, y2 = y2, y1
-        # Check if the line segment is vertical
-        elif x1 == x2:
-            if y1 > y2:
-                x1, x2 = x2, x1
-                y1, y2 = y2, y1
-        # The line segment is angled
-        else:
-            if x1 > x2:
-                x1, x2 = x2, x1
-                y1, y2 = y2, y1
-            elif x1 == x2 and y1 > y2:
-                x1, x2 = x2, x1
-                y1, y2 = y2, y1
-
-        '''include lines that are within defined
-        bounding box's coordinates (topX, topY, bottomX and bottomY)
-        to avoid noise for line detection'''
-        if is_data_element_within_bounding_box(bounding_box_inclusive, x1, y1, x2, y2):
-            # Add the detected line to the list of line segments
-            # and also normalise the coordinates
-            output_line_segments.append(LineSegment(
-                startX=x1/image_width,
-                startY=y1/image_height,
-                endX=x2/image_width,
-                endY=y2/image_height
-            ))
-
-    end = time.perf_counter()
+    if config.line_detection_hough_tiles_enabled:
+        # the tiles of very large sheets are processed in parallel by the worker processes,
+        # with a much smaller accumulator than the whole image
+        hough_results_line_segments = detect_line_segments_in_tiles(
+            preprocessed_image, rho=rho,
+            theta=np.pi/theta_param,
+            threshold=threshold,
+            min_line_length=min_line_length,
+            max_line_gap=max_line_gap,
+            tile_size=config.line_detection_hough_tile_size_pixels,
+            tile_overlap=config.line_detection_hough_tile_overlap_pixels
+        )
+    else:
+        hough_results_line_segments = cv2.HoughLinesP(
+            preprocessed_image, rho=rho,
+            theta=np.pi/theta_param,
+            threshold=threshold,
+            minLineLength=min_line_length,
+            maxLineGap=max_line_gap
+        )
 
-    logger.info('Completed detecting line segments after {:.4f} seconds'
-                .format(end - start))
+    if hough_results_line_segments is None:
+        hough_results_line_segments = []
 
-    return output_line_segments
+    return hough_results_line_segments
 
 
 if __name__ == "__main__":
@@ -0,0 +1,387 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, Optional
+import cv2
+import numpy as np
+from app.config import config
+from app.models.enums.line_detection_algorithm import LineDetectionAlgorithm
+from app.models.line_detection.line_segment import LineSegment
+from app.services.graph_construction.candidate_matching_pool import candidate_matching_pool, get_candidate_matching_workers_count
+from app.services.graph_construction.tools.synthetic_pid_generator import generate_synthetic_sheet
+from app.services.line_detection.line_detection_service import _get_denormalized_items
+from app.services.line_detection.line_segments_service import detect_line_segments, merge_line_segments
+from app.services.line_detection.utils.line_detection_image_preprocessor import LineDetectionImagePreprocessor
+from app.utils.cpu_utils import get_available_cpu_count
+
+
+HOUGH = 'hough'
+HOUGH_TILED = 'hough_tiled'
+MORPHOLOGY = 'morphology'
+DETECTORS = [HOUGH, HOUGH_TILED, MORPHOLOGY]
+DEFAULT_SIZES = [500, 2000]
+# the line segments of two detectors match when they are this close, the Hough transform is not exact
+DEFAULT_TOLERANCE_PIXELS = 2
+
+
+def line_segments_to_array(line_segments: list[LineSegment], image_height: int, image_width: int) -> np.ndarray:
+    '''Denormalizes the line segments into an (N, 4) array of (x1, y1, x2, y2) pixel coordinates.
+
+    :param line_segments: The normalized line segments
+    :type line_segments: list[LineSegment]
+    :param image_height: The height of the image, in pixels
+    :type image_height: int
+    :param image_width: The width of the image, in pixels
+    :type image_width: int
+    :return: The line segments, in pixels
+    :rtype: np.ndarray
+    '''
+    coordinates = np.array([[line.startX, line.startY, line.endX, line.endY] for line in line_segments],
+                           dtype=np.float64).reshape(-1, 4)
+    return np.rint(coordinates * [image_width, image_height, image_width, image_height]).astype(np.int32)
+
+
+def rasterize_line_segments(line_segments: np.ndarray, image_height: int, image_width: int) -> np.ndarray:
+    '''Draws the line segments on a blank binary image, one pixel wide.
+
+    :param line_segments: The line segments (x1, y1, x2, y2), in pixels
+    :type line_segments: np.ndarray
+    :param image_height: The height of the image, in pixels
+    :type image_height: int
+    :param image_width: The width of the image, in pixels
+    :type image_width: int
+    :return: The binary image of the line segments
+    :rtype: np.ndarray
+    '''
+    image = np.zeros((image_height, image_width), dtype=np.uint8)
+    for x1, y1, x2, y2 in np.asarray(line_segments).reshape(-1, 4):
+        cv2.line(image, (int(x1), int(y1)), (int(x2), int(y2)), 255, 1)
+    return image
+
+
+def compare_line_segments(
+    reference_line_segments: np.ndarray,
+    line_segments: np.ndarray,
+    image_height: int,
+    image_width: int,
+    tolerance_pixels: int = DEFAULT_TOLERANCE_PIXELS
+) -> dict:
+    '''Compares the pixels covered by two sets of line segments.
+
+    The line segments are compared by the pixels they cover rather than one by one, since two detectors can split
+    the same line into different line segments.
+
+    :param reference_line_segments: The reference line segments (x1, y1, x2, y2), in pixels
+    :type reference_line_segments: np.ndarray
+    :param line_segments: The compared line segments (x1, y1, x2, y2), in pixels
+    :type line_segments: np.ndarray
+    :param image_height: The height of the image, in pixels
+    :type image_height: int
+    :param image_width: The width of the image, in pixels
+    :type image_width: int
+    :param tolerance_pixels: The distance under which the pixels of the two sets match
+    :type tolerance_pixels: int
+    :return: The recall, the ratio of the reference pixels matched by the compared line segments, and the precision,
+        the ratio of the pixels of the compared line segments matched by the reference
+    :rtype: dict
+    '''
+    reference = rasterize_line_segments(reference_line_segments, image_height, image_width)
+    compared = rasterize_line_segments(line_segments, image_height, image_width)
+    kernel = np.ones((2 * tolerance_pixels + 1, 2 * tolerance_pixels + 1), dtype=np.uint8)
+
+    reference_pixels = np.count_nonzero(reference)
+    compared_pixels = np.count_nonzero(compared)
+    return {
+        'recall': np.count_nonzero(reference & cv2.dilate(compared, kernel)) / reference_pixels if reference_pixels else 1.0,
+        'precision': np.count_nonzero(compared & cv2.dilate(reference, kernel)) / compared_pixels if compared_pixels else 1.0,
+    }
+
+
+def compute_coverage(
+    preprocessed_image: np.ndarray,
+    line_segments: np.ndarray,
+    tolerance_pixels: int = DEFAULT_TOLERANCE_PIXELS
+) -> float:
+    '''Computes the ratio of the pixels of the preprocessed image covered by the line segments.
+
+    Unlike the comparison with a reference detector, it does not penalize the lines that the reference misses.
+
+    :param preprocessed_image: The preprocessed image
+    :type preprocessed_image: np.ndarray
+    :param line_segments: The line segments (x1, y1, x2, y2), in pixels
+    :type line_segments: np.ndarray
+    :param tolerance_pixels: The distance under which a pixel is covered by a line segment
+    :type tolerance_pixels: int
+    :return: The ratio of the pixels of the preprocessed image within tolerance_pixels of a line segment
+    :rtype: float
+    '''
+    image_height, image_width = preprocessed_image.shape[:2]
+    kernel = np.ones((2 * tolerance_pixels + 1, 2 * tolerance_pixels + 1), dtype=np.uint8)
+    covered = cv2.dilate(rasterize_line_segments(line_segments, image_height, image_width), kernel)
+    pixels = np.count_nonzero(preprocessed_image)
+    return np.count_nonzero((preprocessed_image > 0) & (covered > 0)) / pixels if pixels else 1.0
+
+
+@contextmanager
+def line_detector(detector: str) -> Iterator[None]:
+    '''Configures the line segments detection to use the given detector.'''
+    tiles_enabled = config.line_detection_hough_tiles_enabled
+    config.line_detection_hough_tiles_enabled = detector == HOUGH_TILED
+    try:
+        yield
+    finally:
+        config.line_detection_hough_tiles_enabled = tiles_enabled
+
+
+def run_line_segments_detection(preprocessed_image: np.ndarray, detector: str) -> list[LineSegment]:
+    '''Detects the line segments of the preprocessed image with the detector and the configured Hough parameters.
+
+    :param preprocessed_image: The preprocessed image
+    :type preprocessed_image: np.ndarray
+    :param detector: The detector
+    :type detector: str
+    :return: The line segments
+    :rtype: list[LineSegment]
+    '''
+    image_height, image_width = preprocessed_image.shape[:2]
+    with line_detector(detector):
+        return detect_line_segments(
+            'benchmark',
+            preprocessed_image,
+            image_height,
+            image_width,
+            config.line_detection_hough_max_line_gap,
+            config.line_detection_hough_threshold,
+            config.line_detection_hough_min_line_length,
+            config.line_detection_hough_rho,
+            config.line_detection_hough_theta,
+            None,
+            LineDetectionAlgorithm.morphology if detector == MORPHOLOGY else LineDetectionAlgorithm.hough)
+
+
+def load_preprocessed_images(
+    sizes: list[int],
+    image_paths: list[str],
+    seed: int,
+    image_width: int,
+    image_height: int
+) -> Iterator[tuple[str, np.ndarray]]:
+    '''Preprocesses the synthetic sheets of each size and the given images like the line detection does.
+
+    :return: The name and preprocessed image of each sheet
+    :rtype: Iterator[tuple[str, np.ndarray]]
+    '''
+    for size in sizes:
+        sheet = generate_synthetic_sheet(
+            line_segments_count=size,
+            symbols_count=max(size // 8, 2),
+            texts_count=size // 5,
+            arrows_count=size // 50,
+            t_junctions_count=size // 20,
+            image_width=image_width,
+            image_height=image_height,
+            seed=seed)
+        request = sheet.graph_construction_request
+        preprocessed_image = LineDetectionImagePreprocessor.preprocess(
+            sheet.image_bytes,
+            _get_denormalized_items(request.text_and_symbols_associated_list, image_height, image_width),
+            _get_denormalized_items(request.all_text_list, image_height, image_width))
+        yield f'synthetic_{size}', _thin(preprocessed_image)
+
+    for image_path in image_paths:
+        with open(image_path, 'rb') as f:
+            image_bytes = f.read()
+        # the symbols and text of the image are not known, they are kept
+        yield os.path.basename(image_path), _thin(LineDetectionImagePreprocessor.preprocess(image_bytes, [], []))
+
+
+def _thin(preprocessed_image: np.ndarray) -> np.ndarray:
+    if config.enable_thinning_preprocessing_line_detection:
+        return LineDetectionImagePreprocessor.apply_thinning(preprocessed_image)
+    return preprocessed_image
+
+
+def run_benchmark(
+    sizes: list[int],
+    image_paths: list[str],
+    detectors: list[str],
+    repeat: int,
+    seed: int,
+    image_width: int,
+    image_height: int,
+    tolerance_pixels: int,
+    merge: bool = False
+) -> dict:
+    '''Runs the line segments detection of each sheet with each detector, and compares them to the first detector.
+
+    :param sizes: The numbers of line segments of the synthetic sheets
+    :type sizes: list[int]
+    :param image_paths: The paths of P&ID images to detect the line segments of too
+    :type image_paths: list[str]
+    :param detectors: The detectors to run, the first one is the reference of the comparison
+    :type detectors: list[str]
+    :param repeat: The number of runs of each detector per sheet
+    :type repeat: int
+    :param seed: The seed of the sheets generator
+    :type seed: int
+    :param image_width: The width of the synthetic sheets, in pixels
+    :type image_width: int
+    :param image_height: The height of the synthetic sheets, in pixels
+    :type image_height: int
+    :param tolerance_pixels: The distance under which the pixels of two detectors match
+    :type tolerance_pixels: int
+    :param merge: Whether the collinear line segments of each detector are merged, like LINE_DETECTION_MERGE_ENABLED
+    :type merge: bool
+    :return: The benchmark report
+    :rtype: dict
+    '''
+    runs = []
+    for name, preprocessed_image in load_preprocessed_images(sizes, image_paths, seed, image_width, image_height):
+        height, width = preprocessed_image.shape[:2]
+        run = {'sheet': name, 'image_width': width, 'image_height': height, 'detectors': {}}
+        reference: Optional[np.ndarray] = None
+        for detector in detectors:
+            seconds = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                line_segments = run_line_segments_detection(preprocessed_image, detector)
+                line_segments_count_before_merging = len(line_segments)
+                if merge:
+                    line_segments = merge_line_segments(
+                        line_segments,
+                        height,
+                        width,
+                        config.line_detection_merge_distance_tolerance_pixels,
+                        config.line_detection_merge_gap_tolerance_pixels,
+                        config.line_detection_merge_angle_tolerance_degrees)
+                seconds.append(time.perf_counter() - start)
+
+            line_segments = line_segments_to_array(line_segments, height, width)
+            result = {
+                'seconds_median': statistics.median(seconds),
+                'line_segments': len(line_segments),
+                'coverage': compute_coverage(preprocessed_image, line_segments, tolerance_pixels)
+            }
+            if merge:
+                result['line_segments_before_merging'] = line_segments_count_before_merging
+            if reference is None:
+                reference = line_segments
+            else:
+                result.update(compare_line_segments(reference, line_segments, height, width, tolerance_pixels))
+                result['speedup'] = run['detectors'][detectors[0]]['seconds_median'] / result['seconds_median']
+            run['detectors'][detector] = result
+        runs.append(run)
+
+    return {
+        'created_at': datetime.utcnow().isoformat(),
+        'environment': {
+            'python_version': platform.python_version(),
+            'platform': platform.platform(),
+            'available_cpu_count': get_available_cpu_count(),
+            'candidate_matching_workers_count': get_candidate_matching_workers_count(config),
+        },
+        'parameters': {
+            'sizes': sizes,
+            'image_paths': image_paths,
+            'detectors': detectors,
+            'repeat': repeat,
+            'seed': seed,
+            'image_width': image_width,
+            'image_height': image_height,
+            'tolerance_pixels': tolerance_pixels,
+            'merge': merge,
+            'hough_tile_size_pixels': config.line_detection_hough_tile_size_pixels,
+            'hough_tile_overlap_pixels': config.line_detection_hough_tile_overlap_pixels,
+        },
+        'runs': runs
+    }
+
+
+def _get_args():
+    parser = argparse.ArgumentParser(description='Benchmarks and compares the line segments detectors.')
+    parser.add_argument(
+        '--sizes',
+        dest='sizes',
+        type=lambda value: [int(size) for size in value.split(',') if size],
+        default=DEFAULT_SIZES,
+        help='Comma separated numbers of line segments of the generated sheets'
+    )
+    parser.add_argument(
+        '--image-paths',
+        dest='image_paths',
+        type=lambda value: value.split(','),
+        default=[],
+        help='Comma separated paths of P&ID images to detect the line segments of too'
+    )
+    parser.add_argument(
+        '--detectors',
+        dest='detectors',
+        type=lambda value: value.split(','),
+        default=DETECTORS,
+        help=f'Comma separated detectors to run, the first one is the reference: {", ".join(DETECTORS)}'
+    )
+    parser.add_argument('--repeat', dest='repeat', type=int, default=3, help='Number of runs of each detector per sheet')
+    parser.add_argument('--seed', dest='seed', type=int, default=0, help='Seed of the sheets generator')
+    parser.add_argument('--image-width', dest='image_width', type=int, default=7000, help='Width of the sheets, in pixels')
+    parser.add_argument('--image-height', dest='image_height', type=int, default=5000, help='Height of the sheets, in pixels')
+    parser.add_argument('--tile-size', dest='tile_size', type=int, default=None,
+                        help='Size of the Hough tiles, defaults to LINE_DETECTION_HOUGH_TILE_SIZE_PIXELS')
+    parser.add_argument('--tile-overlap', dest='tile_overlap', type=int, default=None,
+                        help='Overlap of the Hough tiles, defaults to LINE_DETECTION_HOUGH_TILE_OVERLAP_PIXELS')
+    parser.add_argument('--tolerance', dest='tolerance_pixels', type=int, default=DEFAULT_TOLERANCE_PIXELS,
+                        help='Distance in pixels under which the line segments of two detectors match')
+    parser.add_argument('--merge', dest='merge', action='store_true',
+                        help='Merge the collinear line segments of each detector, like LINE_DETECTION_MERGE_ENABLED')
+    parser.add_argument('--output-path', dest='output_path', type=str, default=None,
+                        help='Path of the JSON report, printed to stdout when not set')
+    parser.add_argument('--verbose', dest='verbose', action='store_true', help='Keep the info logs of the detectors')
+    args = parser.parse_args()
+
+    unknown_detectors = set(args.detectors) - set(DETECTORS)
+    if unknown_detectors:
+        parser.error(f'Unknown detectors: {", ".join(sorted(unknown_detectors))}')
+
+    return args
+
+
+if __name__ == '__main__':
+    args = _get_args()
+
+    if not args.verbose:
+        logging.disable(logging.INFO)
+    if args.tile_size is not None:
+        config.line_detection_hough_tile_size_pixels = args.tile_size
+    if args.tile_overlap is not None:
+        config.line_detection_hough_tile_overlap_pixels = args.tile_overlap
+
+    candidate_matching_pool.init()
+    try:
+        report = run_benchmark(
+            sizes=args.sizes,
+            image_paths=args.image_paths,
+            detectors=args.detectors,
+            repeat=args.repeat,
+            seed=args.seed,
+            image_width=args.image_width,
+            image_height=args.image_height,
+            tolerance_pixels=args.tolerance_pixels,
+            merge=args.merge)
+    finally:
+        candidate_matching_pool.shutdown()
+
+    if args.output_path is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output_path)), exist_ok=True)
+        with open(args.output_path, 'w') as f:
+            json.dump(report, f, indent=2)
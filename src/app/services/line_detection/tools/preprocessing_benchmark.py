@@ -0,0 +1,201 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+import cv2
+import numpy as np
+from app.models.bounding_box import BoundingBox
+from app.services.base_image_preprocessor import to_binary, to_grayscale
+from app.services.line_detection.utils.line_detection_image_preprocessor import LineDetectionImagePreprocessor
+from app.utils.image_context import decode_image
+
+
+DEFAULT_TEXT_BOXES_COUNTS = [1000, 5000]
+
+
+def generate_sheet(
+    text_boxes_count: int,
+    symbol_boxes_count: int,
+    image_width: int,
+    image_height: int,
+    seed: int
+) -> tuple[bytes, list[BoundingBox], list[BoundingBox]]:
+    '''Generates a white sheet with lines and text, and the bounding boxes of its symbols and text.
+
+    :return: The PNG image bytes, the symbol bounding boxes and the text bounding boxes, in pixels
+    :rtype: tuple[bytes, list[BoundingBox], list[BoundingBox]]
+    '''
+    random = np.random.default_rng(seed)
+    image = np.full((image_height, image_width, 3), 255, dtype=np.uint8)
+    for _ in range(text_boxes_count // 5):
+        x, y = int(random.integers(0, image_width)), int(random.integers(0, image_height))
+        if random.random() < 0.5:
+            cv2.line(image, (x, y), (x + int(random.integers(50, 1000)), y), (0, 0, 0), 2)
+        else:
+            cv2.line(image, (x, y), (x, y + int(random.integers(50, 1000))), (0, 0, 0), 2)
+
+    def boxes(count: int, max_width: int, max_height: int, draw_text: bool) -> list[BoundingBox]:
+        bounding_boxes = []
+        for _ in range(count):
+            width, height = int(random.integers(20, max_width)), int(random.integers(10, max_height))
+            left, top = float(random.uniform(0, image_width - width)), float(random.uniform(0, image_height - height))
+            if draw_text:
+                cv2.putText(image, 'TAG-01', (int(left), int(top + height)), cv2.FONT_HERSHEY_SIMPLEX, height / 30, (0, 0, 0), 1)
+            else:
+                cv2.circle(image, (int(left + width / 2), int(top + height / 2)), min(width, height) // 2, (0, 0, 0), 2)
+            bounding_boxes.append(BoundingBox(topX=left, topY=top, bottomX=left + width, bottomY=top + height))
+        return bounding_boxes
+
+    symbol_bounding_boxes = boxes(symbol_boxes_count, 150, 150, draw_text=False)
+    text_bounding_boxes = boxes(text_boxes_count, 200, 40, draw_text=True)
+    return cv2.imencode('.png', image)[1].tobytes(), symbol_bounding_boxes, text_bounding_boxes
+
+
+def preprocess_per_box(
+    image_bytes: bytes,
+    symbol_bounding_boxes: list[BoundingBox],
+    text_bounding_boxes: list[BoundingBox]
+) -> np.ndarray:
+    '''Preprocesses the image like the line detection did before the grayscale masking: a polygon is filled
+    per bounding box on the BGR image, with the most frequent value of its blue channel, before the conversion
+    to grayscale and the binarization.
+
+    :return: The preprocessed image
+    :rtype: np.ndarray
+    '''
+    image = decode_image(image_bytes)
+    for bounding_boxes in [symbol_bounding_boxes, text_bounding_boxes]:
+        background_value = int(np.argmax(cv2.calcHist([image], [0], None, [256], [0, 256])))
+        for bb in bounding_boxes:
+            points = np.array([[bb.bottomX, bb.topY],
+                               [bb.bottomX, bb.bottomY],
+                               [bb.topX, bb.bottomY],
+                               [bb.topX, bb.topY]],
+                              np.int32)
+            cv2.fillPoly(image, [points], (background_value, background_value, background_value))
+    return to_binary(to_grayscale(image))
+
+
+def run_benchmark(
+    text_boxes_counts: list[int],
+    symbol_boxes_count: int,
+    repeat: int,
+    seed: int,
+    image_width: int,
+    image_height: int
+) -> dict:
+    '''Runs the per box and the grayscale masking preprocessing of a sheet per number of text boxes,
+    and compares their preprocessed images.
+
+    :param text_boxes_counts: The numbers of text boxes of the sheets
+    :type text_boxes_counts: list[int]
+    :param symbol_boxes_count: The number of symbol boxes of the sheets
+    :type symbol_boxes_count: int
+    :param repeat: The number of runs of each preprocessing per sheet
+    :type repeat: int
+    :param seed: The seed of the sheets generator
+    :type seed: int
+    :param image_width: The width of the sheets, in pixels
+    :type image_width: int
+    :param image_height: The height of the sheets, in pixels
+    :type image_height: int
+    :return: The benchmark report
+    :rtype: dict
+    '''
+    preprocessings = {
+        'per_box': preprocess_per_box,
+        'grayscale_masking': LineDetectionImagePreprocessor.preprocess
+    }
+
+    runs = []
+    for text_boxes_count in text_boxes_counts:
+        image_bytes, symbol_bounding_boxes, text_bounding_boxes = generate_sheet(
+            text_boxes_count, symbol_boxes_count, image_width, image_height, seed)
+        run = {'text_boxes': text_boxes_count, 'symbol_boxes': symbol_boxes_count, 'preprocessings': {}}
+
+        # the decoding of the image is common to both preprocessings
+        seconds = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            decode_image(image_bytes)
+            seconds.append(time.perf_counter() - start)
+        run['decoding_seconds_median'] = statistics.median(seconds)
+
+        preprocessed_images = {}
+        for name, preprocess in preprocessings.items():
+            seconds = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                preprocessed_images[name] = preprocess(image_bytes, symbol_bounding_boxes, text_bounding_boxes)
+                seconds.append(time.perf_counter() - start)
+            run['preprocessings'][name] = {'seconds_median': statistics.median(seconds)}
+
+        reference, result = preprocessed_images['per_box'], preprocessed_images['grayscale_masking']
+        run['preprocessings']['grayscale_masking']['speedup'] = \
+            run['preprocessings']['per_box']['seconds_median'] / run['preprocessings']['grayscale_masking']['seconds_median']
+        run['different_pixels'] = int(np.count_nonzero(reference != result))
+        runs.append(run)
+
+    return {
+        'created_at': datetime.utcnow().isoformat(),
+        'environment': {
+            'python_version': platform.python_version(),
+            'platform': platform.platform(),
+            'opencv_version': cv2.__version__,
+        },
+        'parameters': {
+            'text_boxes_counts': text_boxes_counts,
+            'symbol_boxes_count': symbol_boxes_count,
+            'repeat': repeat,
+            'seed': seed,
+            'image_width': image_width,
+            'image_height': image_height,
+        },
+        'runs': runs
+    }
+
+
+def _get_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmarks the clearing of the symbol and text boxes of the line detection preprocessing.')
+    parser.add_argument(
+        '--text-boxes',
+        dest='text_boxes_counts',
+        type=lambda value: [int(count) for count in value.split(',') if count],
+        default=DEFAULT_TEXT_BOXES_COUNTS,
+        help='Comma separated numbers of text boxes of the generated sheets'
+    )
+    parser.add_argument('--symbol-boxes', dest='symbol_boxes_count', type=int, default=300, help='Number of symbol boxes of the sheets')
+    parser.add_argument('--repeat', dest='repeat', type=int, default=5, help='Number of runs of each preprocessing per sheet')
+    parser.add_argument('--seed', dest='seed', type=int, default=0, help='Seed of the sheets generator')
+    parser.add_argument('--image-width', dest='image_width', type=int, default=7000, help='Width of the sheets, in pixels')
+    parser.add_argument('--image-height', dest='image_height', type=int, default=5000, help='Height of the sheets, in pixels')
+    parser.add_argument('--output-path', dest='output_path', type=str, default=None,
+                        help='Path of the JSON report, printed to stdout when not set')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = _get_args()
+
+    report = run_benchmark(
+        text_boxes_counts=args.text_boxes_counts,
+        symbol_boxes_count=args.symbol_boxes_count,
+        repeat=args.repeat,
+        seed=args.seed,
+        image_width=args.image_width,
+        image_height=args.image_height)
+
+    if args.output_path is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output_path)), exist_ok=True)
+        with open(args.output_path, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,236 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from typing import Optional, Tuple
+import cv2
+import numpy as np
+from app.services.graph_construction.candidate_matching_pool import candidate_matching_pool
+from app.services.line_detection.utils.line_segments_merging import find_overlapping_pairs, merge_line_segment_pairs
+from app.utils.shared_memory_utils import copy_arrays_to_shared_memory, read_array_region_from_shared_memory
+from logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# the segments of two tiles are stitched when the end points of the shorter one are this close to the line
+# of the longer one, and when they overlap or are this close along the line
+STITCH_DISTANCE_TOLERANCE_PIXELS = 2.0
+# sine of the largest angle between two segments of two tiles that are stitched, about 3 degrees
+STITCH_ANGLE_TOLERANCE_SINE = 0.05
+
+
+def build_tiles(
+    image_height: int,
+    image_width: int,
+    tile_size: int
+) -> list[Tuple[int, int, int, int]]:
+    '''Splits the image into a grid of tiles of at most tile_size pixels.
+
+    :param image_height: The height of the image, in pixels
+    :type image_height: int
+    :param image_width: The width of the image, in pixels
+    :type image_width: int
+    :param tile_size: The size of the tiles, in pixels
+    :type tile_size: int
+    :return: The tiles (left, top, right, bottom), in row-major order, the right and bottom coordinates are excluded
+    :rtype: list[Tuple[int, int, int, int]]
+    '''
+    return [
+        (left, top, min(left + tile_size, image_width), min(top + tile_size, image_height))
+        for top in range(0, image_height, tile_size)
+        for left in range(0, image_width, tile_size)
+    ]
+
+
+def detect_line_segments_in_tiles(
+    preprocessed_image: np.ndarray,
+    rho: float,
+    theta: float,
+    threshold: int,
+    min_line_length: Optional[int],
+    max_line_gap: Optional[int],
+    tile_size: int,
+    tile_overlap: int
+) -> np.ndarray:
+    '''Runs the Hough line transform on overlapping tiles of the image, in parallel, and stitches the line segments.
+
+    Each tile is extended by tile_overlap pixels on each side and processed by a worker process of the candidate
+    matching pool, which reads it from the image copied once into shared memory. The accumulator of a tile is much
+    smaller than the accumulator of the whole image. The line segments crossing a tile border are detected by both
+    tiles, up to tile_overlap pixels past the border, and are stitched back into single line segments.
+
+    :param preprocessed_image: The binary image
+    :type preprocessed_image: np.ndarray
+    :param rho: The distance resolution of the accumulator in pixels
+    :type rho: float
+    :param theta: The angle resolution of the accumulator in radians
+    :type theta: float
+    :param threshold: The accumulator threshold parameter
+    :type threshold: int
+    :param min_line_length: The min line length
+    :type min_line_length: Optional[int]
+    :param max_line_gap: The maximum allowed gap between line segments to treat them as a single line
+    :type max_line_gap: Optional[int]
+    :param tile_size: The size of the tiles, in pixels
+    :type tile_size: int
+    :param tile_overlap: The number of pixels the tiles are extended by on each side, more than max_line_gap
+    :type tile_overlap: int
+    :return: The line segments (x1, y1, x2, y2) in the (N, 1, 4) layout of cv2.HoughLinesP
+    :rtype: np.ndarray
+    '''
+    image_height, image_width = preprocessed_image.shape[:2]
+    tiles = build_tiles(image_height, image_width, tile_size)
+    hough_parameters = (rho, theta, threshold, min_line_length, max_line_gap)
+
+    if len(tiles) == 1:
+        _, line_segments = detect_tile_line_segments_in_image(preprocessed_image, 0, 0, 0, *hough_parameters)
+        return line_segments.reshape(-1, 1, 4)
+
+    shm, layout = copy_arrays_to_shared_memory({'image': preprocessed_image})
+    try:
+        results = candidate_matching_pool.run(detect_tile_line_segments, [
+            (shm.name, layout, tile_index, _extend_tile(tile, tile_overlap, image_height, image_width), *hough_parameters)
+            for tile_index, tile in enumerate(tiles)])
+    finally:
+        shm.close()
+        shm.unlink()
+
+    # the pool returns the tiles in completion order
+    tiles_line_segments = [line_segments for _, line_segments in sorted(results, key=lambda result: result[0])]
+    line_segments = stitch_tiles_line_segments(tiles_line_segments, tiles, tile_overlap, image_height, image_width)
+    logger.info(f'Detected {len(line_segments)} line segments in {len(tiles)} tiles')
+    return line_segments.reshape(-1, 1, 4)
+
+
+def detect_tile_line_segments(
+    shared_memory_name: str,
+    layout: dict,
+    tile_index: int,
+    region: Tuple[int, int, int, int],
+    rho: float,
+    theta: float,
+    threshold: int,
+    min_line_length: Optional[int],
+    max_line_gap: Optional[int]
+) -> Tuple[int, np.ndarray]:
+    '''Runs the Hough line transform on a region of the image in shared memory, in a candidate matching pool worker.
+
+    :param shared_memory_name: Name of the shared memory block with the image
+    :param layout: Layout of the shared memory block
+    :param tile_index: The index of the tile, returned with its line segments
+    :param region: The region (left, top, right, bottom) of the tile, with its overlap
+    :return: The tile index and its line segments (x1, y1, x2, y2) in image coordinates
+    '''
+    left, top, right, bottom = region
+    tile_image = read_array_region_from_shared_memory(shared_memory_name, layout, 'image',
+                                                      (slice(top, bottom), slice(left, right)))
+    return detect_tile_line_segments_in_image(tile_image, tile_index, left, top,
+                                              rho, theta, threshold, min_line_length, max_line_gap)
+
+
+def detect_tile_line_segments_in_image(
+    tile_image: np.ndarray,
+    tile_index: int,
+    left: int,
+    top: int,
+    rho: float,
+    theta: float,
+    threshold: int,
+    min_line_length: Optional[int],
+    max_line_gap: Optional[int]
+) -> Tuple[int, np.ndarray]:
+    line_segments = cv2.HoughLinesP(
+        tile_image, rho=rho,
+        theta=theta,
+        threshold=threshold,
+        minLineLength=min_line_length,
+        maxLineGap=max_line_gap
+    )
+    if line_segments is None:
+        return tile_index, np.empty((0, 4), dtype=np.int32)
+
+    line_segments = line_segments.reshape(-1, 4).astype(np.int32)
+    line_segments[:, [0, 2]] += left
+    line_segments[:, [1, 3]] += top
+    return tile_index, line_segments
+
+
+def stitch_tiles_line_segments(
+    tiles_line_segments: list[np.ndarray],
+    tiles: list[Tuple[int, int, int, int]],
+    tile_overlap: int,
+    image_height: int,
+    image_width: int
+) -> np.ndarray:
+    '''Stitches the line segments of overlapping tiles.
+
+    The line segments of a tile that are within tile_overlap pixels of a border shared with another tile may have been
+    detected by the other tile too, entirely or in part. These line segments are merged with the nearly collinear
+    and overlapping line segments of the other tiles: the merged line segment goes from the first to the last end
+    point of the group along the longest line segment of the group. The other line segments are kept as they are.
+
+    :param tiles_line_segments: The line segments (x1, y1, x2, y2) of each tile, in image coordinates
+    :type tiles_line_segments: list[np.ndarray]
+    :param tiles: The tiles (left, top, right, bottom), without their overlap
+    :type tiles: list[Tuple[int, int, int, int]]
+    :param tile_overlap: The number of pixels the tiles were extended by on each side
+    :type tile_overlap: int
+    :param image_height: The height of the image, in pixels
+    :type image_height: int
+    :param image_width: The width of the image, in pixels
+    :type image_width: int
+    :return: The stitched line segments (x1, y1, x2, y2)
+    :rtype: np.ndarray
+    '''
+    line_segments = np.concatenate([np.empty((0, 4), dtype=np.int32)] + list(tiles_line_segments)).astype(np.int32)
+    tile_indexes = np.concatenate([np.empty(0, dtype=np.intp)] + [
+        np.full(len(tile_line_segments), tile_index, dtype=np.intp)
+        for tile_index, tile_line_segments in enumerate(tiles_line_segments)])
+
+    # the region of each tile that no other tile sees, its line segments are not stitched
+    tiles_array = np.array(tiles, dtype=np.int64).reshape(-1, 4)
+    inner_regions = tiles_array + np.column_stack([
+        np.where(tiles_array[:, 0] > 0, tile_overlap, 0),
+        np.where(tiles_array[:, 1] > 0, tile_overlap, 0),
+        np.where(tiles_array[:, 2] < image_width, -tile_overlap, 0),
+        np.where(tiles_array[:, 3] < image_height, -tile_overlap, 0)])
+    inner_regions = inner_regions[tile_indexes]
+    xs = line_segments[:, [0, 2]]
+    ys = line_segments[:, [1, 3]]
+    is_inner = ((xs >= inner_regions[:, [0]]) & (xs < inner_regions[:, [2]])
+                & (ys >= inner_regions[:, [1]]) & (ys < inner_regions[:, [3]])).all(axis=1)
+
+    border_line_segments = line_segments[~is_inner]
+    border_tile_indexes = tile_indexes[~is_inner]
+    if len(border_line_segments) == 0:
+        return line_segments
+
+    # the line segments to stitch have an end point close to the same border, and overlap along the border
+    xs = border_line_segments[:, [0, 2]]
+    ys = border_line_segments[:, [1, 3]]
+    pairs = [np.empty((0, 2), dtype=np.intp)]
+    for seam in np.unique(tiles_array[tiles_array[:, 0] > 0, 0]):
+        members = np.flatnonzero((np.abs(xs - seam) <= tile_overlap).any(axis=1))
+        pairs.append(members[find_overlapping_pairs(
+            ys.min(axis=1)[members], ys.max(axis=1)[members], STITCH_DISTANCE_TOLERANCE_PIXELS)])
+    for seam in np.unique(tiles_array[tiles_array[:, 1] > 0, 1]):
+        members = np.flatnonzero((np.abs(ys - seam) <= tile_overlap).any(axis=1))
+        pairs.append(members[find_overlapping_pairs(
+            xs.min(axis=1)[members], xs.max(axis=1)[members], STITCH_DISTANCE_TOLERANCE_PIXELS)])
+
+    # the line segments of a tile are not stitched together, only the ones detected by both tiles
+    pairs = np.concatenate(pairs)
+    pairs = pairs[border_tile_indexes[pairs[:, 0]] != border_tile_indexes[pairs[:, 1]]]
+    stitched_line_segments = merge_line_segment_pairs(
+        border_line_segments, pairs, STITCH_DISTANCE_TOLERANCE_PIXELS, STITCH_DISTANCE_TOLERANCE_PIXELS,
+        STITCH_ANGLE_TOLERANCE_SINE)
+    return np.concatenate([line_segments[is_inner], stitched_line_segments])
+
+
+def _extend_tile(
+    tile: Tuple[int, int, int, int],
+    tile_overlap: int,
+    image_height: int,
+    image_width: int
+) -> Tuple[int, int, int, int]:
+    left, top, right, bottom = tile
+    return (max(left - tile_overlap, 0), max(top - tile_overlap, 0),
+            min(right + tile_overlap, image_width), min(bottom + tile_overlap, image_height))
@@ -4,6 +4,12 @@ import cv2
 import numpy as np
 from app.services.base_image_preprocessor import to_grayscale, to_binary
 from app.models.bounding_box import BoundingBox
+from app.utils.image_context import ImageContext, decode_image
+from typing import Optional, Union
+
+# the background value is the most frequent value of a pixel out of BACKGROUND_SAMPLING_STEP on each axis,
+# the background of a sheet is most of its pixels so the sampling does not change it
+BACKGROUND_SAMPLING_STEP = 4
 
 
 class LineDetectionImagePreprocessor:
@@ -11,18 +17,17 @@ class LineDetectionImagePreprocessor:
     Helper class to perform preprocessing on an image.
     '''
     @staticmethod
-    def preprocess(image_bytes: bytes,
+    def preprocess(image_bytes: Union[bytes, ImageContext],
                    symbol_bounding_boxes: list[BoundingBox],
                    text_bounding_boxes: list[BoundingBox]):
         '''
         Preprocesses the given image bytes. Applies the following transformations:
-        1. Clears symbol bounding boxes
-        2. Clears text bounding boxes
-        3. Converts the image to grayscale
-        4. Binarizes the image using Otsu's method for image thresholding
+        1. Converts the image to grayscale
+        2. Clears symbol and text bounding boxes
+        3. Binarizes the image using Otsu's method for image thresholding
 
-        :param image_bytes: The image bytes to preprocess
-        :type image_bytes: bytes
+        :param image_bytes: The image bytes to preprocess, or the image context of the image to decode it once
+        :type image_bytes: Union[bytes, ImageContext]
         :param symbol_bounding_boxes: The symbol bounding boxes to clear
         :type symbol_bounding_boxes: list
         :param text_bounding_boxes: The text bounding boxes to clear
@@ -30,17 +35,15 @@ class LineDetectionImagePreprocessor:
         :return: The preprocessed image bytes
         :rtype: bytes
         '''
-        # convert image bytes to cv2 image
-        image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
-
-        # Clear symbol bounding boxes
-        image = LineDetectionImagePreprocessor.clear_bounding_boxes(image, symbol_bounding_boxes)
+        # Convert to grayscale first, the bounding boxes are cleared on a single channel.
+        # The bounding boxes are cleared in place so it is a copy of the grayscale image of the context
+        if isinstance(image_bytes, ImageContext):
+            image = image_bytes.grayscale_image.copy()
+        else:
+            image = to_grayscale(decode_image(image_bytes))
 
-        # Clear text bounding boxes
-        image = LineDetectionImagePreprocessor.clear_bounding_boxes(image, text_bounding_boxes)
-
-        # Convert to grayscale
-        image = to_grayscale(image)
+        # Clear symbol and text bounding boxes at once, with the background value of the image
+        image = LineDetectionImagePreprocessor.clear_bounding_boxes(image, [*symbol_bounding_boxes, *text_bounding_boxes])
 
         # Binarization
         image = to_binary(image)
@@ -49,32 +52,39 @@ class LineDetectionImagePreprocessor:
         return image
 
     @staticmethod
-    def clear_bounding_boxes(image, bounding_boxes: list[BoundingBox]):
+    def clear_bounding_boxes(image, bounding_boxes: list[BoundingBox], background_value: Optional[int] = None):
         '''
-        Clears the given bounding boxes from the image.
-        :param image: The image to clear the bounding boxes from
+        Clears the given bounding boxes from the image, borders included.
+        :param image: The image to clear the bounding boxes from, grayscale or BGR
         :type image: np.ndarray
         :param bounding_boxes: The bounding boxes to clear
         :type bounding_boxes: list[BoundingBox]
+        :param background_value: The value of the cleared pixels, defaults to the background value of the image
+        :type background_value: Optional[int]
         :return: The image with the bounding boxes cleared
         '''
+        if background_value is None:
+            background_value = LineDetectionImagePreprocessor.get_background_value(image)
 
-        # Compute the histogram of the image
-        hist = cv2.calcHist([image], [0], None, [256], [0, 256])
-
-        # Find the index of the most frequent pixel value
-        background_value = int(np.argmax(hist))
-
-        for bb in bounding_boxes:
-            points = np.array([[bb.bottomX, bb.topY],
-                              [bb.bottomX, bb.bottomY],
-                              [bb.topX, bb.bottomY],
-                              [bb.topX, bb.topY]],
-                              np.int32)
-            cv2.fillPoly(image, [points], (background_value, background_value, background_value))
+        image_height, image_width = image.shape[:2]
+        for left, top, right, bottom in get_pixel_bounding_boxes(bounding_boxes, image_height, image_width).tolist():
+            image[top:bottom + 1, left:right + 1] = background_value
 
         return image
 
+    @staticmethod
+    def get_background_value(image) -> int:
+        '''
+        Gets the background value of the image, the most frequent value of its first channel.
+        :param image: The grayscale or BGR image
+        :type image: np.ndarray
+        :return: The background value
+        :rtype: int
+        '''
+        sample = np.ascontiguousarray(image[::BACKGROUND_SAMPLING_STEP, ::BACKGROUND_SAMPLING_STEP])
+        hist = cv2.calcHist([sample], [0], None, [256], [0, 256])
+        return int(np.argmax(hist))
+
     @staticmethod
     def apply_thinning(image):
         '''
@@ -82,3 +92,29 @@ class LineDetectionImagePreprocessor:
         :param image: The image to apply the thinning algorithm to'''
         thinningType = cv2.ximgproc.THINNING_ZHANGSUEN
         return cv2.ximgproc.thinning(image, thinningType=thinningType)
+
+
+def get_pixel_bounding_boxes(bounding_boxes: list[BoundingBox], image_height: int, image_width: int) -> np.ndarray:
+    '''Converts the bounding boxes into pixel boxes clipped to the image, like the rectangles filled by cv2.fillPoly.
+
+    The coordinates are truncated to integers, and the boxes out of the image are dropped.
+
+    :param bounding_boxes: The bounding boxes, in pixels
+    :type bounding_boxes: list[BoundingBox]
+    :param image_height: The height of the image
+    :type image_height: int
+    :param image_width: The width of the image
+    :type image_width: int
+    :return: The (left, top, right, bottom) pixel boxes, borders included
+    :rtype: np.ndarray
+    '''
+    coordinates = np.array(
+        [(bb.topX, bb.topY, bb.bottomX, bb.bottomY) for bb in bounding_boxes], dtype=np.float64
+    ).reshape(-1, 4).astype(np.int32)
+    lefts = np.maximum(np.minimum(coordinates[:, 0], coordinates[:, 2]), 0)
+    rights = np.minimum(np.maximum(coordinates[:, 0], coordinates[:, 2]), image_width - 1)
+    tops = np.maximum(np.minimum(coordinates[:, 1], coordinates[:, 3]), 0)
+    bottoms = np.minimum(np.maximum(coordinates[:, 1], coordinates[:, 3]), image_height - 1)
+
+    pixel_bounding_boxes = np.stack([lefts, tops, rights, bottoms], axis=1)
+    return pixel_bounding_boxes[(lefts <= rights) & (tops <= bottoms)]
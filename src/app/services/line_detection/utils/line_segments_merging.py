@@ -0,0 +1,203 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import numpy as np
+from networkx.utils import UnionFind
+
+
+def merge_collinear_line_segments(
+    line_segments: np.ndarray,
+    distance_tolerance: float,
+    gap_tolerance: float,
+    angle_tolerance_degrees: float
+) -> np.ndarray:
+    '''Merges the nearly collinear line segments that overlap or are adjacent into single line segments.
+
+    The candidate pairs are found by a sort and sweep per orientation: the line segments are grouped by orientation
+    in bins of twice angle_tolerance_degrees, each line segment being also added to the closest neighbouring bin, and
+    the line segments of a bin are swept by their offset along the normal of the bin. Two line segments are candidates
+    when their offset ranges overlap, and are merged when they pass the checks of merge_line_segment_pairs.
+
+    :param line_segments: The line segments (x1, y1, x2, y2), in pixels
+    :type line_segments: np.ndarray
+    :param distance_tolerance: The maximum distance of the end points of a line segment to the line of the other one
+    :type distance_tolerance: float
+    :param gap_tolerance: The maximum gap between the two line segments along their line
+    :type gap_tolerance: float
+    :param angle_tolerance_degrees: The maximum angle between the two line segments, in degrees
+    :type angle_tolerance_degrees: float
+    :return: The merged line segments (x1, y1, x2, y2), in the order of the first line segment of each group
+    :rtype: np.ndarray
+    '''
+    line_segments = np.asarray(line_segments).reshape(-1, 4)
+    pairs = find_collinear_pairs(line_segments, distance_tolerance, angle_tolerance_degrees)
+    return merge_line_segment_pairs(
+        line_segments, pairs, distance_tolerance, gap_tolerance, np.sin(np.radians(angle_tolerance_degrees)))
+
+
+def find_collinear_pairs(
+    line_segments: np.ndarray,
+    distance_tolerance: float,
+    angle_tolerance_degrees: float
+) -> np.ndarray:
+    '''Finds the pairs of line segments with close orientations whose offsets overlap.
+
+    :param line_segments: The line segments (x1, y1, x2, y2), in pixels
+    :type line_segments: np.ndarray
+    :param distance_tolerance: The tolerance on the offsets, in pixels
+    :type distance_tolerance: float
+    :param angle_tolerance_degrees: The tolerance on the orientations, in degrees
+    :type angle_tolerance_degrees: float
+    :return: The candidate pairs of line segment indexes, each pair once
+    :rtype: np.ndarray
+    '''
+    line_segments = np.asarray(line_segments, dtype=np.float64).reshape(-1, 4)
+    if len(line_segments) < 2:
+        return np.empty((0, 2), dtype=np.intp)
+
+    # the orientations are in [0, pi), the bins are centered on multiples of their width so that
+    # the horizontal and vertical line segments are at the center of a bin
+    bins_count = max(int(np.floor(np.pi / np.radians(2 * angle_tolerance_degrees))), 1)
+    bin_width = np.pi / bins_count
+    orientations = np.mod(np.arctan2(line_segments[:, 3] - line_segments[:, 1], line_segments[:, 2] - line_segments[:, 0]), np.pi)
+    positions = orientations / bin_width
+    bins = np.rint(positions).astype(np.intp)
+    neighbour_bins = np.where(positions >= bins, bins + 1, bins - 1)
+
+    indexes = np.arange(len(line_segments))
+    members = np.concatenate([indexes, indexes])
+    member_bins = np.mod(np.concatenate([bins, neighbour_bins]), bins_count)
+
+    pairs = [np.empty((0, 2), dtype=np.intp)]
+    for bin_index in np.unique(member_bins):
+        bin_members = members[member_bins == bin_index]
+        if len(bin_members) < 2:
+            continue
+        # the offsets of the end points along the normal of the bin, a nearly collinear line segment of the bin
+        # spans the offsets of the line through its end points
+        angle = bin_index * bin_width
+        normal = np.array([-np.sin(angle), np.cos(angle)])
+        start_offsets = line_segments[bin_members, :2] @ normal
+        end_offsets = line_segments[bin_members, 2:] @ normal
+        bin_pairs = find_overlapping_pairs(
+            np.minimum(start_offsets, end_offsets), np.maximum(start_offsets, end_offsets), distance_tolerance)
+        pairs.append(bin_members[bin_pairs])
+
+    # a pair of line segments that share two bins is found twice
+    pairs = np.sort(np.concatenate(pairs), axis=1)
+    return np.unique(pairs, axis=0)
+
+
+def find_overlapping_pairs(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    tolerance: float
+) -> np.ndarray:
+    '''Finds the pairs of intervals that overlap, or are at most tolerance apart.
+
+    :param starts: The starts of the intervals
+    :type starts: np.ndarray
+    :param ends: The ends of the intervals
+    :type ends: np.ndarray
+    :param tolerance: The maximum distance between two intervals of a pair
+    :type tolerance: float
+    :return: The pairs of interval indexes, each pair once
+    :rtype: np.ndarray
+    '''
+    # sort and sweep: once sorted by start, the intervals overlapping an interval are the next ones starting before its end
+    order = np.argsort(starts, kind='stable')
+    sorted_starts = starts[order]
+    sorted_ends = ends[order]
+    first = np.arange(1, len(order) + 1)
+    last = np.searchsorted(sorted_starts, sorted_ends + tolerance, side='right')
+    counts = np.maximum(last - first, 0)
+
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty((0, 2), dtype=np.intp)
+    left = np.repeat(np.arange(len(order)), counts)
+    right = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(first, counts)
+    return np.column_stack([order[left], order[right]])
+
+
+def merge_line_segment_pairs(
+    line_segments: np.ndarray,
+    pairs: np.ndarray,
+    distance_tolerance: float,
+    gap_tolerance: float,
+    angle_tolerance_sine: float
+) -> np.ndarray:
+    '''Merges the candidate pairs of line segments that are nearly collinear and overlap or are adjacent.
+
+    The longest line segment of a pair is its reference line. The pair is merged when the end points of the other
+    line segment are within distance_tolerance of the reference line, at most gap_tolerance away from the reference
+    line segment along its line, and when the sine of the angle between the line segments is at most
+    angle_tolerance_sine. The merged pairs are grouped transitively, and the merged line segment of a group goes from
+    the first to the last end point of the group along its longest line segment. The line segments that are not merged
+    are returned as they are.
+
+    :param line_segments: The line segments (x1, y1, x2, y2), in pixels
+    :type line_segments: np.ndarray
+    :param pairs: The candidate pairs of line segment indexes
+    :type pairs: np.ndarray
+    :param distance_tolerance: The maximum distance of the end points of a line segment to the reference line
+    :type distance_tolerance: float
+    :param gap_tolerance: The maximum gap between the two line segments along the reference line
+    :type gap_tolerance: float
+    :param angle_tolerance_sine: The maximum sine of the angle between the two line segments
+    :type angle_tolerance_sine: float
+    :return: The merged line segments (x1, y1, x2, y2), in the order of the first line segment of each group
+    :rtype: np.ndarray
+    '''
+    line_segments = np.asarray(line_segments).reshape(-1, 4)
+    pairs = np.asarray(pairs, dtype=np.intp).reshape(-1, 2)
+    if len(pairs) == 0:
+        return line_segments
+
+    start_points = line_segments[:, :2].astype(np.float64)
+    end_points = line_segments[:, 2:].astype(np.float64)
+    vectors = end_points - start_points
+    lengths = np.hypot(vectors[:, 0], vectors[:, 1])
+    directions = vectors / np.maximum(lengths, 1e-9)[:, None]
+
+    # the reference line of a pair is its longest line segment
+    swap = lengths[pairs[:, 0]] < lengths[pairs[:, 1]]
+    references = np.where(swap, pairs[:, 1], pairs[:, 0])
+    others = np.where(swap, pairs[:, 0], pairs[:, 1])
+    reference_directions = directions[references]
+
+    def cross(vector):
+        return reference_directions[:, 0] * vector[:, 1] - reference_directions[:, 1] * vector[:, 0]
+
+    def dot(vector):
+        return reference_directions[:, 0] * vector[:, 0] + reference_directions[:, 1] * vector[:, 1]
+
+    # distances of the end points of the other line segment to the reference line, and positions along it
+    start_offsets = start_points[others] - start_points[references]
+    end_offsets = end_points[others] - start_points[references]
+    distances = np.maximum(np.abs(cross(start_offsets)), np.abs(cross(end_offsets)))
+    gaps = np.maximum(np.minimum(dot(start_offsets), dot(end_offsets)) - lengths[references],
+                      -np.maximum(dot(start_offsets), dot(end_offsets)))
+    angles = np.abs(cross(directions[others]))
+
+    is_merged = (distances <= distance_tolerance) & (gaps <= gap_tolerance) & (angles <= angle_tolerance_sine)
+    if not is_merged.any():
+        return line_segments
+
+    groups = UnionFind(range(len(line_segments)))
+    for i, j in pairs[is_merged]:
+        groups.union(int(i), int(j))
+
+    merged_line_segments = []
+    for group in sorted((sorted(group) for group in groups.to_sets()), key=lambda group: group[0]):
+        if len(group) == 1:
+            merged_line_segments.append(line_segments[group[0]])
+            continue
+
+        # the merged line segment goes from the first to the last end point along the longest line segment
+        group = np.array(group, dtype=np.intp)
+        reference = group[np.argmax(lengths[group])]
+        points = np.concatenate([start_points[group], end_points[group]])
+        positions = (points - start_points[reference]) @ directions[reference]
+        merged_line_segments.append(np.concatenate([points[np.argmin(positions)], points[np.argmax(positions)]]))
+
+    return np.array(merged_line_segments, dtype=line_segments.dtype).reshape(-1, 4)
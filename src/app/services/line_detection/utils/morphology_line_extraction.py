@@ -0,0 +1,84 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from typing import Optional, Tuple
+import cv2
+import numpy as np
+
+
+def extract_axis_aligned_line_segments(
+    preprocessed_image: np.ndarray,
+    min_run_length: int,
+    max_line_gap: Optional[int]
+) -> Tuple[np.ndarray, np.ndarray]:
+    '''Extracts the horizontal and vertical line segments of a binary image.
+
+    The horizontal (resp. vertical) lines are isolated with a morphological opening by a 1 x min_run_length
+    (resp. min_run_length x 1) kernel, which removes the pixels that are not part of a long enough horizontal
+    (resp. vertical) run. The runs of each row (resp. column) of the opened image are then scanned at once
+    from the transitions of the image, and each run is a line segment.
+    The pixels of the extracted line segments, and their neighbours, are cleared from the returned residual image,
+    which holds the diagonal lines and the short segments left for the Hough transform.
+
+    :param preprocessed_image: The binary image
+    :type preprocessed_image: np.ndarray
+    :param min_run_length: The minimum length of a horizontal or vertical run, in pixels, shorter runs stay in the
+        residual image. It should be longer than the pixel runs of the diagonal lines.
+    :type min_run_length: int
+    :param max_line_gap: The maximum gap, in pixels, between two runs of a row or column to join them into a
+        single line segment, e.g. for dashed lines
+    :type max_line_gap: Optional[int]
+    :return: The line segments (x1, y1, x2, y2), horizontal ones first, and the residual image
+    :rtype: Tuple[np.ndarray, np.ndarray]
+    '''
+    binary = (preprocessed_image > 0).astype(np.uint8)
+
+    # the kernels are centered on a pixel, the opening by an even kernel shifts the runs by a pixel
+    kernel_length = min_run_length | 1
+    horizontal = _open_along_axis(binary, (kernel_length, 1), max_line_gap)
+    vertical = _open_along_axis(binary, (1, kernel_length), max_line_gap)
+
+    rows, starts, ends = _scan_runs(horizontal)
+    horizontal_line_segments = np.stack([starts, rows, ends, rows], axis=1)
+    columns, starts, ends = _scan_runs(vertical.T)
+    vertical_line_segments = np.stack([columns, starts, columns, ends], axis=1)
+
+    # the neighbours of the extracted lines are cleared too, so that the jagged pixels of the thinned lines
+    # and the crossings are not detected again as short segments by the Hough transform
+    extracted = cv2.dilate(horizontal | vertical, np.ones((3, 3), dtype=np.uint8))
+    residual = np.where(extracted > 0, 0, preprocessed_image).astype(preprocessed_image.dtype)
+
+    line_segments = np.concatenate([horizontal_line_segments, vertical_line_segments]).astype(np.int32)
+    return line_segments, residual
+
+
+def _open_along_axis(
+    binary: np.ndarray,
+    kernel_size: Tuple[int, int],
+    max_line_gap: Optional[int]
+) -> np.ndarray:
+    '''Keeps the pixels of the runs along the axis of the kernel, of kernel_size (width, height).'''
+    if max_line_gap:
+        # the gaps of the dashed lines are closed along the axis only, the parallel lines are not joined
+        gap_kernel_length = (max_line_gap + 1) | 1
+        gap_kernel_size = (gap_kernel_length, 1) if kernel_size[0] > 1 else (1, gap_kernel_length)
+        binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, gap_kernel_size))
+    return cv2.morphologyEx(binary, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, kernel_size))
+
+
+def _scan_runs(binary: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''Finds the runs of non-zero pixels of each row of the image.
+
+    :return: The row, first column and last column of each run, in row-major order
+    :rtype: Tuple[np.ndarray, np.ndarray, np.ndarray]
+    '''
+    height = binary.shape[0]
+    # a zero column on each side, so that each run has a rising and a falling transition on its row
+    padded = np.zeros((height, binary.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = binary > 0
+    transitions = np.diff(padded, axis=1)
+
+    # the transitions are found in row-major order, the n-th rising transition and the n-th falling transition
+    # are the start and the end of the n-th run
+    rows, starts = np.nonzero(transitions == 1)
+    _, ends = np.nonzero(transitions == -1)
+    return rows, starts, ends - 1
@@ -0,0 +1,64 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from typing import Optional
+from app.config import Config, config
+from app.models.enums.inference_result import InferenceResult
+from app.models.graph_construction.graph_construction_response import GraphConstructionInferenceResponse
+from app.models.line_detection.line_detection_response import LineDetectionInferenceResponse
+from app.services import blob_storage_client, storage_path_template_builder
+from app.services.graph_construction.draw_persistent_graph import render_persistent_graph_networkx
+from app.services.line_detection.line_detection_service import draw_line_segments_output_image
+from app.services.output_image_writer import encode_image, upload_image_tiles
+from logger_config import get_logger
+
+
+logger = get_logger(__name__)
+
+# the output images of the graph construction job steps can be rendered from their inference responses
+RENDERABLE_INFERENCE_RESULTS = frozenset([InferenceResult.line_detection, InferenceResult.graph_construction])
+
+
+def render_output_image(pid_id: str, inference_result: InferenceResult, config: Config = config) -> Optional[bytes]:
+    '''Renders the output image of a graph construction job step from its stored inference response,
+    and stores it in the blob storage so that it is only rendered once.
+
+    :param pid_id: The pid id
+    :type pid_id: str
+    :param inference_result: The job step, line detection or graph construction
+    :type inference_result: InferenceResult
+    :param config: The configuration to use
+    :type config: Config
+    :return: The encoded output image, or None if the image can't be rendered (the step did not complete)
+    :rtype: Optional[bytes]
+    '''
+    if inference_result not in RENDERABLE_INFERENCE_RESULTS:
+        return None
+
+    client = blob_storage_client.blob_storage_client
+    response_path = storage_path_template_builder.build_inference_response_path(
+        pid_id, InferenceResult.graph_construction, inference_result.value)
+    response_bytes = client.download_bytes_if_exists(response_path)
+    if response_bytes is None:
+        return None
+
+    logger.info(f'Rendering the {inference_result.value} output image for pid id {pid_id}')
+    if inference_result == InferenceResult.line_detection:
+        line_detection_response = LineDetectionInferenceResponse.parse_raw(response_bytes)
+        pid_image_path = storage_path_template_builder.build_image_path(pid_id, InferenceResult.symbol_detection)
+        image = draw_line_segments_output_image(client.download_bytes(pid_image_path),
+                                                line_detection_response.line_segments,
+                                                line_detection_response.image_details.height,
+                                                line_detection_response.image_details.width)
+    else:
+        graph_construction_response = GraphConstructionInferenceResponse.parse_raw(response_bytes)
+        image = render_persistent_graph_networkx(graph_construction_response.connected_symbols,
+                                                 config.symbol_label_prefixes_to_include_in_graph_image_output)
+
+    output_image_path = storage_path_template_builder.build_output_image_path(
+        pid_id, InferenceResult.graph_construction, inference_result.value)
+    image_bytes = encode_image(output_image_path, image, config)
+    client.upload_bytes(output_image_path, image_bytes)
+    if config.output_image_tiles_enabled:
+        upload_image_tiles(output_image_path, image, config)
+
+    return image_bytes
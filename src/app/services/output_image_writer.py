@@ -0,0 +1,292 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from prometheus_client import Counter, Gauge
+from typing import Iterator, Optional
+import os
+import threading
+import cv2
+import numpy as np
+from app.config import Config, config
+from app.services import blob_storage_client, storage_path_template_builder
+from app.services.job_queue.job_process_pool import call_in_parent, is_job_worker_process
+from app.utils.image_tiles import build_image_pyramid
+from logger_config import get_logger
+
+
+logger = get_logger(__name__)
+
+output_image_upload_queued_bytes = Gauge(
+    'output_image_upload_queued_bytes',
+    'Size of the output and debug images waiting to be encoded and uploaded to the blob storage')
+
+output_image_upload_failures = Counter(
+    'output_image_upload_failures',
+    'Number of output and debug images that could not be encoded or uploaded to the blob storage')
+
+
+def observe_queued_bytes(delta: int):
+    '''Updates the size of the images waiting to be uploaded in the Prometheus gauge.
+
+    :param delta: The number of bytes added to (positive) or removed from (negative) the queue
+    :type delta: int
+    '''
+    output_image_upload_queued_bytes.inc(delta)
+
+
+def observe_upload_failure():
+    '''Counts an image that could not be uploaded in the Prometheus counter.'''
+    output_image_upload_failures.inc()
+
+
+def _observe(func, *args):
+    # the metrics are served by the app process
+    if is_job_worker_process():
+        call_in_parent(func, *args)
+    else:
+        func(*args)
+
+
+def encode_image(file_path: str, image: np.ndarray, config: Config = config) -> bytes:
+    '''Encodes the image in the format of the extension of the file path, PNG by default.
+
+    :param file_path: The path of the image, e.g. ending with .png, .jpg or .webp
+    :type file_path: str
+    :param image: The image to encode
+    :type image: np.ndarray
+    :param config: The configuration holding the encoding settings
+    :type config: Config
+    :return: The encoded image
+    :rtype: bytes
+    '''
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in ('.jpg', '.jpeg'):
+        params = [cv2.IMWRITE_JPEG_QUALITY, config.output_image_jpeg_quality]
+    elif extension == '.webp':
+        params = [cv2.IMWRITE_WEBP_QUALITY, config.output_image_webp_quality]
+    else:
+        extension = '.png'
+        params = [cv2.IMWRITE_PNG_COMPRESSION, config.output_image_png_compression_level]
+
+    ret, buffer = cv2.imencode(extension, image, params)
+    if not ret:
+        raise ValueError(f'The image {file_path} could not be encoded')
+    return buffer.tobytes()
+
+
+def upload_image_tiles(file_path: str, image: np.ndarray, config: Config = config):
+    '''Uploads the tiled pyramid of the image to the blob storage.
+
+    The manifest is uploaded last, the tiles of an image are complete once its manifest exists.
+
+    :param file_path: The blob name of the image
+    :type file_path: str
+    :param image: The full resolution image
+    :type image: np.ndarray
+    :param config: The configuration holding the tile size and the encoding settings
+    :type config: Config
+    '''
+    client = blob_storage_client.blob_storage_client
+    manifest, tiles = build_image_pyramid(image, config.output_image_tile_size_pixels)
+    for level, row, column, tile in tiles:
+        tile_path = storage_path_template_builder.build_image_tile_path(file_path, level, row, column)
+        client.upload_bytes(tile_path, encode_image(tile_path, tile, config))
+
+    client.upload_bytes(storage_path_template_builder.build_image_tiles_manifest_path(file_path), manifest.json())
+
+
+class OutputImageUploadError(Exception):
+    '''Raised when output or debug images could not be encoded or uploaded to the blob storage.'''
+
+    def __init__(self, file_paths: list[str]):
+        super().__init__(f'The images {", ".join(file_paths)} could not be uploaded to the blob storage')
+        self.file_paths = file_paths
+
+
+class OutputImageWrites:
+    '''The images written in a `OutputImageWriter.track_writes` context, to wait for their upload.'''
+
+    def __init__(self, writer: 'OutputImageWriter'):
+        self._writer = writer
+        # ids of the images of this context queued or being uploaded, guarded by the condition of the writer
+        self._pending_write_ids: set[int] = set()
+        self._failed_file_paths: list[str] = []
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        '''Waits until the images written in the context are uploaded, the images written by other jobs
+        and requests are not waited for.
+
+        :param timeout: The maximum time to wait, in seconds, or None to wait until they are uploaded
+        :type timeout: Optional[float]
+        :raises OutputImageUploadError: If images of the context could not be encoded or uploaded
+        :return: True if the images were uploaded, False if the timeout expired
+        :rtype: bool
+        '''
+        return self._writer._wait(self, timeout)
+
+
+_current_output_image_writes: ContextVar[Optional[OutputImageWrites]] = ContextVar('current_output_image_writes', default=None)
+
+
+class OutputImageWriter:
+    '''Encodes and uploads the output and debug images to the blob storage in background threads.
+
+    Writing an image only copies it to a bounded queue, so the jobs and the request handlers are not
+    blocked by the encoding and the upload. The jobs and the request handlers write their images in a
+    `track_writes` context and wait for them before reporting the results that reference them, the
+    encoding and upload errors are raised by the wait.
+    '''
+
+    def __init__(self, config: Config = config):
+        '''Initializes a new instance of the OutputImageWriter class.
+
+        :param config: The configuration to use
+        :type config: Config
+        '''
+        self._config = config
+        self._reset()
+        # the upload threads are not forked with the process, a job worker process starts its own on first use
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._condition = threading.Condition()
+        self._queue: deque[tuple[int, str, np.ndarray, Optional[OutputImageWrites]]] = deque()
+        self._queued_bytes = 0
+        self._last_write_id = 0
+        # ids of the images queued or being uploaded
+        self._pending_write_ids: set[int] = set()
+        self._threads: list[threading.Thread] = []
+        self._stopping = False
+
+    def init(self):
+        '''Starts the upload threads if they are not running yet.'''
+        with self._condition:
+            if self._threads:
+                return
+
+            self._stopping = False
+            for i in range(max(self._config.output_image_upload_workers_count, 1)):
+                thread = threading.Thread(target=self._upload_worker, name=f'output-image-upload-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def shutdown(self):
+        '''Uploads the queued images and stops the upload threads.'''
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            threads, self._threads = self._threads, []
+
+        for thread in threads:
+            thread.join()
+
+    @contextmanager
+    def track_writes(self) -> Iterator[OutputImageWrites]:
+        '''Tracks the images written in the current context, e.g. by a job step or a request handler.
+
+        The context is propagated to the threads run by `run_in_threadpool` and to the asyncio tasks created in it.
+
+        :return: The images written in the context, to wait for their upload once the context exits
+        :rtype: Iterator[OutputImageWrites]
+        '''
+        writes = OutputImageWrites(self)
+        token = _current_output_image_writes.set(writes)
+        try:
+            yield writes
+        finally:
+            _current_output_image_writes.reset(token)
+
+    def write(self, file_path: str, image: np.ndarray) -> bool:
+        '''Queues the image to be encoded and uploaded to the blob storage.
+
+        The image is copied, the caller can keep drawing on it. Blocks while the queue is full.
+        The image is part of the writes tracked in the current context, if any (see `track_writes`).
+
+        :param file_path: The blob name of the image, its extension selects the encoding
+        :type file_path: str
+        :param image: The image to upload
+        :type image: np.ndarray
+        :return: True, like cv2.imwrite
+        :rtype: bool
+        '''
+        if image is None or image.size == 0:
+            raise ValueError(f'The image {file_path} is empty')
+
+        self.init()
+        image = image.copy()
+        writes = _current_output_image_writes.get()
+        if writes is not None and writes._writer is not self:
+            writes = None
+        with self._condition:
+            # an image larger than the queue is accepted when the queue is empty
+            self._condition.wait_for(
+                lambda: not self._pending_write_ids or
+                self._queued_bytes + image.nbytes <= self._config.output_image_upload_queue_max_bytes)
+            self._last_write_id += 1
+            self._queue.append((self._last_write_id, file_path, image, writes))
+            self._pending_write_ids.add(self._last_write_id)
+            if writes is not None:
+                writes._pending_write_ids.add(self._last_write_id)
+            self._queued_bytes += image.nbytes
+            self._condition.notify_all()
+
+        _observe(observe_queued_bytes, image.nbytes)
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        '''Waits until all the images queued before the call are uploaded, e.g. by the offline tools.
+
+        The jobs and the request handlers wait only for their own images, see `track_writes`.
+
+        :param timeout: The maximum time to wait, in seconds, or None to wait until they are uploaded
+        :type timeout: Optional[float]
+        :return: True if the images were uploaded (or failed to be), False if the timeout expired
+        :rtype: bool
+        '''
+        with self._condition:
+            last_write_id = self._last_write_id
+            return self._condition.wait_for(
+                lambda: all(write_id > last_write_id for write_id in self._pending_write_ids), timeout)
+
+    def _wait(self, writes: OutputImageWrites, timeout: Optional[float]) -> bool:
+        with self._condition:
+            uploaded = self._condition.wait_for(lambda: not writes._pending_write_ids, timeout)
+            failed_file_paths = list(writes._failed_file_paths)
+
+        if failed_file_paths:
+            raise OutputImageUploadError(failed_file_paths)
+        return uploaded
+
+    def _upload_worker(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue or self._stopping)
+                if not self._queue:
+                    return
+                write_id, file_path, image, writes = self._queue.popleft()
+
+            failed = False
+            try:
+                image_bytes = encode_image(file_path, image, self._config)
+                blob_storage_client.blob_storage_client.upload_bytes(file_path, image_bytes)
+                if self._config.output_image_tiles_enabled and storage_path_template_builder.is_output_image_path(file_path):
+                    upload_image_tiles(file_path, image, self._config)
+            except Exception as e:
+                logger.error(f'Exception while uploading the image {file_path} to blob storage: {e}')
+                _observe(observe_upload_failure)
+                failed = True
+            finally:
+                with self._condition:
+                    self._pending_write_ids.discard(write_id)
+                    if writes is not None:
+                        writes._pending_write_ids.discard(write_id)
+                        if failed:
+                            writes._failed_file_paths.append(file_path)
+                    self._queued_bytes -= image.nbytes
+                    self._condition.notify_all()
+                _observe(observe_queued_bytes, -image.nbytes)
+
+
+output_image_writer = OutputImageWriter()
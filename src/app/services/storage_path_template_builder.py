@@ -1,7 +1,9 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
+from app.config import config
 from app.models.enums.inference_result import InferenceResult
 from typing import Optional
+import posixpath
 
 
 def build_image_path(pid_id: str, inference_result: InferenceResult) -> str:
@@ -28,9 +30,9 @@ def build_debug_image_path(pid_id: str, inference_result: InferenceResult, postf
     :return: The debug image storage path.
     :rtype: str'''
     if postfix is None:
-        return f'{pid_id}/{inference_result}/debug_{pid_id}.png'
+        return f'{pid_id}/{inference_result}/debug_{pid_id}.{config.debug_image_format.value}'
     else:
-        return f'{pid_id}/{inference_result}/debug_{pid_id}_{postfix}.png'
+        return f'{pid_id}/{inference_result}/debug_{pid_id}_{postfix}.{config.debug_image_format.value}'
 
 
 def build_inference_request_path(pid_id: str, inference_result: InferenceResult) -> str:
@@ -72,6 +74,18 @@ def build_inference_job_status_path(pid_id: str, inference_result: InferenceResu
     return f'{pid_id}/{inference_result}/job_status.json'
 
 
+def build_inference_job_profile_path(pid_id: str, inference_result: InferenceResult) -> str:
+    '''Builds the inference job profile storage path for the given pid id.
+
+    :param pid_id: The pid id of the request.
+    :type pid_id: str
+    :param inference_result: The inference result type.
+    :type inference_result: InferenceResult
+    :return: The inference job profile storage path.
+    :rtype: str'''
+    return f'{pid_id}/{inference_result}/profile.json'
+
+
 def build_output_image_path(pid_id: str, inference_result: InferenceResult, postfix: Optional[str] = None) -> str:
     '''Builds the output image storage path for the given pid id, inference result type and detection step.
 
@@ -81,3 +95,39 @@ def build_output_image_path(pid_id: str, inference_result: InferenceResult, post
     :type inference_result: InferenceResult
     '''
     return f'{pid_id}/{inference_result}/output_{pid_id}_{postfix}.png'
+
+
+def is_output_image_path(image_path: str) -> bool:
+    '''Checks if the image storage path is the path of an output image (see build_output_image_path).
+
+    :param image_path: The image storage path.
+    :type image_path: str
+    :return: True if the image is an output image, False otherwise.
+    :rtype: bool'''
+    return posixpath.basename(image_path).startswith('output_')
+
+
+def build_image_tiles_manifest_path(image_path: str) -> str:
+    '''Builds the storage path of the manifest of the tiled pyramid of the given image.
+
+    :param image_path: The image storage path.
+    :type image_path: str
+    :return: The image tiles manifest storage path.
+    :rtype: str'''
+    return f'{posixpath.splitext(image_path)[0]}_tiles/manifest.json'
+
+
+def build_image_tile_path(image_path: str, level: int, row: int, column: int) -> str:
+    '''Builds the storage path of a tile of the tiled pyramid of the given image.
+
+    :param image_path: The image storage path.
+    :type image_path: str
+    :param level: The level of the tile in the pyramid, 0 being the full resolution.
+    :type level: int
+    :param row: The row of the tile in the level.
+    :type row: int
+    :param column: The column of the tile in the level.
+    :type column: int
+    :return: The image tile storage path.
+    :rtype: str'''
+    return f'{posixpath.splitext(image_path)[0]}_tiles/{level}/{row}_{column}.png'
@@ -1,8 +1,9 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
+import asyncio
+from typing import Optional
 from app.config import Config, config
-from app.constants.http_methods import HttpMethods
-from app.services.request_session_builder import build_request_session
+import httpx
 import logger_config
 from requests import Session
 
@@ -21,23 +22,70 @@ class SymbolDetectionEndpointClient(object):
         self._object_detection_inference_api = config.symbol_detection_api
         self._bearer_token = config.symbol_detection_api_bearer_token
         self._session = session
-
-    def send_request(
+        self._retry_count = config.inference_service_retry_count
+        self._retry_backoff_factor = config.inference_service_retry_backoff_factor
+        self._max_in_flight_requests = config.symbol_detection_max_in_flight_requests
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._in_flight_requests: Optional[asyncio.Semaphore] = None
+
+    async def init(self):
+        '''Creates the async HTTP client, from the event loop that will send the requests.'''
+        if self._async_client is not None:
+            return
+
+        max_in_flight_requests = max(self._max_in_flight_requests, 1)
+        # the model latency is not bounded, the requests wait for the inference like the sync session does
+        self._async_client = httpx.AsyncClient(
+            timeout=None,
+            limits=httpx.Limits(max_connections=max_in_flight_requests))
+        self._in_flight_requests = asyncio.Semaphore(max_in_flight_requests)
+
+    async def close(self):
+        '''Closes the async HTTP client.'''
+        if self._async_client is None:
+            return
+
+        await self._async_client.aclose()
+        self._async_client = None
+        self._in_flight_requests = None
+
+    async def send_request(
         self,
         image_bytes: bytes
     ):
-        '''Sends a request to the object detection inference endpoint.
+        '''Sends a request to the object detection inference endpoint, without blocking the event loop.
+
+        At most SYMBOL_DETECTION_MAX_IN_FLIGHT_REQUESTS requests are sent at once, the next ones wait for
+        a free slot. The 503 and 504 responses and the transport errors (connection and read errors,
+        timeouts) are retried with an exponential backoff.
 
         :param image_bytes: The bytes of the image to send
         :type image_bytes: bytes
         :return: The response from the object detection inference endpoint
-        :rtype: dict'''
+        :rtype: dict
+        :raises httpx.HTTPStatusError: If the endpoint returns an error status code'''
+        # the CLI sends its request without the lifespan of the application
+        await self.init()
         logger.info(f'Sending request to {self._object_detection_inference_api}/score')
 
-        response = self._session.post(
-            f'{self._object_detection_inference_api}/score',
-            files={'image': image_bytes},
-            headers={'Authorization': f'Bearer {self._bearer_token}'})
+        retry = 0
+        while True:
+            try:
+                async with self._in_flight_requests:
+                    response = await self._async_client.post(
+                        f'{self._object_detection_inference_api}/score',
+                        files={'image': ('image', image_bytes)},
+                        headers={'Authorization': f'Bearer {self._bearer_token}'})
+                if response.status_code not in RETRY_STATUS_FORCELIST or retry >= self._retry_count:
+                    break
+                logger.warning(f'Symbol detection endpoint returned {response.status_code}, retrying')
+            except httpx.TransportError as e:
+                if retry >= self._retry_count:
+                    raise
+                logger.warning(f'Could not reach the symbol detection endpoint, retrying: {e}')
+
+            retry += 1
+            await asyncio.sleep(self._retry_backoff_factor * (2 ** (retry - 1)))
 
         response.raise_for_status()
         return response.json()
@@ -61,14 +109,9 @@ class SymbolDetectionEndpointClient(object):
 
 
 RETRY_STATUS_FORCELIST = [503, 504]
-RETRY_MOUNT_PREFIXES = ['https://', 'http://']
-
-session = build_request_session(
-    config.inference_service_retry_count,
-    config.inference_service_retry_backoff_factor,
-    RETRY_STATUS_FORCELIST,
-    [HttpMethods.POST],
-    RETRY_MOUNT_PREFIXES)
+
+# the session only sends the health checks, the inference requests are retried by send_request
+session = Session()
 
 
 symbol_detection_endpoint_client = SymbolDetectionEndpointClient(config, session)
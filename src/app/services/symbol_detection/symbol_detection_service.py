@@ -12,8 +12,9 @@ from app.services.symbol_detection.utils.symbol_pruning_utils import prune_overl
 from app.utils import image_utils
 import cv2
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+import httpx
 import logger_config
-from requests import HTTPError
 
 
 logger = logger_config.get_logger(__name__)
@@ -35,9 +36,9 @@ async def run_inferencing(
     rtype: symbol_detection.ObjectDetectionPrediction'''
     inference_result = None
     try:
-        inference_result = symbol_detection_endpoint_client.send_request(image_bytes)
+        inference_result = await symbol_detection_endpoint_client.send_request(image_bytes)
         logger.info(f'Symbol detection response successfully received for pid id {pid_id}')
-    except HTTPError as e:
+    except httpx.HTTPStatusError as e:
         logger.warning(f'Http error while calling symbol detection endpoint: {e}')
 
         status_code = e.response.status_code
@@ -50,6 +51,25 @@ async def run_inferencing(
         logger.error(f'Exception while calling symbol detection endpoint: {e}')
         raise HTTPException(status_code=500, detail='Internal server error while fetching the symbol detection results.')
 
+    # the results are filtered and drawn off the event loop, the other requests are served meanwhile
+    return await run_in_threadpool(
+        _build_inference_results,
+        pid_id,
+        bounding_box_inclusive,
+        inference_score_threshold,
+        image_bytes,
+        output_image_path,
+        inference_result)
+
+
+def _build_inference_results(
+    pid_id: str,
+    bounding_box_inclusive: Optional[BoundingBox],
+    inference_score_threshold: float,
+    image_bytes: bytes,
+    output_image_path: str,
+    inference_result: dict
+):
     image_height, image_width = image_utils.get_image_dimensions(image_bytes)
     image_details = ImageDetails(height=image_height, width=image_width)
     filtered_labels: list[Label] = []
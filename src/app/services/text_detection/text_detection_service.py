@@ -8,6 +8,7 @@ from app.services.draw_elements import draw_bounding_boxes
 from app.services.text_detection.symbol_to_text_correlation_service import correlate_symbols_with_text
 from app.services.text_detection.utils.ocr_client import ocr_client
 from app.services.text_detection.utils.text_detection_image_preprocessor import TextDetectionImagePreprocessor
+from app.utils.image_context import ImageContext
 from app.utils.image_utils import normalize_coordinates
 from app.utils.regex_utils import (
     does_string_contain_at_least_one_number_and_one_letter,
@@ -101,9 +102,12 @@ def run_inferencing(
 
     symbol_label_prefixes_with_text_lowered_tuple: tuple[str] = tuple(sorted([elem.lower() for elem in symbol_label_prefixes_with_text]))
 
+    # the image is decoded once for the preprocessing and the drawing
+    image_context = ImageContext.from_bytes(image)
+
     image_byte_stream = io.BytesIO(image)
     if (config.enable_preprocessing_text_detection):
-        preprocessed_image = TextDetectionImagePreprocessor.preprocess(image)
+        preprocessed_image = TextDetectionImagePreprocessor.preprocess(image_context)
         image_byte_stream = io.BytesIO(preprocessed_image)
     try:
         text_detection_inference_results = ocr_client.read_text(image_byte_stream)
@@ -159,7 +163,7 @@ def run_inferencing(
         for result in pruned_text_and_symbols_associated_list
     ]
     debug_symbol_with_text_image = draw_bounding_boxes(
-        image,
+        image_context,
         symbol_detection_inference_results.image_details,
         ids,
         bounding_boxes,
@@ -172,7 +176,7 @@ def run_inferencing(
         ]
         labels = [result.text if result.text else '' for result in text_details]
         debug_text_image = draw_bounding_boxes(
-            image,
+            image_context,
             symbol_detection_inference_results.image_details,
             None,
             bounding_boxes,
@@ -1,9 +1,9 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 import cv2
-import numpy as np
+from typing import Union
 
-from app.services.base_image_preprocessor import to_grayscale, to_binary
+from app.utils.image_context import ImageContext
 
 
 class TextDetectionImagePreprocessor():
@@ -11,21 +11,17 @@ class TextDetectionImagePreprocessor():
     Helper class to perform preprocessing on an image.
     '''
     @staticmethod
-    def preprocess(image_bytes: bytes):
+    def preprocess(image_bytes: Union[bytes, ImageContext]):
         '''
         Preprocesses the given image bytes. Applies the following transformations:
         1. Converts the image to grayscale
         2. Binarizes the image using Otsu's method for image thresholding
-        :param image_bytes: The image bytes to preprocess
-        :type image_bytes: bytes'''
-        # convert image bytes to cv2 image
-        image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+        :param image_bytes: The image bytes to preprocess, or the image context of the image to decode it once
+        :type image_bytes: Union[bytes, ImageContext]'''
+        image_context = image_bytes if isinstance(image_bytes, ImageContext) else ImageContext.from_bytes(image_bytes)
 
-        # Convert to grayscale
-        image = to_grayscale(image)
-
-        # Binarization
-        image = to_binary(image)
+        # the image context converts the image to grayscale and binarizes it
+        image = image_context.binary_image
 
         # return the image bytes
         return cv2.imencode('.png', image)[1].tobytes()
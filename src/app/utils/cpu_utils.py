@@ -0,0 +1,59 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from typing import Optional
+import math
+import os
+
+
+def get_available_cpu_count(cgroup_path: str = '/sys/fs/cgroup') -> int:
+    '''Gets the number of CPUs available to the current process.
+
+    Takes into account the CPU affinity of the process and the cgroup CPU quota,
+    e.g. the CPU limit of the container, which os.cpu_count() ignores.
+
+    :param cgroup_path: The path where the cgroup file system is mounted.
+    :type cgroup_path: str
+    :return: The number of CPUs available, at least 1.
+    :rtype: int
+    '''
+    if hasattr(os, 'sched_getaffinity'):
+        cpu_count = len(os.sched_getaffinity(0))
+    else:
+        cpu_count = os.cpu_count() or 1
+
+    cpu_quota = get_cgroup_cpu_quota(cgroup_path)
+    if cpu_quota is not None:
+        cpu_count = min(cpu_count, math.ceil(cpu_quota))
+
+    return max(cpu_count, 1)
+
+
+def get_cgroup_cpu_quota(cgroup_path: str = '/sys/fs/cgroup') -> Optional[float]:
+    '''Gets the cgroup CPU quota of the current process, in number of CPUs.
+
+    Supports cgroup v2 (cpu.max) and cgroup v1 (cpu.cfs_quota_us and cpu.cfs_period_us).
+
+    :param cgroup_path: The path where the cgroup file system is mounted.
+    :type cgroup_path: str
+    :return: The CPU quota, or None if there is no quota or it can't be read.
+    :rtype: Optional[float]
+    '''
+    try:
+        with open(os.path.join(cgroup_path, 'cpu.max')) as f:
+            quota, period = f.read().split()[:2]
+        if quota == 'max':
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+
+    try:
+        with open(os.path.join(cgroup_path, 'cpu', 'cpu.cfs_quota_us')) as f:
+            quota = int(f.read())
+        with open(os.path.join(cgroup_path, 'cpu', 'cpu.cfs_period_us')) as f:
+            period = int(f.read())
+        if quota <= 0 or period <= 0:
+            return None
+        return quota / period
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,99 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import cv2
+import numpy as np
+from app.utils import image_utils
+
+# the PDF pages are rendered at the resolution of the scanned P&ID sheets, the PDF points are 1/72 inch
+PDF_RENDER_DPI = 300
+PDF_POINTS_PER_INCH = 72
+
+PDF_SIGNATURE = b'%PDF-'
+TIFF_SIGNATURES = (b'II*\x00', b'MM\x00*')
+
+
+class TooManyPagesError(ValueError):
+    '''Raised when a document has more pages than allowed, before its pages are rendered.'''
+    pass
+
+
+def is_pdf(document_bytes: bytes) -> bool:
+    return document_bytes.startswith(PDF_SIGNATURE)
+
+
+def is_tiff(document_bytes: bytes) -> bool:
+    return document_bytes.startswith(TIFF_SIGNATURES)
+
+
+def split_document_pages(document_bytes: bytes, max_pages: int) -> list[bytes]:
+    '''Splits a document into the images of its pages.
+
+    A png or jpg image is a single page, returned as is. The pages of a PDF document are rendered at PDF_RENDER_DPI,
+    and the pages of a TIFF document decoded, and the pages are encoded as png images.
+
+    :param document_bytes: The bytes of the png, jpg, TIFF or PDF document
+    :type document_bytes: bytes
+    :param max_pages: The maximum number of pages of the document, a larger document is not rendered
+    :type max_pages: int
+    :return: The png or jpg images of the pages, in order
+    :rtype: list[bytes]
+    :raises TooManyPagesError: If the document has more than max_pages pages
+    :raises ValueError: If the document is not a valid png, jpg, TIFF or PDF document
+    '''
+    if is_pdf(document_bytes):
+        return _split_pdf_pages(document_bytes, max_pages)
+
+    if is_tiff(document_bytes):
+        return _split_tiff_pages(document_bytes, max_pages)
+
+    if image_utils.probe_image_dimensions(document_bytes) is None:
+        raise ValueError('The document is not a valid png, jpg, tiff or pdf document')
+    if max_pages < 1:
+        raise TooManyPagesError(f'The document has more than {max_pages} pages')
+    return [document_bytes]
+
+
+def _split_pdf_pages(document_bytes: bytes, max_pages: int) -> list[bytes]:
+    # pypdfium2 is only needed for the PDF documents
+    import pypdfium2
+
+    try:
+        pdf = pypdfium2.PdfDocument(document_bytes)
+    except pypdfium2.PdfiumError as e:
+        raise ValueError(f'The document is not a valid pdf document: {e}')
+
+    try:
+        if len(pdf) > max_pages:
+            raise TooManyPagesError(f'The document has more than {max_pages} pages')
+
+        pages = []
+        for page_index in range(len(pdf)):
+            page = pdf[page_index]
+            try:
+                bitmap = page.render(scale=PDF_RENDER_DPI / PDF_POINTS_PER_INCH)
+                pages.append(_encode_png(bitmap.to_numpy()))
+            finally:
+                page.close()
+        return pages
+    finally:
+        pdf.close()
+
+
+def _split_tiff_pages(document_bytes: bytes, max_pages: int) -> list[bytes]:
+    try:
+        success, images = cv2.imdecodemulti(np.frombuffer(document_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    except cv2.error as e:
+        raise ValueError(f'The document is not a valid tiff document: {e}')
+    if not success or len(images) == 0:
+        raise ValueError('The document is not a valid tiff document')
+    if len(images) > max_pages:
+        raise TooManyPagesError(f'The document has more than {max_pages} pages')
+
+    return [_encode_png(image) for image in images]
+
+
+def _encode_png(image: np.ndarray) -> bytes:
+    success, buffer = cv2.imencode('.png', image)
+    if not success:
+        raise ValueError('The page could not be encoded as a png image')
+    return buffer.tobytes()
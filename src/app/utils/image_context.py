@@ -0,0 +1,136 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from typing import Callable, Optional, Tuple, Union
+import mmap
+import threading
+import cv2
+import numpy as np
+from app.services.base_image_preprocessor import to_binary, to_grayscale
+from app.utils.image_utils import get_image_dimensions
+
+ImageBuffer = Union[bytes, mmap.mmap]
+
+
+class ImageContext:
+    '''Image of a P&ID shared by the steps of a job, so that it is downloaded and decoded once.
+
+    The image bytes are loaded on first use and the decoded image and its grayscale and binary variants
+    are computed on first use and memoized. They are read-only, code that draws on the image must work
+    on a copy (see `copy_image`). The memory is released by `release` or when leaving the `with` block.
+    '''
+
+    def __init__(self, load_image_bytes: Callable[[], ImageBuffer]):
+        '''Initializes a new instance of the ImageContext class.
+
+        :param load_image_bytes: The function loading the encoded image, e.g. downloading it from the blob storage,
+            as bytes or as a read-only buffer like the memory map of the image file
+        :type load_image_bytes: Callable[[], ImageBuffer]
+        '''
+        self._load_image_bytes = load_image_bytes
+        self._lock = threading.RLock()
+        self._image_bytes: Optional[ImageBuffer] = None
+        self._image: Optional[np.ndarray] = None
+        self._grayscale_image: Optional[np.ndarray] = None
+        self._binary_image: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_bytes(cls, image_bytes: bytes) -> 'ImageContext':
+        '''Creates an image context from the encoded image.
+
+        :param image_bytes: The encoded image
+        :type image_bytes: bytes
+        :return: The image context
+        :rtype: ImageContext
+        '''
+        return cls(lambda: image_bytes)
+
+    def __enter__(self) -> 'ImageContext':
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    @property
+    def image_bytes(self) -> ImageBuffer:
+        '''The encoded image, bytes or a read-only buffer.'''
+        with self._lock:
+            if self._image_bytes is None:
+                self._image_bytes = self._load_image_bytes()
+            return self._image_bytes
+
+    @property
+    def image(self) -> Optional[np.ndarray]:
+        '''The decoded BGR image, read-only, or None if the image can't be decoded (like cv2.imdecode).'''
+        with self._lock:
+            if self._image is None:
+                self._image = _read_only(cv2.imdecode(np.frombuffer(self.image_bytes, np.uint8), cv2.IMREAD_COLOR))
+            return self._image
+
+    @property
+    def grayscale_image(self) -> np.ndarray:
+        '''The grayscale image, read-only.'''
+        with self._lock:
+            if self._grayscale_image is None:
+                self._grayscale_image = _read_only(to_grayscale(self.image))
+            return self._grayscale_image
+
+    @property
+    def binary_image(self) -> np.ndarray:
+        '''The binarized grayscale image (Otsu's method, inverted), read-only.'''
+        with self._lock:
+            if self._binary_image is None:
+                self._binary_image = _read_only(to_binary(self.grayscale_image))
+            return self._binary_image
+
+    @property
+    def height(self) -> int:
+        return self.dimensions[0]
+
+    @property
+    def width(self) -> int:
+        return self.dimensions[1]
+
+    @property
+    def dimensions(self) -> Tuple[int, int]:
+        '''The dimensions (height, width) of the image, read from its header unless it is already decoded.'''
+        with self._lock:
+            if self._image is not None:
+                return self._image.shape[:2]
+            return get_image_dimensions(self.image_bytes)
+
+    def copy_image(self) -> Optional[np.ndarray]:
+        '''Gets a writable copy of the decoded image, e.g. to draw on it.
+
+        :return: The copy of the decoded BGR image, or None if the image can't be decoded
+        :rtype: Optional[np.ndarray]
+        '''
+        image = self.image
+        return image.copy() if image is not None else None
+
+    def release(self):
+        '''Releases the encoded and decoded images, they are loaded again if used afterwards.'''
+        with self._lock:
+            self._image_bytes = None
+            self._image = None
+            self._grayscale_image = None
+            self._binary_image = None
+
+
+def _read_only(image: Optional[np.ndarray]) -> Optional[np.ndarray]:
+    if image is not None:
+        image.flags.writeable = False
+    return image
+
+
+def decode_image(image: Union[bytes, ImageContext]) -> np.ndarray:
+    '''Gets a writable BGR image from the encoded image or from the image context, which decodes it once.
+
+    :param image: The encoded image or the image context
+    :type image: Union[bytes, ImageContext]
+    :return: The decoded BGR image, owned by the caller
+    :rtype: np.ndarray
+    '''
+    if isinstance(image, ImageContext):
+        return image.copy_image()
+
+    return cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
@@ -0,0 +1,143 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from typing import Callable, Iterator, Tuple
+import math
+import cv2
+import numpy as np
+from app.models.bounding_box import BoundingBox
+from app.models.image_tiles_manifest import ImageTilesManifest
+
+
+def get_level_dimensions(manifest: ImageTilesManifest, level: int) -> Tuple[int, int]:
+    '''Gets the dimensions of a level of the pyramid.
+
+    :param manifest: The manifest of the pyramid
+    :type manifest: ImageTilesManifest
+    :param level: The level, 0 being the full resolution
+    :type level: int
+    :return: The dimensions (height, width) of the level
+    :rtype: Tuple[int, int]
+    '''
+    scale = 2 ** level
+    return math.ceil(manifest.height / scale), math.ceil(manifest.width / scale)
+
+
+def build_image_pyramid(
+    image: np.ndarray,
+    tile_size: int
+) -> Tuple[ImageTilesManifest, Iterator[Tuple[int, int, int, np.ndarray]]]:
+    '''Splits the image into tiles at decreasing resolutions.
+
+    :param image: The full resolution image
+    :type image: np.ndarray
+    :param tile_size: The width and height of the tiles, in pixels
+    :type tile_size: int
+    :return: The manifest of the pyramid, and the tiles as (level, row, column, tile) generated level by level
+    :rtype: Tuple[ImageTilesManifest, Iterator[Tuple[int, int, int, np.ndarray]]]
+    '''
+    height, width = image.shape[:2]
+    levels_count = max(math.ceil(math.log2(max(height, width) / tile_size)), 0) + 1
+    manifest = ImageTilesManifest(width=width, height=height, tile_size=tile_size, levels_count=levels_count)
+
+    def generate_tiles():
+        level_image = image
+        for level in range(levels_count):
+            if level > 0:
+                level_height, level_width = get_level_dimensions(manifest, level)
+                level_image = cv2.resize(level_image, (level_width, level_height), interpolation=cv2.INTER_AREA)
+
+            for row in range(math.ceil(level_image.shape[0] / tile_size)):
+                for column in range(math.ceil(level_image.shape[1] / tile_size)):
+                    yield level, row, column, level_image[row * tile_size:(row + 1) * tile_size,
+                                                          column * tile_size:(column + 1) * tile_size]
+
+    return manifest, generate_tiles()
+
+
+def read_image_region(
+    manifest: ImageTilesManifest,
+    load_tile: Callable[[int, int, int], np.ndarray],
+    bounding_box: BoundingBox,
+    max_size: int
+) -> np.ndarray:
+    '''Reads a region of the image from the tiles of the lowest level that holds it in max_size pixels.
+
+    :param manifest: The manifest of the pyramid
+    :type manifest: ImageTilesManifest
+    :param load_tile: The function loading the tile of a level, row and column
+    :type load_tile: Callable[[int, int, int], np.ndarray]
+    :param bounding_box: The normalized coordinates of the region
+    :type bounding_box: BoundingBox
+    :param max_size: The maximum width and height of the region, in pixels
+    :type max_size: int
+    :return: The region of the image, downscaled to fit in max_size pixels
+    :rtype: np.ndarray
+    '''
+    region_width = max((bounding_box.bottomX - bounding_box.topX) * manifest.width, 1)
+    region_height = max((bounding_box.bottomY - bounding_box.topY) * manifest.height, 1)
+    level = 0
+    while level < manifest.levels_count - 1 and max(region_width, region_height) / 2 ** level > max_size:
+        level += 1
+
+    top_x, top_y, bottom_x, bottom_y = _get_pixel_region(bounding_box, *get_level_dimensions(manifest, level))
+
+    region = None
+    tile_size = manifest.tile_size
+    for row in range(top_y // tile_size, (bottom_y - 1) // tile_size + 1):
+        for column in range(top_x // tile_size, (bottom_x - 1) // tile_size + 1):
+            tile = load_tile(level, row, column)
+            if region is None:
+                region = np.zeros((bottom_y - top_y, bottom_x - top_x) + tile.shape[2:], dtype=tile.dtype)
+
+            # intersection of the tile and the region, in level coordinates
+            tile_top_x, tile_top_y = column * tile_size, row * tile_size
+            x0, y0 = max(top_x, tile_top_x), max(top_y, tile_top_y)
+            x1, y1 = min(bottom_x, tile_top_x + tile.shape[1]), min(bottom_y, tile_top_y + tile.shape[0])
+            region[y0 - top_y:y1 - top_y, x0 - top_x:x1 - top_x] = \
+                tile[y0 - tile_top_y:y1 - tile_top_y, x0 - tile_top_x:x1 - tile_top_x]
+
+    return fit_image(region, max_size)
+
+
+def crop_image_region(image: np.ndarray, bounding_box: BoundingBox, max_size: int) -> np.ndarray:
+    '''Crops a region of the full resolution image, when the image has no tiles.
+
+    :param image: The full resolution image
+    :type image: np.ndarray
+    :param bounding_box: The normalized coordinates of the region
+    :type bounding_box: BoundingBox
+    :param max_size: The maximum width and height of the region, in pixels
+    :type max_size: int
+    :return: The region of the image, downscaled to fit in max_size pixels
+    :rtype: np.ndarray
+    '''
+    top_x, top_y, bottom_x, bottom_y = _get_pixel_region(bounding_box, *image.shape[:2])
+
+    return fit_image(image[top_y:bottom_y, top_x:bottom_x], max_size)
+
+
+def fit_image(image: np.ndarray, max_size: int) -> np.ndarray:
+    '''Downscales the image to fit in max_size pixels, keeping its aspect ratio.
+
+    :param image: The image
+    :type image: np.ndarray
+    :param max_size: The maximum width and height of the image, in pixels
+    :type max_size: int
+    :return: The image, downscaled if needed
+    :rtype: np.ndarray
+    '''
+    height, width = image.shape[:2]
+    if max(height, width) <= max_size:
+        return image
+
+    scale = max_size / max(height, width)
+    return cv2.resize(image, (max(round(width * scale), 1), max(round(height * scale), 1)), interpolation=cv2.INTER_AREA)
+
+
+def _get_pixel_region(bounding_box: BoundingBox, height: int, width: int) -> Tuple[int, int, int, int]:
+    # at least one pixel, within the image
+    top_x = min(int(bounding_box.topX * width), width - 1)
+    top_y = min(int(bounding_box.topY * height), height - 1)
+    bottom_x = min(max(math.ceil(bounding_box.bottomX * width), top_x + 1), width)
+    bottom_y = min(max(math.ceil(bounding_box.bottomY * height), top_y + 1), height)
+    return top_x, top_y, bottom_x, bottom_y
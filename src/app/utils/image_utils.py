@@ -1,5 +1,6 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
+import struct
 import cv2
 import numpy as np
 from typing import Optional, Tuple
@@ -59,13 +60,78 @@ def normalize_coordinates(top_x: float, top_y: float, bottom_x: float, bottom_y:
     )
 
 
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+JPEG_START_OF_IMAGE = b'\xff\xd8'
+# start of frame markers, they hold the dimensions of the image (DHT, JPG and DAC share the range but are not frames)
+JPEG_START_OF_FRAME_MARKERS = frozenset(range(0xc0, 0xd0)) - {0xc4, 0xc8, 0xcc}
+# markers without a length and payload: TEM, RST0-7, SOI and EOI
+JPEG_STANDALONE_MARKERS = frozenset([0x01, *range(0xd0, 0xda)])
+JPEG_START_OF_SCAN_MARKER = 0xda
+
+
+def probe_image_dimensions(image_bytes: bytes) -> Optional[Tuple[int, int]]:
+    '''Gets the dimensions of a PNG or JPEG image from its header, without decoding it.
+
+    :param image_bytes: The image bytes, or a buffer supporting slicing like a memory map.
+    :type image_bytes: bytes
+    :return: The image dimensions (height, width), or None if the image is not a PNG or JPEG or its header is invalid.
+    :rtype: Optional[Tuple[int, int]]'''
+    if image_bytes[:len(PNG_SIGNATURE)] == PNG_SIGNATURE:
+        return _probe_png_dimensions(image_bytes)
+    if image_bytes[:len(JPEG_START_OF_IMAGE)] == JPEG_START_OF_IMAGE:
+        return _probe_jpeg_dimensions(image_bytes)
+    return None
+
+
+def _probe_png_dimensions(image_bytes: bytes) -> Optional[Tuple[int, int]]:
+    # the IHDR chunk comes first: length (4 bytes), type (4 bytes), width (4 bytes), height (4 bytes)
+    if len(image_bytes) < 24 or image_bytes[12:16] != b'IHDR':
+        return None
+    width, height = struct.unpack('>II', image_bytes[16:24])
+    return (height, width) if height > 0 and width > 0 else None
+
+
+def _probe_jpeg_dimensions(image_bytes: bytes) -> Optional[Tuple[int, int]]:
+    # walks the segments up to the start of frame: marker (2 bytes) and length (2 bytes, including itself)
+    offset = len(JPEG_START_OF_IMAGE)
+    while offset + 4 <= len(image_bytes):
+        if image_bytes[offset] != 0xff:
+            return None
+        marker = image_bytes[offset + 1]
+        if marker == 0xff:
+            # fill byte
+            offset += 1
+            continue
+        if marker in JPEG_STANDALONE_MARKERS:
+            offset += 2
+            continue
+        if marker == JPEG_START_OF_SCAN_MARKER:
+            return None
+
+        length, = struct.unpack('>H', image_bytes[offset + 2:offset + 4])
+        if marker in JPEG_START_OF_FRAME_MARKERS:
+            # sample precision (1 byte), height (2 bytes), width (2 bytes)
+            if length < 7 or offset + 9 > len(image_bytes):
+                return None
+            height, width = struct.unpack('>HH', image_bytes[offset + 5:offset + 9])
+            return (height, width) if height > 0 and width > 0 else None
+        offset += 2 + length
+    return None
+
+
 def get_image_dimensions(image_bytes: bytes) -> Tuple[int, int]:
     '''Gets the dimensions of the image.
 
+    The dimensions of PNG and JPEG images are read from their header, other images are decoded.
+
     :param image_bytes: The image bytes.
     :type image_bytes: bytes
     :return: The image dimensions.
     :rtype: Tuple[int, int]'''
+    dimensions = probe_image_dimensions(image_bytes)
+    if dimensions is not None:
+        return dimensions
+
     image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), -1)
     h, w = image.shape[:2]
     return h, w
@@ -0,0 +1,86 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from typing import List, Optional
+from multipart.multipart import MultipartParser, parse_options_header
+
+
+class MultipartFileReader:
+    '''Incremental reader of a file field of a multipart/form-data body.
+
+    The body is written chunk by chunk as it is received and the data of the file is returned as soon as
+    it is parsed, so that the file can be processed while the body is still being received, without
+    buffering the body. Only the first file of the field is read.
+    '''
+
+    def __init__(self, content_type: str, field_name: str):
+        '''Initializes a new instance of the MultipartFileReader class.
+
+        :param content_type: The Content-Type header of the request, with the multipart boundary
+        :type content_type: str
+        :param field_name: The name of the file field to read
+        :type field_name: str
+        :raises ValueError: If the content type has no multipart boundary
+        '''
+        _, params = parse_options_header(content_type)
+        if b'boundary' not in params:
+            raise ValueError('Missing boundary in multipart content type')
+
+        self._field_name = field_name.encode('latin-1')
+        self.filename: Optional[str] = None
+        self.file_complete = False
+        self._reading_file = False
+        self._header_name = b''
+        self._header_value = b''
+        self._content_disposition = b''
+        self._data: List[bytes] = []
+        self._parser = MultipartParser(params[b'boundary'], {
+            'on_part_begin': self._on_part_begin,
+            'on_part_data': self._on_part_data,
+            'on_part_end': self._on_part_end,
+            'on_header_field': self._on_header_field,
+            'on_header_value': self._on_header_value,
+            'on_header_end': self._on_header_end,
+            'on_headers_finished': self._on_headers_finished,
+        })
+
+    def write(self, chunk: bytes) -> List[bytes]:
+        '''Parses the next chunk of the body.
+
+        :param chunk: The chunk of the body
+        :type chunk: bytes
+        :return: The data of the file parsed from the chunk, in order
+        :rtype: List[bytes]
+        '''
+        self._parser.write(chunk)
+        data, self._data = self._data, []
+        return data
+
+    def _on_part_begin(self):
+        self._content_disposition = b''
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        if self._header_name.lower() == b'content-disposition':
+            self._content_disposition = self._header_value
+        self._header_name = b''
+        self._header_value = b''
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._content_disposition)
+        if self.filename is None and options.get(b'name') == self._field_name and b'filename' in options:
+            self.filename = options[b'filename'].decode('utf-8', errors='replace')
+            self._reading_file = True
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._reading_file:
+            self._data.append(data[start:end])
+
+    def _on_part_end(self):
+        if self._reading_file:
+            self._reading_file = False
+            self.file_complete = True
@@ -1,6 +1,7 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 from app.models.bounding_box import BoundingBox
+import numpy as np
 import shapely
 
 from app.models.line_detection.line_segment import LineSegment
@@ -57,6 +58,91 @@ def convert_line_to_line_string(line: LineSegment):
     ])
 
 
+def bounding_boxes_to_polygons(bounding_boxes: list[BoundingBox]) -> np.ndarray:
+    '''Converts a list of bounding boxes to an array of polygons in a single call.
+
+    The vertices are in the same order as `bounding_box_to_polygon`, so the
+    resulting geometries are identical to converting each bounding box one by one.
+
+    :param bounding_boxes: The bounding boxes.
+    :type bounding_boxes: list[BoundingBox]
+    :return: The polygons.
+    :rtype: np.ndarray
+    '''
+    return bounding_box_coordinates_to_polygons(bounding_boxes_to_coordinates(bounding_boxes))
+
+
+def bounding_boxes_to_coordinates(bounding_boxes: list[BoundingBox]) -> np.ndarray:
+    '''Converts a list of bounding boxes to an array of coordinates.
+
+    :param bounding_boxes: The bounding boxes.
+    :type bounding_boxes: list[BoundingBox]
+    :return: The coordinates with shape (n, 4), one row of topX, topY, bottomX, bottomY per bounding box.
+    :rtype: np.ndarray
+    '''
+    return np.array([
+        (bounding_box.topX, bounding_box.topY, bounding_box.bottomX, bounding_box.bottomY)
+        for bounding_box in bounding_boxes], dtype=float).reshape(-1, 4)
+
+
+def bounding_box_coordinates_to_polygons(coordinates: np.ndarray) -> np.ndarray:
+    '''Converts an array of bounding box coordinates to an array of polygons in a single call.
+
+    :param coordinates: The coordinates with shape (n, 4), one row of topX, topY, bottomX, bottomY per bounding box.
+    :type coordinates: np.ndarray
+    :return: The polygons.
+    :rtype: np.ndarray
+    '''
+    if len(coordinates) == 0:
+        return np.empty(0, dtype=object)
+
+    top_x, top_y, bottom_x, bottom_y = coordinates.T
+    return shapely.polygons(np.stack([
+        np.stack([top_x, top_y], axis=1),
+        np.stack([bottom_x, top_y], axis=1),
+        np.stack([bottom_x, bottom_y], axis=1),
+        np.stack([top_x, bottom_y], axis=1)
+    ], axis=1))
+
+
+def convert_lines_to_line_strings(lines: list[LineSegment]) -> np.ndarray:
+    '''Converts a list of line segments to an array of line strings in a single call.
+
+    :param lines: The line segments.
+    :type lines: list[LineSegment]
+    :return: The line strings.
+    :rtype: np.ndarray
+    '''
+    return line_coordinates_to_line_strings(lines_to_coordinates(lines))
+
+
+def lines_to_coordinates(lines: list[LineSegment]) -> np.ndarray:
+    '''Converts a list of line segments to an array of coordinates.
+
+    :param lines: The line segments.
+    :type lines: list[LineSegment]
+    :return: The coordinates with shape (n, 4), one row of startX, startY, endX, endY per line segment.
+    :rtype: np.ndarray
+    '''
+    return np.array([
+        (line.startX, line.startY, line.endX, line.endY)
+        for line in lines], dtype=float).reshape(-1, 4)
+
+
+def line_coordinates_to_line_strings(coordinates: np.ndarray) -> np.ndarray:
+    '''Converts an array of line coordinates to an array of line strings in a single call.
+
+    :param coordinates: The coordinates with shape (n, 4), one row of startX, startY, endX, endY per line segment.
+    :type coordinates: np.ndarray
+    :return: The line strings.
+    :rtype: np.ndarray
+    '''
+    if len(coordinates) == 0:
+        return np.empty(0, dtype=object)
+
+    return shapely.linestrings(coordinates.reshape(-1, 2, 2))
+
+
 def get_polygon_sides(polygon: shapely.Polygon) -> list[shapely.LineString]:
 
     """
@@ -0,0 +1,82 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from multiprocessing import shared_memory
+import numpy as np
+
+
+def copy_arrays_to_shared_memory(arrays: dict[str, np.ndarray]) -> tuple[shared_memory.SharedMemory, dict]:
+    '''Copies the given arrays into a single shared memory block.
+
+    The caller owns the returned block and is responsible for closing and unlinking it
+    once the readers are done with it.
+
+    :param arrays: The arrays to copy, by name.
+    :type arrays: dict[str, np.ndarray]
+    :return: The shared memory block and its layout (name -> (offset, shape, dtype)),
+        which is what the readers need besides the block name to get the arrays back.
+    :rtype: tuple[shared_memory.SharedMemory, dict]
+    '''
+    layout = {}
+    size = 0
+    for name, array in arrays.items():
+        layout[name] = (size, array.shape, array.dtype.str)
+        size += array.nbytes
+
+    # a shared memory block can't be empty
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    for name, array in arrays.items():
+        offset, shape, dtype = layout[name]
+        np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)[...] = array
+
+    return shm, layout
+
+
+def read_arrays_from_shared_memory(shared_memory_name: str, layout: dict) -> dict[str, np.ndarray]:
+    '''Reads the arrays from a shared memory block created by `copy_arrays_to_shared_memory`.
+
+    The arrays are copied out of the block, so the block is not kept open by the reader.
+
+    :param shared_memory_name: The name of the shared memory block.
+    :type shared_memory_name: str
+    :param layout: The layout returned by `copy_arrays_to_shared_memory`.
+    :type layout: dict
+    :return: The arrays, by name.
+    :rtype: dict[str, np.ndarray]
+    '''
+    shm = shared_memory.SharedMemory(name=shared_memory_name)
+    try:
+        return {
+            name: np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset).copy()
+            for name, (offset, shape, dtype) in layout.items()
+        }
+    finally:
+        shm.close()
+
+
+def read_array_region_from_shared_memory(shared_memory_name: str, layout: dict, name: str,
+                                         region: tuple[slice, ...]) -> np.ndarray:
+    '''Reads a region of an array from a shared memory block created by `copy_arrays_to_shared_memory`.
+
+    Only the region is copied out of the block, e.g. a tile of an image shared by the workers processing its tiles.
+
+    :param shared_memory_name: The name of the shared memory block.
+    :type shared_memory_name: str
+    :param layout: The layout returned by `copy_arrays_to_shared_memory`.
+    :type layout: dict
+    :param name: The name of the array.
+    :type name: str
+    :param region: The slices of the region, one per dimension.
+    :type region: tuple[slice, ...]
+    :return: A contiguous copy of the region.
+    :rtype: np.ndarray
+    '''
+    offset, shape, dtype = layout[name]
+    shm = shared_memory.SharedMemory(name=shared_memory_name)
+    try:
+        array = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+        region_array = array[region].copy()
+        # the view must be released before the block is closed
+        del array
+        return region_array
+    finally:
+        shm.close()